@@ -51,6 +51,7 @@ from .schemas import (
     RawDataTagRequest,
     ProcessingStatusRequest,
     AIStatusRequest,
+    ExportJobRequest,
     RawDataResponse,
     RawDataListResponse,
     # Raw Data Upload
@@ -60,6 +61,12 @@ from .schemas import (
     UploadDataRequest,
     UploadFileResponse,
     UploadDataResponse,
+    UploadBatchRequest,
+    UploadBatchItemResult,
+    UploadBatchResponse,
+    ResumableUploadInitRequest,
+    PresignedUploadInitRequest,
+    PresignedUploadConfirmRequest,
     # API Key
     ApiKeyCreateRequest,
     ApiKeyUpdateRequest,
@@ -109,6 +116,7 @@ __all__ = [
     "RawDataTagRequest",
     "ProcessingStatusRequest",
     "AIStatusRequest",
+    "ExportJobRequest",
     "RawDataResponse",
     "RawDataListResponse",
     # Schemas - Raw Data Upload
@@ -118,6 +126,12 @@ __all__ = [
     "UploadDataRequest",
     "UploadFileResponse",
     "UploadDataResponse",
+    "UploadBatchRequest",
+    "UploadBatchItemResult",
+    "UploadBatchResponse",
+    "ResumableUploadInitRequest",
+    "PresignedUploadInitRequest",
+    "PresignedUploadConfirmRequest",
     # Schemas - API Key
     "ApiKeyCreateRequest",
     "ApiKeyUpdateRequest",
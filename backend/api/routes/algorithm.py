@@ -191,8 +191,11 @@ async def upload_algorithm(
         
         # 上传到 MinIO
         from storage.minio_client import minio_client
+        from storage.async_storage import get_async_storage
         minio_path = f"{algorithm_uuid}/{file.filename}"
-        minio_client.upload_file(
+        await get_async_storage().run(
+            "put_object",
+            minio_client.upload_file,
             bucket=MINIO_BUCKET,
             object_name=minio_path,
             data=file_content,
@@ -357,7 +360,10 @@ async def delete_algorithm(
         if algorithm.minio_path:
             try:
                 from storage.minio_client import minio_client
-                minio_client.remove_object(MINIO_BUCKET, algorithm.minio_path)
+                from storage.async_storage import get_async_storage
+                await get_async_storage().run(
+                    "remove_object", minio_client.remove_object, MINIO_BUCKET, algorithm.minio_path
+                )
             except Exception as e:
                 logger.warning(f"删除MinIO文件失败: {e}")
         
@@ -492,7 +498,7 @@ async def download_algorithm(
         
         # 获取文件 - 使用流式传输避免内存问题
         from storage.minio_client import minio_client
-        from minio.datatypes import Object
+        from storage.async_storage import get_async_storage
         import urllib.parse
         
         # 对中文文件名进行 RFC 5987 编码（在try块之前定义，确保except块可用）
@@ -502,34 +508,22 @@ async def download_algorithm(
         # 使用简化的 ASCII 文件名用于传统 filename，同时提供 RFC 5987 格式
         safe_filename = f"algorithm_{algorithm.uuid[:8]}_v{algorithm.version}.zip"
         
+        storage = get_async_storage()
+
         try:
-            # 获取文件信息和大小
-            import math
-            
             # 创建流式响应
             from fastapi.responses import StreamingResponse
-            import io
             
             # 获取文件流
-            response = minio_client._client.get_object(MINIO_BUCKET, algorithm.minio_path)
-            
-            # 创建流式响应，逐块传输数据
-            async def file_streamer():
-                try:
-                    # 使用较小的块大小，避免内存问题
-                    chunk_size = 1024 * 1024  # 1MB
-                    while True:
-                        chunk = response.read(chunk_size)
-                        if not chunk:
-                            break
-                        yield chunk
-                finally:
-                    response.close()
-                    response.release_conn()
+            response = await storage.run(
+                "get_object", minio_client._client.get_object, MINIO_BUCKET, algorithm.minio_path
+            )
             
             # 获取文件大小以设置Content-Length（如果知道）
             try:
-                stat = minio_client._client.stat_object(MINIO_BUCKET, algorithm.minio_path)
+                stat = await storage.run(
+                    "stat_object", minio_client._client.stat_object, MINIO_BUCKET, algorithm.minio_path
+                )
                 content_length = stat.size
                 headers = {
                     "Content-Disposition": f"attachment; filename=\"{safe_filename}\"; filename*=utf-8''{encoded_filename}",
@@ -543,8 +537,9 @@ async def download_algorithm(
                     "Content-Type": "application/zip"
                 }
             
+            # 逐块传输数据（每次读取在存储线程池中执行，不阻塞事件循环）
             return StreamingResponse(
-                file_streamer(),
+                storage.iter_response(response),
                 media_type="application/zip",
                 headers=headers
             )
@@ -552,7 +547,7 @@ async def download_algorithm(
         except Exception as e:
             logger.error(f"获取或流式传输文件失败: {str(e)}")
             # 回退到旧方法
-            file_data = minio_client.get_object(MINIO_BUCKET, algorithm.minio_path)
+            file_data = await storage.run("get_object", minio_client.get_object, MINIO_BUCKET, algorithm.minio_path)
             
             from fastapi.responses import StreamingResponse
             import io
@@ -25,10 +25,13 @@ async def list_logs(
     source: Optional[str] = Query(None, description="来源模糊搜索"),
     date_from: Optional[str] = Query(None, description="开始日期 YYYY-MM-DD"),
     date_to: Optional[str] = Query(None, description="结束日期 YYYY-MM-DD"),
+    count_mode: str = Query("auto", pattern="^(exact|estimate|cached|auto)$", description="总数计数方式"),
     current_user: User = Depends(get_current_user),
 ):
     """
     分页查询当前用户的系统日志
+
+    返回的 count_mode 表示 total 的来源：exact（精确计数）/ estimate（规划器估算）/ cached（缓存的精确计数）
     """
     db = None
     try:
@@ -41,6 +44,7 @@ async def list_logs(
             source=source,
             date_from=date_from,
             date_to=date_to,
+            count_mode=count_mode,
         )
         return result
     except Exception as e:
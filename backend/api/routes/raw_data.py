@@ -5,26 +5,28 @@
 注意：每个用户有独立的数据库，不需要 user_id 验证
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File, Form, Header
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, UploadFile, File, Form, Header
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
 import logging
 import uuid
-import io
 logger = logging.getLogger(__name__)
-from PIL import Image
 
 from ..routes.auth import get_current_user, get_current_user_from_api_key
 
 from database.db_models.meta_model import User
-from database.db_models.user_models import RawData, CollectionSession, Field, Device
+from database.db_models.user_models import RawData
 from database.user_db_manager import get_user_db, get_current_user_db
 from database.main_db import get_meta_db
-from sqlalchemy import desc
 from database.db_services.raw_data_service import (
     create_raw_data,
+    create_raw_data_batch,
+    check_sessions_writable,
+    build_raw_data_row,
     get_raw_data_by_id,
     get_raw_data_list_for_frontend,
     update_processing_status,
@@ -34,14 +36,42 @@ from database.db_services.raw_data_service import (
     get_session_data_types,
     get_raw_data_statistics,
     get_overview_statistics,
-    get_timeseries_data
+    get_timeseries_data,
+    delete_raw_data
 )
 from database.db_services.log_service import create_log
+from database.db_services.storage_object_service import (
+    STORAGE_DEDUP_ENABLED,
+    find_shared_thumbnails,
+    release_object,
+    store_deduplicated
+)
+from database.db_services.upload_service import (
+    RESUMABLE_MAX_PART_SIZE,
+    UPLOAD_STATUS,
+    ResumableUploadError,
+    abort_resumable_upload,
+    complete_resumable_upload,
+    compute_upload_checksum,
+    confirm_presigned_upload,
+    get_resumable_upload,
+    init_presigned_upload,
+    init_resumable_upload,
+    upload_resumable_part
+)
+from database.db_services.export_service import (
+    COLUMNAR_EXPORT_FORMATS,
+    EXPORT_FORMATS,
+    HAS_PYARROW,
+    EXPORT_MEDIA_TYPES,
+    stream_raw_data_export
+)
 from ..schemas.raw_data import (
     RawDataRequest,
     RawDataTagRequest,
     ProcessingStatusRequest,
-    AIStatusRequest
+    AIStatusRequest,
+    ExportJobRequest
 )
 from ..schemas.raw_data_upload import (
     DataType,
@@ -49,13 +79,47 @@ from ..schemas.raw_data_upload import (
     UploadDataRequest,
     UploadFileResponse,
     UploadDataResponse,
-    SUBTYPE_UNIT_MAP
+    UploadBatchRequest,
+    UploadBatchItemResult,
+    UploadBatchResponse,
+    ResumableUploadInitRequest,
+    PresignedUploadInitRequest,
+    PresignedUploadConfirmRequest,
+    SUBTYPE_UNIT_MAP,
+    NUMERIC_SUBTYPES_MAP
 )
-from storage.storage_manager import get_storage_manager
+from storage.async_storage import get_async_storage
+from storage.disk_cache import get_disk_cache
 from utils.image_processor import get_image_processor
+from utils.ingest_queue import get_ingest_queue, get_default_ingest_mode, IngestQueueFullError
+from utils.export_jobs import get_export_job_manager
+from utils.http_cache import (
+    RangeNotSatisfiable,
+    cache_headers,
+    etag_for_bytes,
+    if_range_matches,
+    is_not_modified,
+    make_etag,
+    not_modified_response,
+    parse_range,
+    to_http_date
+)
+from utils.thumbnail_service import (
+    ThumbnailPoolBusyError,
+    get_thumbnail_render_pool,
+    is_thumbnail_source,
+    schedule_thumbnails,
+    select_thumbnail
+)
 
 router = APIRouter(prefix="/raw-data", tags=["原始数据"])
 
+# 文件类型（存储在 MinIO 中）的数据子类型
+FILE_SUBTYPES = [
+    DataSubType.RGB, DataSubType.NIR, DataSubType.RED_EDGE,
+    DataSubType.THERMAL, DataSubType.MULTISPECTRAL, DataSubType.VIDEO
+]
+
 
 @router.post("/", summary="添加原始数据")
 async def create_new_raw_data(
@@ -150,7 +214,8 @@ async def get_raw_data_statistics_endpoint(
     data_type: Optional[str] = Query(None, description="数据类型过滤"),
     data_subtype: Optional[str] = Query(None, description="数据子类型过滤"),
     start_time: Optional[str] = Query(None, description="开始时间（ISO格式）"),
-    end_time: Optional[str] = Query(None, description="结束时间（ISO格式）"),
+    end_time: Optional[str] = Query(None, description="结束时间（ISO格式，不包含）"),
+    count_mode: str = Query("auto", pattern="^(exact|estimate|cached|auto)$", description="exact 时跳过结果缓存重新统计，其他值优先使用缓存"),
     user_id: str = Query("3d5e8a9f-1fc1-4374-8afe-1277b4e0b175", description="用户ID")
 ):
     """
@@ -158,6 +223,7 @@ async def get_raw_data_statistics_endpoint(
 
     该接口直接在数据库层面进行聚合统计，不需要分页限制，
     返回统计数据而非数据列表，性能更好。
+    结果按过滤条件缓存，涉及的会话写入新数据后自动失效。
 
     返回数据包括：
     - total_records: 总记录数
@@ -166,6 +232,7 @@ async def get_raw_data_statistics_endpoint(
     - min_values: 各数据类型的最小值
     - max_values: 各数据类型的最大值
     - session_count: 涉及的会话数量
+    - count_mode: 结果来源（exact 为本次统计，cached 为缓存结果）
     """
     # 连接到用户数据库
     db = get_user_db(user_id)
@@ -197,7 +264,8 @@ async def get_raw_data_statistics_endpoint(
             data_type=data_type,
             data_subtype=data_subtype,
             start_time=parsed_start_time,
-            end_time=parsed_end_time
+            end_time=parsed_end_time,
+            count_mode=count_mode
         )
 
         return {"code": 200, "message": "success", "data": result}
@@ -213,8 +281,10 @@ async def get_timeseries_data_endpoint(
     session_ids: Optional[str] = Query(None, description="会话ID列表，用逗号分隔"),
     data_subtypes: Optional[str] = Query(None, description="数据子类型列表，用逗号分隔，如 temperature,humidity"),
     start_time: Optional[str] = Query(None, description="开始时间（ISO格式）"),
-    end_time: Optional[str] = Query(None, description="结束时间（ISO格式）"),
+    end_time: Optional[str] = Query(None, description="结束时间（ISO格式，不包含）"),
     limit: int = Query(200, ge=10, le=1000, description="每个子类型最多返回的数据点数"),
+    resolution: str = Query("auto", pattern="^(auto|raw|1m|1h|1d)$", description="数据粒度：auto/raw/1m/1h/1d"),
+    downsample: Optional[str] = Query(None, pattern="^(lttb|minmax)$", description="降采样算法：lttb/minmax（可选），在整个时间范围内选取 limit 个代表点"),
     user_id: str = Query("3d5e8a9f-1fc1-4374-8afe-1277b4e0b175", description="用户ID")
 ):
     """
@@ -222,6 +292,12 @@ async def get_timeseries_data_endpoint(
 
     按 data_subtype 分组返回时间-数值对，支持按会话、子类型、时间范围过滤。
     专为温度、湿度、CO2、光照等数值型数据的折线图优化。
+
+    resolution=auto 时，时间跨度较短或原始点数不多时返回原始数据，否则自动选择 1分钟/1小时/1天 聚合粒度；
+    聚合数据点的 value 为桶内均值，并附带 min/max/count，只包含完全落在时间范围内的时间桶。
+
+    指定 downsample 时，每条曲线返回覆盖整个时间范围的 limit 个代表点，
+    而不是最早的 limit 个点（resolution=raw 时对原始数据流式降采样）。
     """
     db = get_user_db(user_id)
     try:
@@ -252,7 +328,9 @@ async def get_timeseries_data_endpoint(
             data_subtypes=subtype_list,
             start_time=parsed_start_time,
             end_time=parsed_end_time,
-            limit=limit
+            limit=limit,
+            resolution=resolution,
+            downsample=downsample
         )
 
         return {"code": 200, "message": "success", "data": result}
@@ -270,6 +348,10 @@ async def get_raw_data_list(
     session_id: Optional[str] = Query(None, description="会话ID过滤"),
     data_type: Optional[str] = Query(None, description="数据类型过滤"),
     data_subtype: Optional[str] = Query(None, description="数据子类型过滤"),
+    pagination: str = Query("offset", pattern="^(offset|cursor)$", description="分页方式：offset（页码）/ cursor（游标）"),
+    cursor: Optional[str] = Query(None, description="游标分页：上一页返回的 next_cursor，首页不传"),
+    include_total: Optional[bool] = Query(None, description="是否返回总数（offset 模式默认返回，cursor 模式默认不返回）"),
+    count_mode: str = Query("auto", pattern="^(exact|estimate|cached|auto)$", description="总数计数方式：exact / estimate / cached / auto"),
     user_id: str = Query("3d5e8a9f-1fc1-4374-8afe-1277b4e0b175", description="用户ID")
 ):
     """
@@ -281,7 +363,23 @@ async def get_raw_data_list(
     - 数据类型 (data_type)
     - 数据值 (data_value) - 图像显示缩略图，数值显示单位
     - 操作按钮 - 删除和详情
+
+    分页方式：
+    - offset（默认）：按 page 分页
+    - cursor：传入上一页的 next_cursor 获取下一页，翻页开销与页深无关；
+      传入 cursor 时自动使用游标分页
+
+    总数计数方式（count_mode）：
+    - exact：精确 COUNT(*)
+    - estimate：查询规划器估算值，不扫描数据
+    - cached：精确计数结果缓存，数据写入后失效
+    - auto（默认）：小表精确计数，大表使用缓存
     """
+    if cursor:
+        pagination = "cursor"
+    if include_total is None:
+        include_total = pagination == "offset"
+
     # 连接到用户数据库
     db = get_user_db(user_id)
     try:
@@ -291,8 +389,14 @@ async def get_raw_data_list(
             page_size=page_size,
             session_id=session_id,
             data_type=data_type,
-            data_subtype=data_subtype
+            data_subtype=data_subtype,
+            pagination=pagination,
+            cursor=cursor,
+            include_total=include_total,
+            count_mode=count_mode
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     finally:
         db.close()
 
@@ -301,11 +405,14 @@ async def get_raw_data_list(
 
 @router.get("/overview", summary="获取概览统计数据")
 async def get_overview_statistics_endpoint(
+    refresh: bool = Query(False, description="是否跳过缓存快照重新统计"),
     current_user: User = Depends(get_current_user)
 ):
     """
     获取概览页面的统计数据
 
+    结果为按用户缓存的快照（snapshot_time 为生成时间），设备/任务/数据写入后自动刷新。
+
     返回数据包括：
     - total_devices: 设备总数
     - active_devices: 在线设备数
@@ -324,7 +431,7 @@ async def get_overview_statistics_endpoint(
         print(f"[概览API] 数据库连接成功")
 
         # 获取概览统计信息
-        result = get_overview_statistics(db)
+        result = get_overview_statistics(db, use_cache=not refresh)
 
         # 用 MQTT 设备管理器的实时在线数覆盖静态字段
         try:
@@ -361,7 +468,7 @@ async def get_overview_statistics_endpoint(
 
 @router.get("/export", summary="导出原始数据")
 async def export_raw_data(
-    format: str = Query('csv', description="导出格式: csv/json/zip"),
+    format: str = Query('csv', description="导出格式: csv/json/zip/parquet/arrow"),
     session_id: Optional[str] = Query(None, description="会话ID过滤"),
     data_type: Optional[str] = Query(None, description="数据类型过滤"),
     data_subtype: Optional[str] = Query(None, description="数据子类型过滤"),
@@ -370,22 +477,25 @@ async def export_raw_data(
     """
     导出原始数据
 
-    支持三种格式：
+    支持以下格式：
     - csv: 数值数据CSV表格，适合Excel分析
-    - json: 完整数据JSON格式，包含所有字段
+    - json: 完整数据JSON格式，包含所有字段（紧凑输出，total_count 位于末尾）
     - zip: 文件数据打包，包含原始文件和CSV元数据
+    - parquet: 列式 Parquet 文件（zstd 压缩），适合 pandas / 数据分析工具直接读取
+    - arrow: Arrow IPC 流格式，可用 pyarrow.ipc.open_stream 读取
 
+    均为流式响应，按批读取数据库并边读边发送，内存占用与导出行数无关；
+    zip 格式由有界线程池并发下载文件，JPEG/PNG/MP4 等已压缩格式不再重复压缩。
     返回二进制数据流，自动设置正确的Content-Type和Content-Disposition
     """
-    import csv
-    import io
-    import zipfile
-    import json
-    from typing import Dict, Any, List
-
     logger.info(f"[导出数据] 开始导出，用户ID: {user_id}, 格式: {format}")
     logger.info(f"[导出数据] 过滤条件: session_id={session_id}, data_type={data_type}, data_subtype={data_subtype}")
 
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}，支持的格式: csv/json/zip/parquet/arrow")
+    if format in COLUMNAR_EXPORT_FORMATS and not HAS_PYARROW:
+        raise HTTPException(status_code=400, detail=f"服务器未安装 pyarrow，暂不支持 {format} 格式导出")
+
     # 连接到用户数据库
     try:
         db = get_user_db(user_id)
@@ -394,330 +504,138 @@ async def export_raw_data(
         logger.error(f"[导出数据] 数据库连接失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"数据库连接失败: {str(e)}")
 
+    # 流式导出：生成器通过服务端游标分批读取并负责关闭数据库会话
+    filename = f"raw_data_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        stream_raw_data_export(
+            db=db,
+            format=format,
+            user_id=user_id,
+            session_id=session_id,
+            data_type=data_type,
+            data_subtype=data_subtype
+        ),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            'Content-Disposition': f'attachment; filename*=UTF-8\'\'{filename}'
+        },
+        # 客户端在开始读取前断开时生成器不会执行，兜底关闭会话
+        background=BackgroundTask(db.close)
+    )
+
+
+def _export_job_response(job: dict) -> dict:
+    """导出任务状态（不含内部字段），已完成的任务附带预签名下载地址"""
+    data = {k: v for k, v in job.items() if k not in ("user_id", "object_key")}
+    data["download_url"] = get_export_job_manager().get_download_url(job)
+    return data
+
+
+@router.post("/exports", summary="创建后台导出任务")
+async def create_export_job(
+    request: ExportJobRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    创建后台导出任务
+
+    任务由后台线程池执行，导出文件通过分片上传写入对象存储，接口立即返回 202 和任务ID。
+    通过 GET /exports/{job_id} 轮询进度（rows_done / bytes_written），完成后返回预签名下载地址。
+    """
+    if request.format in COLUMNAR_EXPORT_FORMATS and not HAS_PYARROW:
+        raise HTTPException(status_code=400, detail=f"服务器未安装 pyarrow，暂不支持 {request.format} 格式导出")
+
+    user_id = str(current_user.userid)
     try:
-        # 构建查询
-        query = db.query(RawData)
+        job = await run_in_threadpool(
+            get_export_job_manager().submit,
+            user_id=user_id,
+            format=request.format,
+            filters={
+                "session_id": request.session_id,
+                "data_type": request.data_type,
+                "data_subtype": request.data_subtype
+            }
+        )
+    except Exception as e:
+        logger.error(f"[导出任务] 创建失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"创建导出任务失败: {str(e)}")
 
-        if session_id:
-            query = query.filter(RawData.session_id == session_id)
-        if data_type:
-            query = query.filter(RawData.data_type == data_type)
-        if data_subtype:
-            query = query.filter(RawData.data_subtype == data_subtype)
+    return JSONResponse(status_code=202, content={
+        "code": 202,
+        "message": "accepted",
+        "data": _export_job_response(job)
+    })
 
-        # 按时间倒序
-        query = query.order_by(desc(RawData.capture_time))
-        raw_data_list = query.all()
 
-        logger.info(f"[导出数据] 共获取 {len(raw_data_list)} 条数据，格式: {format}")
+@router.get("/exports/{job_id}", summary="查询导出任务状态")
+async def get_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_current_user_db)
+):
+    """
+    查询导出任务状态
 
-        # 记录操作日志
-        try:
-            create_log(db, "info", "data.export",
-                       f"用户 {user_id} 导出数据: {format} 格式, {len(raw_data_list)} 条",
-                       detail=f"过滤条件: session_id={session_id}, data_type={data_type}, data_subtype={data_subtype}")
-        except Exception:
-            pass
+    返回 status（pending/running/completed/failed）、rows_done、bytes_written，
+    任务完成时 download_url 为预签名下载地址。任务状态保存在用户数据库中，任意 worker 都能查询。
+    """
+    job = await run_in_threadpool(get_export_job_manager().get, db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="导出任务不存在或已过期")
 
-        if format == 'csv':
-            # 导出CSV格式
-            output = io.StringIO()
-            writer = csv.writer(output)
-
-            # 写入表头
-            writer.writerow([
-                '数据ID', '采集时间', '任务名称', '地块名称', '设备名称',
-                '数据类型', '数据子类型', '数据值', '数据单位', '数据格式',
-                '质量评分', '位置', '高度(m)', '朝向(°)',
-                '处理状态', 'AI状态', '是否有效'
-            ])
-
-            # 写入数据行
-            for item in raw_data_list:
-                # 获取关联信息
-                session = db.query(CollectionSession).filter(
-                    CollectionSession.id == item.session_id
-                ).first() if item.session_id else None
-
-                field = None
-                device = None
-                if session:
-                    field = db.query(Field).filter(Field.id == session.field_id).first() if session.field_id else None
-                    device = db.query(Device).filter(Device.id == session.device_id).first() if session.device_id else None
-
-                writer.writerow([
-                    item.id,
-                    item.capture_time.strftime('%Y-%m-%d %H:%M:%S') if item.capture_time else '',
-                    session.mission_name if session else '',
-                    field.name if field else '',
-                    device.name if device else '',
-                    item.data_type,
-                    item.data_subtype or '',
-                    item.data_value or '',
-                    item.data_unit or '',
-                    item.data_format or '',
-                    f'{item.quality_score:.2f}' if item.quality_score else '',
-                    item.location_geom if item.location_geom else '',
-                    item.altitude_m if item.altitude_m else '',
-                    item.heading if item.heading else '',
-                    item.processing_status or '',
-                    item.ai_status or '',
-                    '是' if item.is_valid else '否'
-                ])
-
-            csv_content = output.getvalue()
-            output.close()
-
-            # 生成文件名
-            filename = f"raw_data_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-
-            return Response(
-                content=csv_content,
-                media_type='text/csv; charset=utf-8-sig',
-                headers={
-                    'Content-Disposition': f'attachment; filename*=UTF-8\'\'{filename}',
-                    'Content-Type': 'text/csv; charset=utf-8-sig'
-                }
-            )
+    return {"code": 200, "message": "success", "data": _export_job_response(job)}
 
-        elif format == 'json':
-            # 导出JSON格式
-            export_data = []
 
-            # 安全序列化函数（放在循环外部复用）
-            def safe_isoformat(val):
-                if val is None:
-                    return None
-                try:
-                    if hasattr(val, 'isoformat'):
-                        return val.isoformat()
-                    return str(val)
-                except Exception:
-                    return str(val)
+@router.get("/ingest/stats", summary="获取异步写入队列状态")
+async def get_ingest_queue_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取当前用户异步写入队列的状态
 
-            def safe_value(val):
-                if val is None:
-                    return None
-                try:
-                    if isinstance(val, (str, int, float, bool)):
-                        return val
-                    if hasattr(val, 'isoformat'):  # datetime
-                        return val.isoformat()
-                    if isinstance(val, dict):
-                        return {k: safe_value(v) for k, v in val.items()}
-                    if isinstance(val, (list, tuple)):
-                        return [safe_value(v) for v in val]
-                    return str(val)
-                except Exception:
-                    return str(val)
+    返回队列深度、累计入队/写入/丢弃/拒绝条数，以及全局刷写延迟统计。
+    """
+    try:
+        stats = get_ingest_queue().stats(user_id=str(current_user.userid))
+        return {"code": 200, "message": "success", "data": stats}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取写入队列状态失败: {str(e)}")
 
-            for item in raw_data_list:
-                try:
-                    # 获取关联信息
-                    session = db.query(CollectionSession).filter(
-                        CollectionSession.id == item.session_id
-                    ).first() if item.session_id else None
-
-                    field = None
-                    device = None
-                    if session:
-                        field = db.query(Field).filter(Field.id == session.field_id).first() if session.field_id else None
-                        device = db.query(Device).filter(Device.id == session.device_id).first() if session.device_id else None
-
-                    export_data.append({
-                        'id': str(item.id) if item.id else None,
-                        'capture_time': safe_isoformat(item.capture_time),
-                        'session': {
-                            'id': str(session.id) if session else None,
-                            'mission_name': session.mission_name if session else None,
-                            'mission_type': session.mission_type if session else None
-                        },
-                        'field': {
-                            'id': str(field.id) if field else None,
-                            'name': field.name if field else None
-                        },
-                        'device': {
-                            'id': str(device.id) if device else None,
-                            'name': device.name if device else None,
-                            'type': device.device_type if device else None
-                        },
-                        'data_type': str(item.data_type) if item.data_type else None,
-                        'data_subtype': str(item.data_subtype) if item.data_subtype else None,
-                        'data_value': str(item.data_value) if item.data_value else None,
-                        'data_unit': str(item.data_unit) if item.data_unit else None,
-                        'data_format': str(item.data_format) if item.data_format else None,
-                        'bucket_name': str(item.bucket_name) if item.bucket_name else None,
-                        'object_key': str(item.object_key) if item.object_key else None,
-                        'location': {
-                            'geom': str(item.location_geom) if item.location_geom else None,
-                            'altitude_m': float(item.altitude_m) if item.altitude_m else None,
-                            'heading': float(item.heading) if item.heading else None
-                        },
-                        'metadata': {
-                            'sensor_meta': safe_value(item.sensor_meta),
-                            'file_meta': safe_value(item.file_meta),
-                            'acquisition_meta': safe_value(item.acquisition_meta)
-                        },
-                        'quality': {
-                            'score': float(item.quality_score) if item.quality_score else None,
-                            'flags': safe_value(item.quality_flags),
-                            'is_valid': bool(item.is_valid) if item.is_valid is not None else None,
-                            'validation_notes': str(item.validation_notes) if item.validation_notes else None
-                        },
-                        'status': {
-                            'processing': str(item.processing_status) if item.processing_status else None,
-                            'ai': str(item.ai_status) if item.ai_status else None
-                        },
-                        'created_at': safe_isoformat(item.created_at)
-                    })
-                except Exception as e:
-                    logger.warning(f"[导出JSON] 处理单条数据失败: {e}, item_id={item.id}")
-                    continue  # 跳过有问题的记录
-
-            json_content = json.dumps({
-                'export_time': datetime.now().isoformat(),
-                'total_count': len(export_data),
-                'filters': {
-                    'session_id': session_id,
-                    'data_type': data_type,
-                    'data_subtype': data_subtype
-                },
-                'data': export_data
-            }, ensure_ascii=False, indent=2)
-
-            filename = f"raw_data_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-
-            return Response(
-                content=json_content,
-                media_type='application/json; charset=utf-8',
-                headers={
-                    'Content-Disposition': f'attachment; filename*=UTF-8\'\'{filename}',
-                    'Content-Type': 'application/json; charset=utf-8'
-                }
-            )
 
-        elif format == 'zip':
-            # 导出ZIP格式（包含文件数据+元数据）
-            output = io.BytesIO()
-
-            with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                # 1. 写入元数据CSV
-                csv_output = io.StringIO()
-                writer = csv.writer(csv_output)
-                writer.writerow([
-                    '数据ID', '文件名', '采集时间', '任务名称', '数据类型', '数据子类型',
-                    '质量评分', '原始路径', '新文件名'
-                ])
-
-                files_written = 0
-                for item in raw_data_list:
-                    session = db.query(CollectionSession).filter(
-                        CollectionSession.id == item.session_id
-                    ).first() if item.session_id else None
-
-                    # 如果有文件，下载并添加到ZIP
-                    if item.object_key and item.bucket_name:
-                        try:
-                            from storage.storage_manager import get_storage_manager
-                            storage = get_storage_manager()
-
-                            # 获取文件内容
-                            file_result = storage._get_file_bytes_direct(item.object_key)
-                            if file_result and file_result.get('success'):
-                                # 生成新文件名
-                                original_name = item.object_key.split('/')[-1] if item.object_key else f'{item.id}'
-                                ext = item.data_format or original_name.split('.')[-1] if '.' in original_name else 'bin'
-                                new_name = f"files/{item.data_subtype or item.data_type}_{files_written + 1}.{ext}"
-
-                                # 写入ZIP
-                                zip_file.writestr(new_name, file_result['data'])
-                                files_written += 1
-
-                                writer.writerow([
-                                    item.id,
-                                    original_name,
-                                    item.capture_time.strftime('%Y-%m-%d %H:%M:%S') if item.capture_time else '',
-                                    session.mission_name if session else '',
-                                    item.data_type,
-                                    item.data_subtype or '',
-                                    f'{item.quality_score:.2f}' if item.quality_score else '',
-                                    item.object_key,
-                                    new_name
-                                ])
-                        except Exception as e:
-                            logger.warning(f"[导出ZIP] 下载文件失败 {item.object_key}: {e}")
-                            writer.writerow([
-                                item.id,
-                                item.object_key.split('/')[-1] if item.object_key else '',
-                                item.capture_time.strftime('%Y-%m-%d %H:%M:%S') if item.capture_time else '',
-                                session.mission_name if session else '',
-                                item.data_type,
-                                item.data_subtype or '',
-                                f'{item.quality_score:.2f}' if item.quality_score else '',
-                                item.object_key,
-                                '[文件下载失败]'
-                            ])
-
-                # 将CSV写入ZIP
-                zip_file.writestr('metadata.csv', csv_output.getvalue())
-                csv_output.close()
-
-                # 2. 写入摘要JSON
-                summary = {
-                    'export_time': datetime.now().isoformat(),
-                    'total_records': len(raw_data_list),
-                    'files_included': files_written,
-                    'filters': {
-                        'session_id': session_id,
-                        'data_type': data_type,
-                        'data_subtype': data_subtype
-                    },
-                    'data_types': {},
-                    'data_subtypes': {}
-                }
-
-                for item in raw_data_list:
-                    dt = item.data_type or 'unknown'
-                    dst = item.data_subtype or 'unknown'
-                    summary['data_types'][dt] = summary['data_types'].get(dt, 0) + 1
-                    summary['data_subtypes'][dst] = summary['data_subtypes'].get(dst, 0) + 1
-
-                zip_file.writestr('summary.json', json.dumps(summary, ensure_ascii=False, indent=2))
-
-            zip_content = output.getvalue()
-            output.close()
-
-            filename = f"raw_data_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-
-            return Response(
-                content=zip_content,
-                media_type='application/zip',
-                headers={
-                    'Content-Disposition': f'attachment; filename*=UTF-8\'\'{filename}',
-                    'Content-Type': 'application/zip'
-                }
-            )
+@router.get("/thumbnails/stats", summary="获取缩略图渲染池状态")
+async def get_thumbnail_render_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取缩略图渲染池的状态
 
-        else:
-            raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}，支持的格式: csv/json/zip")
+    返回并发占用（saturation = in_flight / max_pending）、等待数、因等待超时被拒绝的次数，
+    以及等待和渲染耗时统计。
+    """
+    try:
+        return {"code": 200, "message": "success", "data": get_thumbnail_render_pool().stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取缩略图渲染池状态失败: {str(e)}")
 
-    except HTTPException:
-        raise
+
+@router.get("/storage/stats", summary="获取存储 IO 状态")
+async def get_storage_io_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取存储 IO 线程池的状态
+
+    返回线程数、进行中的调用数（saturation = in_flight / workers，大于 1 表示有调用在排队），
+    以及每种存储操作的次数、失败数和平均/p95/最大耗时；disk_cache 为本地磁盘缓存的占用和命中情况（未启用时为 null）。
+    """
+    try:
+        stats = get_async_storage().stats()
+        cache = get_disk_cache()
+        stats["disk_cache"] = cache.stats() if cache is not None else None
+        return {"code": 200, "message": "success", "data": stats}
     except Exception as e:
-        logger.error(f"[导出数据] 失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        error_detail = f"导出数据失败: {str(e)}"
-        return JSONResponse(
-            status_code=500,
-            content={"detail": error_detail}
-        )
-    finally:
-        if db:
-            try:
-                db.close()
-            except:
-                pass
+        raise HTTPException(status_code=500, detail=f"获取存储 IO 状态失败: {str(e)}")
 
 
 @router.get("/{raw_data_id}", summary="获取原始数据详情")
@@ -757,6 +675,54 @@ async def get_raw_data_detail(
     }
 
 
+@router.delete("/{raw_data_id}", summary="删除原始数据")
+async def delete_raw_data_by_id(
+    raw_data_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_current_user_db)
+):
+    """
+    删除原始数据
+
+    文件数据同时释放 MinIO 对象：去重存储的对象减少引用计数，没有其他记录引用时删除对象和缩略图。
+    未完成的可续传/直传上传请使用 DELETE /uploads/{data_id}。
+    """
+    try:
+        status = db.query(RawData.processing_status).filter(RawData.id == raw_data_id).scalar()
+        if status is None:
+            raise HTTPException(status_code=404, detail="原始数据不存在")
+        if status == UPLOAD_STATUS:
+            raise HTTPException(status_code=409, detail="上传尚未完成，请使用 DELETE /uploads/{data_id} 取消上传")
+
+        deleted = await run_in_threadpool(delete_raw_data, db, raw_data_id)
+        if not deleted:
+            raise HTTPException(status_code=404, detail="原始数据不存在")
+
+        object_removed = False
+        if deleted["object_key"]:
+            object_removed = await run_in_threadpool(
+                release_object, db, deleted["object_key"], deleted["thumbnails"]
+            )
+
+        try:
+            create_log(db, "warning", "data.delete",
+                       f"用户 {current_user.username} 删除原始数据: {raw_data_id}",
+                       related_id=raw_data_id, related_type="raw_data")
+        except Exception:
+            pass
+
+        return {
+            "code": 200,
+            "message": "success",
+            "data": {"id": raw_data_id, "object_removed": object_removed}
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[删除原始数据] 失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"删除原始数据失败: {str(e)}")
+
+
 @router.put("/{raw_data_id}/processing-status", summary="更新处理状态")
 async def update_processing_status_by_id(
     raw_data_id: str,
@@ -764,7 +730,20 @@ async def update_processing_status_by_id(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_current_user_db)
 ):
-    """更新原始数据处理状态"""
+    """
+    更新原始数据处理状态
+
+    上传中的记录由上传流程维护状态，不能通过此接口修改，也不能设置为上传中。
+    """
+    if request.processing_status == UPLOAD_STATUS:
+        raise HTTPException(status_code=400, detail="不能将处理状态设置为上传中")
+
+    status = db.query(RawData.processing_status).filter(RawData.id == raw_data_id).scalar()
+    if status is None:
+        raise HTTPException(status_code=404, detail="原始数据不存在")
+    if status == UPLOAD_STATUS:
+        raise HTTPException(status_code=409, detail="上传尚未完成，不能修改处理状态")
+
     success = update_processing_status(db, raw_data_id, request.processing_status)
 
     if not success:
@@ -824,21 +803,55 @@ async def get_tags_for_raw_data(
     return {"code": 200, "message": "success", "data": {"tags": tags}}
 
 
+# 缩略图响应允许跨域直接引用
+_THUMBNAIL_CORS_HEADERS = {"Access-Control-Allow-Origin": "*"}
+
+
+def _thumbnail_etag(raw_data: dict, variant: str) -> Optional[str]:
+    """由原图校验和与缩略图版本生成 ETag，没有校验和时返回 None（改为按内容计算）"""
+    if not raw_data.get("checksum"):
+        return None
+    return make_etag(raw_data["checksum"], variant, "v1")
+
+
+def _thumbnail_response(
+    data: bytes,
+    content_type: str,
+    etag: Optional[str],
+    last_modified: Optional[str],
+    cache_control: str,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    headers: dict
+) -> Response:
+    """返回缩略图；没有校验和的旧数据按内容计算 ETag 后再判断条件请求"""
+    if etag is None:
+        etag = etag_for_bytes(data)
+        if is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+            return not_modified_response(etag, last_modified, cache_control, _THUMBNAIL_CORS_HEADERS)
+    all_headers = {**_THUMBNAIL_CORS_HEADERS, **headers, **cache_headers(etag, last_modified, cache_control)}
+    return Response(content=data, media_type=content_type, headers=all_headers)
+
+
 @router.get("/{raw_data_id}/thumbnail", summary="获取图像缩略图")
 async def get_raw_data_thumbnail(
     raw_data_id: str,
+    background_tasks: BackgroundTasks,
     user_id: str = Query(..., description="用户ID"),
-    size: int = Query(150, description="缩略图尺寸", ge=50, le=500)
+    size: int = Query(150, description="缩略图尺寸", ge=50, le=500),
+    if_none_match: Optional[str] = Header(None, description="条件请求：上次响应的 ETag"),
+    if_modified_since: Optional[str] = Header(None, description="条件请求：上次响应的 Last-Modified")
 ):
     """
     获取原始数据的缩略图
-    
+
     特性：
-    - 真正的缩略图处理（不是原图压缩）
+    - 优先返回上传时预生成的缩略图（不小于请求尺寸的最小一级）
+    - 没有预生成缩略图时现场生成，并在后台补齐整套缩略图
+    - 支持 ETag / Last-Modified 条件请求，内容未变化时返回 304
     - 多级缓存策略
-    - 性能优化
     - 错误处理
-    
+
     Args:
         raw_data_id: 原始数据ID
         user_id: 用户ID
@@ -857,8 +870,8 @@ async def get_raw_data_thumbnail(
             logger.warning(f"[缩略图接口] 数据不存在: {raw_data_id}")
             raise HTTPException(status_code=404, detail="数据不存在")
         
-        # 检查是否为图像类型
-        if raw_data.get("data_type") != "image":
+        # 检查是否为图像类型（上传的图像为 file 类型，按文件格式判断）
+        if not is_thumbnail_source(raw_data.get("data_type"), raw_data.get("data_format")):
             raise HTTPException(status_code=400, detail="该数据不是图像类型")
         
         # 权限检查：验证用户是否有权限访问该数据
@@ -866,9 +879,19 @@ async def get_raw_data_thumbnail(
         if session_id:
             # 这里可以添加更严格的权限检查逻辑
             pass
-        
+
+        # 确定返回的缩略图版本：预生成的某一级（p），或按请求尺寸现场生成（r）
+        selected = select_thumbnail((raw_data.get("file_meta") or {}).get("thumbnails"), size)
+        variant = f"p{selected[0]}" if selected else f"r{size}"
+
+        # 条件请求：ETag 由原图校验和与缩略图版本确定，未变化时直接返回 304，不读取缓存和 MinIO
+        etag = _thumbnail_etag(raw_data, variant)
+        last_modified = to_http_date(raw_data.get("updated_at") or raw_data.get("created_at"))
+        if is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+            return not_modified_response(etag, last_modified, "public, max-age=86400", _THUMBNAIL_CORS_HEADERS)
+
         # 生成缩略图缓存键
-        cache_key = f"thumb:{raw_data_id}:{size}:v1"
+        cache_key = f"thumb:{raw_data_id}:{variant}:v1"
         
         # 尝试从缓存获取缩略图
         cache_manager = None
@@ -878,19 +901,38 @@ async def get_raw_data_thumbnail(
             cached_thumb = cache_manager.get(cache_key)
             if cached_thumb:
                 logger.info(f"[缩略图接口] 缓存命中: {cache_key}")
-                content_type = cached_thumb.get('content_type', 'image/jpeg')
-                return Response(
-                    content=cached_thumb['data'],
-                    media_type=content_type,
-                    headers={
-                        "Cache-Control": "public, max-age=86400",  # 24小时缓存
-                        "Access-Control-Allow-Origin": "*",
-                        "X-Cache": "HIT"
-                    }
+                return _thumbnail_response(
+                    cached_thumb['data'], cached_thumb.get('content_type', 'image/jpeg'),
+                    etag, last_modified, "public, max-age=86400",  # 24小时缓存
+                    if_none_match, if_modified_since, {"X-Cache": "HIT"}
                 )
         except ImportError:
             logger.debug("[缩略图接口] 缓存模块不可用，跳过缓存")
-        
+
+        # 优先使用预生成的缩略图
+        if selected:
+            thumb_size, thumb_path = selected
+            result = await get_async_storage().get_bytes(thumb_path)
+            if result and result.get('success') and result.get('data'):
+                try:
+                    if cache_manager:
+                        cache_manager.set(cache_key, {
+                            'data': result['data'],
+                            'content_type': 'image/jpeg',
+                            'size': thumb_size
+                        }, ttl=3600)
+                except Exception:
+                    logger.debug("[缩略图接口] 缓存保存失败，继续返回")
+                return _thumbnail_response(
+                    result['data'], 'image/jpeg', etag, last_modified, "public, max-age=86400",
+                    if_none_match, if_modified_since,
+                    {"X-Cache": "MISS", "X-Thumbnail-Size": str(thumb_size)}
+                )
+            logger.warning(f"[缩略图接口] 预生成缩略图不可用，改为现场生成: {thumb_path}")
+            variant = f"r{size}"
+            etag = _thumbnail_etag(raw_data, variant)
+            cache_key = f"thumb:{raw_data_id}:{variant}:v1"
+
         # 获取原始图像数据
         image_data = None
         original_format = None
@@ -898,11 +940,8 @@ async def get_raw_data_thumbnail(
         if raw_data.get("object_key"):
             logger.info(f"[缩略图接口] 从MinIO获取原图: {raw_data.get('object_key')}")
             try:
-                from storage.storage_manager import get_storage_manager
-                storage_manager = get_storage_manager()
                 object_path = raw_data["object_key"]
-                
-                result = storage_manager._get_file_bytes_direct(object_path)
+                result = await get_async_storage().get_bytes(object_path)
                 
                 if result and result.get('success') and result.get('data'):
                     image_data = result['data']
@@ -926,7 +965,7 @@ async def get_raw_data_thumbnail(
             logger.info(f"[缩略图接口] 从外部URL获取图像: {raw_data['data_value']}")
             try:
                 import requests
-                response = requests.get(raw_data["data_value"], timeout=10)
+                response = await run_in_threadpool(requests.get, raw_data["data_value"], timeout=10)
                 if response.status_code == 200:
                     image_data = response.content
                     original_format = 'jpeg'  # 默认格式
@@ -941,39 +980,37 @@ async def get_raw_data_thumbnail(
         
         # 生成缩略图
         try:
-            # 确保original_format是字符串
-            original_format_str = original_format if original_format else 'jpeg'
-            thumbnail_data, thumbnail_format = generate_thumbnail(
-                image_data, 
-                size, 
-                original_format_str
-            )
-            
+            # 解码和缩放在渲染池中执行，不阻塞事件循环
+            pyramid = await get_thumbnail_render_pool().render_async(image_data, (size,))
+            thumbnail_data, thumbnail_format = pyramid[size], 'jpeg'
+
+            # 旧数据没有预生成缩略图：响应返回后在后台补齐，后续请求直接读取；
+            # 后台任务自行从 MinIO 读取原图，不在队列中保留本次请求的图像数据
+            if raw_data.get("object_key"):
+                background_tasks.add_task(schedule_thumbnails, user_id, raw_data_id, raw_data["object_key"])
+
             # 缓存缩略图
             try:
                 if cache_manager:
                     cache_data = {
                         'data': thumbnail_data,
                         'content_type': f'image/{thumbnail_format}',
-                        'size': size,
-                        'original_format': original_format_str
+                        'size': size
                     }
                     cache_manager.set(cache_key, cache_data, ttl=3600)  # 1小时缓存
                 logger.info(f"[缩略图接口] 缩略图已缓存: {cache_key}")
             except:
                 logger.debug("[缩略图接口] 缓存保存失败，继续返回")
             
-            content_type = f'image/{thumbnail_format}'
-            return Response(
-                content=thumbnail_data,
-                media_type=content_type,
-                headers={
-                    "Cache-Control": "public, max-age=3600",
-                    "Access-Control-Allow-Origin": "*",
-                    "X-Cache": "MISS"
-                }
+            return _thumbnail_response(
+                thumbnail_data, f'image/{thumbnail_format}', etag, last_modified, "public, max-age=3600",
+                if_none_match, if_modified_since, {"X-Cache": "MISS"}
             )
-            
+
+        except ThumbnailPoolBusyError as e:
+            # 渲染池已满：直接拒绝，由前端稍后重试，不返回原图加重负载
+            logger.warning(f"[缩略图接口] {e}")
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
         except Exception as e:
             logger.error(f"[缩略图接口] 生成缩略图失败: {str(e)}")
             import traceback
@@ -1016,88 +1053,230 @@ async def get_raw_data_thumbnail(
         db.close()
 
 
-def generate_thumbnail(image_data: bytes, size: int, original_format: str = 'jpeg') -> tuple[bytes, str]:
+
+@router.get("/{raw_data_id}/content", summary="获取原始文件内容（支持 Range）")
+async def get_raw_data_content(
+    raw_data_id: str,
+    range_header: Optional[str] = Header(None, alias="Range", description="按范围读取，如 bytes=0-1048575"),
+    if_range: Optional[str] = Header(None, description="上次响应的 ETag 或 Last-Modified，文件已变化时忽略 Range"),
+    if_none_match: Optional[str] = Header(None, description="条件请求：上次响应的 ETag"),
+    if_modified_since: Optional[str] = Header(None, description="条件请求：上次响应的 Last-Modified"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_current_user_db)
+):
     """
-    生成图像缩略图
-    
-    Args:
-        image_data: 原始图像数据
-        size: 缩略图尺寸（正方形）
-        original_format: 原始图像格式
-    
-    Returns:
-        (缩略图数据, 输出格式)
+    获取文件类原始数据（图像、视频等）的内容
+
+    特性：
+    - 支持单个字节范围的 Range 请求，返回 206 和 Content-Range，视频拖动时只传输播放器请求的部分
+    - 每个请求对应一次 MinIO 范围读取，按块流式返回，不把文件读入内存
+    - 支持 If-Range 和 ETag / Last-Modified 条件请求
+    - 范围超出文件长度时返回 416
     """
+    row = db.query(RawData.object_key, RawData.processing_status).filter(RawData.id == raw_data_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="原始数据不存在")
+    if row.processing_status == UPLOAD_STATUS:
+        raise HTTPException(status_code=409, detail="上传尚未完成")
+    if not row.object_key:
+        raise HTTPException(status_code=404, detail="该数据没有存储文件")
+
+    storage = get_async_storage()
     try:
-        # 创建图像对象
-        image = Image.open(io.BytesIO(image_data))
-        
-        # 转换为RGB（处理RGBA等格式）
-        if image.mode in ('RGBA', 'LA', 'P'):
-            # 对于PNG等有透明度的图像，创建白色背景
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            if image.mode == 'RGBA':
-                background.paste(image, mask=image.split()[-1])  # 使用alpha通道作为mask
-                image = background
-            else:
-                image = image.convert('RGB')
-        elif image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # 计算缩略图尺寸（保持宽高比）
-        original_width, original_height = image.size
-        aspect_ratio = original_width / original_height
-        
-        if aspect_ratio > 1:
-            # 宽图
-            new_width = size
-            new_height = int(size / aspect_ratio)
-        else:
-            # 高图或正方形
-            new_height = size
-            new_width = int(size * aspect_ratio)
-        
-        # 生成缩略图（高质量）
-        image.thumbnail((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        # 创建正方形画布，居中放置缩略图
-        thumbnail = Image.new('RGB', (size, size), (240, 240, 240))  # 浅灰色背景
-        
-        # 计算居中位置
-        x_offset = (size - image.size[0]) // 2
-        y_offset = (size - image.size[1]) // 2
-        
-        # 粘贴缩略图
-        thumbnail.paste(image, (x_offset, y_offset))
-        
-        # 保存为JPEG格式以获得更好的压缩
-        output = io.BytesIO()
-        thumbnail.save(output, format='JPEG', quality=85, optimize=True)
-        thumbnail_data = output.getvalue()
-        output.close()
-        
-        logger.info(f"[缩略图] 生成成功: {original_width}x{original_height} -> {size}x{size}, {len(thumbnail_data)} bytes")
-        
-        return thumbnail_data, 'jpeg'
-
-    except ImportError:
-        # PIL不可用，尝试其他方案
-        logger.warning("PIL不可用，尝试其他缩略图方案")
-        # 这里可以添加其他图像处理库的fallback
-        # 暂时返回原图
-        return image_data, original_format or 'jpeg'
+        stat = await storage.stat_object(row.object_key)
     except Exception as e:
-        logger.error(f"生成缩略图失败: {str(e)}")
-        raise
+        logger.error(f"[文件内容] 获取对象信息失败: {row.object_key}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"读取文件失败: {str(e)}")
+    if stat is None:
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    size = stat["size"]
+    etag = make_etag(stat["etag"]) if stat["etag"] else None
+    last_modified = to_http_date(stat["last_modified"])
+    cache_control = "private, max-age=3600"
+    if is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+        return not_modified_response(etag, last_modified, cache_control, {"Accept-Ranges": "bytes"})
+
+    headers = {"Accept-Ranges": "bytes", **cache_headers(etag, last_modified, cache_control)}
+    byte_range = None
+    if size > 0 and if_range_matches(if_range, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={"Accept-Ranges": "bytes", "Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    length = end - start + 1
+    media_type = stat["content_type"] or "application/octet-stream"
+    if length <= 0:
+        return Response(content=b"", media_type=media_type, headers=headers)
+
+    headers["Content-Length"] = str(length)
+    try:
+        response = await storage.open_object(row.object_key, start, length)
+    except Exception as e:
+        logger.error(f"[文件内容] 读取对象失败: {row.object_key}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"读取文件失败: {str(e)}")
+
+    return StreamingResponse(
+        storage.iter_response(response),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
 
 
 # ============ 新的数据上传接口 ============
 
+async def _authenticate_uploader(
+    authorization: Optional[str],
+    x_api_key: Optional[str],
+    meta_db: Session,
+    log_tag: str
+) -> User:
+    """
+    上传接口的统一认证：优先使用JWT令牌，备用API密钥认证
+
+    Args:
+        authorization: Authorization 请求头
+        x_api_key: X-API-Key 请求头
+        meta_db: 元数据库会话
+        log_tag: 日志前缀
+
+    Returns:
+        User: 认证通过的用户
+    """
+    # 优先尝试JWT认证
+    if authorization:
+        try:
+            from fastapi.security import HTTPAuthorizationCredentials
+            if authorization.startswith('Bearer '):
+                token = authorization[7:]
+                credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+                current_user = await get_current_user(credentials, meta_db)
+                logger.info(f"[{log_tag}] JWT认证成功: {current_user.username}")
+                return current_user
+            else:
+                raise HTTPException(status_code=401, detail="无效的Authorization格式")
+        except Exception as e:
+            raise HTTPException(status_code=401, detail=f"JWT认证失败: {str(e)}")
+
+    # 如果没有JWT，尝试API密钥认证
+    if x_api_key:
+        try:
+            current_user = await get_current_user_from_api_key(x_api_key, meta_db)
+            logger.info(f"[{log_tag}] API密钥认证成功: {current_user.username}")
+            return current_user
+        except Exception as e:
+            raise HTTPException(status_code=401, detail=f"API密钥认证失败: {str(e)}")
+
+    raise HTTPException(
+        status_code=401,
+        detail="需要认证：请提供JWT令牌（推荐）或API密钥"
+    )
+
+
+def _validate_numeric_request(request: UploadDataRequest) -> Optional[str]:
+    """
+    校验数字数据的数据类型与子类型是否匹配
+
+    Returns:
+        Optional[str]: 校验失败原因，通过时返回 None
+    """
+    if request.data_type == DataType.FILE:
+        # FILE 类型数据应使用 /upload-file 接口上传
+        return "文件类型数据请使用 /api/raw-data/upload-file 接口上传"
+
+    valid_subtypes = NUMERIC_SUBTYPES_MAP.get(request.data_type)
+    if valid_subtypes is None:
+        return f"不支持的数据类型: {request.data_type}"
+
+    if request.data_subtype not in valid_subtypes:
+        return f"数据类型 {request.data_type} 不支持子类型 {request.data_subtype}"
+
+    return None
+
+
+def _numeric_request_to_raw_data(request: UploadDataRequest) -> dict:
+    """将数字数据上传请求转换为 create_raw_data 的参数"""
+    # 根据 data_subtype 自动推断单位
+    data_unit = SUBTYPE_UNIT_MAP.get(request.data_subtype)
+    if data_unit:
+        data_unit = data_unit.value
+
+    return {
+        "session_id": request.session_id,
+        "data_type": request.data_type.value,
+        "data_subtype": request.data_subtype.value,
+        "data_value": request.data_value,
+        "data_unit": data_unit,  # 自动添加单位
+        "capture_time": request.capture_time or datetime.now(),
+        "location_geom": request.location_geom,
+        "altitude_m": request.altitude_m,
+        "heading": request.heading,
+        "sensor_meta": request.sensor_meta,
+        "quality_score": request.quality_score,
+        "is_valid": request.is_valid,
+        "validation_notes": request.validation_notes
+    }
+
+
+def _resolve_ingest_mode(ingest_mode: Optional[str]) -> str:
+    """解析写入模式，未指定时使用 INGEST_MODE 环境变量"""
+    if ingest_mode is None:
+        return get_default_ingest_mode()
+    mode = ingest_mode.lower()
+    if mode not in ("sync", "async"):
+        raise HTTPException(status_code=400, detail=f"无效的写入模式: {ingest_mode}，可选值: sync, async")
+    return mode
+
+
+def _enqueue_numeric_rows(current_user: User, db: Session, items: list) -> list:
+    """
+    异步模式：校验会话后将数据放入写入队列
+
+    Args:
+        current_user: 当前用户
+        db: 用户数据库会话（仅用于会话校验）
+        items: _numeric_request_to_raw_data 转换后的数据列表
+
+    Returns:
+        list: 与 items 一一对应的 (data_id, error) 元组
+
+    Raises:
+        HTTPException: 队列已满时返回 429
+    """
+    session_errors = check_sessions_writable(db, (item["session_id"] for item in items))
+
+    results = []
+    rows = []
+    for item in items:
+        session_error = session_errors.get(str(item["session_id"]))
+        if session_error:
+            results.append((None, session_error))
+            continue
+        row = build_raw_data_row(**item)
+        rows.append(row)
+        results.append((row["id"], None))
+
+    if rows:
+        try:
+            get_ingest_queue().enqueue(str(current_user.userid), rows)
+        except IngestQueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    return results
+
+
 @router.post("/upload-data", summary="上传数字数据")
 async def upload_numeric_data(
     request: UploadDataRequest,
+    ingest_mode: Optional[str] = Query(None, description="写入模式: sync（同步提交）或 async（写入队列，返回202）"),
     x_api_key: Optional[str] = Header(None, description="API密钥（可选）"),
     authorization: Optional[str] = Header(None, description="JWT令牌（可选）"),
     meta_db: Session = Depends(get_meta_db)
@@ -1114,86 +1293,45 @@ async def upload_numeric_data(
     数据值说明：
     - environmental/soil 类型：data_value 为数值字符串
     - 单位通过 data_subtype 推断，不需要单独上传单位字段
+
+    写入模式：
+    - sync（默认）：同步写入并提交，返回 200
+    - async：数据放入写入队列后立即返回 202 及数据ID，由后台批量写入；
+      队列已满时返回 429，客户端应稍后重试
     """
+    db: Session | None = None
     try:
-        # 认证用户：优先使用JWT令牌，备用API密钥认证
-        current_user = None
-        db: Session | None = None
-
-        # 优先尝试JWT认证
-        if authorization:
-            try:
-                from fastapi.security import HTTPAuthorizationCredentials
-                if authorization.startswith('Bearer '):
-                    token = authorization[7:]
-                    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
-                    current_user = await get_current_user(credentials, meta_db)
-                    db = get_current_user_db(current_user)
-                    logger.info(f"[上传数据] JWT认证成功: {current_user.username}")
-                else:
-                    raise HTTPException(status_code=401, detail="无效的Authorization格式")
-            except Exception as e:
-                raise HTTPException(status_code=401, detail=f"JWT认证失败: {str(e)}")
+        mode = _resolve_ingest_mode(ingest_mode)
 
-        # 如果没有JWT，尝试API密钥认证
-        elif x_api_key:
-            try:
-                current_user = await get_current_user_from_api_key(x_api_key, meta_db)
-                db = get_current_user_db(current_user)
-                logger.info(f"[上传数据] API密钥认证成功: {current_user.username}")
-            except Exception as e:
-                raise HTTPException(status_code=401, detail=f"API密钥认证失败: {str(e)}")
-
-        else:
-            raise HTTPException(
-                status_code=401,
-                detail="需要认证：请提供JWT令牌（推荐）或API密钥"
-            )
+        # 认证用户：优先使用JWT令牌，备用API密钥认证
+        current_user = await _authenticate_uploader(authorization, x_api_key, meta_db, "上传数据")
+        db = get_current_user_db(current_user)
 
         # 验证数据类型和子类型的匹配
-        if request.data_type == DataType.ENVIRONMENTAL:
-            valid_subtypes = [DataSubType.TEMPERATURE, DataSubType.HUMIDITY, DataSubType.CO2,
-                           DataSubType.LIGHT, DataSubType.PRESSURE]
-        elif request.data_type == DataType.SOIL:
-            valid_subtypes = [DataSubType.MOISTURE, DataSubType.PH, DataSubType.EC,
-                           DataSubType.TEMPERATURE_SOIL]
-        elif request.data_type == DataType.FILE:
-            # FILE 类型数据应使用 /upload-file 接口上传
-            raise HTTPException(
-                status_code=400,
-                detail="文件类型数据请使用 /api/raw-data/upload-file 接口上传"
-            )
-        else:
-            raise HTTPException(status_code=400, detail=f"不支持的数据类型: {request.data_type}")
-
-        if request.data_subtype not in valid_subtypes:
-            raise HTTPException(
-                status_code=400,
-                detail=f"数据类型 {request.data_type} 不支持子类型 {request.data_subtype}"
-            )
-
-        # 根据 data_subtype 自动推断单位
-        data_unit = SUBTYPE_UNIT_MAP.get(request.data_subtype)
-        if data_unit:
-            data_unit = data_unit.value
+        validation_error = _validate_numeric_request(request)
+        if validation_error:
+            raise HTTPException(status_code=400, detail=validation_error)
+
+        if mode == "async":
+            data_id, error = _enqueue_numeric_rows(current_user, db, [_numeric_request_to_raw_data(request)])[0]
+            if error:
+                raise HTTPException(status_code=400, detail=f"数据上传失败：{error}")
+
+            # 异步模式不写操作日志，避免在请求路径上再做一次同步提交
+            return JSONResponse(status_code=202, content={
+                "code": 202,
+                "message": "accepted",
+                "data": UploadDataResponse(
+                    data_id=data_id,
+                    data_type=request.data_type,
+                    data_subtype=request.data_subtype,
+                    data_value=request.data_value,
+                    upload_time=datetime.now().isoformat()
+                ).model_dump(mode="json")
+            })
 
         # 创建数据记录
-        data_id = create_raw_data(
-            db=db,
-            session_id=request.session_id,
-            data_type=request.data_type.value,
-            data_subtype=request.data_subtype.value,
-            data_value=request.data_value,
-            data_unit=data_unit,  # 自动添加单位
-            capture_time=request.capture_time or datetime.now(),
-            location_geom=request.location_geom,
-            altitude_m=request.altitude_m,
-            heading=request.heading,
-            sensor_meta=request.sensor_meta,
-            quality_score=request.quality_score,
-            is_valid=request.is_valid,
-            validation_notes=request.validation_notes
-        )
+        data_id = create_raw_data(db=db, **_numeric_request_to_raw_data(request))
 
         if not data_id:
             raise HTTPException(
@@ -1227,12 +1365,117 @@ async def upload_numeric_data(
         logger.error(f"[上传数据] 失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"数据上传失败: {str(e)}")
     finally:
-        if db is not None:  # pyright: ignore[reportPossiblyUnboundVariable]
-            db.close()  # pyright: ignore[reportPossiblyUnboundVariable]
+        if db is not None:
+            db.close()
+
+
+@router.post("/upload-batch", summary="批量上传数字数据")
+async def upload_numeric_data_batch(
+    request: UploadBatchRequest,
+    ingest_mode: Optional[str] = Query(None, description="写入模式: sync（同步提交）或 async（写入队列，返回202）"),
+    x_api_key: Optional[str] = Header(None, description="API密钥（可选）"),
+    authorization: Optional[str] = Header(None, description="JWT令牌（可选）"),
+    meta_db: Session = Depends(get_meta_db)
+):
+    """
+    批量上传数字类型数据（环境数据、土壤数据等）
+
+    面向网关类设备：一次请求携带多条读数，服务端对每个涉及的会话只校验一次，
+    所有合法数据在同一事务中通过一条多行 INSERT 写入。
+
+    认证方式与 /upload-data 相同（JWT 令牌优先，其次 API 密钥）。
+
+    返回逐条结果（与请求顺序一致），单条数据校验失败不影响其它数据写入。
+
+    async 模式下合法数据整批放入写入队列并返回 202；队列剩余容量不足时整批拒绝（429）。
+    """
+    db: Session | None = None
+    try:
+        mode = _resolve_ingest_mode(ingest_mode)
+        current_user = await _authenticate_uploader(authorization, x_api_key, meta_db, "批量上传数据")
+        db = get_current_user_db(current_user)
+
+        results = [
+            UploadBatchItemResult(index=i, success=False)
+            for i in range(len(request.items))
+        ]
+
+        # 逐条校验数据类型与子类型，收集合法数据
+        valid_indexes = []
+        valid_items = []
+        for i, item in enumerate(request.items):
+            validation_error = _validate_numeric_request(item)
+            if validation_error:
+                results[i].error = validation_error
+                continue
+            valid_indexes.append(i)
+            valid_items.append(_numeric_request_to_raw_data(item))
+
+        if mode == "async":
+            if valid_items:
+                queued = _enqueue_numeric_rows(current_user, db, valid_items)
+                for i, (data_id, error) in zip(valid_indexes, queued):
+                    results[i].success = error is None
+                    results[i].data_id = data_id
+                    results[i].error = error
+
+            succeeded = sum(1 for r in results if r.success)
+            return JSONResponse(status_code=202, content={
+                "code": 202,
+                "message": "accepted",
+                "data": UploadBatchResponse(
+                    total=len(results),
+                    succeeded=succeeded,
+                    failed=len(results) - succeeded,
+                    results=results,
+                    upload_time=datetime.now().isoformat()
+                ).model_dump(mode="json")
+            })
+
+        # 单事务批量写入
+        if valid_items:
+            batch_results = create_raw_data_batch(db, valid_items)
+            for i, batch_result in zip(valid_indexes, batch_results):
+                results[i].success = batch_result["success"]
+                results[i].data_id = batch_result["data_id"]
+                results[i].error = batch_result["error"]
+
+        succeeded = sum(1 for r in results if r.success)
+
+        # 记录操作日志（整批一条）
+        if succeeded:
+            try:
+                create_log(db, "info", "data.upload_batch",
+                           f"用户 {current_user.username} 批量上传数据: 成功 {succeeded} 条，失败 {len(results) - succeeded} 条",
+                           related_type="raw_data")
+            except Exception:
+                pass
+
+        return {
+            "code": 200,
+            "message": "success",
+            "data": UploadBatchResponse(
+                total=len(results),
+                succeeded=succeeded,
+                failed=len(results) - succeeded,
+                results=results,
+                upload_time=datetime.now().isoformat()
+            ).model_dump()
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[批量上传数据] 失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"批量数据上传失败: {str(e)}")
+    finally:
+        if db is not None:
+            db.close()
 
 
 @router.post("/upload-file", summary="上传文件数据")
 async def upload_file_data(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(..., description="文件数据"),
     session_id: str = Form(..., description="采集会话ID"),
     data_subtype: str = Form(..., description="数据子类型"),
@@ -1261,76 +1504,51 @@ async def upload_file_data(
     - multispectral: 多光谱图像
     - video: 视频文件
     """
+    db: Session | None = None
     try:
         # 认证用户：优先使用JWT令牌，备用API密钥认证
-        current_user = None
-        db: Session | None = None
-
-        # 优先尝试JWT认证
-        if authorization:
-            try:
-                from fastapi.security import HTTPAuthorizationCredentials
-                if authorization.startswith('Bearer '):
-                    token = authorization[7:]
-                    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
-                    current_user = await get_current_user(credentials, meta_db)
-                    db = get_current_user_db(current_user)
-                    logger.info(f"[上传文件] JWT认证成功: {current_user.username}")
-                else:
-                    raise HTTPException(status_code=401, detail="无效的Authorization格式")
-            except Exception as e:
-                raise HTTPException(status_code=401, detail=f"JWT认证失败: {str(e)}")
-
-        # 如果没有JWT，尝试API密钥认证
-        elif x_api_key:
-            try:
-                current_user = await get_current_user_from_api_key(x_api_key, meta_db)
-                db = get_current_user_db(current_user)
-                logger.info(f"[上传文件] API密钥认证成功: {current_user.username}")
-            except Exception as e:
-                raise HTTPException(status_code=401, detail=f"API密钥认证失败: {str(e)}")
-
-        else:
-            raise HTTPException(
-                status_code=401,
-                detail="需要认证：请提供JWT令牌（推荐）或API密钥"
-            )
+        current_user = await _authenticate_uploader(authorization, x_api_key, meta_db, "上传文件")
+        db = get_current_user_db(current_user)
 
         # 验证数据子类型（使用统一枚举，仅允许 file 类型的子类型）
-        file_subtypes = [
-            DataSubType.RGB, DataSubType.NIR, DataSubType.RED_EDGE,
-            DataSubType.THERMAL, DataSubType.MULTISPECTRAL, DataSubType.VIDEO
-        ]
         try:
             subtype_enum = DataSubType(data_subtype)
         except ValueError:
             raise HTTPException(
                 status_code=400,
-                detail=f"不支持的数据子类型: {data_subtype}，支持的类型: {', '.join(s.value for s in file_subtypes)}"
+                detail=f"不支持的数据子类型: {data_subtype}，支持的类型: {', '.join(s.value for s in FILE_SUBTYPES)}"
             )
-        if subtype_enum not in file_subtypes:
+        if subtype_enum not in FILE_SUBTYPES:
             raise HTTPException(
                 status_code=400,
                 detail=f"数据子类型 {data_subtype} 不属于文件类型，请使用 /upload-data 接口"
             )
 
-        # 读取文件数据
-        file_data = await file.read()
+        # 文件内容之后按块流式上传，不整体读入内存
+        file_size = file.size
+        if file_size is None:
+            file.file.seek(0, 2)
+            file_size = file.file.tell()
+            file.file.seek(0)
 
-        # 如果是图像，进行格式检测和验证
+        # 如果是图像，单次检查格式、尺寸和 EXIF 并完成验证（只解析文件头，不解码像素）；
+        # 去重存储时在同一次读取中计算 SHA-256，存储时不再重复计算
         data_format = None
+        inspection = None
         if file.content_type and file.content_type.startswith('image/'):
-            image_processor = get_image_processor()
-            format_info = image_processor.detect_image_format(file_data, file.filename)
-            data_format = format_info['extension']
-
-            # 验证图像文件
-            validation_result = image_processor.validate_image_file(file_data)
-            if not validation_result['is_valid']:
+            inspection = await run_in_threadpool(
+                get_image_processor().inspect_image,
+                file.file,
+                file.filename,
+                size_bytes=file_size,
+                compute_hash=STORAGE_DEDUP_ENABLED
+            )
+            if not inspection.is_valid:
                 raise HTTPException(
                     status_code=400,
-                    detail=f"图像验证失败: {'; '.join(validation_result['errors'])}"
+                    detail=f"图像验证失败: {'; '.join(inspection.errors)}"
                 )
+            data_format = inspection.extension
         elif file.content_type and file.content_type.startswith('video/'):
             # 视频文件格式
             ext_map = {
@@ -1346,24 +1564,50 @@ async def upload_file_data(
         # 生成唯一文件名
         unique_filename = f"{uuid.uuid4().hex}_{int(datetime.now().timestamp())}.{data_format}"
 
-        # 上传文件到MinIO (路径规范: user_{userid}/data/session_{session_id}/)
-        storage_manager = get_storage_manager()
-        upload_result = storage_manager.upload_bytes(
-            user_id=str(current_user.userid),
-            data=file_data,
-            filename=unique_filename,
-            session_id=session_id,
-            content_type=file.content_type or 'application/octet-stream'
-        )
+        if STORAGE_DEDUP_ENABLED:
+            # 内容寻址存储 (路径规范: user_{userid}/cas/)：先计算 SHA-256，内容已存在时跳过上传；
+            # 在存储 IO 线程池中执行，计入存储操作统计
+            upload_result = await get_async_storage().run(
+                "store_deduplicated",
+                store_deduplicated,
+                db,
+                user_id=str(current_user.userid),
+                fileobj=file.file,
+                filename=unique_filename,
+                content_type=file.content_type or 'application/octet-stream',
+                sha256=inspection.sha256 if inspection else None,
+                size=inspection.size_bytes if inspection else None
+            )
+        else:
+            # 流式分片上传到MinIO (路径规范: user_{userid}/data/session_{session_id}/)，同时计算 SHA-256 校验和
+            upload_result = await get_async_storage().upload_file(
+                user_id=str(current_user.userid),
+                fileobj=file.file,
+                filename=unique_filename,
+                session_id=session_id,
+                content_type=file.content_type or 'application/octet-stream'
+            )
 
         if not upload_result['success']:
             raise HTTPException(status_code=500, detail=f"文件上传失败: {upload_result['message']}")
 
-        # 计算文件校验和
-        checksum = None
-        if file.content_type and file.content_type.startswith('image/'):
-            image_processor = get_image_processor()
-            checksum = image_processor.calculate_checksum(file_data)
+        file_size = upload_result['size']
+        checksum = upload_result['sha256']
+        deduplicated = upload_result.get('deduplicated', False)
+
+        file_meta = {
+            "original_filename": file.filename,
+            "stored_filename": unique_filename,
+            "file_size_bytes": file_size,
+            "content_type": file.content_type,
+            "description": description
+        }
+        if inspection:
+            file_meta["image"] = inspection.to_file_meta()
+        # 相同内容已生成过缩略图时直接复用
+        thumbnails = find_shared_thumbnails(db, upload_result['path']) if deduplicated else None
+        if thumbnails:
+            file_meta["thumbnails"] = thumbnails
 
         # 创建数据库记录
         data_id = create_raw_data(
@@ -1379,16 +1623,11 @@ async def upload_file_data(
             location_geom=location_geom,
             altitude_m=altitude_m,
             heading=heading,
-            file_meta={
-                "original_filename": file.filename,
-                "stored_filename": unique_filename,
-                "file_size_bytes": len(file_data),
-                "content_type": file.content_type,
-                "description": description
-            },
+            file_meta=file_meta,
             acquisition_meta={
                 "upload_time": datetime.now().isoformat(),
-                "upload_method": "api" if x_api_key else "web"
+                "upload_method": "api" if x_api_key else "web",
+                "deduplicated": deduplicated
             },
             quality_score=1.0,
             checksum=checksum,
@@ -1396,11 +1635,20 @@ async def upload_file_data(
         )
 
         if not data_id:
+            # 归还本次上传获得的对象引用
+            if STORAGE_DEDUP_ENABLED:
+                await run_in_threadpool(release_object, db, upload_result['path'])
             raise HTTPException(
                 status_code=400,
                 detail="文件上传失败：会话不存在或状态不允许上传数据"
             )
 
+        # 图像在响应返回后生成缩略图金字塔（从 MinIO 读取原图）
+        if is_thumbnail_source(DataType.FILE.value, data_format) and not thumbnails:
+            background_tasks.add_task(
+                schedule_thumbnails, str(current_user.userid), data_id, upload_result['path']
+            )
+
         # 记录操作日志
         try:
             create_log(db, "info", "data.upload_file",
@@ -1418,8 +1666,8 @@ async def upload_file_data(
                 access_url=upload_result['url'],
                 data_type=DataType.FILE,
                 data_subtype=subtype_enum,
-                file_size_bytes=len(file_data),
-                file_size_mb=round(len(file_data) / (1024 * 1024), 2),
+                file_size_bytes=file_size,
+                file_size_mb=round(file_size / (1024 * 1024), 2),
                 data_format=data_format,
                 upload_time=datetime.now().isoformat()
             ).model_dump()
@@ -1436,3 +1684,324 @@ async def upload_file_data(
         if db is not None:
             db.close()
 
+
+# ============ 可续传文件上传 ============
+
+def _schedule_upload_followups(
+    background_tasks: BackgroundTasks,
+    db: Session,
+    current_user: User,
+    data_id: str,
+    result: dict,
+    upload_label: str
+):
+    """上传完成后调度校验和、缩略图后台任务并记录日志"""
+    user_id = str(current_user.userid)
+    background_tasks.add_task(compute_upload_checksum, user_id, data_id, result["object_key"])
+    if is_thumbnail_source(DataType.FILE.value, result["data_format"]):
+        background_tasks.add_task(schedule_thumbnails, user_id, data_id, result["object_key"])
+    try:
+        create_log(db, "info", "data.upload_file",
+                   f"用户 {current_user.username} 上传文件（{upload_label}）: {result['data_subtype']}",
+                   related_id=data_id, related_type="raw_data")
+    except Exception:
+        pass
+
+
+@router.post("/uploads", summary="初始化可续传文件上传")
+async def init_resumable_file_upload(
+    request: ResumableUploadInitRequest,
+    x_api_key: Optional[str] = Header(None, description="API密钥（可选）"),
+    authorization: Optional[str] = Header(None, description="JWT令牌（可选）"),
+    meta_db: Session = Depends(get_meta_db)
+):
+    """
+    初始化可续传文件上传（适用于网络不稳定时上传大文件）
+
+    流程：
+    1. POST /uploads 创建上传，返回 data_id、分片大小和分片数
+    2. PUT /uploads/{data_id}/parts/{part_number} 逐个上传分片（请求体为分片内容），
+       可选 X-Content-SHA256 / Content-MD5 请求头校验分片
+    3. POST /uploads/{data_id}/complete 合并分片
+
+    断线后通过 GET /uploads/{data_id} 查询缺失的分片，只补传缺失部分。
+    超过有效期未完成的上传会被清理。
+    """
+    db: Session | None = None
+    try:
+        current_user = await _authenticate_uploader(authorization, x_api_key, meta_db, "可续传上传")
+        if request.data_subtype not in FILE_SUBTYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"数据子类型 {request.data_subtype.value} 不属于文件类型，请使用 /upload-data 接口"
+            )
+        db = get_current_user_db(current_user)
+        result = await run_in_threadpool(
+            init_resumable_upload,
+            db,
+            user_id=str(current_user.userid),
+            session_id=request.session_id,
+            data_subtype=request.data_subtype.value,
+            filename=request.filename,
+            total_size=request.total_size,
+            content_type=request.content_type,
+            part_size=request.part_size,
+            description=request.description,
+            location_geom=request.location_geom,
+            altitude_m=request.altitude_m,
+            heading=request.heading,
+            upload_method="api" if x_api_key else "web"
+        )
+        return {"code": 200, "message": "success", "data": result}
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[可续传上传] 初始化失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"初始化上传失败: {str(e)}")
+    finally:
+        if db is not None:
+            db.close()
+
+
+@router.post("/uploads/presigned", summary="初始化预签名直传")
+async def init_presigned_file_upload(
+    request: PresignedUploadInitRequest,
+    x_api_key: Optional[str] = Header(None, description="API密钥（可选）"),
+    authorization: Optional[str] = Header(None, description="JWT令牌（可选）"),
+    meta_db: Session = Depends(get_meta_db)
+):
+    """
+    初始化预签名直传，文件内容不经过 API 服务
+
+    流程：
+    1. POST /uploads/presigned 获取 upload_url，以及上传时须携带的请求头
+    2. 客户端用 PUT 把文件直接上传到 upload_url（MinIO）
+    3. POST /uploads/{data_id}/confirm 确认，服务端校验对象大小和内容类型后启用记录
+
+    提供 sha256 时，确认后在后台校验文件内容，不一致会把记录标记为无效。
+    """
+    db: Session | None = None
+    try:
+        current_user = await _authenticate_uploader(authorization, x_api_key, meta_db, "预签名直传")
+        if request.data_subtype not in FILE_SUBTYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"数据子类型 {request.data_subtype.value} 不属于文件类型，请使用 /upload-data 接口"
+            )
+        db = get_current_user_db(current_user)
+        result = await run_in_threadpool(
+            init_presigned_upload,
+            db,
+            user_id=str(current_user.userid),
+            session_id=request.session_id,
+            data_subtype=request.data_subtype.value,
+            filename=request.filename,
+            total_size=request.total_size,
+            content_type=request.content_type,
+            sha256=request.sha256,
+            description=request.description,
+            location_geom=request.location_geom,
+            altitude_m=request.altitude_m,
+            heading=request.heading,
+            upload_method="api" if x_api_key else "web"
+        )
+        return {"code": 200, "message": "success", "data": result}
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[预签名直传] 初始化失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"初始化上传失败: {str(e)}")
+    finally:
+        if db is not None:
+            db.close()
+
+
+@router.post("/uploads/{data_id}/confirm", summary="确认预签名直传")
+async def confirm_presigned_file_upload(
+    data_id: str,
+    background_tasks: BackgroundTasks,
+    request: Optional[PresignedUploadConfirmRequest] = None,
+    x_api_key: Optional[str] = Header(None, description="API密钥（可选）"),
+    authorization: Optional[str] = Header(None, description="JWT令牌（可选）"),
+    meta_db: Session = Depends(get_meta_db)
+):
+    """
+    确认文件已直传到 MinIO，校验通过后原始数据记录变为可用
+
+    重复调用返回已完成的结果。文件 SHA-256 和图像缩略图在响应返回后于后台生成。
+    """
+    db: Session | None = None
+    try:
+        current_user = await _authenticate_uploader(authorization, x_api_key, meta_db, "预签名直传")
+        db = get_current_user_db(current_user)
+        # 重复调用时不再重复调度后台任务
+        was_pending = db.query(RawData.processing_status).filter(
+            RawData.id == data_id
+        ).scalar() == UPLOAD_STATUS
+        result = await run_in_threadpool(
+            confirm_presigned_upload, db, data_id, request.md5 if request else None
+        )
+
+        if was_pending:
+            _schedule_upload_followups(background_tasks, db, current_user, data_id, result, "直传")
+
+        return {"code": 200, "message": "success", "data": result}
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[预签名直传] 确认上传失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"确认上传失败: {str(e)}")
+    finally:
+        if db is not None:
+            db.close()
+
+
+@router.get("/uploads/{data_id}", summary="查询可续传上传状态")
+async def get_resumable_file_upload(
+    data_id: str,
+    x_api_key: Optional[str] = Header(None, description="API密钥（可选）"),
+    authorization: Optional[str] = Header(None, description="JWT令牌（可选）"),
+    meta_db: Session = Depends(get_meta_db)
+):
+    """查询上传状态，未完成时返回已收到和缺失的分片编号"""
+    db: Session | None = None
+    try:
+        current_user = await _authenticate_uploader(authorization, x_api_key, meta_db, "可续传上传")
+        db = get_current_user_db(current_user)
+        result = await run_in_threadpool(get_resumable_upload, db, data_id)
+        return {"code": 200, "message": "success", "data": result}
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查询上传状态失败: {str(e)}")
+    finally:
+        if db is not None:
+            db.close()
+
+
+async def _read_part_body(request: Request, limit: int) -> bytes:
+    """
+    按块读取请求体，累计超过 limit 字节时立即返回 413
+
+    没有 Content-Length（如分块传输编码）的请求同样受限，不会把超大请求体整个读入内存。
+    """
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer.extend(chunk)
+        if len(buffer) > limit:
+            raise HTTPException(status_code=413, detail=f"分片不能超过 {limit} 字节")
+    return bytes(buffer)
+
+
+@router.put("/uploads/{data_id}/parts/{part_number}", summary="上传分片")
+async def upload_resumable_file_part(
+    data_id: str,
+    part_number: int,
+    request: Request,
+    content_length: Optional[int] = Header(None, description="分片大小"),
+    content_md5: Optional[str] = Header(None, description="分片 MD5（Base64，可选）"),
+    x_content_sha256: Optional[str] = Header(None, description="分片 SHA-256（十六进制，可选）"),
+    x_api_key: Optional[str] = Header(None, description="API密钥（可选）"),
+    authorization: Optional[str] = Header(None, description="JWT令牌（可选）"),
+    meta_db: Session = Depends(get_meta_db)
+):
+    """
+    上传一个分片，请求体为分片内容
+
+    同一编号可重复上传（后一次覆盖前一次），断线重试不会产生重复数据。
+    """
+    db: Session | None = None
+    try:
+        current_user = await _authenticate_uploader(authorization, x_api_key, meta_db, "可续传上传")
+        # 读取请求体之前检查大小，避免超大请求占用内存
+        if content_length is not None and content_length > RESUMABLE_MAX_PART_SIZE:
+            raise HTTPException(status_code=413, detail=f"分片不能超过 {RESUMABLE_MAX_PART_SIZE} 字节")
+        data = await _read_part_body(request, RESUMABLE_MAX_PART_SIZE)
+        db = get_current_user_db(current_user)
+        result = await run_in_threadpool(
+            upload_resumable_part, db, data_id, part_number, data,
+            sha256=x_content_sha256, content_md5=content_md5
+        )
+        return {"code": 200, "message": "success", "data": result}
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[可续传上传] 分片 {part_number} 上传失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"分片上传失败: {str(e)}")
+    finally:
+        if db is not None:
+            db.close()
+
+
+@router.post("/uploads/{data_id}/complete", summary="完成可续传上传")
+async def complete_resumable_file_upload(
+    data_id: str,
+    background_tasks: BackgroundTasks,
+    x_api_key: Optional[str] = Header(None, description="API密钥（可选）"),
+    authorization: Optional[str] = Header(None, description="JWT令牌（可选）"),
+    meta_db: Session = Depends(get_meta_db)
+):
+    """
+    校验分片齐全后合并文件，原始数据记录变为可用
+
+    重复调用返回已完成的结果。文件 SHA-256 和图像缩略图在响应返回后于后台生成。
+    """
+    db: Session | None = None
+    try:
+        current_user = await _authenticate_uploader(authorization, x_api_key, meta_db, "可续传上传")
+        db = get_current_user_db(current_user)
+        # 重复调用时不再重复调度后台任务
+        was_pending = db.query(RawData.processing_status).filter(
+            RawData.id == data_id
+        ).scalar() == UPLOAD_STATUS
+        result = await run_in_threadpool(complete_resumable_upload, db, data_id)
+
+        if was_pending:
+            _schedule_upload_followups(background_tasks, db, current_user, data_id, result, "可续传")
+
+        return {"code": 200, "message": "success", "data": result}
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"[可续传上传] 完成上传失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"完成上传失败: {str(e)}")
+    finally:
+        if db is not None:
+            db.close()
+
+
+@router.delete("/uploads/{data_id}", summary="取消可续传上传")
+async def abort_resumable_file_upload(
+    data_id: str,
+    x_api_key: Optional[str] = Header(None, description="API密钥（可选）"),
+    authorization: Optional[str] = Header(None, description="JWT令牌（可选）"),
+    meta_db: Session = Depends(get_meta_db)
+):
+    """取消未完成的上传（可续传或预签名直传），释放已上传的内容并删除原始数据记录"""
+    db: Session | None = None
+    try:
+        current_user = await _authenticate_uploader(authorization, x_api_key, meta_db, "可续传上传")
+        db = get_current_user_db(current_user)
+        await run_in_threadpool(abort_resumable_upload, db, data_id)
+        return {"code": 200, "message": "success", "data": {"data_id": data_id}}
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"取消上传失败: {str(e)}")
+    finally:
+        if db is not None:
+            db.close()
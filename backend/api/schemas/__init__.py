@@ -18,6 +18,7 @@ from .raw_data import (
     RawDataTagRequest,
     ProcessingStatusRequest,
     AIStatusRequest,
+    ExportJobRequest,
     RawDataResponse,
     RawDataListResponse
 )
@@ -27,7 +28,13 @@ from .raw_data_upload import (
     DataUnit,
     UploadDataRequest,
     UploadFileResponse,
-    UploadDataResponse
+    UploadDataResponse,
+    UploadBatchRequest,
+    UploadBatchItemResult,
+    UploadBatchResponse,
+    ResumableUploadInitRequest,
+    PresignedUploadInitRequest,
+    PresignedUploadConfirmRequest
 )
 from .api_key import (
     ApiKeyCreateRequest,
@@ -67,6 +74,7 @@ __all__ = [
     "RawDataTagRequest",
     "ProcessingStatusRequest",
     "AIStatusRequest",
+    "ExportJobRequest",
     "RawDataResponse",
     "RawDataListResponse",
     # Raw Data Upload
@@ -76,6 +84,12 @@ __all__ = [
     "UploadDataRequest",
     "UploadFileResponse",
     "UploadDataResponse",
+    "UploadBatchRequest",
+    "UploadBatchItemResult",
+    "UploadBatchResponse",
+    "ResumableUploadInitRequest",
+    "PresignedUploadInitRequest",
+    "PresignedUploadConfirmRequest",
     # API Key
     "ApiKeyCreateRequest",
     "ApiKeyUpdateRequest",
@@ -96,6 +96,24 @@ class AIStatusRequest(BaseModel):
     }
 
 
+class ExportJobRequest(BaseModel):
+    """导出任务创建请求模型"""
+    format: str = Field('csv', pattern="^(csv|json|zip|parquet|arrow)$", description="导出格式: csv/json/zip/parquet/arrow")
+    session_id: Optional[str] = Field(None, description="会话ID过滤")
+    data_type: Optional[str] = Field(None, description="数据类型过滤")
+    data_subtype: Optional[str] = Field(None, description="数据子类型过滤")
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "format": "parquet",
+                "session_id": "550e8400-e29b-41d4-a716-446655440000",
+                "data_type": "environmental"
+            }
+        }
+    }
+
+
 class RawDataResponse(BaseModel):
     """原始数据响应模型"""
     id: str
@@ -145,6 +163,7 @@ __all__ = [
     "RawDataTagRequest",
     "ProcessingStatusRequest",
     "AIStatusRequest",
+    "ExportJobRequest",
     "RawDataResponse",
     "RawDataListResponse"
 ]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from enum import Enum
 
@@ -81,6 +81,21 @@ SUBTYPE_UNIT_MAP = {
     DataSubType.TEMPERATURE_SOIL: DataUnit.CELSIUS,
 }
 
+# 数值型数据大类到合法子类型的映射表（FILE 类型走 /upload-file 接口）
+NUMERIC_SUBTYPES_MAP = {
+    DataType.ENVIRONMENTAL: [
+        DataSubType.TEMPERATURE, DataSubType.HUMIDITY, DataSubType.CO2,
+        DataSubType.LIGHT, DataSubType.PRESSURE
+    ],
+    DataType.SOIL: [
+        DataSubType.MOISTURE, DataSubType.PH, DataSubType.EC,
+        DataSubType.TEMPERATURE_SOIL
+    ],
+}
+
+# 单次批量上传的最大条数
+UPLOAD_BATCH_MAX_ITEMS = 1000
+
 
 class UploadDataRequest(BaseModel):
     """数字数据上传请求模型"""
@@ -165,11 +180,131 @@ class UploadDataResponse(BaseModel):
     }
 
 
+class UploadBatchRequest(BaseModel):
+    """批量数字数据上传请求模型"""
+    items: List[UploadDataRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=UPLOAD_BATCH_MAX_ITEMS,
+        description=f"数据列表（最多{UPLOAD_BATCH_MAX_ITEMS}条）"
+    )
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "items": [
+                    {
+                        "session_id": "550e8400-e29b-41d4-a716-446655440000",
+                        "data_type": "environmental",
+                        "data_subtype": "temperature",
+                        "data_value": "25.5",
+                        "capture_time": "2024-01-15T10:30:00"
+                    },
+                    {
+                        "session_id": "550e8400-e29b-41d4-a716-446655440000",
+                        "data_type": "soil",
+                        "data_subtype": "moisture",
+                        "data_value": "32.1",
+                        "capture_time": "2024-01-15T10:30:00"
+                    }
+                ]
+            }
+        }
+    }
+
+
+class UploadBatchItemResult(BaseModel):
+    """批量上传单条结果"""
+    index: int = Field(..., description="在请求 items 中的下标")
+    success: bool = Field(..., description="是否写入成功")
+    data_id: Optional[str] = Field(None, description="数据ID（成功时返回）")
+    error: Optional[str] = Field(None, description="失败原因")
+
+
+class UploadBatchResponse(BaseModel):
+    """批量数字数据上传响应模型"""
+    total: int = Field(..., description="请求条数")
+    succeeded: int = Field(..., description="成功条数")
+    failed: int = Field(..., description="失败条数")
+    results: List[UploadBatchItemResult] = Field(..., description="逐条结果，与请求顺序一致")
+    upload_time: str = Field(..., description="上传时间")
+
+
+class ResumableUploadInitRequest(BaseModel):
+    """可续传文件上传初始化请求模型"""
+    session_id: str = Field(..., description="采集会话ID")
+    data_subtype: DataSubType = Field(..., description="数据子类型（仅文件类型子类型）")
+    filename: str = Field(..., min_length=1, description="原始文件名")
+    content_type: Optional[str] = Field(None, description="文件内容类型")
+    total_size: int = Field(..., gt=0, description="文件总大小（字节）")
+    part_size: Optional[int] = Field(None, description="分片大小（字节），默认由服务端决定")
+    description: Optional[str] = Field(None, description="文件描述")
+    location_geom: Optional[str] = Field(None, description="位置几何信息（WKT格式）")
+    altitude_m: Optional[float] = Field(None, description="采集高度（米）")
+    heading: Optional[float] = Field(None, description="朝向（度）")
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "session_id": "session-uuid",
+                "data_subtype": "video",
+                "filename": "DJI_0001.MP4",
+                "content_type": "video/mp4",
+                "total_size": 2147483648,
+                "part_size": 16777216
+            }
+        }
+    }
+
+
+class PresignedUploadInitRequest(BaseModel):
+    """预签名直传初始化请求模型"""
+    session_id: str = Field(..., description="采集会话ID")
+    data_subtype: DataSubType = Field(..., description="数据子类型（仅文件类型子类型）")
+    filename: str = Field(..., min_length=1, description="原始文件名")
+    content_type: Optional[str] = Field(None, description="文件内容类型，上传时须以 Content-Type 请求头发送")
+    total_size: int = Field(..., gt=0, description="文件大小（字节）")
+    sha256: Optional[str] = Field(
+        None, pattern=r"^[0-9a-fA-F]{64}$", description="文件 SHA-256（十六进制，可选，确认后在后台校验）"
+    )
+    description: Optional[str] = Field(None, description="文件描述")
+    location_geom: Optional[str] = Field(None, description="位置几何信息（WKT格式）")
+    altitude_m: Optional[float] = Field(None, description="采集高度（米）")
+    heading: Optional[float] = Field(None, description="朝向（度）")
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "session_id": "session-uuid",
+                "data_subtype": "rgb",
+                "filename": "DJI_0001.JPG",
+                "content_type": "image/jpeg",
+                "total_size": 8388608
+            }
+        }
+    }
+
+
+class PresignedUploadConfirmRequest(BaseModel):
+    """预签名直传确认请求模型"""
+    md5: Optional[str] = Field(
+        None, pattern=r"^[0-9a-fA-F]{32}$", description="文件 MD5（十六进制，可选，与对象 ETag 比对）"
+    )
+
+
 __all__ = [
     "DataType",
     "DataSubType",
     "DataUnit",
     "UploadDataRequest",
     "UploadFileResponse",
-    "UploadDataResponse"
+    "UploadDataResponse",
+    "UploadBatchRequest",
+    "UploadBatchItemResult",
+    "UploadBatchResponse",
+    "ResumableUploadInitRequest",
+    "PresignedUploadInitRequest",
+    "PresignedUploadConfirmRequest",
+    "NUMERIC_SUBTYPES_MAP",
+    "UPLOAD_BATCH_MAX_ITEMS"
 ]
@@ -8,7 +8,7 @@ import os
 from dotenv import load_dotenv
 from pathlib import Path
 import logging
-from typing import Optional, Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # 加载环境变量
 project_root = Path(__file__).parent.parent.parent
@@ -27,6 +27,9 @@ META_DB_NAME = os.getenv("META_DB_NAME", "green_tracker_meta")
 TEMPLATE_DB_NAME = os.getenv("TEMPLATE_DB_NAME", "green_tracker_template")
 USER_DB_PREFIX = os.getenv("USER_DB_PREFIX", "green_tracker_user_")
 
+# numeric_value 回填配置
+NUMERIC_BACKFILL_BATCH_SIZE = int(os.getenv("NUMERIC_BACKFILL_BATCH_SIZE", "5000"))
+
 logger = logging.getLogger(__name__)
 
 
@@ -268,7 +271,7 @@ class DatabaseInitializer:
             # 8. 使用 SQLAlchemy 创建所有表（但不检查索引是否存在）
             from database.db_models.user_models import (
                 Field, Device, CollectionSession,
-                RawData, RawDataTag, CropObject, SystemLog
+                RawData, RawDataRollup, RawDataTag, CropObject, SystemLog, StorageObject, ExportJob
             )
             from sqlalchemy import inspect
 
@@ -282,9 +285,12 @@ class DatabaseInitializer:
                 (Device, 'devices'),
                 (CollectionSession, 'collection_sessions'),
                 (RawData, 'raw_data'),
+                (RawDataRollup, 'raw_data_rollups'),
                 (RawDataTag, 'raw_data_tags'),
                 (CropObject, 'crop_objects'),
-                (SystemLog, 'system_logs')
+                (SystemLog, 'system_logs'),
+                (StorageObject, 'storage_objects'),
+                (ExportJob, 'export_jobs')
             ]:
                 if table_name not in existing_tables:
                     try:
@@ -307,6 +313,11 @@ class DatabaseInitializer:
                         migration_conn.commit()
                     logger.info("Added mqtt_secret column to devices table")
 
+            # 启用分区时将 raw_data 转换为按月分区表（新用户数据库从模板继承）
+            from database.raw_data_partitioning import RawDataPartitionManager
+            if RawDataPartitionManager.is_enabled():
+                RawDataPartitionManager.convert_to_partitioned(template_engine, TEMPLATE_DB_NAME)
+
             logger.info("Template tables created successfully")
 
             template_engine.dispose()
@@ -366,6 +377,47 @@ class DatabaseInitializer:
                             from database.db_models.user_models import SystemLog
                             SystemLog.__table__.create(bind=engine, checkfirst=True)
                             logger.info(f"[{db_name}] system_logs table created")
+
+                        # 迁移：为 raw_data 表添加 numeric_value 列（缺失的索引和数据回填在命令行中执行，
+                        # 启动时不在每个 worker 中同步建索引）
+                        if 'raw_data' in existing_tables:
+                            DatabaseInitializer.migrate_raw_data_numeric_value(
+                                engine, db_name, inspector, create_indexes=False
+                            )
+
+                        # 迁移：创建时间桶聚合表（已有数据的聚合在命令行中构建，启动时不在每个 worker 中全表扫描）
+                        if 'raw_data_rollups' not in existing_tables and 'collection_sessions' in existing_tables:
+                            logger.info(f"[{db_name}] Creating raw_data_rollups table...")
+                            from database.db_models.user_models import RawDataRollup
+                            RawDataRollup.__table__.create(bind=engine, checkfirst=True)
+                            logger.info(f"[{db_name}] raw_data_rollups table created")
+                            if 'raw_data' in existing_tables:
+                                logger.warning(
+                                    f"[{db_name}] raw_data_rollups is empty for existing data; run "
+                                    f"'python database_initializer.py rebuild-rollups {db_name}' to build it"
+                                )
+
+                        # 迁移：创建内容寻址存储对象表
+                        if 'storage_objects' not in existing_tables:
+                            logger.info(f"[{db_name}] Creating storage_objects table...")
+                            from database.db_models.user_models import StorageObject
+                            StorageObject.__table__.create(bind=engine, checkfirst=True)
+                            logger.info(f"[{db_name}] storage_objects table created")
+
+                        # 迁移：创建后台导出任务表
+                        if 'export_jobs' not in existing_tables:
+                            logger.info(f"[{db_name}] Creating export_jobs table...")
+                            from database.db_models.user_models import ExportJob
+                            ExportJob.__table__.create(bind=engine, checkfirst=True)
+                            logger.info(f"[{db_name}] export_jobs table created")
+                        else:
+                            columns = {col['name'] for col in inspector.get_columns('export_jobs') or []}
+                            if 'updated_at' not in columns:
+                                logger.info(f"[{db_name}] Adding export_jobs.updated_at column...")
+                                with engine.connect() as conn:
+                                    conn.execute(text("ALTER TABLE export_jobs ADD COLUMN updated_at TIMESTAMP"))
+                                    conn.commit()
+                                logger.info(f"[{db_name}] export_jobs.updated_at column added")
                     except ProgrammingError as pe:
                         logger.warning(f"[{db_name}] Migration skipped (DB may not exist): {pe}")
                     finally:
@@ -377,6 +429,227 @@ class DatabaseInitializer:
             logger.error(f"Failed to migrate user databases: {e}")
             raise
 
+    @staticmethod
+    def migrate_raw_data_numeric_value(engine, db_name: str, inspector=None, create_indexes: bool = True):
+        """
+        为 raw_data 表添加 numeric_value 列，并补建模型中定义但缺失的索引
+        （包括 (data_subtype, capture_time) INCLUDE (numeric_value) 覆盖索引）
+
+        添加可空列不会重写表；索引使用 CONCURRENTLY 创建，不阻塞写入。
+
+        Args:
+            engine: 用户数据库引擎
+            db_name: 数据库名称（用于日志）
+            inspector: 已创建的 inspector（可选）
+            create_indexes: 是否创建缺失的索引（为 False 时只记录缺失的索引，见 ensure-indexes 命令）
+        """
+        from sqlalchemy import inspect, text
+
+        inspector = inspector or inspect(engine)
+        columns = {col['name'] for col in inspector.get_columns('raw_data') or []}
+        if 'numeric_value' not in columns:
+            logger.info(f"[{db_name}] Adding raw_data.numeric_value column...")
+            with engine.connect() as conn:
+                conn.execute(text("ALTER TABLE raw_data ADD COLUMN IF NOT EXISTS numeric_value DOUBLE PRECISION"))
+                conn.commit()
+            logger.info(f"[{db_name}] raw_data.numeric_value column added")
+
+        DatabaseInitializer.ensure_raw_data_indexes(engine, db_name, inspector, create=create_indexes)
+
+    @staticmethod
+    def ensure_raw_data_indexes(engine, db_name: str, inspector=None, create: bool = True) -> list:
+        """
+        按模型定义为 raw_data 补建缺失的索引
+
+        普通表使用 CREATE INDEX CONCURRENTLY，不阻塞写入；分区表不支持 CONCURRENTLY，直接创建。
+
+        Args:
+            engine: 用户数据库引擎
+            db_name: 数据库名称（用于日志）
+            inspector: 已创建的 inspector（可选）
+            create: 为 False 时只检查并记录缺失的索引
+
+        Returns:
+            list: 缺失（或本次创建）的索引名称
+        """
+        from sqlalchemy import inspect, text
+        from sqlalchemy.schema import CreateIndex
+        from database.db_models.user_models import RawData
+        from database.raw_data_partitioning import RawDataPartitionManager
+
+        inspector = inspector or inspect(engine)
+        existing = {idx['name'] for idx in inspector.get_indexes('raw_data') or []}
+        missing = [idx for idx in RawData.__table__.indexes if idx.name not in existing]
+        if not missing:
+            return []
+        if not create:
+            logger.warning(
+                f"[{db_name}] raw_data is missing indexes {[idx.name for idx in missing]}, "
+                f"run: python -m database.database_initializer ensure-indexes {db_name}"
+            )
+            return [idx.name for idx in missing]
+
+        # CREATE INDEX CONCURRENTLY 不能在事务中执行
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            concurrently = not RawDataPartitionManager.is_partitioned(conn)
+            for index in missing:
+                ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+                if concurrently:
+                    ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+                logger.info(f"[{db_name}] Creating index {index.name}...")
+                conn.execute(text(ddl))
+        return [idx.name for idx in missing]
+
+    @staticmethod
+    def create_user_engine(db_name: str):
+        """
+        创建用户数据库引擎（使用本模块的数据库连接配置）
+
+        Args:
+            db_name: 用户数据库名称
+
+        Returns:
+            Engine: SQLAlchemy 引擎，用完后由调用方 dispose
+        """
+        from sqlalchemy import create_engine
+        return create_engine(f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{db_name}")
+
+    @staticmethod
+    def user_database_names(active_only: bool = False) -> List[str]:
+        """
+        从元数据库读取用户数据库名称
+
+        Args:
+            active_only: 是否只返回活跃的用户数据库
+
+        Returns:
+            List[str]: 用户数据库名称
+        """
+        from database.main_db import SessionLocal
+        from database.db_models.meta_model import UserDatabase
+
+        with SessionLocal() as db:
+            query = db.query(UserDatabase)
+            if active_only:
+                query = query.filter(UserDatabase.is_active == True)
+            return [u.database_name for u in query.all()]
+
+    @staticmethod
+    def _for_each_user_db(fn: Callable[[Any], Any], db_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        对每个用户数据库执行一次维护操作（命令行维护命令共用）
+
+        每个数据库使用独立的引擎和会话，单个数据库失败不影响其它数据库；
+        fn 返回 None 表示该数据库不适用（如没有 raw_data 表），不记录结果。
+
+        Args:
+            fn: 维护操作，参数为用户数据库会话
+            db_name: 用户数据库名称（可选，默认处理所有用户数据库）
+
+        Returns:
+            dict: 每个数据库的执行结果
+        """
+        from sqlalchemy.orm import Session
+
+        action = getattr(fn, "__name__", "maintenance")
+        db_names = [db_name] if db_name else DatabaseInitializer.user_database_names()
+        results: Dict[str, Any] = {}
+        for name in db_names:
+            engine = DatabaseInitializer.create_user_engine(name)
+            try:
+                with Session(engine) as session:
+                    result = fn(session)
+                if result is not None:
+                    results[name] = result
+                    logger.info(f"[{name}] {action} completed: {result}")
+            except Exception as e:
+                logger.error(f"[{name}] {action} failed: {e}")
+                results[name] = {"error": str(e)}
+            finally:
+                engine.dispose()
+
+        return {"status": "success", "databases": results}
+
+    @staticmethod
+    def _has_raw_data(session) -> bool:
+        from sqlalchemy import inspect
+        return 'raw_data' in (inspect(session.get_bind()).get_table_names() or [])
+
+    @staticmethod
+    def ensure_indexes(db_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        为用户数据库的 raw_data 补建缺失的索引（命令行执行，服务启动时只检查不创建）
+
+        Args:
+            db_name: 用户数据库名称（可选，默认处理所有用户数据库）
+
+        Returns:
+            dict: 每个数据库创建的索引
+        """
+        def ensure_raw_data_indexes(session):
+            engine = session.get_bind()
+            if not DatabaseInitializer._has_raw_data(session):
+                return None
+            return DatabaseInitializer.ensure_raw_data_indexes(engine, engine.url.database)
+
+        return DatabaseInitializer._for_each_user_db(ensure_raw_data_indexes, db_name)
+
+    @staticmethod
+    def backfill_numeric_values(db_name: Optional[str] = None,
+                                batch_size: int = NUMERIC_BACKFILL_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        回填已有数据的 raw_data.numeric_value（缺少该列时先添加）
+
+        一次性的维护操作，通过命令行执行：python -m database.database_initializer backfill-numeric
+
+        Args:
+            db_name: 用户数据库名称（可选，默认处理所有用户数据库）
+            batch_size: 每批处理的行数
+
+        Returns:
+            dict: 每个数据库回填的行数
+        """
+        from database.db_services.raw_data_service import backfill_numeric_values
+
+        def backfill_numeric(session):
+            engine = session.get_bind()
+            if not DatabaseInitializer._has_raw_data(session):
+                return None
+            DatabaseInitializer.migrate_raw_data_numeric_value(engine, engine.url.database)
+            return backfill_numeric_values(session, batch_size)
+
+        return DatabaseInitializer._for_each_user_db(backfill_numeric, db_name)
+
+    @staticmethod
+    def rebuild_rollups(db_name: Optional[str] = None) -> Dict[str, Any]:
+        """从 raw_data 重建时间桶聚合表，返回每个数据库写入的聚合行数"""
+        from database.db_services.rollup_service import rebuild_rollups
+        return DatabaseInitializer._for_each_user_db(rebuild_rollups, db_name)
+
+    @staticmethod
+    def backfill_thumbnails(db_name: Optional[str] = None) -> Dict[str, Any]:
+        """为已有图像数据补齐缩略图金字塔，返回每个数据库生成成功和失败的数量"""
+        from utils.thumbnail_service import backfill_thumbnails
+        return DatabaseInitializer._for_each_user_db(backfill_thumbnails, db_name)
+
+    @staticmethod
+    def expire_uploads(db_name: Optional[str] = None) -> Dict[str, Any]:
+        """清理过期未完成的上传，返回每个数据库清理的上传数"""
+        from database.db_services.upload_service import expire_resumable_uploads
+        return DatabaseInitializer._for_each_user_db(expire_resumable_uploads, db_name)
+
+    @staticmethod
+    def expire_exports(db_name: Optional[str] = None) -> Dict[str, Any]:
+        """清理超过保留时间（EXPORT_JOB_TTL）的导出任务及导出文件，并将心跳超时的任务标记为失败"""
+        from database.db_services.export_job_service import expire_export_jobs
+        return DatabaseInitializer._for_each_user_db(expire_export_jobs, db_name)
+
+    @staticmethod
+    def reconcile_storage(db_name: Optional[str] = None) -> Dict[str, Any]:
+        """修正内容寻址存储对象的引用计数，删除已无引用的对象"""
+        from database.db_services.storage_object_service import reconcile_storage_objects
+        return DatabaseInitializer._for_each_user_db(reconcile_storage_objects, db_name)
+
     @staticmethod
     def verify_database(db_name: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -448,6 +721,35 @@ def verify(db_name: Optional[str] = None) -> Dict[str, Any]:
     return DatabaseInitializer.verify_database(db_name)
 
 
+def partition_raw_data(db_name: Optional[str] = None) -> Dict[str, Any]:
+    """将用户数据库 raw_data 迁移为分区表的便捷函数"""
+    from database.raw_data_partitioning import RawDataPartitionManager
+    return RawDataPartitionManager.migrate_databases(db_name)
+
+
+def maintain_partitions(db_name: Optional[str] = None) -> Dict[str, Any]:
+    """执行 raw_data 分区维护的便捷函数"""
+    from database.raw_data_partitioning import RawDataPartitionManager
+    return RawDataPartitionManager.run_maintenance(db_name)
+
+
+# 按用户数据库执行的维护命令：命令 -> (处理函数, 说明)，参数均为可选的数据库名称
+USER_DB_COMMANDS: Dict[str, Tuple[Callable[[Optional[str]], Dict[str, Any]], str]] = {
+    "backfill-numeric": (DatabaseInitializer.backfill_numeric_values, "Backfill raw_data.numeric_value"),
+    "ensure-indexes": (DatabaseInitializer.ensure_indexes, "Create missing raw_data indexes (CONCURRENTLY)"),
+    "rebuild-rollups": (DatabaseInitializer.rebuild_rollups, "Rebuild raw_data_rollups from raw_data"),
+    "backfill-thumbnails": (DatabaseInitializer.backfill_thumbnails, "Generate missing image thumbnails"),
+    "expire-uploads": (DatabaseInitializer.expire_uploads, "Remove expired unfinished resumable uploads"),
+    "expire-exports": (DatabaseInitializer.expire_exports, "Remove expired export jobs and their files"),
+    "reconcile-storage": (
+        DatabaseInitializer.reconcile_storage,
+        "Fix deduplicated object refcounts and remove unreferenced objects"
+    ),
+    "partition-raw-data": (partition_raw_data, "Convert raw_data to monthly partitions"),
+    "partition-maintain": (maintain_partitions, "Create future partitions / drop expired ones"),
+}
+
+
 if __name__ == "__main__":
     import sys
 
@@ -457,6 +759,8 @@ if __name__ == "__main__":
         print("  init-meta    - Initialize meta database")
         print("  init-template - Initialize template database")
         print("  verify       - Verify database")
+        for name, (_, description) in USER_DB_COMMANDS.items():
+            print(f"  {name} [db_name] - {description}")
         sys.exit(1)
 
     command = sys.argv[1]
@@ -471,6 +775,10 @@ if __name__ == "__main__":
         db_name = sys.argv[2] if len(sys.argv) > 2 else None
         result = verify(db_name)
         print(f"Success: {result}")
+    elif command in USER_DB_COMMANDS:
+        db_name = sys.argv[2] if len(sys.argv) > 2 else None
+        result = USER_DB_COMMANDS[command][0](db_name)
+        print(f"Success: {result}")
     else:
         print(f"Unknown command: {command}")
         sys.exit(1)
@@ -3,7 +3,7 @@
 这些模型用于每个用户的独立数据库中
 """
 
-from sqlalchemy import Column, String, Boolean, Integer, Float, DateTime, Text, ForeignKey, Index, JSON, ARRAY
+from sqlalchemy import Column, String, Boolean, Integer, BigInteger, Float, DateTime, Text, ForeignKey, Index, JSON, ARRAY
 from sqlalchemy.orm import declarative_base, relationship
 from geoalchemy2 import Geometry
 from datetime import datetime
@@ -137,6 +137,7 @@ class RawData(UserBase):
     data_subtype = Column(Text, nullable=True, index=True, comment="数据子类：rgb/nir/red_edge/thermal/multispectral/video/temperature/humidity/co2/light/pressure/ph/moisture/ec/temperature_soil")
     data_unit = Column(Text, nullable=True, comment="数据单位：°C/%/ppm/lux/cm/ms/mm")
     data_value = Column(Text, nullable=True, comment="数据值（非图像数据使用）")
+    numeric_value = Column(Float, nullable=True, comment="数值（environmental/soil 数据写入时由 data_value 解析，用于聚合统计）")
     data_format = Column(Text, nullable=True, comment="数据格式：jpeg/png/tiff/mp4/csv/json")
     bucket_name = Column(Text, nullable=True, comment="MinIO bucket（图像/视频数据使用，与session_id一致）")
     object_key = Column(Text, nullable=True, comment="MinIO 对象路径（图像/视频数据使用）")
@@ -172,8 +173,16 @@ class RawData(UserBase):
         # PostGIS 会为 geometry 列自动创建 gist 索引，不需要手动创建
         # Index('idx_raw_data_location_geom', 'location_geom', postgresql_using='gist'),
         Index('uniq_raw_data_object', 'session_id', 'bucket_name', 'object_key'),
+        # 内容寻址存储：按对象路径统计引用、查找共用同一对象的记录
+        Index('idx_raw_data_object_key', 'object_key'),
         Index('idx_raw_data_session_type', 'session_id', 'data_type'),
         Index('idx_raw_data_type_time', 'data_type', 'capture_time'),
+        # 时序/统计查询覆盖索引：按子类型+时间范围扫描时直接读取数值，无需回表
+        Index('idx_raw_data_subtype_time_value', 'data_subtype', 'capture_time',
+              postgresql_include=['numeric_value']),
+        # 列表游标分页：ORDER BY capture_time DESC, id DESC
+        Index('idx_raw_data_time_id', 'capture_time', 'id'),
+        Index('idx_raw_data_session_time_id', 'session_id', 'capture_time', 'id'),
         {'comment': '原始数据表'}
     )
 
@@ -181,6 +190,93 @@ class RawData(UserBase):
         return f"<RawData(id={self.id}, type={self.data_type})>"
 
 
+class RawDataRollup(UserBase):
+    """
+    原始数据时间桶聚合表 - 按 (会话, 子类型) 在 1分钟/1小时/1天 粒度上预聚合数值型数据
+
+    写入原始数据时在同一事务中增量更新，供长时间范围的时序图和统计查询使用。
+    """
+    __tablename__ = "raw_data_rollups"
+
+    bucket_size = Column(Text, primary_key=True, comment="时间桶粒度：1m/1h/1d")
+    session_id = Column(String(36), ForeignKey('collection_sessions.id', ondelete='CASCADE'), primary_key=True, comment="所属任务")
+    data_subtype = Column(Text, primary_key=True, comment="数据子类")
+    bucket_start = Column(DateTime, primary_key=True, comment="时间桶起始时间")
+    data_type = Column(Text, nullable=False, comment="数据大类：environmental/soil")
+    value_count = Column(Integer, nullable=False, default=0, comment="数据点数")
+    min_value = Column(Float, nullable=True, comment="最小值")
+    max_value = Column(Float, nullable=True, comment="最大值")
+    sum_value = Column(Float, nullable=True, comment="数值总和")
+    last_value = Column(Float, nullable=True, comment="桶内最新数值")
+    last_time = Column(DateTime, nullable=True, comment="桶内最新数据的采集时间")
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, comment="更新时间")
+
+    __table_args__ = (
+        Index('idx_raw_data_rollups_size_subtype_start', 'bucket_size', 'data_subtype', 'bucket_start'),
+        {'comment': '原始数据时间桶聚合表'}
+    )
+
+    def __repr__(self):
+        return f"<RawDataRollup(size={self.bucket_size}, subtype={self.data_subtype}, start={self.bucket_start})>"
+
+
+class StorageObject(UserBase):
+    """
+    内容寻址存储对象表 - 按 SHA-256 去重的 MinIO 对象及其引用计数
+
+    相同内容的文件只存储一份（user_{user_id}/cas/ 前缀下），每条引用它的原始数据记录计一次引用，
+    引用数降为 0 时删除对象。
+    """
+    __tablename__ = "storage_objects"
+
+    sha256 = Column(String(64), primary_key=True, comment="内容 SHA-256")
+    object_key = Column(Text, nullable=False, comment="MinIO 对象路径")
+    size_bytes = Column(BigInteger, nullable=False, comment="对象大小（字节）")
+    content_type = Column(Text, nullable=True, comment="内容类型")
+    ref_count = Column(Integer, nullable=False, default=0, comment="引用该对象的原始数据记录数")
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, comment="创建时间")
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, comment="更新时间")
+
+    __table_args__ = (
+        {'comment': '内容寻址存储对象表'},
+    )
+
+    def __repr__(self):
+        return f"<StorageObject(sha256={self.sha256}, refs={self.ref_count})>"
+
+
+class ExportJob(UserBase):
+    """
+    后台导出任务表 - 记录导出任务的状态和进度
+
+    任务由提交它的 API 进程执行，状态保存在用户数据库中，任意 worker 都能查询；
+    执行进程每次保存进度时更新 updated_at，心跳超时的 running 任务视为执行进程已退出；
+    超过保留时间的任务及其导出文件由 expire-exports 命令清理。
+    """
+    __tablename__ = "export_jobs"
+
+    id = Column(String(32), primary_key=True, comment="任务ID")
+    status = Column(Text, nullable=False, default='pending', comment="任务状态：pending/running/completed/failed")
+    format = Column(Text, nullable=False, comment="导出格式")
+    filters = Column(JSON, nullable=True, comment="过滤条件（session_id / data_type / data_subtype）")
+    filename = Column(Text, nullable=False, comment="下载文件名")
+    object_key = Column(Text, nullable=False, comment="导出文件的 MinIO 对象路径")
+    rows_done = Column(BigInteger, nullable=False, default=0, comment="已导出行数")
+    bytes_written = Column(BigInteger, nullable=False, default=0, comment="已写入字节数")
+    error = Column(Text, nullable=True, comment="失败原因")
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True, comment="创建时间")
+    started_at = Column(DateTime, nullable=True, comment="开始执行时间")
+    finished_at = Column(DateTime, nullable=True, comment="结束时间")
+    updated_at = Column(DateTime, nullable=True, comment="最近一次写入状态的时间（执行进程心跳）")
+
+    __table_args__ = (
+        {'comment': '后台导出任务表'},
+    )
+
+    def __repr__(self):
+        return f"<ExportJob(id={self.id}, status={self.status})>"
+
+
 class RawDataTag(UserBase):
     """
     原始数据标签表 - 存储原始数据的标签信息
@@ -6,6 +6,7 @@ from database.db_models.user_models import Device
 import uuid
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from database.db_services.count_service import invalidate_table_counts, invalidate_raw_data_counts
 
 def create_collection_session(
     db: Session,
@@ -62,6 +63,7 @@ def create_collection_session(
     db.add(new_session)
     db.commit()
     db.refresh(new_session)
+    invalidate_table_counts(db, 'collection_sessions')
 
     print(f"[后端CollectionSessionService] 成功创建采集任务，ID={new_session.id}")
     return new_session
@@ -228,6 +230,7 @@ def update_collection_session(
     
     db.commit()
     db.refresh(session)
+    invalidate_table_counts(db, 'collection_sessions')
     
     return session
 
@@ -248,6 +251,9 @@ def delete_collection_session(db: Session, session_id: str) -> bool:
     
     db.delete(session)
     db.commit()
+    # 会话删除会级联删除其原始数据
+    invalidate_table_counts(db, 'collection_sessions')
+    invalidate_raw_data_counts(db, [session_id])
     
     return True
 
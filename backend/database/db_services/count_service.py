@@ -0,0 +1,273 @@
+"""
+计数服务
+为列表和统计接口提供三种计数方式，减少大表上的 COUNT(*) 开销：
+
+- exact：直接执行 COUNT(*)，适用于小表
+- estimate：使用查询规划器的估算值（无过滤条件时读取 pg_class.reltuples，
+  有过滤条件时读取 EXPLAIN 的行数估算），不扫描数据
+- cached：精确计数按 (用户数据库, 表, 过滤条件) 缓存，写入时通过更换表的
+  代际令牌使旧缓存失效，并有 TTL 兜底
+
+raw_data 写入频繁，其代际令牌采用防抖更换：距上次更换不足
+RAW_DATA_INVALIDATION_INTERVAL 秒的写入只标记为“待更换”，到期后由下一次读取更换，
+因此持续写入时令牌每个间隔最多更换一次，依赖它的缓存最多滞后一个间隔。
+
+auto 模式按表的估算行数选择：小表使用 exact，大表使用 cached；选择结果同样缓存，
+命中缓存计数时不执行任何数据库查询。
+
+代际令牌和缓存计数保存在 get_cache_manager() 中。只有 Redis 后端在多个 worker 之间共享；
+内存后端下写入只能使本进程的缓存失效，其他 worker 最多返回 COUNT_CACHE_TTL 秒前的计数，
+多 worker 部署需要 Redis 才能保证写入后计数及时更新。
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Any, Iterable, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from utils.cache_manager import get_cache_manager
+
+COUNT_MODES = ("exact", "estimate", "cached", "auto")
+
+# 缓存计数的有效期（秒）
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "60"))
+# auto 模式下，估算行数低于该值的表直接精确计数
+COUNT_EXACT_THRESHOLD = int(os.getenv("COUNT_EXACT_THRESHOLD", "100000"))
+# raw_data 代际令牌的最短更换间隔（秒），0 表示每次写入立即更换
+RAW_DATA_INVALIDATION_INTERVAL = int(os.getenv("RAW_DATA_INVALIDATION_INTERVAL", "10"))
+# 代际令牌的有效期（秒），过期后自动生成新令牌，等同于一次失效
+_GENERATION_TTL = 7 * 24 * 3600
+
+
+def get_tenant_key(db: Session) -> str:
+    """
+    获取用户数据库标识（每个用户独立数据库，以数据库名区分）
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        str: 数据库名
+    """
+    return str(db.get_bind().url.database)
+
+
+def _generation_key(tenant: str, table: str) -> str:
+    return f"count_gen:{tenant}:{table}"
+
+
+def _pending_key(tenant: str, table: str) -> str:
+    return f"count_gen_pending:{tenant}:{table}"
+
+
+def _rotate_generation(cache, tenant: str, table: str) -> str:
+    """生成新的代际令牌（记录更换时间，用于防抖）"""
+    token = uuid.uuid4().hex
+    cache.set(_generation_key(tenant, table), {"token": token, "rotated_at": time.time()}, _GENERATION_TTL)
+    return token
+
+
+def _rotated_at(entry: Any) -> float:
+    return entry.get("rotated_at", 0.0) if isinstance(entry, dict) else 0.0
+
+
+def get_table_generation(db: Session, table: str) -> str:
+    """
+    获取表的当前代际令牌（不存在时生成）
+
+    表有待更换标记且距上次更换已满防抖间隔时，在此处更换令牌。
+
+    Args:
+        db: 数据库会话
+        table: 表名
+
+    Returns:
+        str: 代际令牌
+    """
+    cache = get_cache_manager()
+    tenant = get_tenant_key(db)
+    entry = cache.get(_generation_key(tenant, table))
+    if not entry:
+        return _rotate_generation(cache, tenant, table)
+
+    if cache.get(_pending_key(tenant, table)) and time.time() - _rotated_at(entry) >= RAW_DATA_INVALIDATION_INTERVAL:
+        cache.delete(_pending_key(tenant, table))
+        return _rotate_generation(cache, tenant, table)
+    return entry["token"] if isinstance(entry, dict) else entry
+
+
+def invalidate_table_counts(db: Session, *tables: str, debounce: bool = False) -> None:
+    """
+    写入后使表的缓存计数失效（更换代际令牌，旧缓存键不再被命中）
+
+    debounce 为 True 时，距上次更换不足 RAW_DATA_INVALIDATION_INTERVAL 秒则只设置
+    待更换标记，由间隔到期后的下一次读取更换令牌。
+    缓存不可用时静默忽略，不影响写入流程。
+
+    Args:
+        db: 数据库会话
+        tables: 表名
+        debounce: 是否防抖更换
+    """
+    try:
+        cache = get_cache_manager()
+        tenant = get_tenant_key(db)
+        now = time.time()
+        for table in tables:
+            if debounce and RAW_DATA_INVALIDATION_INTERVAL > 0:
+                entry = cache.get(_generation_key(tenant, table))
+                if entry and now - _rotated_at(entry) < RAW_DATA_INVALIDATION_INTERVAL:
+                    cache.set(_pending_key(tenant, table), True, _GENERATION_TTL)
+                    continue
+            _rotate_generation(cache, tenant, table)
+    except Exception as e:
+        print(f"[后端CountService] 计数缓存失效失败: {str(e)}")
+
+
+def session_data_table(session_id: str) -> str:
+    """
+    按会话划分的 raw_data 代际令牌名（用于只依赖部分会话数据的结果缓存）
+
+    Args:
+        session_id: 会话ID
+
+    Returns:
+        str: 令牌名
+    """
+    return f"raw_data:session:{session_id}"
+
+
+def invalidate_raw_data_counts(db: Session, session_ids: Iterable[str]) -> None:
+    """
+    raw_data 写入后使表级缓存和所涉及会话的缓存失效
+
+    表级和会话级令牌都防抖更换（概览快照、计数和统计缓存最多滞后
+    RAW_DATA_INVALIDATION_INTERVAL 秒），避免持续写入时每次写入都使这些缓存失效。
+
+    Args:
+        db: 数据库会话
+        session_ids: 写入涉及的会话ID
+    """
+    invalidate_table_counts(
+        db, 'raw_data', *(session_data_table(str(sid)) for sid in set(session_ids) if sid), debounce=True
+    )
+
+
+def _compile(db: Session, query) -> Tuple[str, dict]:
+    """将 ORM 查询编译为带参数的 SQL（IN 列表展开为独立参数）"""
+    compiled = query.statement.compile(
+        dialect=db.get_bind().dialect,
+        compile_kwargs={"render_postcompile": True}
+    )
+    return str(compiled), dict(compiled.params)
+
+
+def _has_filters(query) -> bool:
+    return query.statement.whereclause is not None
+
+
+def estimate_table_rows(db: Session, table: str) -> int:
+    """
+    读取 pg_class.reltuples 估算表的行数（分区表累加所有分区）
+
+    Args:
+        db: 数据库会话
+        table: 表名
+
+    Returns:
+        int: 估算行数（表从未 ANALYZE 时为 0）
+    """
+    result = db.execute(text("""
+        SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)
+        FROM pg_class c
+        WHERE c.oid = to_regclass(:table)
+           OR c.oid IN (
+               SELECT i.inhrelid FROM pg_inherits i WHERE i.inhparent = to_regclass(:table)
+           )
+    """), {"table": table}).scalar()
+    return int(result or 0)
+
+
+def estimate_query_rows(db: Session, query) -> int:
+    """
+    读取 EXPLAIN 对查询的行数估算
+
+    Args:
+        db: 数据库会话
+        query: ORM 查询
+
+    Returns:
+        int: 估算行数
+    """
+    sql, params = _compile(db, query)
+    row = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+    plan = json.loads(row) if isinstance(row, str) else row
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _resolve_auto_mode(db: Session, table: str) -> str:
+    """auto 模式按表的估算行数选择 exact / cached，选择结果缓存 COUNT_CACHE_TTL 秒"""
+    cache_key = f"count_auto:{get_tenant_key(db)}:{table}"
+    try:
+        mode = get_cache_manager().get(cache_key)
+        if mode:
+            return mode
+    except Exception:
+        pass
+
+    try:
+        mode = "exact" if estimate_table_rows(db, table) < COUNT_EXACT_THRESHOLD else "cached"
+    except Exception:
+        return "exact"
+    get_cache_manager().set(cache_key, mode, COUNT_CACHE_TTL)
+    return mode
+
+
+def count_query(db: Session, query, table: str, mode: str = "auto") -> Tuple[int, str]:
+    """
+    按指定方式统计查询结果数量
+
+    Args:
+        db: 数据库会话
+        query: ORM 查询（已添加过滤条件，未分页）
+        table: 查询的主表名（用于估算和缓存失效）
+        mode: exact / estimate / cached / auto
+
+    Returns:
+        Tuple[int, str]: (数量, 实际使用的计数方式)
+    """
+    if mode == "auto":
+        mode = _resolve_auto_mode(db, table)
+
+    if mode == "estimate":
+        try:
+            if _has_filters(query):
+                return estimate_query_rows(db, query), "estimate"
+            return estimate_table_rows(db, table), "estimate"
+        except Exception as e:
+            print(f"[后端CountService] 估算行数失败，改用精确计数: {str(e)}")
+            return query.count(), "exact"
+
+    if mode == "cached":
+        cache_key = None
+        try:
+            sql, params = _compile(db, query)
+            digest = hashlib.md5(f"{sql}|{sorted(params.items())!r}".encode("utf-8")).hexdigest()
+            cache_key = f"count:{get_tenant_key(db)}:{table}:{get_table_generation(db, table)}:{digest}"
+            cached: Optional[Any] = get_cache_manager().get(cache_key)
+            if cached is not None:
+                return int(cached), "cached"
+        except Exception as e:
+            print(f"[后端CountService] 读取计数缓存失败: {str(e)}")
+
+        total = query.count()
+        if cache_key:
+            get_cache_manager().set(cache_key, total, COUNT_CACHE_TTL)
+        return total, "exact"
+
+    return query.count(), "exact"
@@ -2,6 +2,7 @@ import logging
 from sqlalchemy import and_, or_, text
 from sqlalchemy.orm import Session
 from database.db_models.user_models import Device
+from database.db_services.count_service import invalidate_table_counts
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -46,6 +47,7 @@ def create_device(db: Session, name: str, device_type: str, platform_level: str,
     db.add(new_device)
     db.commit()
     db.refresh(new_device)
+    invalidate_table_counts(db, 'devices')
 
     print(f"[DeviceService] 设备已创建: {new_device.id}")
     return new_device
@@ -194,6 +196,7 @@ def update_device(db: Session, device_id: str,
     if update_data:
         db.query(Device).filter(and_(*conditions)).update(update_data)
         db.commit()
+        invalidate_table_counts(db, 'devices')
 
     # 刷新对象以获取更新后的值
     db.refresh(device)
@@ -222,6 +225,7 @@ def delete_device(db: Session, device_id: str, soft_delete: bool = True) -> bool
     else:
         db.delete(device)
     db.commit()
+    invalidate_table_counts(db, 'devices')
 
     return True
 
@@ -248,6 +252,7 @@ def restore_device(db: Session, device_id: str) -> Optional[Device]:
     device.is_active = True  # type: ignore
     db.commit()
     db.refresh(device)
+    invalidate_table_counts(db, 'devices')
 
     return device
 
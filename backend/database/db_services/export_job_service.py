@@ -0,0 +1,155 @@
+"""
+后台导出任务状态服务模块
+
+导出任务的状态和进度保存在用户数据库的 export_jobs 表中：
+- 执行任务的进程定期写入进度（同时更新心跳时间），任意 worker 都能查询到同一状态
+- 心跳超过 EXPORT_JOB_STALE_TIMEOUT 的 running 任务视为执行进程已退出，查询或清理时标记为失败
+- 超过保留时间的任务连同 user_{user_id}/exports/ 下的导出文件一起清理
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from database.db_models.user_models import ExportJob
+
+# 导出任务及导出文件的保留时间（秒）
+EXPORT_JOB_TTL = int(os.getenv("EXPORT_JOB_TTL", "86400"))
+# running 任务的心跳超时（秒），应为执行进程保存进度间隔的数倍
+EXPORT_JOB_STALE_TIMEOUT = int(os.getenv("EXPORT_JOB_STALE_TIMEOUT", "60"))
+
+# 任务状态字典中与表字段对应的键（job_id 对应主键 id）
+_JOB_FIELDS = (
+    "status", "format", "filters", "filename", "object_key",
+    "rows_done", "bytes_written", "error"
+)
+_JOB_TIME_FIELDS = ("created_at", "started_at", "finished_at", "updated_at")
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def export_job_to_dict(job: ExportJob) -> Dict[str, Any]:
+    """
+    将任务记录转换为任务状态字典
+
+    Args:
+        job: 任务记录
+
+    Returns:
+        Dict[str, Any]: 任务状态
+    """
+    data: Dict[str, Any] = {"job_id": job.id}
+    for field in _JOB_FIELDS:
+        data[field] = getattr(job, field)
+    for field in _JOB_TIME_FIELDS:
+        value = getattr(job, field)
+        data[field] = value.isoformat() if value else None
+    return data
+
+
+def save_export_job(db: Session, job: Dict[str, Any]) -> None:
+    """
+    写入任务状态（不存在时创建），同时更新心跳时间
+
+    执行进程在任务被判定为超时后恢复写入时，状态以执行进程写入的为准。
+
+    Args:
+        db: 用户数据库会话
+        job: 任务状态字典
+    """
+    record = db.get(ExportJob, job["job_id"])
+    if record is None:
+        record = ExportJob(id=job["job_id"])
+        db.add(record)
+    for field in _JOB_FIELDS:
+        setattr(record, field, job.get(field))
+    for field in _JOB_TIME_FIELDS:
+        if field != "updated_at":
+            setattr(record, field, _parse_time(job.get(field)))
+    record.updated_at = datetime.now()
+    db.commit()
+
+
+def _is_stale(job: ExportJob, now: datetime, timeout: int) -> bool:
+    heartbeat = job.updated_at or job.started_at or job.created_at
+    return job.status == "running" and heartbeat is not None and now - heartbeat > timedelta(seconds=timeout)
+
+
+def _mark_stale(job: ExportJob, now: datetime):
+    job.status = "failed"
+    job.error = "执行任务的进程已退出，导出中断"
+    job.finished_at = now
+    job.updated_at = now
+
+
+def get_export_job(db: Session, job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    获取任务状态
+
+    running 任务的心跳超过 EXPORT_JOB_STALE_TIMEOUT 时标记为失败。
+
+    Args:
+        db: 用户数据库会话
+        job_id: 任务ID
+
+    Returns:
+        Optional[Dict[str, Any]]: 任务状态，不存在时返回 None
+    """
+    record = db.get(ExportJob, job_id)
+    if record is None:
+        return None
+    now = datetime.now()
+    if _is_stale(record, now, EXPORT_JOB_STALE_TIMEOUT):
+        _mark_stale(record, now)
+        db.commit()
+        print(f"[后端ExportJobService] 导出任务心跳超时，已标记为失败: {job_id}")
+    return export_job_to_dict(record)
+
+
+def expire_export_jobs(db: Session, ttl: int = EXPORT_JOB_TTL) -> Dict[str, int]:
+    """
+    清理超过保留时间的导出任务及其导出文件
+
+    先将心跳超时的 running 任务标记为失败；仍在执行的任务超过保留时间时同样清理。
+
+    Args:
+        db: 用户数据库会话
+        ttl: 保留时间（秒）
+
+    Returns:
+        Dict[str, int]: 标记为失败的任务数、删除的任务数和导出文件数
+    """
+    from storage.storage_manager import get_storage_manager
+
+    now = datetime.now()
+    failed_jobs = 0
+    for job in db.query(ExportJob).filter(ExportJob.status == "running").all():
+        if _is_stale(job, now, EXPORT_JOB_STALE_TIMEOUT):
+            _mark_stale(job, now)
+            failed_jobs += 1
+    if failed_jobs:
+        db.commit()
+        print(f"[后端ExportJobService] 已将 {failed_jobs} 个心跳超时的导出任务标记为失败")
+
+    cutoff = now - timedelta(seconds=ttl)
+    jobs = db.query(ExportJob).filter(ExportJob.created_at < cutoff).all()
+    storage_manager = get_storage_manager()
+    removed_jobs = 0
+    removed_objects = 0
+    for job in jobs:
+        try:
+            storage_manager.remove_object(job.object_key)
+            removed_objects += 1
+            db.delete(job)
+            db.commit()
+            removed_jobs += 1
+        except Exception as e:
+            db.rollback()
+            print(f"[后端ExportJobService] 清理导出任务失败: {job.id}: {str(e)}")
+    if removed_jobs:
+        print(f"[后端ExportJobService] 已清理 {removed_jobs} 个过期导出任务")
+    return {"jobs_failed": failed_jobs, "jobs_removed": removed_jobs, "objects_removed": removed_objects}
@@ -0,0 +1,644 @@
+"""
+原始数据导出服务
+提供 CSV / JSON / ZIP / Parquet / Arrow 格式的流式导出：
+
+- 通过 yield_per 服务端游标分批读取，内存占用与导出行数无关
+- 会话、地块、设备信息在同一条 LEFT JOIN 查询中取出，不再逐行查询
+- 生成器按批输出字节块，直接作为 StreamingResponse 的响应体
+- ZIP 导出由有界线程池并发预取 MinIO 对象，按块写入流式 ZIP，已压缩格式不再压缩
+- Parquet / Arrow IPC 导出按列类型写入（时间戳、浮点、字典编码的分类列，元数据为 JSON 字符串），
+  每个行组由游标读取的一批数据生成，需要安装 pyarrow
+"""
+
+import csv
+import io
+import itertools
+import json
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+from utils.zip_stream import ChunkSink, ZipStreamWriter
+
+# 列式导出依赖 pyarrow（可选）
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    _pyarrow_available = True
+except ImportError:
+    pa = None
+    pq = None
+    _pyarrow_available = False
+
+HAS_PYARROW: bool = _pyarrow_available
+
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from database.db_models.user_models import RawData, CollectionSession, Field, Device
+from database.db_services.log_service import create_log
+from database.db_services.raw_data_service import completed_raw_data
+
+# 服务端游标每批读取的行数
+EXPORT_STREAM_BATCH_SIZE = int(os.getenv("EXPORT_STREAM_BATCH_SIZE", "2000"))
+
+# ZIP 导出：并发下载对象的线程数
+EXPORT_ZIP_WORKERS = int(os.getenv("EXPORT_ZIP_WORKERS", "4"))
+# ZIP 导出：读取对象的块大小（字节）
+EXPORT_ZIP_CHUNK_SIZE = int(os.getenv("EXPORT_ZIP_CHUNK_SIZE", str(1024 * 1024)))
+# ZIP 导出：每个预取中的对象最多缓冲的块数
+EXPORT_ZIP_PREFETCH_CHUNKS = int(os.getenv("EXPORT_ZIP_PREFETCH_CHUNKS", "8"))
+
+# Parquet 导出：每个行组的行数
+EXPORT_PARQUET_ROW_GROUP_ROWS = int(os.getenv("EXPORT_PARQUET_ROW_GROUP_ROWS", "50000"))
+
+EXPORT_FORMATS = ("csv", "json", "zip", "parquet", "arrow")
+# 需要 pyarrow 的格式
+COLUMNAR_EXPORT_FORMATS = ("parquet", "arrow")
+
+EXPORT_CSV_HEADER = [
+    '数据ID', '采集时间', '任务名称', '地块名称', '设备名称',
+    '数据类型', '数据子类型', '数据值', '数据单位', '数据格式',
+    '质量评分', '位置', '高度(m)', '朝向(°)',
+    '处理状态', 'AI状态', '是否有效'
+]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8-sig",
+    "json": "application/json; charset=utf-8",
+    "zip": "application/zip",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+ZIP_METADATA_HEADER = [
+    '数据ID', '文件名', '采集时间', '任务名称', '数据类型', '数据子类型',
+    '质量评分', '原始路径', '新文件名'
+]
+
+
+def build_export_query(
+    db: Session,
+    session_id: Optional[str] = None,
+    data_type: Optional[str] = None,
+    data_subtype: Optional[str] = None
+):
+    """
+    构建导出查询（原始数据 LEFT JOIN 会话、地块、设备）
+
+    Args:
+        db: 数据库会话
+        session_id: 会话ID过滤（可选）
+        data_type: 数据类型过滤（可选）
+        data_subtype: 数据子类型过滤（可选）
+
+    Returns:
+        Query: 每行包含 RawData 实体及关联的会话/地块/设备字段（不含上传中的占位记录），按采集时间倒序
+    """
+    query = db.query(
+        RawData,
+        CollectionSession.id.label('joined_session_id'),
+        CollectionSession.mission_name.label('mission_name'),
+        CollectionSession.mission_type.label('mission_type'),
+        Field.id.label('field_id'),
+        Field.name.label('field_name'),
+        Device.id.label('device_id'),
+        Device.name.label('device_name'),
+        Device.device_type.label('device_type'),
+    ).outerjoin(
+        CollectionSession, CollectionSession.id == RawData.session_id
+    ).outerjoin(
+        Field, Field.id == CollectionSession.field_id
+    ).outerjoin(
+        Device, Device.id == CollectionSession.device_id
+    ).filter(completed_raw_data())
+
+    if session_id:
+        query = query.filter(RawData.session_id == session_id)
+    if data_type:
+        query = query.filter(RawData.data_type == data_type)
+    if data_subtype:
+        query = query.filter(RawData.data_subtype == data_subtype)
+
+    return query.order_by(desc(RawData.capture_time), desc(RawData.id))
+
+
+def _safe_isoformat(val) -> Optional[str]:
+    if val is None:
+        return None
+    try:
+        if hasattr(val, 'isoformat'):
+            return val.isoformat()
+        return str(val)
+    except Exception:
+        return str(val)
+
+
+def _safe_value(val):
+    if val is None:
+        return None
+    try:
+        if isinstance(val, (str, int, float, bool)):
+            return val
+        if hasattr(val, 'isoformat'):  # datetime
+            return val.isoformat()
+        if isinstance(val, dict):
+            return {k: _safe_value(v) for k, v in val.items()}
+        if isinstance(val, (list, tuple)):
+            return [_safe_value(v) for v in val]
+        return str(val)
+    except Exception:
+        return str(val)
+
+
+def export_row_to_csv(row) -> list:
+    """
+    将导出查询的一行转换为 CSV 行
+
+    Args:
+        row: build_export_query 返回的行
+
+    Returns:
+        list: 与 EXPORT_CSV_HEADER 对应的字段列表
+    """
+    item = row.RawData
+    return [
+        item.id,
+        item.capture_time.strftime('%Y-%m-%d %H:%M:%S') if item.capture_time else '',
+        row.mission_name or '',
+        row.field_name or '',
+        row.device_name or '',
+        item.data_type,
+        item.data_subtype or '',
+        item.data_value or '',
+        item.data_unit or '',
+        item.data_format or '',
+        f'{item.quality_score:.2f}' if item.quality_score else '',
+        item.location_geom if item.location_geom else '',
+        item.altitude_m if item.altitude_m else '',
+        item.heading if item.heading else '',
+        item.processing_status or '',
+        item.ai_status or '',
+        '是' if item.is_valid else '否'
+    ]
+
+
+def export_row_to_dict(row) -> Dict[str, Any]:
+    """
+    将导出查询的一行转换为 JSON 对象
+
+    Args:
+        row: build_export_query 返回的行
+
+    Returns:
+        Dict[str, Any]: 单条数据的完整字段
+    """
+    item = row.RawData
+    return {
+        'id': str(item.id) if item.id else None,
+        'capture_time': _safe_isoformat(item.capture_time),
+        'session': {
+            'id': str(row.joined_session_id) if row.joined_session_id else None,
+            'mission_name': row.mission_name,
+            'mission_type': row.mission_type
+        },
+        'field': {
+            'id': str(row.field_id) if row.field_id else None,
+            'name': row.field_name
+        },
+        'device': {
+            'id': str(row.device_id) if row.device_id else None,
+            'name': row.device_name,
+            'type': row.device_type
+        },
+        'data_type': str(item.data_type) if item.data_type else None,
+        'data_subtype': str(item.data_subtype) if item.data_subtype else None,
+        'data_value': str(item.data_value) if item.data_value else None,
+        'data_unit': str(item.data_unit) if item.data_unit else None,
+        'data_format': str(item.data_format) if item.data_format else None,
+        'bucket_name': str(item.bucket_name) if item.bucket_name else None,
+        'object_key': str(item.object_key) if item.object_key else None,
+        'location': {
+            'geom': str(item.location_geom) if item.location_geom else None,
+            'altitude_m': float(item.altitude_m) if item.altitude_m else None,
+            'heading': float(item.heading) if item.heading else None
+        },
+        'metadata': {
+            'sensor_meta': _safe_value(item.sensor_meta),
+            'file_meta': _safe_value(item.file_meta),
+            'acquisition_meta': _safe_value(item.acquisition_meta)
+        },
+        'quality': {
+            'score': float(item.quality_score) if item.quality_score else None,
+            'flags': _safe_value(item.quality_flags),
+            'is_valid': bool(item.is_valid) if item.is_valid is not None else None,
+            'validation_notes': str(item.validation_notes) if item.validation_notes else None
+        },
+        'status': {
+            'processing': str(item.processing_status) if item.processing_status else None,
+            'ai': str(item.ai_status) if item.ai_status else None
+        },
+        'created_at': _safe_isoformat(item.created_at)
+    }
+
+
+def _arrow_export_schema():
+    """列式导出的 Arrow schema（重复度高的文本列使用字典编码，pandas 读取为 category）"""
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('id', pa.string()),
+        ('capture_time', pa.timestamp('us')),
+        ('session_id', pa.string()),
+        ('mission_name', category),
+        ('mission_type', category),
+        ('field_id', pa.string()),
+        ('field_name', category),
+        ('device_id', pa.string()),
+        ('device_name', category),
+        ('device_type', category),
+        ('data_type', category),
+        ('data_subtype', category),
+        ('data_value', pa.string()),
+        ('numeric_value', pa.float64()),
+        ('data_unit', category),
+        ('data_format', category),
+        ('bucket_name', pa.string()),
+        ('object_key', pa.string()),
+        ('location', pa.string()),
+        ('altitude_m', pa.float64()),
+        ('heading', pa.float64()),
+        ('sensor_meta', pa.string()),
+        ('file_meta', pa.string()),
+        ('acquisition_meta', pa.string()),
+        ('quality_score', pa.float64()),
+        ('quality_flags', pa.string()),
+        ('is_valid', pa.bool_()),
+        ('validation_notes', pa.string()),
+        ('processing_status', category),
+        ('ai_status', category),
+        ('created_at', pa.timestamp('us')),
+    ])
+
+
+def _json_text(val) -> Optional[str]:
+    if val is None:
+        return None
+    return json.dumps(_safe_value(val), ensure_ascii=False)
+
+
+def export_row_to_columns(row) -> tuple:
+    """
+    将导出查询的一行转换为列式导出的字段（顺序与 Arrow schema 一致）
+
+    Args:
+        row: build_export_query 返回的行
+
+    Returns:
+        tuple: 字段值
+    """
+    item = row.RawData
+    return (
+        item.id,
+        item.capture_time,
+        item.session_id,
+        row.mission_name,
+        row.mission_type,
+        row.field_id,
+        row.field_name,
+        row.device_id,
+        row.device_name,
+        row.device_type,
+        item.data_type,
+        item.data_subtype,
+        item.data_value,
+        item.numeric_value,
+        item.data_unit,
+        item.data_format,
+        item.bucket_name,
+        item.object_key,
+        str(item.location_geom) if item.location_geom is not None else None,
+        item.altitude_m,
+        item.heading,
+        _json_text(item.sensor_meta),
+        _json_text(item.file_meta),
+        _json_text(item.acquisition_meta),
+        item.quality_score,
+        _json_text(item.quality_flags),
+        item.is_valid,
+        item.validation_notes,
+        item.processing_status,
+        item.ai_status,
+        item.created_at,
+    )
+
+
+def _iter_csv(query, batch_size: int, counter: Dict[str, int]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # UTF-8 BOM，Excel 打开中文表头不乱码
+    yield b'\xef\xbb\xbf'
+    writer.writerow(EXPORT_CSV_HEADER)
+
+    pending = 0
+    for row in query.yield_per(batch_size):
+        writer.writerow(export_row_to_csv(row))
+        counter['rows'] += 1
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+
+    yield buffer.getvalue().encode('utf-8')
+
+
+def _iter_json(query, batch_size: int, counter: Dict[str, int], filters: Dict[str, Any]) -> Iterator[bytes]:
+    head = json.dumps({
+        'export_time': datetime.now().isoformat(),
+        'filters': filters
+    }, ensure_ascii=False)
+    # 去掉结尾的 "}"，在同一对象中继续输出 data 数组
+    yield (head[:-1] + ', "data": [').encode('utf-8')
+
+    chunk = []
+    for row in query.yield_per(batch_size):
+        try:
+            record = json.dumps(export_row_to_dict(row), ensure_ascii=False, separators=(',', ':'))
+        except Exception as e:
+            print(f"[后端ExportService] 处理单条数据失败: {e}, item_id={row.RawData.id}")
+            continue  # 跳过有问题的记录
+        chunk.append(record if counter['rows'] == 0 else ',' + record)
+        counter['rows'] += 1
+        if len(chunk) >= batch_size:
+            yield ''.join(chunk).encode('utf-8')
+            chunk = []
+
+    chunk.append(f'], "total_count": {counter["rows"]}}}')
+    yield ''.join(chunk).encode('utf-8')
+
+
+def _iter_columnar(query, batch_size: int, counter: Dict[str, int], format: str) -> Iterator[bytes]:
+    schema = _arrow_export_schema()
+    sink = ChunkSink()
+    output = pa.PythonFile(sink, mode='w')
+    if format == 'parquet':
+        writer = pq.ParquetWriter(output, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_stream(output, schema)
+
+    def to_batch(columns) -> 'pa.RecordBatch':
+        return pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        )
+
+    columns = [[] for _ in schema]
+    pending = 0
+    for row in query.yield_per(batch_size):
+        for values, value in zip(columns, export_row_to_columns(row)):
+            values.append(value)
+        counter['rows'] += 1
+        pending += 1
+        # 一个行组（Arrow 为一个记录批）对应缓冲的一批行，写出后立即发送
+        if pending >= EXPORT_PARQUET_ROW_GROUP_ROWS:
+            writer.write_batch(to_batch(columns))
+            columns = [[] for _ in schema]
+            pending = 0
+            data = sink.drain()
+            if data:
+                yield data
+
+    if pending:
+        writer.write_batch(to_batch(columns))
+    writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+
+_FETCH_END = object()
+
+
+class _ObjectPrefetcher:
+    """
+    对象并发预取器
+
+    每个对象由线程池中的一个线程按块读取，放入该对象专属的有界队列；
+    消费者按提交顺序读取。内存上限约为 workers × queue_chunks × chunk_size。
+    """
+
+    def __init__(self, storage, workers: int, chunk_size: int, queue_chunks: int):
+        self._storage = storage
+        self._chunk_size = chunk_size
+        self._queue_chunks = queue_chunks
+        self._cancel = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zip-export")
+
+    def submit(self, object_key: str) -> queue.Queue:
+        """提交一个对象的预取任务，返回其数据块队列"""
+        chunks: queue.Queue = queue.Queue(maxsize=self._queue_chunks)
+        self._executor.submit(self._fetch, object_key, chunks)
+        return chunks
+
+    def _put(self, chunks: queue.Queue, item) -> bool:
+        # 消费者取消后不再阻塞在满队列上
+        while not self._cancel.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fetch(self, object_key: str, chunks: queue.Queue):
+        if self._cancel.is_set():
+            return
+        try:
+            for chunk in self._storage.iter_object(object_key, self._chunk_size):
+                if not self._put(chunks, chunk):
+                    return
+            self._put(chunks, _FETCH_END)
+        except Exception as e:
+            self._put(chunks, e)
+
+    @staticmethod
+    def iter_chunks(chunks: queue.Queue) -> Iterator[bytes]:
+        """按顺序读取对象的数据块（下载失败时抛出异常）"""
+        while True:
+            item = chunks.get()
+            if item is _FETCH_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def close(self):
+        """取消未完成的预取任务"""
+        self._cancel.set()
+        self._executor.shutdown(wait=False)
+
+
+def _zip_file_name(item, sequence: int) -> Tuple[str, str]:
+    original_name = item.object_key.split('/')[-1]
+    ext = item.data_format or (original_name.rsplit('.', 1)[-1] if '.' in original_name else 'bin')
+    return original_name, f"files/{item.data_subtype or item.data_type}_{sequence}.{ext}"
+
+
+def _iter_zip(query, batch_size: int, counter: Dict[str, int], filters: Dict[str, Any]) -> Iterator[bytes]:
+    from storage.storage_manager import get_storage_manager
+
+    writer = ZipStreamWriter()
+    metadata = io.StringIO()
+    metadata_writer = csv.writer(metadata)
+    metadata_writer.writerow(ZIP_METADATA_HEADER)
+    summary = {
+        'export_time': datetime.now().isoformat(),
+        'total_records': 0,
+        'files_included': 0,
+        'filters': filters,
+        'data_types': {},
+        'data_subtypes': {}
+    }
+
+    prefetcher = _ObjectPrefetcher(
+        get_storage_manager(),
+        workers=EXPORT_ZIP_WORKERS,
+        chunk_size=EXPORT_ZIP_CHUNK_SIZE,
+        queue_chunks=EXPORT_ZIP_PREFETCH_CHUNKS
+    )
+    rows = iter(query.yield_per(batch_size))
+    window: Deque[tuple] = deque()
+    sequence = 0
+
+    def fill_window():
+        # 保持 EXPORT_ZIP_WORKERS 个文件在预取中，非文件数据只计入摘要
+        while len(window) < EXPORT_ZIP_WORKERS:
+            row = next(rows, None)
+            if row is None:
+                return
+            item = row.RawData
+            counter['rows'] += 1
+            summary['total_records'] += 1
+            dt = item.data_type or 'unknown'
+            dst = item.data_subtype or 'unknown'
+            summary['data_types'][dt] = summary['data_types'].get(dt, 0) + 1
+            summary['data_subtypes'][dst] = summary['data_subtypes'].get(dst, 0) + 1
+            if item.object_key and item.bucket_name:
+                window.append((item, row.mission_name, prefetcher.submit(item.object_key)))
+
+    try:
+        fill_window()
+        while window:
+            item, mission_name, chunks = window.popleft()
+            fill_window()
+
+            capture_time = item.capture_time.strftime('%Y-%m-%d %H:%M:%S') if item.capture_time else ''
+            quality = f'{item.quality_score:.2f}' if item.quality_score else ''
+            original_name = item.object_key.split('/')[-1]
+
+            file_chunks = prefetcher.iter_chunks(chunks)
+            try:
+                # 先取到首块再创建成员，下载失败的文件不写入压缩包
+                first = list(itertools.islice(file_chunks, 1))
+            except Exception as e:
+                print(f"[后端ExportService] 导出ZIP下载文件失败 {item.object_key}: {e}")
+                metadata_writer.writerow([
+                    item.id, original_name, capture_time, mission_name or '',
+                    item.data_type, item.data_subtype or '', quality, item.object_key, '[文件下载失败]'
+                ])
+                continue
+
+            sequence += 1
+            original_name, new_name = _zip_file_name(item, sequence)
+            status = new_name
+            try:
+                yield from writer.write_stream(new_name, itertools.chain(first, file_chunks))
+                summary['files_included'] += 1
+            except Exception as e:
+                print(f"[后端ExportService] 导出ZIP文件读取中断 {item.object_key}: {e}")
+                status = f'{new_name} [文件不完整]'
+
+            metadata_writer.writerow([
+                item.id, original_name, capture_time, mission_name or '',
+                item.data_type, item.data_subtype or '', quality, item.object_key, status
+            ])
+    finally:
+        prefetcher.close()
+
+    yield from writer.write_bytes('metadata.csv', metadata.getvalue().encode('utf-8'))
+    metadata.close()
+    yield from writer.write_bytes('summary.json', json.dumps(summary, ensure_ascii=False, indent=2).encode('utf-8'))
+    yield from writer.close()
+
+
+def stream_raw_data_export(
+    db: Session,
+    format: str,
+    user_id: str,
+    session_id: Optional[str] = None,
+    data_type: Optional[str] = None,
+    data_subtype: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    counter: Optional[Dict[str, int]] = None
+) -> Iterator[bytes]:
+    """
+    流式导出原始数据（生成器，负责关闭数据库会话）
+
+    JSON 格式为紧凑输出，total_count 位于对象末尾（在所有数据输出后才能确定）。
+    ZIP 格式包含文件数据（files/）、metadata.csv 和 summary.json，文件内容边下载边写出。
+    Parquet / Arrow 格式需要安装 pyarrow（调用前应检查 HAS_PYARROW）。
+
+    Args:
+        db: 用户数据库会话（导出结束后由生成器关闭）
+        format: csv / json / zip / parquet / arrow
+        user_id: 用户ID（用于操作日志）
+        session_id: 会话ID过滤（可选）
+        data_type: 数据类型过滤（可选）
+        data_subtype: 数据子类型过滤（可选）
+        batch_size: 服务端游标每批行数，默认 EXPORT_STREAM_BATCH_SIZE
+        counter: 进度计数（可选），导出过程中 counter['rows'] 为已导出行数
+
+    Yields:
+        bytes: 响应体数据块
+    """
+    batch_size = batch_size or EXPORT_STREAM_BATCH_SIZE
+    filters = {
+        'session_id': session_id,
+        'data_type': data_type,
+        'data_subtype': data_subtype
+    }
+    if counter is None:
+        counter = {}
+    counter['rows'] = 0
+
+    try:
+        query = build_export_query(db, session_id, data_type, data_subtype)
+        if format == 'json':
+            yield from _iter_json(query, batch_size, counter, filters)
+        elif format == 'zip':
+            yield from _iter_zip(query, batch_size, counter, filters)
+        elif format in COLUMNAR_EXPORT_FORMATS:
+            yield from _iter_columnar(query, batch_size, counter, format)
+        else:
+            yield from _iter_csv(query, batch_size, counter)
+
+        print(f"[后端ExportService] 导出完成，格式: {format}，共 {counter['rows']} 条")
+
+        # 游标读取结束后再写操作日志
+        try:
+            create_log(db, "info", "data.export",
+                       f"用户 {user_id} 导出数据: {format} 格式, {counter['rows']} 条",
+                       detail=f"过滤条件: session_id={session_id}, data_type={data_type}, data_subtype={data_subtype}")
+        except Exception:
+            db.rollback()
+    except Exception as e:
+        print(f"[后端ExportService] 导出中断（已输出 {counter['rows']} 条）: {str(e)}")
+        raise
+    finally:
+        db.close()
@@ -1,7 +1,8 @@
 import uuid
 from sqlalchemy import and_, or_, func, text
 from sqlalchemy.orm import Session
-from database.db_models.user_models import Field
+from database.db_models.user_models import Field, CollectionSession
+from database.db_services.count_service import invalidate_table_counts, invalidate_raw_data_counts
 from typing import Optional, List, Dict, Any
 
 # 检查GeoAlchemy2是否可用
@@ -544,6 +545,7 @@ def update_field(db: Session, field_id: str,
         print(f"[后端FieldService] 更新字段: {list(update_data.keys())}")
         db.query(Field).filter(Field.id == field_id).update(update_data)
         db.commit()
+        invalidate_table_counts(db, 'fields')
         # 刷新对象以获取更新后的值
         db.refresh(field)
 
@@ -586,10 +588,15 @@ def delete_field(db: Session, field_id: str) -> bool:
         print("[后端FieldService] 地块不存在")
         return False
 
+    # 地块删除会级联删除其采集会话和原始数据，先记录会话ID用于缓存失效
+    session_ids = [row.id for row in db.query(CollectionSession.id).filter(CollectionSession.field_id == field_id).all()]
+
     # 硬删除：从数据库中删除
     print("[后端FieldService] 执行硬删除")
     db.delete(field)
     db.commit()
+    invalidate_table_counts(db, 'fields', 'collection_sessions')
+    invalidate_raw_data_counts(db, session_ids)
 
     print(f"[后端FieldService] 地块删除成功: {field_id}")
     return True
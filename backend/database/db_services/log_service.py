@@ -8,6 +8,7 @@ from database.db_models.user_models import SystemLog
 from datetime import datetime
 import uuid
 from typing import Optional, List, Dict, Any
+from database.db_services.count_service import count_query, invalidate_table_counts
 
 
 def create_log(
@@ -48,6 +49,7 @@ def create_log(
     db.add(log)
     db.commit()
     db.refresh(log)
+    invalidate_table_counts(db, 'system_logs')
     return log
 
 
@@ -59,6 +61,7 @@ def get_logs(
     source: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    count_mode: str = 'auto',
 ) -> Dict[str, Any]:
     """
     分页查询系统日志
@@ -71,9 +74,10 @@ def get_logs(
         source: 来源模糊匹配
         date_from: 开始日期（YYYY-MM-DD）
         date_to: 结束日期（YYYY-MM-DD）
+        count_mode: 总数计数方式 exact/estimate/cached/auto
 
     Returns:
-        dict: { total, page, page_size, items }
+        dict: { total, count_mode, page, page_size, items }
     """
     query = db.query(SystemLog)
 
@@ -97,7 +101,7 @@ def get_logs(
         except ValueError:
             pass
 
-    total = query.count()
+    total, used_count_mode = count_query(db, query, 'system_logs', count_mode)
     items = (
         query
         .order_by(desc(SystemLog.timestamp))
@@ -108,6 +112,7 @@ def get_logs(
 
     return {
         'total': total,
+        'count_mode': used_count_mode,
         'page': page,
         'page_size': page_size,
         'items': [
@@ -156,6 +161,7 @@ def delete_log(db: Session, log_id: str) -> bool:
         return False
     db.delete(log)
     db.commit()
+    invalidate_table_counts(db, 'system_logs')
     return True
 
 
@@ -178,4 +184,5 @@ def clear_logs(db: Session, before_days: Optional[int] = None) -> int:
     count = query.count()
     query.delete()
     db.commit()
+    invalidate_table_counts(db, 'system_logs')
     return count
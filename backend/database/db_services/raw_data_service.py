@@ -5,11 +5,142 @@
 注意：每个用户有独立的数据库，因此不需要 user_id 过滤
 """
 
-from sqlalchemy import desc, Float, func, and_, or_
+from sqlalchemy import desc, func, and_, or_, insert, tuple_, select, literal, cast, null, union_all, Text
 from sqlalchemy.orm import Session
 from database.db_models.user_models import RawData, RawDataTag, CollectionSession, Device, Field
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+from database.db_services.count_service import (
+    count_query,
+    get_table_generation,
+    get_tenant_key,
+    invalidate_raw_data_counts,
+    session_data_table
+)
+from database.db_services.rollup_service import (
+    apply_raw_data_rollups,
+    choose_statistics_bucket,
+    choose_timeseries_bucket,
+    count_rollup_points,
+    get_rollup_statistics,
+    get_rollup_time_span,
+    get_rollup_timeseries,
+    recompute_rollup_buckets,
+    ROLLUP_BUCKET_SECONDS
+)
+from typing import Optional, List, Dict, Any, Iterable
+from datetime import datetime, timedelta
+import base64
+import hashlib
+import json
+import math
+import os
+import re
+import uuid
+from utils.cache_manager import get_cache_manager
+
+# 允许上传数据的会话状态
+WRITABLE_SESSION_STATUSES = ('running', 'in_progress')
+
+# 上传中的原始数据记录的处理状态（可续传/直传上传完成前占位，不应出现在列表、统计和导出中）
+UPLOAD_STATUS = 'uploading'
+
+# 时序降采样：每条曲线在内存中保留的最大原始点数，以及游标每批读取的行数
+TIMESERIES_MAX_SOURCE_POINTS = int(os.getenv("TIMESERIES_MAX_SOURCE_POINTS", "200000"))
+TIMESERIES_STREAM_BATCH_SIZE = int(os.getenv("TIMESERIES_STREAM_BATCH_SIZE", "5000"))
+
+# 时间转换为浮点秒时使用的基准（capture_time 为无时区时间）
+_EPOCH = datetime(1970, 1, 1)
+
+# 数值型数据大类（data_value 为数值字符串，写入时同步填充 numeric_value）
+NUMERIC_DATA_TYPES = ('environmental', 'soil')
+
+# 数值字符串格式（写入路径与 SQL 回填/重建共用，保证两边得到相同的结果）：
+# 只接受十进制数字，排除 NaN/Infinity、下划线分隔等 float() 特有写法；
+# 限制位数和指数范围，保证 PostgreSQL CAST 为 double precision 时不会溢出报错
+NUMERIC_VALUE_PATTERN = (
+    r'^[ \t\n\r\f\v]*[-+]?([0-9]{1,200}(\.[0-9]{0,200})?|\.[0-9]{1,200})([eE][-+]?[0-9]{1,2})?[ \t\n\r\f\v]*$'
+)
+_NUMERIC_VALUE_RE = re.compile(NUMERIC_VALUE_PATTERN)
+
+
+def completed_raw_data():
+    """
+    排除上传中占位记录的过滤条件（列表、计数、统计和导出查询共用）
+
+    Returns:
+        过滤条件表达式
+    """
+    return RawData.processing_status != UPLOAD_STATUS
+
+
+def parse_numeric_value(data_type: Optional[str], data_value: Optional[str]) -> Optional[float]:
+    """
+    解析数值型数据的 data_value
+
+    Args:
+        data_type: 数据大类
+        data_value: 数据值字符串
+
+    Returns:
+        Optional[float]: 解析后的数值；非数值类型、无法解析或非有限值时返回 None
+    """
+    if data_type not in NUMERIC_DATA_TYPES or data_value is None:
+        return None
+    text_value = str(data_value)
+    if not _NUMERIC_VALUE_RE.match(text_value):
+        return None
+    value = float(text_value.strip())
+    return value if math.isfinite(value) else None
+
+
+def backfill_numeric_values(db: Session, batch_size: int = 5000) -> int:
+    """
+    回填已有数据的 numeric_value
+
+    只扫描 numeric_value 为 NULL 的数值型数据，按主键顺序分批处理，每批独立提交：
+    中断后重新执行只会处理仍为 NULL 的行，可以安全地重复运行。
+    解析规则与写入路径的 parse_numeric_value 相同，无法解析为数值的 data_value 保持 NULL。
+
+    Args:
+        db: 数据库会话
+        batch_size: 每批处理的行数
+
+    Returns:
+        int: 回填的行数
+    """
+    from sqlalchemy import text
+
+    select_ids = text(
+        "SELECT id FROM raw_data "
+        "WHERE id > :last_id "
+        "AND numeric_value IS NULL "
+        "AND data_type IN ('environmental', 'soil') "
+        "ORDER BY id LIMIT :batch_size"
+    )
+    update_batch = text(
+        "UPDATE raw_data SET numeric_value = CAST(TRIM(data_value) AS DOUBLE PRECISION) "
+        "WHERE id = ANY(:ids) "
+        "AND numeric_value IS NULL "
+        "AND data_value ~ :pattern"
+    )
+
+    updated = 0
+    last_id = ''
+    try:
+        while True:
+            ids = [row[0] for row in db.execute(select_ids, {"last_id": last_id, "batch_size": batch_size})]
+            if not ids:
+                break
+            updated += db.execute(update_batch, {"ids": ids, "pattern": NUMERIC_VALUE_PATTERN}).rowcount or 0
+            db.commit()
+            last_id = ids[-1]
+    except Exception as e:
+        db.rollback()
+        print(f"[后端RawDataService] 回填 numeric_value 失败（已回填 {updated} 行）: {str(e)}")
+        raise
+
+    print(f"[后端RawDataService] 回填 numeric_value 完成: {updated} 行")
+    return updated
+
 
 def create_raw_data(
     db: Session,
@@ -32,7 +163,8 @@ def create_raw_data(
     quality_flags: Optional[Any] = None,
     checksum: Optional[str] = None,
     is_valid: Optional[bool] = True,
-    validation_notes: Optional[str] = None
+    validation_notes: Optional[str] = None,
+    processing_status: str = 'pending'
 ) -> Optional[str]:
     """
     创建新的原始数据记录
@@ -59,6 +191,7 @@ def create_raw_data(
         checksum: 文件校验值
         is_valid: 是否有效
         validation_notes: 验证备注
+        processing_status: 处理状态（可续传上传未完成时为 uploading）
 
     Returns:
         str: 创建的原始数据ID，失败返回None
@@ -81,7 +214,7 @@ def create_raw_data(
             print(f"[后端RawDataService] 会话不存在: {session_id}")
             return None
             
-        if session_record.status not in ['running', 'in_progress']:
+        if session_record.status not in WRITABLE_SESSION_STATUSES:
             print(f"[后端RawDataService] 会话状态不允许上传数据: {session_record.status}")
             return None
 
@@ -89,6 +222,7 @@ def create_raw_data(
             session_id=session_id,
             data_type=data_type,
             data_value=data_value,
+            numeric_value=parse_numeric_value(data_type, data_value),
             capture_time=capture_time or datetime.now(),
             data_subtype=data_subtype,
             data_unit=data_unit,
@@ -107,13 +241,22 @@ def create_raw_data(
             is_valid=is_valid,
             validation_notes=validation_notes,
             # 添加数据库表结构中存在但模型定义中缺失的字段
-            processing_status='pending',  # 处理状态，必需字段
+            processing_status=processing_status,  # 处理状态，必需字段
             ai_status='pending',          # AI分析状态，必需字段
         )
 
         db.add(new_raw_data)
+        # 在同一事务中增量更新时间桶聚合
+        apply_raw_data_rollups(db, [{
+            "session_id": session_id,
+            "data_type": data_type,
+            "data_subtype": data_subtype,
+            "capture_time": new_raw_data.capture_time,
+            "numeric_value": new_raw_data.numeric_value,
+        }])
         db.commit()
         db.refresh(new_raw_data)
+        invalidate_raw_data_counts(db, [session_id])
 
         print(f"[后端RawDataService] 成功创建原始数据，ID={new_raw_data.id}")
         return str(new_raw_data.id)
@@ -124,6 +267,176 @@ def create_raw_data(
         return None
 
 
+def check_sessions_writable(db: Session, session_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+    """
+    批量校验会话是否允许写入数据（每个会话只查询一次）
+
+    Args:
+        db: 数据库会话
+        session_ids: 会话ID集合
+
+    Returns:
+        Dict[str, Optional[str]]: 会话ID -> 不可写原因，可写时为 None
+    """
+    unique_ids = {str(sid) for sid in session_ids if sid}
+    if not unique_ids:
+        return {}
+
+    rows = db.query(CollectionSession.id, CollectionSession.status).filter(
+        CollectionSession.id.in_(unique_ids)
+    ).all()
+    status_map = {row.id: row.status for row in rows}
+
+    result: Dict[str, Optional[str]] = {}
+    for sid in unique_ids:
+        if sid not in status_map:
+            result[sid] = f"会话不存在: {sid}"
+        elif status_map[sid] not in WRITABLE_SESSION_STATUSES:
+            result[sid] = f"会话状态不允许上传数据: {status_map[sid]}"
+        else:
+            result[sid] = None
+    return result
+
+
+def build_raw_data_row(
+    session_id: str,
+    data_type: str,
+    data_value: str,
+    capture_time: Optional[datetime] = None,
+    data_subtype: Optional[str] = None,
+    data_unit: Optional[str] = None,
+    data_format: Optional[str] = None,
+    bucket_name: Optional[str] = None,
+    object_key: Optional[str] = None,
+    location_geom: Optional[str] = None,
+    altitude_m: Optional[float] = None,
+    heading: Optional[float] = None,
+    sensor_meta: Optional[Dict[str, Any]] = None,
+    file_meta: Optional[Dict[str, Any]] = None,
+    acquisition_meta: Optional[Dict[str, Any]] = None,
+    quality_score: Optional[float] = None,
+    quality_flags: Optional[Any] = None,
+    checksum: Optional[str] = None,
+    is_valid: Optional[bool] = True,
+    validation_notes: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    构建一行完整的原始数据字典（用于批量 INSERT）
+
+    所有行包含相同的列集合，保证 SQLAlchemy 能合并为一条多行 INSERT；
+    ID 在应用侧预先生成，便于在写入前就返回给调用方。
+
+    Returns:
+        Dict[str, Any]: 可直接传给 insert(RawData) 的行数据
+    """
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "session_id": str(session_id),
+        "data_type": data_type,
+        "data_subtype": data_subtype,
+        "data_unit": data_unit,
+        "data_value": data_value,
+        "numeric_value": parse_numeric_value(data_type, data_value),
+        "data_format": data_format,
+        "bucket_name": bucket_name,
+        "object_key": object_key,
+        "capture_time": capture_time or datetime.now(),
+        "location_geom": location_geom,
+        "altitude_m": altitude_m,
+        "heading": heading,
+        "sensor_meta": sensor_meta,
+        "file_meta": file_meta,
+        "acquisition_meta": acquisition_meta,
+        "quality_score": quality_score,
+        "quality_flags": quality_flags,
+        "checksum": checksum,
+        "is_valid": True if is_valid is None else is_valid,
+        "validation_notes": validation_notes,
+        "processing_status": 'pending',
+        "ai_status": 'pending',
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def insert_raw_data_rows(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    使用一条多行 INSERT 写入预先构建好的原始数据行，并在同一事务中更新时间桶聚合（不提交事务）
+
+    Args:
+        db: 数据库会话
+        rows: build_raw_data_row 构建的行列表
+
+    Returns:
+        int: 写入的行数
+    """
+    if not rows:
+        return 0
+    db.execute(insert(RawData), rows)
+    apply_raw_data_rollups(db, rows)
+    return len(rows)
+
+
+def create_raw_data_batch(db: Session, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    批量创建原始数据记录
+
+    每个不同的会话只校验一次，所有通过校验的行在同一事务中
+    通过一条多行 INSERT 写入。
+
+    Args:
+        db: 数据库会话
+        items: 数据列表，每项为 create_raw_data 的关键字参数字典
+
+    Returns:
+        List[Dict[str, Any]]: 与 items 一一对应的结果，
+        包含 index / success / data_id / error
+    """
+    VALID_DATA_TYPES = {"environmental", "soil", "file"}
+    results: List[Dict[str, Any]] = [
+        {"index": i, "success": False, "data_id": None, "error": None}
+        for i in range(len(items))
+    ]
+
+    try:
+        session_errors = check_sessions_writable(db, (item.get("session_id") for item in items))
+
+        rows = []
+        row_indexes = []
+        for i, item in enumerate(items):
+            if item.get("data_type") not in VALID_DATA_TYPES:
+                results[i]["error"] = f"无效的数据大类: {item.get('data_type')}"
+                continue
+            session_error = session_errors.get(str(item.get("session_id")))
+            if session_error:
+                results[i]["error"] = session_error
+                continue
+            rows.append(build_raw_data_row(**item))
+            row_indexes.append(i)
+
+        if rows:
+            insert_raw_data_rows(db, rows)
+            db.commit()
+            invalidate_raw_data_counts(db, (row["session_id"] for row in rows))
+
+        for i, row in zip(row_indexes, rows):
+            results[i]["success"] = True
+            results[i]["data_id"] = row["id"]
+
+        print(f"[后端RawDataService] 批量创建原始数据: 成功 {len(rows)} 条，失败 {len(items) - len(rows)} 条")
+        return results
+
+    except Exception as e:
+        print(f"[后端RawDataService] 批量创建原始数据失败: {str(e)}")
+        db.rollback()
+        for result in results:
+            result["success"] = False
+            result["data_id"] = None
+            result["error"] = result["error"] or f"批量写入失败: {str(e)}"
+        return results
+
+
 def get_raw_data_by_id(db: Session, raw_data_id: str) -> Optional[Dict[str, Any]]:
     """
     根据ID获取原始数据详情
@@ -174,30 +487,83 @@ def get_raw_data_by_id(db: Session, raw_data_id: str) -> Optional[Dict[str, Any]
         return None
 
 
+def encode_list_cursor(capture_time: datetime, raw_data_id: str) -> str:
+    """
+    生成列表游标（不透明字符串，编码 capture_time 和 id）
+
+    Args:
+        capture_time: 当前页最后一条数据的采集时间
+        raw_data_id: 当前页最后一条数据的ID
+
+    Returns:
+        str: URL 安全的游标
+    """
+    payload = json.dumps([capture_time.isoformat(), str(raw_data_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_list_cursor(cursor: str) -> tuple:
+    """
+    解析列表游标
+
+    Args:
+        cursor: encode_list_cursor 生成的游标
+
+    Returns:
+        tuple: (capture_time, raw_data_id)
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        capture_time, raw_data_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(capture_time), str(raw_data_id)
+    except Exception:
+        raise ValueError(f"无效的分页游标: {cursor}")
+
+
 def get_raw_data_list_for_frontend(
     db: Session,
     page: int = 1,
     page_size: int = 20,
     session_id: Optional[str] = None,
     data_type: Optional[str] = None,
-    data_subtype: Optional[str] = None
+    data_subtype: Optional[str] = None,
+    pagination: str = 'offset',
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    count_mode: str = 'auto'
 ) -> Dict[str, Any]:
     """
     获取原始数据列表（前端展示）
 
+    支持两种分页方式，均按 capture_time DESC, id DESC 排序：
+    - offset：按页码分页（页码越大越慢）
+    - cursor：游标分页，通过 (capture_time, id) 定位下一页，任意深度的翻页开销相同
+
     Args:
         db: 数据库会话
-        page: 页码
+        page: 页码（offset 模式）
         page_size: 每页数量
         session_id: 会话ID过滤
         data_type: 数据类型过滤
         data_subtype: 数据子类型过滤
+        pagination: 分页方式 offset / cursor
+        cursor: 上一页返回的 next_cursor（cursor 模式，首页不传）
+        include_total: 是否统计总数（大数据量时 COUNT 开销较高）
+        count_mode: 总数计数方式 exact/estimate/cached/auto
 
     Returns:
         Dict[str, Any]: 分页数据列表和分页信息
+
+    Raises:
+        ValueError: 游标格式无效
     """
-    # 构建查询，先查询原始数据
-    query = db.query(RawData)
+    cursor_position = decode_list_cursor(cursor) if cursor else None
+
+    # 构建查询，先查询原始数据（不含上传中的占位记录）
+    query = db.query(RawData).filter(completed_raw_data())
 
     # 添加过滤条件
     if session_id:
@@ -221,12 +587,25 @@ def get_raw_data_list_for_frontend(
     if data_subtype:
         query = query.filter(RawData.data_subtype == data_subtype)
 
-    # 计算总数
-    total_count = query.count()
+    # 计算总数（可选）
+    total_count, used_count_mode = None, None
+    if include_total:
+        total_count, used_count_mode = count_query(db, query, 'raw_data', count_mode)
+
+    # 分页：多取一条用于判断是否还有下一页
+    ordered = query.order_by(desc(RawData.capture_time), desc(RawData.id))
+    if pagination == 'cursor':
+        if cursor_position:
+            ordered = ordered.filter(
+                tuple_(RawData.capture_time, RawData.id) < tuple_(*cursor_position)
+            )
+        raw_data_list = ordered.limit(page_size + 1).all()
+    else:
+        offset = (page - 1) * page_size
+        raw_data_list = ordered.offset(offset).limit(page_size + 1).all()
 
-    # 分页
-    offset = (page - 1) * page_size
-    raw_data_list = query.order_by(desc(RawData.capture_time)).offset(offset).limit(page_size).all()
+    has_next = len(raw_data_list) > page_size
+    raw_data_list = raw_data_list[:page_size]
 
     # 批量预加载所有关联的 CollectionSession（消除 N+1 查询）
     session_ids = set()
@@ -294,16 +673,32 @@ def get_raw_data_list_for_frontend(
         })
 
     # 构建分页信息
-    total_pages = (total_count + page_size - 1) // page_size
+    if pagination == 'cursor':
+        last_item = raw_data_list[-1] if raw_data_list else None
+        return {
+            "items": items,
+            "pagination": {
+                "mode": "cursor",
+                "page_size": page_size,
+                "total_count": total_count,
+                "count_mode": used_count_mode,
+                "next_cursor": encode_list_cursor(last_item.capture_time, last_item.id) if has_next and last_item else None,
+                "has_next": has_next
+            }
+        }
+
+    total_pages = (total_count + page_size - 1) // page_size if total_count is not None else None
 
     return {
         "items": items,
         "pagination": {
+            "mode": "offset",
             "page": page,
             "page_size": page_size,
             "total_count": total_count,
+            "count_mode": used_count_mode,
             "total_pages": total_pages,
-            "has_next": page < total_pages,
+            "has_next": has_next,
             "has_prev": page > 1
         }
     }
@@ -313,6 +708,8 @@ def update_processing_status(db: Session, raw_data_id: str, processing_status: s
     """
     更新原始数据处理状态
 
+    上传中的占位记录由上传流程维护状态，不会被更新。
+
     Args:
         db: 数据库会话
         raw_data_id: 原始数据ID
@@ -324,8 +721,9 @@ def update_processing_status(db: Session, raw_data_id: str, processing_status: s
     try:
         # 直接使用字符串ID，不转换为UUID，因为数据库字段是String类型
         affected_rows = db.query(RawData).filter(
-            RawData.id == str(raw_data_id)
-        ).update({"processing_status": processing_status})
+            RawData.id == str(raw_data_id),
+            completed_raw_data()
+        ).update({"processing_status": processing_status}, synchronize_session=False)
 
         db.commit()
         return affected_rows > 0
@@ -335,6 +733,36 @@ def update_processing_status(db: Session, raw_data_id: str, processing_status: s
         return False
 
 
+def update_file_meta(db: Session, raw_data_id: str, updates: Dict[str, Any]) -> bool:
+    """
+    合并更新原始数据的文件元数据（保留已有字段）
+
+    Args:
+        db: 数据库会话
+        raw_data_id: 原始数据ID
+        updates: 需要写入 file_meta 的字段
+
+    Returns:
+        bool: 更新是否成功
+    """
+    try:
+        raw_data = db.query(RawData).filter(RawData.id == str(raw_data_id)).first()
+        if not raw_data:
+            return False
+
+        # JSON 列不跟踪原地修改，需要整体赋值
+        file_meta = dict(raw_data.file_meta or {})
+        file_meta.update(updates)
+        raw_data.file_meta = file_meta
+
+        db.commit()
+        return True
+    except Exception as e:
+        print(f"[后端RawDataService] 更新文件元数据失败: {str(e)}")
+        db.rollback()
+        return False
+
+
 def update_ai_status(db: Session, raw_data_id: str, ai_status: str) -> bool:
     """
     更新原始数据AI分析状态
@@ -361,6 +789,48 @@ def update_ai_status(db: Session, raw_data_id: str, ai_status: str) -> bool:
         return False
 
 
+def delete_raw_data(db: Session, raw_data_id: str) -> Optional[Dict[str, Any]]:
+    """
+    删除原始数据记录（标签和处理记录级联删除，MinIO 对象由调用方释放）
+
+    数值型数据删除后在同一事务中重新计算其所在的时间桶。
+
+    Args:
+        db: 数据库会话
+        raw_data_id: 原始数据ID
+
+    Returns:
+        Optional[Dict[str, Any]]: 被删除记录的会话ID、数据大类、对象路径和缩略图，记录不存在时返回 None
+    """
+    try:
+        raw_data = db.query(RawData).filter(RawData.id == str(raw_data_id)).first()
+        if not raw_data:
+            return None
+
+        deleted = {
+            "id": str(raw_data.id),
+            "session_id": raw_data.session_id,
+            "data_type": raw_data.data_type,
+            "object_key": raw_data.object_key,
+            "thumbnails": (raw_data.file_meta or {}).get("thumbnails"),
+        }
+        data_subtype, capture_time = raw_data.data_subtype, raw_data.capture_time
+        db.delete(raw_data)
+        if deleted["data_type"] in NUMERIC_DATA_TYPES and data_subtype and capture_time:
+            db.flush()
+            recompute_rollup_buckets(db, deleted["session_id"], data_subtype, capture_time)
+        db.commit()
+
+        invalidate_raw_data_counts(db, [deleted["session_id"]])
+
+        print(f"[后端RawDataService] 已删除原始数据: {raw_data_id}")
+        return deleted
+    except Exception as e:
+        print(f"[后端RawDataService] 删除原始数据失败: {str(e)}")
+        db.rollback()
+        raise
+
+
 def add_raw_data_tag(
     db: Session,
     raw_data_id: str,
@@ -487,24 +957,108 @@ def get_session_data_types(db: Session, session_id: str, data_type: Optional[str
         return {"dataTypes": [], "dataSubtypes": []}
 
 
+# 统计结果缓存有效期（秒）；相关会话写入数据时通过代际令牌提前失效
+# （令牌防抖更换，持续写入时最多滞后 RAW_DATA_INVALIDATION_INTERVAL 秒）
+STATISTICS_CACHE_TTL = int(os.getenv("STATISTICS_CACHE_TTL", "60"))
+# 会话过滤超过该数量时改用表级代际令牌（避免逐个读取会话令牌）
+_STATISTICS_SESSION_TOKEN_LIMIT = 50
+
+
+def _statistics_cache_key(
+    db: Session,
+    session_ids: Optional[List[str]],
+    data_type: Optional[str],
+    data_subtype: Optional[str],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime]
+) -> str:
+    """
+    统计结果缓存键：用户数据库 + 相关代际令牌 + 规范化后的过滤条件
+
+    按会话过滤时使用这些会话的代际令牌，其他会话写入数据不会使缓存失效；
+    令牌防抖更换，正在写入的会话每个 RAW_DATA_INVALIDATION_INTERVAL 最多失效一次。
+    """
+    normalized = {
+        "session_ids": sorted({str(sid) for sid in session_ids}) if session_ids else None,
+        "data_type": data_type or None,
+        "data_subtype": data_subtype or None,
+        "start_time": start_time.isoformat() if start_time else None,
+        "end_time": end_time.isoformat() if end_time else None,
+    }
+    digest = hashlib.md5(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+    if normalized["session_ids"] and len(normalized["session_ids"]) <= _STATISTICS_SESSION_TOKEN_LIMIT:
+        tables = [session_data_table(sid) for sid in normalized["session_ids"]]
+    else:
+        tables = ['raw_data']
+    generations = hashlib.md5(
+        ":".join(get_table_generation(db, table) for table in tables).encode("utf-8")
+    ).hexdigest()
+    return f"raw_stats:{get_tenant_key(db)}:{generations}:{digest}"
+
+
+def _query_statistics_aggregates(query, per_subtype: bool):
+    """
+    一次扫描完成总数、会话数和按子类型的数值聚合
+
+    per_subtype 为 True 时使用 GROUPING SETS ((data_subtype), ())：
+    is_total=1 的行为总计，其余为各子类型；数值聚合只统计 numeric_value 不为空的
+    environmental/soil 数据，与聚合表的统计口径一致。
+
+    Args:
+        query: 已添加过滤条件的查询
+        per_subtype: 是否按子类型分组
+
+    Returns:
+        list: 聚合结果行
+    """
+    is_numeric = and_(RawData.data_type.in_(NUMERIC_DATA_TYPES), RawData.numeric_value.isnot(None))
+    aggregates = [
+        func.count(RawData.id).label('total'),
+        func.count(RawData.id).filter(is_numeric).label('numeric_count'),
+        func.avg(RawData.numeric_value).filter(is_numeric).label('avg_value'),
+        func.min(RawData.numeric_value).filter(is_numeric).label('min_value'),
+        func.max(RawData.numeric_value).filter(is_numeric).label('max_value'),
+        func.count(func.distinct(RawData.session_id)).label('session_count'),
+    ]
+    if not per_subtype:
+        return [query.with_entities(
+            literal(None).label('data_subtype'), literal(1).label('is_total'), *aggregates
+        ).one()]
+
+    return query.with_entities(
+        RawData.data_subtype,
+        func.grouping(RawData.data_subtype).label('is_total'),
+        *aggregates
+    ).group_by(
+        func.grouping_sets(tuple_(RawData.data_subtype), tuple_())
+    ).all()
+
+
 def get_raw_data_statistics(
     db: Session,
     session_ids: Optional[List[str]] = None,
     data_type: Optional[str] = None,
     data_subtype: Optional[str] = None,
     start_time: Optional[datetime] = None,
-    end_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None,
+    count_mode: str = 'auto'
 ) -> Dict[str, Any]:
     """
     获取原始数据的统计信息（用于数据分析页面）
 
+    时间范围边界能对齐聚合粒度时，数值型数据的数量/均值/最值从时间桶聚合表读取；
+    否则在原始数据上用一条 GROUPING SETS 查询同时得到总数、会话数和分组聚合。
+    结果按规范化的过滤条件缓存，涉及的会话写入数据时失效。
+
     Args:
         db: 数据库会话
         session_ids: 会话ID列表（可选）
         data_type: 数据类型过滤（可选）
         data_subtype: 数据子类型过滤（可选）
-        start_time: 开始时间（可选）
-        end_time: 结束时间（可选）
+        start_time: 开始时间（可选，包含）
+        end_time: 结束时间（可选，不包含）
+        count_mode: exact 时跳过结果缓存重新统计；其他值（estimate/cached/auto）优先使用缓存
 
     Returns:
         统计信息字典，包含：
@@ -514,120 +1068,254 @@ def get_raw_data_statistics(
         - min_values: 各数据类型的最小值
         - max_values: 各数据类型的最大值
         - session_count: 涉及的会话数量
+        - count_mode: 结果来源，exact（本次统计）或 cached（缓存结果）
     """
-    try:
-        from sqlalchemy import func, and_
-
-        query = db.query(RawData)
-
-        # 过滤会话ID列表
-        if session_ids and len(session_ids) > 0:
-            query = query.filter(RawData.session_id.in_(session_ids))
+    empty_result = {
+        "total_records": 0,
+        "data_types": {},
+        "average_values": {},
+        "min_values": {},
+        "max_values": {},
+        "session_count": 0
+    }
 
-        # 过滤数据类型
-        if data_type:
-            query = query.filter(RawData.data_type == data_type)
-
-        # 过滤数据子类型
-        if data_subtype:
-            query = query.filter(RawData.data_subtype == data_subtype)
-
-        # 过滤时间范围
-        if start_time or end_time:
-            time_filter = []
-            if start_time:
-                time_filter.append(RawData.capture_time >= start_time)
-            if end_time:
-                time_filter.append(RawData.capture_time <= end_time)
-            if time_filter:
-                query = query.filter(and_(*time_filter))
-
-        # 统计总记录数
-        total_records = query.count()
-
-        if total_records == 0:
-            return {
-                "total_records": 0,
-                "data_types": {},
-                "average_values": {},
-                "min_values": {},
-                "max_values": {},
-                "session_count": 0
-            }
+    try:
+        cache_key = None
+        try:
+            cache_key = _statistics_cache_key(db, session_ids, data_type, data_subtype, start_time, end_time)
+            if count_mode != 'exact':
+                cached = get_cache_manager().get(cache_key)
+                if cached is not None:
+                    return {**cached, "count_mode": "cached"}
+        except Exception as e:
+            print(f"[后端RawDataService] 读取统计缓存失败: {str(e)}")
 
-        # 按data_subtype分组统计
-        # 只统计数值类型的数据（环境数据、土壤数据），过滤掉图像/视频等文件类型
-        grouped_result = query.filter(
-            RawData.data_type.in_(['environmental', 'soil'])
-        ).with_entities(
-            RawData.data_subtype,
-            func.count(RawData.id).label('count'),
-            func.avg(func.cast(RawData.data_value, Float)).label('avg_value'),
-            func.min(func.cast(RawData.data_value, Float)).label('min_value'),
-            func.max(func.cast(RawData.data_value, Float)).label('max_value')
-        ).group_by(RawData.data_subtype).all()
-
-        data_types = {}
-        average_values = {}
-        min_values = {}
-        max_values = {}
-
-        for row in grouped_result:
-            if row.data_subtype:
-                data_types[row.data_subtype] = row.count
-                if row.avg_value is not None:
-                    average_values[row.data_subtype] = round(row.avg_value, 2)
-                if row.min_value is not None:
-                    min_values[row.data_subtype] = row.min_value
-                if row.max_value is not None:
-                    max_values[row.data_subtype] = row.max_value
-
-        # 统计涉及的会话数量
-        session_count_query = db.query(func.count(func.distinct(RawData.session_id)))
-        if session_ids and len(session_ids) > 0:
-            session_count_query = session_count_query.filter(RawData.session_id.in_(session_ids))
-        if data_type:
-            session_count_query = session_count_query.filter(RawData.data_type == data_type)
-        if data_subtype:
-            session_count_query = session_count_query.filter(RawData.data_subtype == data_subtype)
-        if start_time or end_time:
-            time_filter = []
-            if start_time:
-                time_filter.append(RawData.capture_time >= start_time)
-            if end_time:
-                time_filter.append(RawData.capture_time <= end_time)
-            if time_filter:
-                session_count_query = session_count_query.filter(and_(*time_filter))
-
-        session_count = session_count_query.scalar() or 0
+        result = _compute_raw_data_statistics(
+            db, session_ids, data_type, data_subtype, start_time, end_time
+        )
+        if result is None:
+            return empty_result
 
-        return {
-            "total_records": total_records,
-            "data_types": data_types,
-            "average_values": average_values,
-            "min_values": min_values,
-            "max_values": max_values,
-            "session_count": session_count
-        }
+        if cache_key:
+            get_cache_manager().set(cache_key, result, STATISTICS_CACHE_TTL)
+        return {**result, "count_mode": "exact"}
 
     except Exception as e:
         print(f"[后端RawDataService] 获取数据统计失败: {str(e)}")
         import traceback
         traceback.print_exc()
-        return {
-            "total_records": 0,
-            "data_types": {},
-            "average_values": {},
-            "min_values": {},
-            "max_values": {},
-            "session_count": 0
-        }
+        return empty_result
+
+
+def _compute_raw_data_statistics(
+    db: Session,
+    session_ids: Optional[List[str]],
+    data_type: Optional[str],
+    data_subtype: Optional[str],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime]
+) -> Optional[Dict[str, Any]]:
+    """
+    计算统计信息（不经过缓存），没有数据时返回 None
+    """
+    query = db.query(RawData).filter(completed_raw_data())
+
+    # 过滤会话ID列表
+    if session_ids and len(session_ids) > 0:
+        query = query.filter(RawData.session_id.in_(session_ids))
+
+    # 过滤数据类型
+    if data_type:
+        query = query.filter(RawData.data_type == data_type)
+
+    # 过滤数据子类型
+    if data_subtype:
+        query = query.filter(RawData.data_subtype == data_subtype)
+
+    # 过滤时间范围（左闭右开，与聚合表按桶起点过滤的语义一致）
+    if start_time:
+        query = query.filter(RawData.capture_time >= start_time)
+    if end_time:
+        query = query.filter(RawData.capture_time < end_time)
+
+    # 选择聚合粒度（文件类型数据不进入聚合表）
+    bucket_size = None
+    if data_type is None or data_type in NUMERIC_DATA_TYPES:
+        bucket_size = choose_statistics_bucket(start_time, end_time)
+
+    data_types = {}
+    average_values = {}
+    min_values = {}
+    max_values = {}
+
+    if bucket_size:
+        rollup = get_rollup_statistics(
+            db, bucket_size,
+            session_ids=session_ids,
+            data_type=data_type,
+            data_subtype=data_subtype,
+            start_time=start_time,
+            end_time=end_time
+        )
+        for subtype, item in rollup["subtypes"].items():
+            data_types[subtype] = item["count"]
+            if item["avg"] is not None:
+                average_values[subtype] = round(item["avg"], 2)
+            if item["min"] is not None:
+                min_values[subtype] = item["min"]
+            if item["max"] is not None:
+                max_values[subtype] = item["max"]
+
+    # 总数和会话数始终取自原始数据（包含文件类型和无法解析为数值的记录），两条路径口径一致；
+    # 聚合表已提供分组数值时，原始数据上只需统计总数和会话数
+    rows = _query_statistics_aggregates(query, per_subtype=not bucket_size)
+
+    total_records = 0
+    session_count = 0
+    for row in rows:
+        if row.is_total:
+            total_records = row.total or 0
+            session_count = row.session_count or 0
+        elif row.data_subtype and row.numeric_count:
+            # 只统计数值类型的数据（环境数据、土壤数据），过滤掉图像/视频等文件类型
+            data_types[row.data_subtype] = row.numeric_count
+            if row.avg_value is not None:
+                average_values[row.data_subtype] = round(row.avg_value, 2)
+            if row.min_value is not None:
+                min_values[row.data_subtype] = row.min_value
+            if row.max_value is not None:
+                max_values[row.data_subtype] = row.max_value
+
+    if total_records == 0:
+        return None
+
+    return {
+        "total_records": total_records,
+        "data_types": data_types,
+        "average_values": average_values,
+        "min_values": min_values,
+        "max_values": max_values,
+        "session_count": session_count
+    }
+
+
+# 概览快照缓存有效期（秒）；相关表写入时通过代际令牌提前失效
+OVERVIEW_CACHE_TTL = int(os.getenv("OVERVIEW_CACHE_TTL", "30"))
+# 概览快照依赖的表
+_OVERVIEW_TABLES = ('devices', 'collection_sessions', 'raw_data', 'fields')
+
+_DATA_TYPE_LABELS = {
+    "image": "图像/文件",
+    "file": "图像/文件",
+    "video": "图像/文件",
+    "environmental": "环境数据",
+    "soil": "土壤数据",
+    "spectral": "光谱数据",
+    "multispectral": "多光谱数据",
+    "thermal": "热成像数据",
+}
+
+
+def _overview_cache_key(db: Session) -> str:
+    generations = ":".join(get_table_generation(db, table) for table in _OVERVIEW_TABLES)
+    return f"overview:{get_tenant_key(db)}:{generations}"
+
 
+def _query_overview_counts(db: Session, now: datetime) -> Dict[str, int]:
+    """
+    一条查询统计设备总数、在线设备数和进行中的任务数
+
+    Args:
+        db: 数据库会话
+        now: 当前时间
+
+    Returns:
+        Dict[str, int]: total_devices / active_devices / today_sessions
+    """
+    device_counts = select(
+        func.count().label('total_devices'),
+        func.count().filter(Device.is_active == True).label('active_devices')
+    ).select_from(Device).cte('device_counts')
+
+    # 今日任务数（今天还在进行中的任务）：任务已开始，并且尚未结束
+    session_counts = select(
+        func.count().label('today_sessions')
+    ).select_from(CollectionSession).where(
+        CollectionSession.start_time <= now,
+        or_(
+            CollectionSession.end_time.is_(None),  # 还没结束
+            CollectionSession.end_time > now  # 结束时间在未来
+        )
+    ).cte('session_counts')
+
+    row = db.execute(select(
+        device_counts.c.total_devices,
+        device_counts.c.active_devices,
+        session_counts.c.today_sessions
+    )).one()
+
+    return {
+        "total_devices": row.total_devices or 0,
+        "active_devices": row.active_devices or 0,
+        "today_sessions": row.today_sessions or 0,
+    }
+
+
+def _query_recent_activities(db: Session, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    一条 UNION ALL 查询获取最近的采集任务和数据记录（地块名称通过 JOIN 取得）
+
+    Args:
+        db: 数据库会话
+        limit: 返回条数
+
+    Returns:
+        List[Dict[str, Any]]: 按时间倒序的活动记录
+    """
+    recent_sessions = select(
+        literal('session').label('kind'),
+        CollectionSession.start_time.label('ts'),
+        cast(CollectionSession.mission_type, Text).label('label'),
+        cast(Field.name, Text).label('field_name')
+    ).outerjoin(
+        Field, Field.id == CollectionSession.field_id
+    ).order_by(desc(CollectionSession.start_time)).limit(limit).subquery()
+
+    recent_data = select(
+        literal('data').label('kind'),
+        RawData.capture_time.label('ts'),
+        cast(RawData.data_type, Text).label('label'),
+        cast(null(), Text).label('field_name')
+    ).where(completed_raw_data()).order_by(desc(RawData.capture_time)).limit(limit).subquery()
+
+    activities = union_all(select(recent_sessions), select(recent_data)).subquery()
+    rows = db.execute(
+        select(activities).order_by(activities.c.ts.desc().nulls_last()).limit(limit)
+    ).all()
+
+    result = []
+    for row in rows:
+        if row.kind == 'session':
+            content = f"任务 {row.label or '采集'} 在 {row.field_name or '未知地块'} 开始"
+        else:
+            data_type_label = row.label or "数据"
+            content = f"采集{_DATA_TYPE_LABELS.get(data_type_label, data_type_label)}"
+        result.append({
+            "time": row.ts.strftime("%H:%M") if row.ts else "",
+            "content": content,
+            "type": row.kind,
+            "timestamp": row.ts.isoformat() if row.ts else None
+        })
+    return result
 
-def get_overview_statistics(db: Session) -> Dict[str, Any]:
+
+def get_overview_statistics(db: Session, use_cache: bool = True) -> Dict[str, Any]:
     """
     获取概览页面的统计数据
 
+    固定执行两条聚合查询（计数 CTE + 最近活动 UNION ALL）和一次数据总数计数，
+    结果按用户数据库缓存为快照，设备/会话/数据/地块写入时失效，并有 TTL 兜底。
+
     返回数据包括：
     - total_devices: 设备总数
     - active_devices: 在线设备数（is_active=True）
@@ -635,107 +1323,32 @@ def get_overview_statistics(db: Session) -> Dict[str, Any]:
     - total_data_records: 总数据记录数
     - recent_activities: 最近活动记录（最近10条）
     - system_status: 系统状态（基于数据库连接和数据量）
+    - snapshot_time: 快照生成时间
 
     Args:
         db: 数据库会话
+        use_cache: 是否使用缓存快照
 
     Returns:
         Dict[str, Any]: 包含概览统计数据的字典
     """
     try:
-        # 获取当前时间
-        now = datetime.now()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        # 统计设备总数
-        total_devices = db.query(func.count(Device.id)).scalar() or 0
-
-        # 统计在线设备数
-        active_devices = db.query(func.count(Device.id)).filter(Device.is_active == True).scalar() or 0
-
-        # 统计今日任务数（今天还在进行中的任务）
-        # 条件：任务在今天之前开始，并且尚未完成
-        today_sessions = db.query(func.count(CollectionSession.id)).filter(
-            CollectionSession.start_time <= now,
-            or_(
-                CollectionSession.end_time.is_(None),  # 还没结束
-                CollectionSession.end_time > now  # 结束时间在未来
-            )
-        ).scalar() or 0
-        
-        # 调试：查询所有会话的详细信息
-        all_sessions = db.query(
-            CollectionSession.id, 
-            CollectionSession.start_time,
-            CollectionSession.end_time,
-            CollectionSession.mission_name
-        ).all()
-        total_data_records = db.query(func.count(RawData.id)).scalar() or 0
-
-        # 获取最近的活动记录（采集任务）
-        recent_sessions = db.query(CollectionSession).order_by(
-            desc(CollectionSession.start_time)
-        ).limit(10).all()
-
-        # 获取最近的数据记录
-        recent_data = db.query(RawData).order_by(desc(RawData.capture_time)).limit(10).all()
-
-        # 组合最近活动
-        all_activities = []
-
-        # 添加最近的采集任务
-        for session in recent_sessions:
-            field_name = "未知地块"
+        cache_key = None
+        if use_cache:
             try:
-                field = db.query(Field).filter(Field.id == session.field_id).first()
-                if field:
-                    field_name = field.name
-            except:
-                pass
-
-            session_start_time = session.start_time
-            all_activities.append({
-                "time": session_start_time.strftime("%H:%M") if session_start_time else "",
-                "content": f"任务 {session.mission_type or '采集'} 在 {field_name} 开始",
-                "type": "session",
-                "timestamp": session_start_time.isoformat() if session_start_time else None,
-                "_sort_time": session_start_time or datetime.min
-            })
-
-        # 添加最近的数据记录
-        for data in recent_data:
-            data_type_label = data.data_type or "数据"
-            if data_type_label in ("image", "file", "video"):
-                data_type_label = "图像/文件"
-            elif data_type_label == "environmental":
-                data_type_label = "环境数据"
-            elif data_type_label == "soil":
-                data_type_label = "土壤数据"
-            elif data_type_label == "spectral":
-                data_type_label = "光谱数据"
-            elif data_type_label == "multispectral":
-                data_type_label = "多光谱数据"
-            elif data_type_label == "thermal":
-                data_type_label = "热成像数据"
-
-            capture_time = data.capture_time
-            all_activities.append({
-                "time": capture_time.strftime("%H:%M") if capture_time else "",
-                "content": f"采集{data_type_label}",
-                "type": "data",
-                "timestamp": capture_time.isoformat() if capture_time else None,
-                "_sort_time": capture_time or datetime.min
-            })
-
-        # 按时间排序并取前10条
-        all_activities.sort(key=lambda x: x["_sort_time"], reverse=True)
-        recent_activities = all_activities[:10]
+                cache_key = _overview_cache_key(db)
+                cached = get_cache_manager().get(cache_key)
+                if cached is not None:
+                    return dict(cached)
+            except Exception as e:
+                print(f"[后端RawDataService] 读取概览缓存失败: {str(e)}")
 
-        # 移除排序辅助字段
-        for activity in recent_activities:
-            if "_sort_time" in activity:
-                del activity["_sort_time"]
+        now = datetime.now()
+        counts = _query_overview_counts(db, now)
+        total_data_records, data_count_mode = count_query(
+            db, db.query(RawData).filter(completed_raw_data()), 'raw_data', 'auto'
+        )
+        recent_activities = _query_recent_activities(db, limit=10)
 
         # 计算系统状态
         system_status = {
@@ -744,15 +1357,21 @@ def get_overview_statistics(db: Session) -> Dict[str, Any]:
             "disk_usage": "正常" if total_data_records < 100000 else "警告"
         }
 
-        return {
-            "total_devices": total_devices,
-            "active_devices": active_devices,
-            "today_sessions": today_sessions,
+        result = {
+            **counts,
             "total_data_records": total_data_records,
+            "total_data_records_count_mode": data_count_mode,
             "recent_activities": recent_activities,
-            "system_status": system_status
+            "system_status": system_status,
+            "snapshot_time": now.isoformat()
         }
 
+        if cache_key:
+            get_cache_manager().set(cache_key, result, OVERVIEW_CACHE_TTL)
+
+        # 返回副本，调用方修改结果不影响内存缓存中的快照
+        return dict(result)
+
     except Exception as e:
         print(f"[后端RawDataService] 获取概览统计失败: {str(e)}")
         import traceback
@@ -771,13 +1390,126 @@ def get_overview_statistics(db: Session) -> Dict[str, Any]:
         }
 
 
+def _stream_downsampled_series(
+    query,
+    target: int,
+    method: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> Dict[str, list]:
+    """
+    通过流式游标逐批读取时序数据，并按子类型降采样到 target 个点
+
+    降采样器的时间桶需要在读取前确定：请求同时指定了起止时间时直接使用，
+    否则先按子类型查询 MIN/MAX(capture_time)。
+
+    Args:
+        query: 已按 capture_time 升序排列的查询（data_subtype, numeric_value, capture_time）
+        target: 每条曲线的目标点数
+        method: 降采样算法 lttb / minmax
+        start_time: 请求的开始时间（可选）
+        end_time: 请求的结束时间（可选）
+
+    Returns:
+        Dict[str, list]: 子类型 -> [{"time", "value"}, ...]
+    """
+    from utils.downsampling import StreamingSeriesReducer
+
+    def to_seconds(value: datetime) -> float:
+        return (value - _EPOCH).total_seconds()
+
+    ranges: Dict[str, tuple] = {}
+    if start_time is None or end_time is None:
+        span_query = query.order_by(None).with_entities(
+            RawData.data_subtype,
+            func.min(RawData.capture_time),
+            func.max(RawData.capture_time)
+        ).group_by(RawData.data_subtype)
+        for subtype, first, last in span_query.all():
+            ranges[subtype or 'unknown'] = (to_seconds(start_time or first), to_seconds(end_time or last))
+
+    reducers = {}
+    for row in query.yield_per(TIMESERIES_STREAM_BATCH_SIZE):
+        subtype = row.data_subtype or 'unknown'
+        x = to_seconds(row.capture_time)
+        reducer = reducers.get(subtype)
+        if reducer is None:
+            if start_time is not None and end_time is not None:
+                x_start, x_end = to_seconds(start_time), to_seconds(end_time)
+            else:
+                x_start, x_end = ranges.get(subtype, (x, x))
+            reducer = StreamingSeriesReducer(target, x_start, x_end, TIMESERIES_MAX_SOURCE_POINTS, method)
+            reducers[subtype] = reducer
+        reducer.append(x, row.numeric_value)
+
+    series: Dict[str, list] = {}
+    for subtype, reducer in reducers.items():
+        xs, ys = reducer.result()
+        series[subtype] = [
+            {"time": (_EPOCH + timedelta(seconds=float(x))).isoformat(), "value": float(y)}
+            for x, y in zip(xs, ys)
+        ]
+        print(f"[后端RawDataService] 时序降采样 {subtype}: {reducer.source_points} -> {len(xs)} 点")
+    return series
+
+
+def _downsample_points(points: list, target: int, method: str) -> list:
+    """对已生成的数据点列表降采样（用于聚合数据超过点数上限时）"""
+    if len(points) <= target:
+        return points
+
+    import numpy as np
+    from utils.downsampling import downsample_indices
+
+    xs = np.asarray([(datetime.fromisoformat(p["time"]) - _EPOCH).total_seconds() for p in points], dtype=np.float64)
+    ys = np.asarray([p["value"] for p in points], dtype=np.float64)
+    return [points[int(i)] for i in downsample_indices(xs, ys, target, method)]
+
+
+def _choose_auto_resolution(
+    db: Session,
+    session_ids: Optional[List[str]],
+    data_subtypes: Optional[List[str]],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    limit: int,
+    downsample: Optional[str]
+) -> str:
+    """
+    resolution=auto 时选择数据粒度
+
+    分钟级时间桶数或原始点数不超过上限时返回原始数据（raw），否则选择点数不超过 limit 的最细聚合粒度。
+    上限为 limit；指定 downsample 时原始数据由流式降采样器处理，上限为 TIMESERIES_MAX_SOURCE_POINTS。
+    聚合表中没有数据（如尚未执行 rebuild-rollups）时同样返回原始数据。
+
+    Returns:
+        str: raw/1m/1h/1d
+    """
+    span_start, span_end = start_time, end_time
+    if span_start is None or span_end is None:
+        first, last = get_rollup_time_span(db, session_ids, data_subtypes)
+        if first is None:
+            return 'raw'
+        span_start = span_start or first
+        span_end = span_end or last
+
+    max_raw_points = TIMESERIES_MAX_SOURCE_POINTS if downsample else limit
+    if (span_end - span_start).total_seconds() / 60 <= limit:
+        return 'raw'
+    if count_rollup_points(db, session_ids, data_subtypes, start_time, end_time) <= max_raw_points:
+        return 'raw'
+    return choose_timeseries_bucket(span_start, span_end, limit)
+
+
 def get_timeseries_data(
     db: Session,
     session_ids: Optional[List[str]] = None,
     data_subtypes: Optional[List[str]] = None,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
-    limit: int = 200
+    limit: int = 200,
+    resolution: str = 'auto',
+    downsample: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     获取时序数据，用于折线图展示
@@ -788,27 +1520,53 @@ def get_timeseries_data(
         db: 数据库会话
         session_ids: 会话ID列表
         data_subtypes: 数据子类型列表，如 ["temperature", "humidity"]
-        start_time: 开始时间
-        end_time: 结束时间
+        start_time: 开始时间（包含）
+        end_time: 结束时间（不包含）
         limit: 每个子类型最多返回的数据点数
+        resolution: 数据粒度，raw 为原始数据，1m/1h/1d 为时间桶聚合（值为桶内均值，只包含完全落在范围内的桶），
+            auto 在时间跨度较短或原始点数不多时返回原始数据，否则选择点数不超过 limit 的最细粒度
+        downsample: 降采样算法 lttb / minmax（可选）。指定后不再截断为最早的 limit 个点，
+            而是在整个时间范围内选取 limit 个代表点；原始数据通过流式游标读取，内存占用有上限
 
     Returns:
         {
             "series": {
                 "temperature": [{"time": "2024-01-01T10:00:00", "value": 25.3}, ...],
                 "humidity": [...]
-            }
+            },
+            "resolution": "1h"
         }
     """
     try:
+        if resolution == 'auto':
+            resolution = _choose_auto_resolution(
+                db, session_ids, data_subtypes, start_time, end_time, limit, downsample
+            )
+
+        if resolution in ROLLUP_BUCKET_SECONDS:
+            series = get_rollup_timeseries(
+                db, resolution,
+                session_ids=session_ids,
+                data_subtypes=data_subtypes,
+                start_time=start_time,
+                end_time=end_time,
+                limit=None if downsample else limit
+            )
+            if downsample:
+                series = {k: _downsample_points(v, limit, downsample) for k, v in series.items()}
+            return {"series": series, "resolution": resolution}
+
         query = db.query(
             RawData.data_subtype,
-            RawData.data_value,
+            RawData.numeric_value,
             RawData.capture_time
         )
 
-        # 只查询数值类型（environmental 和 soil），排除文件类型
-        query = query.filter(RawData.data_type.in_(['environmental', 'soil']))
+        # 只查询数值类型（environmental 和 soil），排除文件类型和无法解析的数值
+        query = query.filter(
+            RawData.data_type.in_(NUMERIC_DATA_TYPES),
+            RawData.numeric_value.isnot(None)
+        )
 
         if session_ids:
             query = query.filter(RawData.session_id.in_(session_ids))
@@ -819,12 +1577,17 @@ def get_timeseries_data(
         if start_time:
             query = query.filter(RawData.capture_time >= start_time)
 
+        # 时间范围左闭右开，与聚合粒度查询一致
         if end_time:
-            query = query.filter(RawData.capture_time <= end_time)
+            query = query.filter(RawData.capture_time < end_time)
 
         # 按时间升序排列，便于绘制折线图
         query = query.order_by(RawData.capture_time.asc())
 
+        if downsample:
+            series = _stream_downsampled_series(query, limit, downsample, start_time, end_time)
+            return {"series": series, "resolution": 'raw'}
+
         results = query.all()
 
         # 按 data_subtype 分组
@@ -838,18 +1601,12 @@ def get_timeseries_data(
             if limit and len(series[subtype]) >= limit:
                 continue
 
-            try:
-                value = float(row.data_value) if row.data_value else None
-            except (ValueError, TypeError):
-                value = None
-
-            if value is not None:
-                series[subtype].append({
-                    "time": row.capture_time.isoformat() if row.capture_time else None,
-                    "value": value
-                })
+            series[subtype].append({
+                "time": row.capture_time.isoformat() if row.capture_time else None,
+                "value": row.numeric_value
+            })
 
-        return {"series": series}
+        return {"series": series, "resolution": 'raw'}
 
     except Exception as e:
         print(f"[后端RawDataService] 获取时序数据失败: {str(e)}")
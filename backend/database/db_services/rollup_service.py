@@ -0,0 +1,489 @@
+"""
+原始数据时间桶聚合服务
+
+维护 raw_data_rollups 表：写入数值型原始数据时，在同一事务中按 1分钟/1小时/1天
+粒度增量更新 (会话, 子类型) 的 count/min/max/sum/last，
+并为时序和统计查询选择合适的聚合粒度。
+"""
+
+from sqlalchemy import func, case, or_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from database.db_models.user_models import RawDataRollup
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+from datetime import datetime, timedelta
+
+# 聚合粒度（由细到粗）及对应秒数
+ROLLUP_BUCKET_SECONDS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+# 粒度对应的 PostgreSQL date_trunc 单位
+_DATE_TRUNC_UNITS = {
+    '1m': 'minute',
+    '1h': 'hour',
+    '1d': 'day',
+}
+
+
+def get_bucket_start(value: datetime, bucket_size: str) -> datetime:
+    """
+    计算时间所在时间桶的起始时间（与 PostgreSQL date_trunc 一致）
+
+    Args:
+        value: 时间
+        bucket_size: 粒度 1m/1h/1d
+
+    Returns:
+        datetime: 时间桶起始时间
+    """
+    if bucket_size == '1m':
+        return value.replace(second=0, microsecond=0)
+    if bucket_size == '1h':
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def apply_raw_data_rollups(db: Session, rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    将新写入的原始数据增量合并到聚合表（不提交事务，与原始数据写入同一事务）
+
+    先在内存中按 (粒度, 会话, 子类型, 时间桶) 合并，再通过一条
+    INSERT ... ON CONFLICT DO UPDATE 写入；按主键排序以保证并发写入时加锁顺序一致。
+
+    Args:
+        db: 数据库会话
+        rows: 原始数据行，需包含 session_id / data_type / data_subtype / capture_time / numeric_value
+
+    Returns:
+        int: 更新的聚合行数
+    """
+    buckets: Dict[Tuple[str, str, str, datetime], Dict[str, Any]] = {}
+    for row in rows:
+        value = row.get("numeric_value")
+        subtype = row.get("data_subtype")
+        capture_time = row.get("capture_time")
+        if value is None or not subtype or capture_time is None:
+            continue
+
+        for bucket_size in ROLLUP_BUCKET_SECONDS:
+            key = (bucket_size, str(row["session_id"]), subtype, get_bucket_start(capture_time, bucket_size))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {
+                    "data_type": row.get("data_type"),
+                    "value_count": 1,
+                    "min_value": value,
+                    "max_value": value,
+                    "sum_value": value,
+                    "last_value": value,
+                    "last_time": capture_time,
+                }
+                continue
+            bucket["value_count"] += 1
+            bucket["min_value"] = min(bucket["min_value"], value)
+            bucket["max_value"] = max(bucket["max_value"], value)
+            bucket["sum_value"] += value
+            if capture_time >= bucket["last_time"]:
+                bucket["last_value"] = value
+                bucket["last_time"] = capture_time
+
+    if not buckets:
+        return 0
+
+    now = datetime.utcnow()
+    values = [
+        {
+            "bucket_size": key[0],
+            "session_id": key[1],
+            "data_subtype": key[2],
+            "bucket_start": key[3],
+            **bucket,
+            "updated_at": now,
+        }
+        for key, bucket in sorted(buckets.items(), key=lambda item: item[0])
+    ]
+
+    stmt = pg_insert(RawDataRollup).values(values)
+    excluded = stmt.excluded
+    table = RawDataRollup.__table__.c
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['bucket_size', 'session_id', 'data_subtype', 'bucket_start'],
+        set_={
+            "value_count": table.value_count + excluded.value_count,
+            "min_value": func.least(table.min_value, excluded.min_value),
+            "max_value": func.greatest(table.max_value, excluded.max_value),
+            "sum_value": func.coalesce(table.sum_value, 0) + excluded.sum_value,
+            "last_value": case(
+                (or_(table.last_time.is_(None), excluded.last_time >= table.last_time), excluded.last_value),
+                else_=table.last_value
+            ),
+            "last_time": func.greatest(table.last_time, excluded.last_time),
+            "updated_at": excluded.updated_at,
+        }
+    )
+    db.execute(stmt)
+    return len(values)
+
+
+def rebuild_rollups(db: Session, session_id: Optional[str] = None) -> int:
+    """
+    从 raw_data 全量重建聚合表（用于首次创建聚合表或数据修正）
+
+    numeric_value 尚未回填的历史数据会直接解析 data_value。
+
+    Args:
+        db: 数据库会话
+        session_id: 只重建指定会话（可选）
+
+    Returns:
+        int: 写入的聚合行数
+    """
+    from database.db_services.raw_data_service import NUMERIC_VALUE_PATTERN
+
+    session_filter = "AND session_id = :session_id" if session_id else ""
+    params: Dict[str, Any] = {"pattern": NUMERIC_VALUE_PATTERN}
+    if session_id:
+        params["session_id"] = session_id
+
+    try:
+        db.execute(
+            text(f"DELETE FROM raw_data_rollups WHERE TRUE {session_filter}"),
+            params
+        )
+
+        inserted = 0
+        for bucket_size, unit in _DATE_TRUNC_UNITS.items():
+            inserted += db.execute(text(f"""
+                INSERT INTO raw_data_rollups (
+                    bucket_size, session_id, data_subtype, bucket_start, data_type,
+                    value_count, min_value, max_value, sum_value, last_value, last_time, updated_at
+                )
+                SELECT
+                    '{bucket_size}', session_id, data_subtype, date_trunc('{unit}', capture_time), min(data_type),
+                    count(*), min(v), max(v), sum(v),
+                    (array_agg(v ORDER BY capture_time DESC))[1], max(capture_time), now()
+                FROM (
+                    SELECT session_id, data_subtype, data_type, capture_time,
+                           COALESCE(numeric_value,
+                                    CASE WHEN data_value ~ :pattern
+                                         THEN CAST(TRIM(data_value) AS DOUBLE PRECISION) END) AS v
+                    FROM raw_data
+                    WHERE data_type IN ('environmental', 'soil')
+                      AND data_subtype IS NOT NULL
+                      {session_filter}
+                ) s
+                WHERE v IS NOT NULL
+                GROUP BY session_id, data_subtype, date_trunc('{unit}', capture_time)
+            """), params).rowcount or 0
+
+        db.commit()
+        print(f"[后端RollupService] 重建聚合数据完成: {inserted} 行")
+        return inserted
+
+    except Exception as e:
+        print(f"[后端RollupService] 重建聚合数据失败: {str(e)}")
+        db.rollback()
+        raise
+
+
+def recompute_rollup_buckets(db: Session, session_id: str, data_subtype: str, capture_time: datetime) -> None:
+    """
+    删除原始数据后重新计算其所在的 1m/1h/1d 时间桶（不提交事务，与删除在同一事务中）
+
+    分钟桶从 raw_data 重新聚合（最多一分钟的数据），小时桶由该小时的分钟桶合并，
+    天桶由当天的小时桶合并，不需要扫描整个会话。
+
+    Args:
+        db: 数据库会话
+        session_id: 会话ID
+        data_subtype: 数据子类型
+        capture_time: 被删除数据的采集时间
+    """
+    from database.db_services.raw_data_service import NUMERIC_VALUE_PATTERN
+
+    starts = {size: get_bucket_start(capture_time, size) for size in ROLLUP_BUCKET_SECONDS}
+    params: Dict[str, Any] = {"session_id": str(session_id), "data_subtype": data_subtype, "pattern": NUMERIC_VALUE_PATTERN}
+    for size, start in starts.items():
+        params[f"start_{size}"] = start
+        params[f"end_{size}"] = start + timedelta(seconds=ROLLUP_BUCKET_SECONDS[size])
+
+    db.execute(text("""
+        DELETE FROM raw_data_rollups
+        WHERE session_id = :session_id AND data_subtype = :data_subtype
+          AND ((bucket_size = '1m' AND bucket_start = :start_1m)
+            OR (bucket_size = '1h' AND bucket_start = :start_1h)
+            OR (bucket_size = '1d' AND bucket_start = :start_1d))
+    """), params)
+
+    db.execute(text("""
+        INSERT INTO raw_data_rollups (
+            bucket_size, session_id, data_subtype, bucket_start, data_type,
+            value_count, min_value, max_value, sum_value, last_value, last_time, updated_at
+        )
+        SELECT
+            '1m', session_id, data_subtype, :start_1m, min(data_type),
+            count(*), min(v), max(v), sum(v),
+            (array_agg(v ORDER BY capture_time DESC))[1], max(capture_time), now()
+        FROM (
+            SELECT session_id, data_subtype, data_type, capture_time,
+                   COALESCE(numeric_value,
+                            CASE WHEN data_value ~ :pattern
+                                 THEN CAST(TRIM(data_value) AS DOUBLE PRECISION) END) AS v
+            FROM raw_data
+            WHERE session_id = :session_id AND data_subtype = :data_subtype
+              AND data_type IN ('environmental', 'soil')
+              AND capture_time >= :start_1m AND capture_time < :end_1m
+        ) s
+        WHERE v IS NOT NULL
+        GROUP BY session_id, data_subtype
+    """), params)
+
+    # 由细一级的时间桶合并出粗一级的时间桶
+    for size, finer in (('1h', '1m'), ('1d', '1h')):
+        db.execute(text(f"""
+            INSERT INTO raw_data_rollups (
+                bucket_size, session_id, data_subtype, bucket_start, data_type,
+                value_count, min_value, max_value, sum_value, last_value, last_time, updated_at
+            )
+            SELECT
+                '{size}', session_id, data_subtype, :start_{size}, min(data_type),
+                sum(value_count), min(min_value), max(max_value), sum(sum_value),
+                (array_agg(last_value ORDER BY last_time DESC))[1], max(last_time), now()
+            FROM raw_data_rollups
+            WHERE bucket_size = '{finer}'
+              AND session_id = :session_id AND data_subtype = :data_subtype
+              AND bucket_start >= :start_{size} AND bucket_start < :end_{size}
+            GROUP BY session_id, data_subtype
+        """), params)
+
+
+def remove_rollup_range(db: Session, start_time: datetime, end_time: datetime) -> int:
+    """
+    原始数据按时间范围整体删除后（如删除过期分区），清理 [start_time, end_time) 对应的聚合（不提交事务）
+
+    完全落在范围内的时间桶直接删除；范围边界未对齐到某一粒度时，跨越边界的时间桶
+    按剩余的原始数据重新计算。需在原始数据删除之后、同一事务中调用。
+
+    Args:
+        db: 数据库会话
+        start_time: 范围起点
+        end_time: 范围终点（不包含）
+
+    Returns:
+        int: 删除的聚合行数
+    """
+    removed = 0
+    for size, seconds in ROLLUP_BUCKET_SECONDS.items():
+        removed += db.execute(text("""
+            DELETE FROM raw_data_rollups
+            WHERE bucket_size = :size AND bucket_start >= :start AND bucket_start <= :last_start
+        """), {
+            "size": size,
+            "start": start_time,
+            "last_start": end_time - timedelta(seconds=seconds),
+        }).rowcount or 0
+
+    # 天桶未对齐时分钟、小时桶必然也未对齐，跨越边界的会话/子类型从天桶中查找
+    for boundary in (start_time, end_time):
+        day_start = get_bucket_start(boundary, '1d')
+        if day_start == boundary:
+            continue
+        series = db.execute(text("""
+            SELECT DISTINCT session_id, data_subtype FROM raw_data_rollups
+            WHERE bucket_size = '1d' AND bucket_start = :day_start
+        """), {"day_start": day_start}).all()
+        for session_id, data_subtype in series:
+            recompute_rollup_buckets(db, session_id, data_subtype, boundary)
+    return removed
+
+
+def choose_timeseries_bucket(start_time: datetime, end_time: datetime, max_points: int) -> str:
+    """
+    为时序图选择聚合粒度：在点数不超过 max_points 的前提下选择最细的粒度
+
+    Args:
+        start_time: 开始时间
+        end_time: 结束时间
+        max_points: 每条曲线最多的数据点数
+
+    Returns:
+        str: 1m/1h/1d（跨度过大时返回最粗的 1d）
+    """
+    span = max((end_time - start_time).total_seconds(), 0)
+    for bucket_size, seconds in ROLLUP_BUCKET_SECONDS.items():
+        if span / seconds <= max_points:
+            return bucket_size
+    return '1d'
+
+
+def count_rollup_points(
+    db: Session,
+    session_ids: Optional[List[str]] = None,
+    data_subtypes: Optional[List[str]] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> int:
+    """
+    通过天级聚合估算时间范围内每条曲线的原始数据点数（取各子类型中的最大值）
+
+    按覆盖起止时间的整天统计，结果不小于实际点数，用于判断能否直接返回原始数据。
+
+    Returns:
+        int: 单个子类型的最大原始点数
+    """
+    counts = _apply_rollup_filters(
+        db.query(func.sum(RawDataRollup.value_count).label('value_count')),
+        '1d', session_ids, None, data_subtypes,
+        get_bucket_start(start_time, '1d') if start_time else None, end_time
+    ).group_by(RawDataRollup.data_subtype).all()
+    return max((int(row.value_count or 0) for row in counts), default=0)
+
+
+def choose_statistics_bucket(start_time: Optional[datetime], end_time: Optional[datetime]) -> Optional[str]:
+    """
+    为统计查询选择聚合粒度：选择时间范围边界对齐的最粗粒度
+
+    聚合表按整桶统计，只有起止时间都落在桶边界上时结果才与原始数据一致
+    （时间范围为左闭右开 [start_time, end_time)，原始数据查询使用相同的边界）。
+
+    Returns:
+        Optional[str]: 1d/1h/1m，边界无法对齐任何粒度时返回 None（应查询原始数据）
+    """
+    for bucket_size in reversed(list(ROLLUP_BUCKET_SECONDS)):
+        if all(t is None or get_bucket_start(t, bucket_size) == t for t in (start_time, end_time)):
+            return bucket_size
+    return None
+
+
+def _apply_rollup_filters(query, bucket_size: str, session_ids: Optional[List[str]],
+                          data_type: Optional[str], data_subtypes: Optional[List[str]],
+                          start_time: Optional[datetime], end_time: Optional[datetime]):
+    query = query.filter(RawDataRollup.bucket_size == bucket_size)
+    if session_ids:
+        query = query.filter(RawDataRollup.session_id.in_(session_ids))
+    if data_type:
+        query = query.filter(RawDataRollup.data_type == data_type)
+    if data_subtypes:
+        query = query.filter(RawDataRollup.data_subtype.in_(data_subtypes))
+    if start_time:
+        query = query.filter(RawDataRollup.bucket_start >= start_time)
+    if end_time:
+        query = query.filter(RawDataRollup.bucket_start < end_time)
+    return query
+
+
+def get_rollup_time_span(
+    db: Session,
+    session_ids: Optional[List[str]] = None,
+    data_subtypes: Optional[List[str]] = None
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    通过天级聚合获取数据的时间跨度（用于未指定时间范围时选择时序粒度）
+
+    Returns:
+        Tuple[Optional[datetime], Optional[datetime]]: (最早时间桶, 最新采集时间)
+    """
+    query = _apply_rollup_filters(
+        db.query(func.min(RawDataRollup.bucket_start), func.max(RawDataRollup.last_time)),
+        '1d', session_ids, None, data_subtypes, None, None
+    )
+    first, last = query.one()
+    return first, last
+
+
+def get_rollup_timeseries(
+    db: Session,
+    bucket_size: str,
+    session_ids: Optional[List[str]] = None,
+    data_subtypes: Optional[List[str]] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    limit: Optional[int] = 200
+) -> Dict[str, list]:
+    """
+    从聚合表读取时序数据（多个会话在同一时间桶内合并）
+
+    只返回完全落在 [start_time, end_time) 内的时间桶：起点不对齐时从下一个桶开始，
+    终点不对齐时不包含终点所在的桶，每个点都不含范围外的数据。
+    limit 为 None 时返回全部时间桶。
+
+    Returns:
+        Dict[str, list]: 子类型 -> [{"time", "value"(均值), "min", "max", "count"}, ...]
+    """
+    # 时间范围为左闭右开 [start_time, end_time)：起点向后、终点向前对齐到桶边界，只保留整桶
+    if start_time and get_bucket_start(start_time, bucket_size) != start_time:
+        start_time = get_bucket_start(start_time, bucket_size) + timedelta(seconds=ROLLUP_BUCKET_SECONDS[bucket_size])
+    if end_time:
+        end_time = get_bucket_start(end_time, bucket_size)
+
+    query = _apply_rollup_filters(
+        db.query(
+            RawDataRollup.data_subtype,
+            RawDataRollup.bucket_start,
+            func.sum(RawDataRollup.value_count).label('value_count'),
+            func.min(RawDataRollup.min_value).label('min_value'),
+            func.max(RawDataRollup.max_value).label('max_value'),
+            func.sum(RawDataRollup.sum_value).label('sum_value'),
+        ),
+        bucket_size, session_ids, None, data_subtypes, start_time, end_time
+    ).group_by(
+        RawDataRollup.data_subtype, RawDataRollup.bucket_start
+    ).order_by(RawDataRollup.bucket_start.asc())
+
+    series: Dict[str, list] = {}
+    for row in query.all():
+        points = series.setdefault(row.data_subtype, [])
+        if limit and len(points) >= limit:
+            continue
+        points.append({
+            "time": row.bucket_start.isoformat(),
+            "value": row.sum_value / row.value_count if row.value_count else None,
+            "min": row.min_value,
+            "max": row.max_value,
+            "count": int(row.value_count),
+        })
+    return series
+
+
+def get_rollup_statistics(
+    db: Session,
+    bucket_size: str,
+    session_ids: Optional[List[str]] = None,
+    data_type: Optional[str] = None,
+    data_subtype: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    从聚合表按子类型统计数量、均值、最值（总数和会话数由调用方从原始数据统计）
+
+    Returns:
+        dict: {"subtypes": {子类型: {"count", "avg", "min", "max"}}}
+    """
+    base = _apply_rollup_filters(
+        db.query(RawDataRollup),
+        bucket_size, session_ids, data_type, [data_subtype] if data_subtype else None, start_time, end_time
+    )
+
+    grouped = base.with_entities(
+        RawDataRollup.data_subtype,
+        func.sum(RawDataRollup.value_count).label('value_count'),
+        func.min(RawDataRollup.min_value).label('min_value'),
+        func.max(RawDataRollup.max_value).label('max_value'),
+        func.sum(RawDataRollup.sum_value).label('sum_value'),
+    ).group_by(RawDataRollup.data_subtype).all()
+
+    subtypes = {}
+    for row in grouped:
+        count = int(row.value_count or 0)
+        subtypes[row.data_subtype] = {
+            "count": count,
+            "avg": row.sum_value / count if count else None,
+            "min": row.min_value,
+            "max": row.max_value,
+        }
+
+    return {"subtypes": subtypes}
@@ -0,0 +1,306 @@
+"""
+内容寻址存储服务模块
+
+文件按内容 SHA-256 存储在 user_{user_id}/cas/ 前缀下，storage_objects 表记录每个对象的引用计数：
+- 上传时先在本地计算 SHA-256，内容已存在时跳过 MinIO 写入，只增加引用计数
+- 删除原始数据时减少引用计数，降为 0 时删除对象及其缩略图
+
+设备重试上传或重复上传同一帧图像时，不再重复占用存储空间和上传带宽。
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.db_models.user_models import RawData
+
+# 是否对文件上传启用内容寻址去重
+STORAGE_DEDUP_ENABLED = os.getenv("STORAGE_DEDUP_ENABLED", "true").lower() == "true"
+
+# 本地计算 SHA-256 时每次读取的块大小
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def is_cas_object(object_key: Optional[str]) -> bool:
+    """
+    判断对象路径是否为内容寻址路径（user_{user_id}/cas/...）
+
+    Args:
+        object_key: 对象路径
+
+    Returns:
+        bool: 是否为内容寻址对象
+    """
+    if not object_key:
+        return False
+    parts = object_key.split("/")
+    return len(parts) == 4 and parts[0].startswith("user_") and parts[1] == "cas"
+
+
+def hash_fileobj(fileobj: BinaryIO, chunk_size: int = _HASH_CHUNK_SIZE) -> Tuple[str, int]:
+    """
+    按块计算文件对象的 SHA-256，完成后回到文件开头
+
+    Args:
+        fileobj: 可读且可 seek 的文件对象（如 UploadFile.file）
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        Tuple[str, int]: SHA-256（十六进制）和文件大小
+    """
+    import hashlib
+
+    digest = hashlib.sha256()
+    size = 0
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+
+def _acquire_existing(db: Session, sha256: str) -> Optional[str]:
+    """内容已存在时增加引用计数并返回对象路径（引用数为 0 的对象正在被删除，不再复用）"""
+    row = db.execute(text("""
+        UPDATE storage_objects
+        SET ref_count = ref_count + 1, updated_at = (now() AT TIME ZONE 'utc')
+        WHERE sha256 = :sha256 AND ref_count > 0
+        RETURNING object_key
+    """), {"sha256": sha256}).first()
+    db.commit()
+    return row.object_key if row else None
+
+
+def _register_object(db: Session, sha256: str, object_key: str, size: int, content_type: Optional[str]):
+    """登记新写入的对象（并发上传相同内容时合并为一行并累加引用计数）"""
+    db.execute(text("""
+        INSERT INTO storage_objects (sha256, object_key, size_bytes, content_type, ref_count, created_at, updated_at)
+        VALUES (:sha256, :object_key, :size, :content_type, 1, (now() AT TIME ZONE 'utc'), (now() AT TIME ZONE 'utc'))
+        ON CONFLICT (sha256) DO UPDATE
+        SET ref_count = storage_objects.ref_count + 1, updated_at = (now() AT TIME ZONE 'utc')
+    """), {"sha256": sha256, "object_key": object_key, "size": size, "content_type": content_type})
+    db.commit()
+
+
+def store_deduplicated(
+    db: Session,
+    user_id: str,
+    fileobj: BinaryIO,
+    filename: str,
+    content_type: Optional[str] = None,
+    sha256: Optional[str] = None,
+    size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    以内容寻址方式存储文件：内容已存在时只增加引用计数，否则流式上传到 cas/ 路径
+
+    调用方创建原始数据记录失败时，需要调用 release_object 归还本次获得的引用。
+
+    Args:
+        db: 用户数据库会话
+        user_id: 用户ID
+        fileobj: 可读且可 seek 的文件对象
+        filename: 文件名（用于推断内容类型）
+        content_type: 内容类型
+        sha256: 已计算的 SHA-256（如 ImageProcessor.inspect_image 的结果，与 size 一起提供时不再重复计算）
+        size: 文件大小
+
+    Returns:
+        Dict[str, Any]: 与 StorageManager.upload_file 相同的上传结果，另含 deduplicated
+    """
+    from storage.storage_manager import get_storage_manager
+
+    storage_manager = get_storage_manager()
+    try:
+        if sha256 is None or size is None:
+            sha256, size = hash_fileobj(fileobj)
+        object_key = _acquire_existing(db, sha256)
+        if object_key:
+            print(f"[后端StorageObjectService] 内容已存在，跳过上传: {sha256}")
+            return {
+                "success": True,
+                "message": "内容已存在",
+                "bucket": storage_manager.BUCKET_NAME,
+                "path": object_key,
+                "url": storage_manager._get_file_url(object_key),
+                "filename": filename,
+                "size": size,
+                "sha256": sha256,
+                "deduplicated": True
+            }
+
+        object_key = storage_manager._get_cas_object_path(user_id, sha256)
+        # SHA-256 已在上面得到，上传时不再重复计算
+        result = storage_manager.upload_file(
+            user_id=user_id,
+            fileobj=fileobj,
+            filename=filename,
+            session_id="",
+            content_type=content_type,
+            object_path=object_key,
+            sha256=sha256
+        )
+        if not result["success"]:
+            return result
+        _register_object(db, sha256, object_key, size, content_type)
+
+        # 上传期间同一内容的最后一个引用可能恰好被删除（对象随之被移除），登记后确认对象仍在
+        if storage_manager.stat_object(object_key) is None:
+            fileobj.seek(0)
+            storage_manager.upload_file(
+                user_id=user_id, fileobj=fileobj, filename=filename, session_id="",
+                content_type=content_type, object_path=object_key, sha256=sha256
+            )
+
+        result["deduplicated"] = False
+        return result
+
+    except Exception as e:
+        db.rollback()
+        print(f"[后端StorageObjectService] 存储文件失败: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+
+def find_shared_thumbnails(db: Session, object_key: str) -> Optional[Dict[str, str]]:
+    """
+    查找引用同一对象的其他原始数据已生成的缩略图（内容相同，缩略图可直接复用）
+
+    Args:
+        db: 用户数据库会话
+        object_key: 对象路径
+
+    Returns:
+        Optional[Dict[str, str]]: file_meta["thumbnails"]，没有时返回 None
+    """
+    rows = db.query(RawData.file_meta).filter(RawData.object_key == object_key).limit(10).all()
+    for (file_meta,) in rows:
+        thumbnails = (file_meta or {}).get("thumbnails")
+        if thumbnails:
+            return thumbnails
+    return None
+
+
+def _remove_with_thumbnails(object_key: str, thumbnails: Optional[Dict[str, str]]):
+    """删除对象及其缩略图（内容寻址对象的缩略图由多条记录共用，按当前配置的尺寸一并删除）"""
+    from storage.storage_manager import get_storage_manager
+    from utils.thumbnail_service import THUMBNAIL_SIZES, thumbnail_object_path
+
+    thumb_paths = set((thumbnails or {}).values())
+    if is_cas_object(object_key):
+        thumb_paths.update(thumbnail_object_path(object_key, size) for size in THUMBNAIL_SIZES)
+
+    storage_manager = get_storage_manager()
+    storage_manager.remove_object(object_key)
+    for thumb_path in thumb_paths:
+        storage_manager.remove_object(thumb_path)
+
+
+def release_object(db: Session, object_key: Optional[str], thumbnails: Optional[Dict[str, str]] = None) -> bool:
+    """
+    原始数据记录删除后释放其引用的对象
+
+    内容寻址对象减少引用计数，降为 0 时删除对象和缩略图；其他对象只属于一条记录，直接删除。
+
+    Args:
+        db: 用户数据库会话
+        object_key: 对象路径
+        thumbnails: 该记录的 file_meta["thumbnails"]
+
+    Returns:
+        bool: 对象是否已被删除
+    """
+    if not object_key:
+        return False
+
+    if not is_cas_object(object_key):
+        try:
+            _remove_with_thumbnails(object_key, thumbnails)
+            return True
+        except Exception as e:
+            print(f"[后端StorageObjectService] 删除对象失败: {object_key}: {str(e)}")
+            return False
+
+    sha256 = object_key.rsplit("/", 1)[-1]
+    try:
+        # 行锁一直持有到提交，期间复用该内容的上传会等待，看到引用数为 0 后重新写入对象
+        row = db.execute(text("""
+            UPDATE storage_objects
+            SET ref_count = ref_count - 1, updated_at = (now() AT TIME ZONE 'utc')
+            WHERE sha256 = :sha256 AND ref_count > 0
+            RETURNING ref_count
+        """), {"sha256": sha256}).first()
+        if row is None or row.ref_count > 0:
+            db.commit()
+            return False
+
+        _remove_with_thumbnails(object_key, thumbnails)
+        db.execute(text("DELETE FROM storage_objects WHERE sha256 = :sha256 AND ref_count = 0"), {"sha256": sha256})
+        db.commit()
+        print(f"[后端StorageObjectService] 已删除无引用的对象: {object_key}")
+        return True
+
+    except Exception as e:
+        # 回滚后引用计数偏大，对象保留，由 reconcile_storage_objects 修正
+        db.rollback()
+        print(f"[后端StorageObjectService] 释放对象失败: {object_key}: {str(e)}")
+        return False
+
+
+def reconcile_storage_objects(db: Session, min_age_seconds: int = 3600) -> Dict[str, int]:
+    """
+    按 raw_data 中的实际引用重新计算引用计数，删除已无引用的对象
+
+    用于修正删除会话（级联删除原始数据）或删除过程中断后偏大的引用计数。
+    最近有上传引用的对象会跳过：上传获得引用后到原始数据记录创建前，实际引用数暂时偏小。
+
+    Args:
+        db: 用户数据库会话
+        min_age_seconds: 只处理最近这段时间内没有变化的对象
+
+    Returns:
+        Dict[str, int]: 检查、修正和删除的对象数
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=min_age_seconds)
+    candidates = [r.sha256 for r in db.execute(
+        text("SELECT sha256 FROM storage_objects WHERE updated_at < :cutoff ORDER BY sha256"),
+        {"cutoff": cutoff}
+    )]
+
+    checked = corrected = removed = 0
+    for sha256 in candidates:
+        try:
+            row = db.execute(text("""
+                SELECT object_key, ref_count FROM storage_objects
+                WHERE sha256 = :sha256 AND updated_at < :cutoff
+                FOR UPDATE
+            """), {"sha256": sha256, "cutoff": cutoff}).first()
+            if row is None:
+                db.commit()
+                continue
+            checked += 1
+
+            refs = db.query(RawData.id).filter(RawData.object_key == row.object_key).count()
+            if refs == 0:
+                _remove_with_thumbnails(row.object_key, None)
+                db.execute(text("DELETE FROM storage_objects WHERE sha256 = :sha256"), {"sha256": sha256})
+                removed += 1
+            elif refs != row.ref_count:
+                db.execute(
+                    text("UPDATE storage_objects SET ref_count = :refs, updated_at = (now() AT TIME ZONE 'utc') WHERE sha256 = :sha256"),
+                    {"refs": refs, "sha256": sha256}
+                )
+                corrected += 1
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[后端StorageObjectService] 修正引用计数失败: {sha256}: {str(e)}")
+
+    print(f"[后端StorageObjectService] 引用计数修正完成: 检查 {checked}，修正 {corrected}，删除 {removed}")
+    return {"checked": checked, "corrected": corrected, "removed": removed}
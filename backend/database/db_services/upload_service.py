@@ -0,0 +1,717 @@
+"""
+可续传文件上传服务模块
+
+基于 MinIO 分片上传实现三步协议，适用于网络不稳定时上传大视频等文件：
+1. 初始化：创建 MinIO 分片上传和一条 processing_status=uploading 的原始数据记录
+2. 上传分片：每个分片单独 PUT，可重复上传（同一编号覆盖），支持 SHA-256 / Content-MD5 校验
+3. 完成：校验分片齐全后合并对象，更新原始数据记录
+
+断线后客户端查询已收到的分片，只补传缺失部分。超过有效期未完成的上传会被中止并删除记录。
+
+另提供预签名直传：服务端只签发 MinIO 预签名 PUT 地址，文件内容不经过 API 进程，
+客户端上传后确认，服务端通过 stat_object 校验大小和内容类型后，在服务端把对象复制到
+新的最终路径并删除直传路径上的对象，之后预签名地址即使仍在有效期内也无法覆盖记录引用的文件。
+"""
+
+import hashlib
+import math
+import os
+import posixpath
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from database.db_models.user_models import RawData
+from database.db_services.count_service import invalidate_raw_data_counts
+from database.db_services.raw_data_service import UPLOAD_STATUS, create_raw_data
+
+# 分片大小限制（MinIO/S3 要求除最后一个分片外不小于 5MB，分片数不超过 10000）
+RESUMABLE_MIN_PART_SIZE = 5 * 1024 * 1024
+RESUMABLE_MAX_PARTS = 10000
+RESUMABLE_DEFAULT_PART_SIZE = int(os.getenv("RESUMABLE_DEFAULT_PART_SIZE", str(16 * 1024 * 1024)))
+RESUMABLE_MAX_PART_SIZE = int(os.getenv("RESUMABLE_MAX_PART_SIZE", str(64 * 1024 * 1024)))
+
+# 未完成上传的有效期（秒）
+RESUMABLE_UPLOAD_TTL = int(os.getenv("RESUMABLE_UPLOAD_TTL", "86400"))
+
+# 预签名 PUT 地址的有效期（秒），以及单次 PUT 的对象大小上限（S3 协议限制 5GB）
+PRESIGNED_UPLOAD_EXPIRES = int(os.getenv("PRESIGNED_UPLOAD_EXPIRES", "3600"))
+PRESIGNED_MAX_SIZE = 5 * 1024 * 1024 * 1024
+
+# 完成上传时读取的文件头部大小（用于识别图像格式）
+_SNIFF_BYTES = 64 * 1024
+
+
+class ResumableUploadError(Exception):
+    """可续传上传请求无法处理（status_code 对应 HTTP 状态码）"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _expected_part_size(upload: Dict[str, Any], part_number: int) -> int:
+    """分片应有的大小（最后一个分片为剩余部分）"""
+    if part_number < upload["part_count"]:
+        return upload["part_size"]
+    return upload["total_size"] - upload["part_size"] * (upload["part_count"] - 1)
+
+
+def _delete_upload_row(db: Session, raw_data: RawData):
+    """中止 MinIO 分片上传（或删除已直传但未确认的对象）并删除原始数据记录"""
+    from storage.storage_manager import get_storage_manager
+
+    upload = (raw_data.file_meta or {}).get("upload") or {}
+    try:
+        if upload.get("upload_id"):
+            get_storage_manager().abort_multipart_upload(raw_data.object_key, upload["upload_id"])
+        elif upload.get("method") == "presigned":
+            get_storage_manager().remove_object(raw_data.object_key)
+    except Exception as e:
+        # 分片上传可能已被 MinIO 生命周期规则清理
+        print(f"[后端UploadService] 清理未完成上传失败（忽略）: {str(e)}")
+    session_id = raw_data.session_id
+    db.delete(raw_data)
+    db.commit()
+    invalidate_raw_data_counts(db, [session_id])
+
+
+def _get_upload_row(db: Session, data_id: str, method: Optional[str] = None) -> RawData:
+    """
+    获取上传中的原始数据记录（已过期的上传在此处清理）
+
+    Args:
+        db: 数据库会话
+        data_id: 原始数据ID
+        method: 要求的上传方式（multipart / presigned），None 表示不限
+
+    Raises:
+        ResumableUploadError: 记录不存在（404）、上传已完成或上传方式不符（409）、已过期（410）
+    """
+    raw_data = db.query(RawData).filter(RawData.id == str(data_id)).first()
+    if not raw_data:
+        raise ResumableUploadError("上传不存在", 404)
+
+    upload = (raw_data.file_meta or {}).get("upload")
+    if raw_data.processing_status != UPLOAD_STATUS or not upload:
+        raise ResumableUploadError("上传已完成", 409)
+
+    if datetime.fromisoformat(upload["expires_at"]) < datetime.utcnow():
+        _delete_upload_row(db, raw_data)
+        raise ResumableUploadError("上传已过期，请重新上传", 410)
+
+    if method and upload.get("method", "multipart") != method:
+        raise ResumableUploadError(f"该上传不是 {method} 方式的上传", 409)
+    return raw_data
+
+
+def _finalize_upload(db: Session, raw_data: RawData, size: int) -> Dict[str, Any]:
+    """
+    对象写入完成后启用原始数据记录：图像根据文件头确认格式，生成访问地址
+
+    Args:
+        db: 数据库会话
+        raw_data: 上传中的原始数据记录
+        size: 对象大小（字节）
+
+    Returns:
+        Dict[str, Any]: 完成后的文件信息
+
+    Raises:
+        ResumableUploadError: 不是有效的图像文件（对象和记录会被删除）
+    """
+    from storage.storage_manager import get_storage_manager
+    from utils.image_processor import get_image_processor
+
+    storage_manager = get_storage_manager()
+    file_meta = dict(raw_data.file_meta)
+    file_meta.pop("upload")
+
+    data_format = raw_data.data_format
+    if (file_meta.get("content_type") or "").startswith("image/"):
+        # 只读取对象头部检查格式和尺寸（校验和由 compute_upload_checksum 在后台计算）
+        head = storage_manager.read_object_range(raw_data.object_key, 0, _SNIFF_BYTES)
+        inspection = get_image_processor().inspect_image(
+            head, file_meta.get("original_filename"), compute_hash=False
+        )
+        if not inspection.is_valid:
+            storage_manager.remove_object(raw_data.object_key)
+            raw_data.file_meta = file_meta
+            _delete_upload_row(db, raw_data)
+            raise ResumableUploadError(f"图像验证失败: {'; '.join(inspection.errors)}")
+        data_format = inspection.extension or data_format
+        if inspection.width:
+            file_meta["image"] = inspection.to_file_meta()
+
+    file_meta["file_size_bytes"] = size
+    raw_data.file_meta = file_meta
+    raw_data.data_format = data_format
+    raw_data.data_value = storage_manager._get_file_url(raw_data.object_key)
+    raw_data.is_valid = True
+    raw_data.validation_notes = None
+    raw_data.processing_status = 'pending'
+    db.commit()
+    return _completed_state(raw_data)
+
+
+def _completed_state(raw_data: RawData) -> Dict[str, Any]:
+    file_meta = raw_data.file_meta or {}
+    return {
+        "data_id": str(raw_data.id),
+        "status": "completed",
+        "object_key": raw_data.object_key,
+        "access_url": raw_data.data_value,
+        "data_subtype": raw_data.data_subtype,
+        "data_format": raw_data.data_format,
+        "file_size_bytes": file_meta.get("file_size_bytes"),
+    }
+
+
+def init_resumable_upload(
+    db: Session,
+    user_id: str,
+    session_id: str,
+    data_subtype: str,
+    filename: str,
+    total_size: int,
+    content_type: Optional[str] = None,
+    part_size: Optional[int] = None,
+    description: Optional[str] = None,
+    location_geom: Optional[str] = None,
+    altitude_m: Optional[float] = None,
+    heading: Optional[float] = None,
+    upload_method: str = "web"
+) -> Dict[str, Any]:
+    """
+    初始化可续传上传
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        session_id: 采集会话ID
+        data_subtype: 数据子类型
+        filename: 原始文件名
+        total_size: 文件总大小（字节）
+        content_type: 文件内容类型
+        part_size: 分片大小（字节），默认 RESUMABLE_DEFAULT_PART_SIZE
+        description: 文件描述
+        location_geom: 位置几何信息
+        altitude_m: 采集高度
+        heading: 朝向
+        upload_method: 上传方式（web / api）
+
+    Returns:
+        Dict[str, Any]: 数据ID、分片大小、分片数和过期时间
+
+    Raises:
+        ResumableUploadError: 分片参数无效或会话不允许上传
+    """
+    from storage.storage_manager import get_storage_manager
+
+    part_size = part_size or RESUMABLE_DEFAULT_PART_SIZE
+    if part_size < RESUMABLE_MIN_PART_SIZE or part_size > RESUMABLE_MAX_PART_SIZE:
+        raise ResumableUploadError(
+            f"分片大小需在 {RESUMABLE_MIN_PART_SIZE} 到 {RESUMABLE_MAX_PART_SIZE} 字节之间"
+        )
+    part_count = math.ceil(total_size / part_size)
+    if part_count > RESUMABLE_MAX_PARTS:
+        raise ResumableUploadError(f"分片数 {part_count} 超过上限 {RESUMABLE_MAX_PARTS}，请增大分片大小")
+
+    data_format = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'bin'
+    stored_filename = f"{uuid.uuid4().hex}_{int(datetime.now().timestamp())}.{data_format}"
+    storage_manager = get_storage_manager()
+    object_key = storage_manager._get_object_path(user_id, stored_filename, session_id)
+    content_type = content_type or storage_manager._infer_content_type(filename)
+
+    upload_id = storage_manager.create_multipart_upload(object_key, content_type)
+    expires_at = datetime.utcnow() + timedelta(seconds=RESUMABLE_UPLOAD_TTL)
+
+    data_id = create_raw_data(
+        db=db,
+        session_id=session_id,
+        data_type="file",
+        data_subtype=data_subtype,
+        data_value=object_key,  # 完成后替换为访问地址
+        data_format=data_format,
+        bucket_name=storage_manager.BUCKET_NAME,
+        object_key=object_key,
+        capture_time=datetime.now(),
+        location_geom=location_geom,
+        altitude_m=altitude_m,
+        heading=heading,
+        file_meta={
+            "original_filename": filename,
+            "stored_filename": stored_filename,
+            "file_size_bytes": total_size,
+            "content_type": content_type,
+            "description": description,
+            "upload": {
+                "method": "multipart",
+                "upload_id": upload_id,
+                "part_size": part_size,
+                "part_count": part_count,
+                "total_size": total_size,
+                "expires_at": expires_at.isoformat(),
+            },
+        },
+        acquisition_meta={
+            "upload_time": datetime.now().isoformat(),
+            "upload_method": upload_method,
+            "resumable": True
+        },
+        is_valid=False,
+        validation_notes="上传未完成",
+        processing_status=UPLOAD_STATUS
+    )
+    if not data_id:
+        storage_manager.abort_multipart_upload(object_key, upload_id)
+        raise ResumableUploadError("会话不存在或状态不允许上传数据")
+
+    print(f"[后端UploadService] 创建可续传上传: {data_id}, {total_size} 字节, {part_count} 个分片")
+    return {
+        "data_id": data_id,
+        "object_key": object_key,
+        "part_size": part_size,
+        "part_count": part_count,
+        "total_size": total_size,
+        "expires_at": expires_at.isoformat(),
+    }
+
+
+def get_resumable_upload(db: Session, data_id: str) -> Dict[str, Any]:
+    """
+    查询上传状态及已收到的分片
+
+    Args:
+        db: 数据库会话
+        data_id: 原始数据ID
+
+    Returns:
+        Dict[str, Any]: 上传状态；未完成时包含已收到和缺失的分片编号
+
+    Raises:
+        ResumableUploadError: 上传不存在或已过期
+    """
+    from storage.storage_manager import get_storage_manager
+
+    try:
+        raw_data = _get_upload_row(db, data_id)
+    except ResumableUploadError as e:
+        if e.status_code != 409:
+            raise
+        return _completed_state(db.query(RawData).filter(RawData.id == str(data_id)).first())
+
+    upload = raw_data.file_meta["upload"]
+    if upload.get("method") == "presigned":
+        return {
+            "data_id": str(raw_data.id),
+            "status": UPLOAD_STATUS,
+            "method": "presigned",
+            "total_size": upload["total_size"],
+            "expires_at": upload["expires_at"],
+        }
+    parts = get_storage_manager().list_parts(raw_data.object_key, upload["upload_id"])
+    received = {p["part_number"] for p in parts if p["size"] == _expected_part_size(upload, p["part_number"])}
+    return {
+        "data_id": str(raw_data.id),
+        "status": UPLOAD_STATUS,
+        "part_size": upload["part_size"],
+        "part_count": upload["part_count"],
+        "total_size": upload["total_size"],
+        "expires_at": upload["expires_at"],
+        "received_parts": sorted(received),
+        "received_bytes": sum(_expected_part_size(upload, n) for n in received),
+        "missing_parts": [n for n in range(1, upload["part_count"] + 1) if n not in received],
+    }
+
+
+def upload_resumable_part(
+    db: Session,
+    data_id: str,
+    part_number: int,
+    data: bytes,
+    sha256: Optional[str] = None,
+    content_md5: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    上传一个分片（幂等：同一编号重复上传会覆盖）
+
+    Args:
+        db: 数据库会话
+        data_id: 原始数据ID
+        part_number: 分片编号（从 1 开始）
+        data: 分片内容
+        sha256: 客户端提供的分片 SHA-256（十六进制），提供时校验
+        content_md5: 客户端提供的 Content-MD5（Base64），由 MinIO 校验
+
+    Returns:
+        Dict[str, Any]: 分片编号、ETag、大小和 SHA-256
+
+    Raises:
+        ResumableUploadError: 分片编号、大小或校验值不正确
+    """
+    from storage.storage_manager import get_storage_manager
+
+    raw_data = _get_upload_row(db, data_id, "multipart")
+    upload = raw_data.file_meta["upload"]
+
+    if part_number < 1 or part_number > upload["part_count"]:
+        raise ResumableUploadError(f"分片编号需在 1 到 {upload['part_count']} 之间")
+    expected = _expected_part_size(upload, part_number)
+    if len(data) != expected:
+        raise ResumableUploadError(f"分片 {part_number} 大小应为 {expected} 字节，实际 {len(data)} 字节")
+
+    digest = hashlib.sha256(data).hexdigest()
+    if sha256 and sha256.lower() != digest:
+        raise ResumableUploadError(f"分片 {part_number} SHA-256 校验失败")
+
+    storage_manager = get_storage_manager()
+    try:
+        etag = storage_manager.upload_part(
+            raw_data.object_key, upload["upload_id"], part_number, data, content_md5=content_md5
+        )
+    except storage_manager._S3Error as e:
+        if e.code in ("BadDigest", "InvalidDigest"):
+            raise ResumableUploadError(f"分片 {part_number} Content-MD5 校验失败")
+        if e.code == "NoSuchUpload":
+            raise ResumableUploadError("上传已失效，请重新上传", 410)
+        raise
+
+    return {"part_number": part_number, "etag": etag, "size": len(data), "sha256": digest}
+
+
+def complete_resumable_upload(db: Session, data_id: str) -> Dict[str, Any]:
+    """
+    完成上传：校验分片齐全后合并对象，更新原始数据记录（重复调用返回已完成的结果）
+
+    Args:
+        db: 数据库会话
+        data_id: 原始数据ID
+
+    Returns:
+        Dict[str, Any]: 完成后的文件信息
+
+    Raises:
+        ResumableUploadError: 分片不齐全（409）、上传已过期（410）或不是有效的图像（400）
+    """
+    from storage.storage_manager import get_storage_manager
+
+    try:
+        raw_data = _get_upload_row(db, data_id, "multipart")
+    except ResumableUploadError as e:
+        if e.status_code != 409:
+            raise
+        completed = db.query(RawData).filter(RawData.id == str(data_id)).first()
+        if completed.processing_status == UPLOAD_STATUS:
+            raise
+        return _completed_state(completed)
+
+    upload = raw_data.file_meta["upload"]
+    storage_manager = get_storage_manager()
+
+    parts = storage_manager.list_parts(raw_data.object_key, upload["upload_id"])
+    received = {p["part_number"]: p for p in parts}
+    missing = [
+        n for n in range(1, upload["part_count"] + 1)
+        if n not in received or received[n]["size"] != _expected_part_size(upload, n)
+    ]
+    if missing:
+        raise ResumableUploadError(f"分片不完整，缺少 {len(missing)} 个分片: {missing[:20]}", 409)
+
+    try:
+        storage_manager.complete_multipart_upload(
+            raw_data.object_key, upload["upload_id"], [received[n] for n in sorted(received)]
+        )
+    except storage_manager._S3Error as e:
+        if e.code != "NoSuchUpload":
+            raise
+        # 并发的完成请求已经合并了对象
+        db.refresh(raw_data)
+        if raw_data.processing_status != UPLOAD_STATUS:
+            return _completed_state(raw_data)
+        raise ResumableUploadError("上传已失效，请重新上传", 410)
+
+    result = _finalize_upload(db, raw_data, upload["total_size"])
+    print(f"[后端UploadService] 可续传上传完成: {data_id}, {upload['total_size']} 字节")
+    return result
+
+
+def abort_resumable_upload(db: Session, data_id: str):
+    """
+    取消上传：中止 MinIO 分片上传并删除原始数据记录
+
+    Args:
+        db: 数据库会话
+        data_id: 原始数据ID
+
+    Raises:
+        ResumableUploadError: 上传不存在或已完成
+    """
+    _delete_upload_row(db, _get_upload_row(db, data_id))
+
+
+def init_presigned_upload(
+    db: Session,
+    user_id: str,
+    session_id: str,
+    data_subtype: str,
+    filename: str,
+    total_size: int,
+    content_type: Optional[str] = None,
+    sha256: Optional[str] = None,
+    description: Optional[str] = None,
+    location_geom: Optional[str] = None,
+    altitude_m: Optional[float] = None,
+    heading: Optional[float] = None,
+    upload_method: str = "web"
+) -> Dict[str, Any]:
+    """
+    初始化预签名直传：创建上传中的原始数据记录并签发 MinIO 预签名 PUT 地址
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        session_id: 采集会话ID
+        data_subtype: 数据子类型
+        filename: 原始文件名
+        total_size: 文件大小（字节）
+        content_type: 文件内容类型
+        sha256: 客户端提供的文件 SHA-256（确认后在后台校验）
+        description: 文件描述
+        location_geom: 位置几何信息
+        altitude_m: 采集高度
+        heading: 朝向
+        upload_method: 上传方式（web / api）
+
+    Returns:
+        Dict[str, Any]: 数据ID、上传地址、上传时须携带的请求头和过期时间
+
+    Raises:
+        ResumableUploadError: 文件过大或会话不允许上传
+    """
+    from storage.storage_manager import get_storage_manager
+
+    if total_size > PRESIGNED_MAX_SIZE:
+        raise ResumableUploadError(f"直传文件不能超过 {PRESIGNED_MAX_SIZE} 字节，请使用可续传上传")
+
+    data_format = filename.rsplit('.', 1)[-1].lower() if '.' in filename else 'bin'
+    stored_filename = f"{uuid.uuid4().hex}_{int(datetime.now().timestamp())}.{data_format}"
+    storage_manager = get_storage_manager()
+    object_key = storage_manager._get_object_path(user_id, stored_filename, session_id)
+    content_type = content_type or storage_manager._infer_content_type(filename)
+    expires_at = datetime.utcnow() + timedelta(seconds=RESUMABLE_UPLOAD_TTL)
+
+    data_id = create_raw_data(
+        db=db,
+        session_id=session_id,
+        data_type="file",
+        data_subtype=data_subtype,
+        data_value=object_key,  # 确认后替换为访问地址
+        data_format=data_format,
+        bucket_name=storage_manager.BUCKET_NAME,
+        object_key=object_key,
+        capture_time=datetime.now(),
+        location_geom=location_geom,
+        altitude_m=altitude_m,
+        heading=heading,
+        file_meta={
+            "original_filename": filename,
+            "stored_filename": stored_filename,
+            "file_size_bytes": total_size,
+            "content_type": content_type,
+            "description": description,
+            "client_sha256": sha256.lower() if sha256 else None,
+            "upload": {
+                "method": "presigned",
+                "total_size": total_size,
+                "expires_at": expires_at.isoformat(),
+            },
+        },
+        acquisition_meta={
+            "upload_time": datetime.now().isoformat(),
+            "upload_method": upload_method,
+            "presigned": True
+        },
+        is_valid=False,
+        validation_notes="上传未完成",
+        processing_status=UPLOAD_STATUS
+    )
+    if not data_id:
+        raise ResumableUploadError("会话不存在或状态不允许上传数据")
+
+    url_expires = min(PRESIGNED_UPLOAD_EXPIRES, RESUMABLE_UPLOAD_TTL)
+    upload_url = storage_manager.presigned_put_url(object_key, url_expires)
+
+    print(f"[后端UploadService] 签发预签名直传地址: {data_id}, {total_size} 字节")
+    return {
+        "data_id": data_id,
+        "object_key": object_key,
+        "upload_url": upload_url,
+        "method": "PUT",
+        "headers": {"Content-Type": content_type},
+        "total_size": total_size,
+        "url_expires_at": (datetime.utcnow() + timedelta(seconds=url_expires)).isoformat(),
+        "expires_at": expires_at.isoformat(),
+    }
+
+
+def confirm_presigned_upload(db: Session, data_id: str, md5: Optional[str] = None) -> Dict[str, Any]:
+    """
+    确认预签名直传：通过 stat_object 校验对象后启用原始数据记录（重复调用返回已完成的结果）
+
+    校验通过的对象（按 ETag 锁定内容）在服务端复制到新的最终路径，记录改为引用最终路径，
+    直传路径上的对象随后删除，预签名地址不能再修改已确认的文件。
+    大小或内容类型不符时保留对象和记录，客户端可在地址有效期内重新 PUT 后再次确认。
+
+    Args:
+        db: 数据库会话
+        data_id: 原始数据ID
+        md5: 客户端提供的文件 MD5（十六进制），与对象 ETag 比对
+
+    Returns:
+        Dict[str, Any]: 完成后的文件信息
+
+    Raises:
+        ResumableUploadError: 对象尚未上传或确认期间被覆盖（409）、大小/内容类型/MD5 不符（400）或上传已过期（410）
+    """
+    from storage.storage_manager import get_storage_manager
+
+    storage_manager = get_storage_manager()
+
+    try:
+        raw_data = _get_upload_row(db, data_id, "presigned")
+    except ResumableUploadError as e:
+        if e.status_code != 409:
+            raise
+        completed = db.query(RawData).filter(RawData.id == str(data_id)).first()
+        if completed.processing_status == UPLOAD_STATUS:
+            raise
+        return _completed_state(completed)
+
+    upload = raw_data.file_meta["upload"]
+    expected_type = raw_data.file_meta.get("content_type")
+
+    stat = storage_manager.stat_object(raw_data.object_key)
+    if stat is None:
+        raise ResumableUploadError("文件尚未上传到存储", 409)
+    if stat["size"] != upload["total_size"]:
+        raise ResumableUploadError(f"文件大小应为 {upload['total_size']} 字节，实际 {stat['size']} 字节")
+    if expected_type and stat["content_type"] != expected_type:
+        raise ResumableUploadError(
+            f"文件内容类型应为 {expected_type}，实际 {stat['content_type']}，请携带 Content-Type 请求头重新上传"
+        )
+    # 单次 PUT 的对象 ETag 即内容 MD5
+    if md5 and "-" not in stat["etag"] and stat["etag"].lower() != md5.lower():
+        raise ResumableUploadError("文件 MD5 校验失败")
+
+    # 复制到预签名地址无法写入的最终路径，只复制校验过的内容
+    staging_key = raw_data.object_key
+    stored_filename = f"{uuid.uuid4().hex}_{int(datetime.now().timestamp())}.{raw_data.data_format}"
+    final_key = f"{posixpath.dirname(staging_key)}/{stored_filename}"
+    try:
+        storage_manager.copy_object(staging_key, final_key, match_etag=stat["etag"])
+    except Exception as e:
+        print(f"[后端UploadService] 复制直传对象失败: {data_id}: {str(e)}")
+        raise ResumableUploadError("文件在确认期间被修改或复制失败，请重新确认", 409)
+
+    raw_data.object_key = final_key
+    raw_data.file_meta = {**raw_data.file_meta, "stored_filename": stored_filename}
+    try:
+        result = _finalize_upload(db, raw_data, stat["size"])
+    except ResumableUploadError:
+        # 图像验证失败时记录和最终对象已删除
+        _remove_quietly(storage_manager, staging_key)
+        raise
+    except Exception:
+        db.rollback()
+        _remove_quietly(storage_manager, final_key)
+        raise
+
+    _remove_quietly(storage_manager, staging_key)
+    print(f"[后端UploadService] 预签名直传完成: {data_id}, {stat['size']} 字节")
+    return result
+
+
+def _remove_quietly(storage_manager, object_key: str):
+    """删除对象，失败时只记录日志"""
+    try:
+        storage_manager.remove_object(object_key)
+    except Exception as e:
+        print(f"[后端UploadService] 删除对象失败（忽略）: {object_key}: {str(e)}")
+
+
+def expire_resumable_uploads(db: Session) -> int:
+    """
+    清理过期未完成的上传
+
+    Args:
+        db: 用户数据库会话
+
+    Returns:
+        int: 清理的上传数
+    """
+    now = datetime.utcnow()
+    rows: List[RawData] = db.query(RawData).filter(RawData.processing_status == UPLOAD_STATUS).all()
+    expired = 0
+    for raw_data in rows:
+        upload = (raw_data.file_meta or {}).get("upload") or {}
+        expires_at = upload.get("expires_at")
+        if expires_at and datetime.fromisoformat(expires_at) >= now:
+            continue
+        try:
+            _delete_upload_row(db, raw_data)
+            expired += 1
+        except Exception as e:
+            db.rollback()
+            print(f"[后端UploadService] 清理过期上传失败: {raw_data.id}: {str(e)}")
+    if expired:
+        print(f"[后端UploadService] 已清理 {expired} 个过期上传")
+    return expired
+
+
+def compute_upload_checksum(user_id: str, data_id: str, object_key: str) -> Optional[str]:
+    """
+    流式读取已完成的对象，计算 SHA-256 写入 checksum（完成上传后的后台任务），
+    与客户端提供的 SHA-256 不一致时将记录标记为无效
+
+    Args:
+        user_id: 用户ID
+        data_id: 原始数据ID
+        object_key: 对象路径
+
+    Returns:
+        Optional[str]: SHA-256，失败时返回 None
+    """
+    from database.user_db_manager import get_user_db
+    from storage.storage_manager import get_storage_manager
+
+    db = None
+    try:
+        digest = hashlib.sha256()
+        for chunk in get_storage_manager().iter_object(object_key):
+            digest.update(chunk)
+        checksum = digest.hexdigest()
+
+        db = get_user_db(user_id)
+        raw_data = db.query(RawData).filter(RawData.id == str(data_id)).first()
+        if not raw_data:
+            return None
+        raw_data.checksum = checksum
+        # 客户端在初始化时提供了 SHA-256 的，与实际内容比对
+        client_sha256 = (raw_data.file_meta or {}).get("client_sha256")
+        if client_sha256 and client_sha256 != checksum:
+            raw_data.is_valid = False
+            raw_data.validation_notes = "SHA-256 校验失败: 与客户端提供的值不一致"
+            print(f"[后端UploadService] SHA-256 校验失败: {data_id}")
+        db.commit()
+        return checksum
+    except Exception as e:
+        print(f"[后端UploadService] 计算校验和失败: {data_id}: {str(e)}")
+        if db is not None:
+            db.rollback()
+        return None
+    finally:
+        if db is not None:
+            db.close()
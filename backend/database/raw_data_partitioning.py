@@ -0,0 +1,451 @@
+"""
+raw_data 按月分区管理
+
+将用户数据库中的 raw_data 表转换为按 capture_time 按月 RANGE 分区的表：
+- 模板数据库初始化时直接创建分区表（新用户数据库自动继承）
+- 已有用户数据库通过 CLI 迁移（数据按月复制，单事务完成切换）
+- 后台线程定期预建未来分区，并按保留期删除过期分区
+
+分区表的主键为 (id, capture_time)；PostgreSQL 不支持外键引用分区表的部分唯一键，
+因此 raw_data_tags / data_processing / crop_objects 对 raw_data 的外键改由删除触发器维护。
+"""
+
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.database_initializer import DatabaseInitializer
+
+# 是否启用 raw_data 按月分区
+RAW_DATA_PARTITIONING = os.getenv("RAW_DATA_PARTITIONING", "false").lower() == "true"
+# 预建未来分区的月数
+RAW_DATA_PARTITION_MONTHS_AHEAD = int(os.getenv("RAW_DATA_PARTITION_MONTHS_AHEAD", "3"))
+# 数据保留月数（0 表示永久保留，不自动删除分区）
+RAW_DATA_RETENTION_MONTHS = int(os.getenv("RAW_DATA_RETENTION_MONTHS", "0"))
+# 分区维护间隔（秒）
+RAW_DATA_PARTITION_MAINTENANCE_INTERVAL = int(os.getenv("RAW_DATA_PARTITION_MAINTENANCE_INTERVAL", "86400"))
+
+PARTITION_NAME_PATTERN = re.compile(r'^raw_data_p(\d{4})(\d{2})$')
+DEFAULT_PARTITION_NAME = 'raw_data_default'
+
+# 维护类操作（迁移默认分区数据、删除过期分区）设置该参数，跳过引用清理触发器
+SKIP_CLEANUP_SETTING = 'green_tracker.skip_raw_data_cleanup'
+
+logger = logging.getLogger(__name__)
+
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    month_index = value.year * 12 + (value.month - 1) + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _partition_name(month: datetime) -> str:
+    return f"raw_data_p{month.year:04d}{month.month:02d}"
+
+
+class RawDataPartitionManager:
+    """raw_data 分区管理器"""
+
+    @staticmethod
+    def is_enabled() -> bool:
+        """是否启用分区"""
+        return RAW_DATA_PARTITIONING
+
+    @staticmethod
+    def is_partitioned(conn) -> bool:
+        """
+        判断当前数据库中的 raw_data 是否已是分区表
+
+        Args:
+            conn: SQLAlchemy 连接
+
+        Returns:
+            bool: 是否为分区表
+        """
+        from sqlalchemy import text
+        result = conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = 'raw_data' AND c.relnamespace = 'public'::regnamespace"
+        )).first()
+        return result is not None
+
+    @staticmethod
+    def list_partitions(conn) -> List[Tuple[str, Optional[datetime]]]:
+        """
+        列出 raw_data 的所有分区
+
+        Returns:
+            List[Tuple[str, Optional[datetime]]]: (分区名, 分区月份)，默认分区的月份为 None
+        """
+        from sqlalchemy import text
+        rows = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'public.raw_data'::regclass "
+            "ORDER BY c.relname"
+        )).all()
+
+        partitions = []
+        for (name,) in rows:
+            match = PARTITION_NAME_PATTERN.match(name)
+            month = datetime(int(match.group(1)), int(match.group(2)), 1) if match else None
+            partitions.append((name, month))
+        return partitions
+
+    @staticmethod
+    def _create_month_partition(conn, parent: str, month: datetime):
+        """在空的父表上创建月分区（父表无默认分区数据冲突时使用）"""
+        from sqlalchemy import text
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF {parent} '
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+        ))
+
+    @staticmethod
+    def _cleanup_trigger_sql(existing_tables: set) -> List[str]:
+        """生成替代外键级联的删除触发器 SQL"""
+        statements = []
+        if 'raw_data_tags' in existing_tables:
+            statements.append("DELETE FROM raw_data_tags WHERE raw_data_id = OLD.id;")
+        if 'data_processing' in existing_tables:
+            statements.append("DELETE FROM data_processing WHERE raw_data_id = OLD.id;")
+        if 'crop_objects' in existing_tables:
+            statements.append("UPDATE crop_objects SET source_raw_data_id = NULL WHERE source_raw_data_id = OLD.id;")
+
+        body = "\n    ".join(statements) or "NULL;"
+        return [
+            f"""
+CREATE OR REPLACE FUNCTION raw_data_cleanup_refs() RETURNS trigger AS $$
+BEGIN
+    IF current_setting('{SKIP_CLEANUP_SETTING}', true) = 'on' THEN
+        RETURN OLD;
+    END IF;
+    {body}
+    RETURN OLD;
+END
+$$ LANGUAGE plpgsql
+""",
+            "DROP TRIGGER IF EXISTS trg_raw_data_cleanup_refs ON raw_data",
+            "CREATE TRIGGER trg_raw_data_cleanup_refs AFTER DELETE ON raw_data "
+            "FOR EACH ROW EXECUTE FUNCTION raw_data_cleanup_refs()",
+        ]
+
+    @staticmethod
+    def convert_to_partitioned(engine, db_name: str,
+                               months_ahead: int = RAW_DATA_PARTITION_MONTHS_AHEAD) -> Dict[str, Any]:
+        """
+        将 raw_data 转换为按月分区表
+
+        在单个事务中完成：创建分区父表和月分区 → 按月复制数据 → 删除旧表并重命名 →
+        重建索引、会话外键和引用清理触发器。转换期间旧表加 SHARE ROW EXCLUSIVE 锁，
+        读请求不受影响，写请求等待至转换完成。已是分区表时直接返回。
+
+        Args:
+            engine: 用户数据库引擎
+            db_name: 数据库名称（用于日志）
+            months_ahead: 预建未来分区的月数
+
+        Returns:
+            dict: 转换结果
+        """
+        from sqlalchemy import inspect, text
+        from sqlalchemy.schema import CreateIndex
+        from database.db_models.user_models import RawData
+
+        with engine.begin() as conn:
+            if RawDataPartitionManager.is_partitioned(conn):
+                logger.info(f"[{db_name}] raw_data is already partitioned")
+                return {"status": "skipped", "database": db_name, "message": "already partitioned"}
+
+            existing_tables = set(inspect(conn).get_table_names() or [])
+            if 'raw_data' not in existing_tables:
+                return {"status": "skipped", "database": db_name, "message": "raw_data not found"}
+
+            logger.info(f"[{db_name}] Converting raw_data to monthly partitions...")
+            conn.execute(text("LOCK TABLE raw_data IN SHARE ROW EXCLUSIVE MODE"))
+
+            # 1. 创建分区父表（列定义、默认值、注释与原表一致）
+            conn.execute(text("DROP TABLE IF EXISTS raw_data_partitioned"))
+            conn.execute(text(
+                "CREATE TABLE raw_data_partitioned "
+                "(LIKE raw_data INCLUDING DEFAULTS INCLUDING COMMENTS INCLUDING STORAGE) "
+                "PARTITION BY RANGE (capture_time)"
+            ))
+            conn.execute(text(
+                "ALTER TABLE raw_data_partitioned "
+                "ADD CONSTRAINT raw_data_partitioned_pkey PRIMARY KEY (id, capture_time)"
+            ))
+
+            # 2. 为已有数据的月份及未来月份创建分区
+            data_months = [
+                row[0] for row in conn.execute(text(
+                    "SELECT DISTINCT date_trunc('month', capture_time) FROM raw_data ORDER BY 1"
+                ))
+            ]
+            current = _month_start(datetime.now())
+            months = set(data_months)
+            months.update(_add_months(current, i) for i in range(months_ahead + 1))
+            for month in sorted(months):
+                RawDataPartitionManager._create_month_partition(conn, 'raw_data_partitioned', month)
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION_NAME} PARTITION OF raw_data_partitioned DEFAULT"
+            ))
+
+            # 3. 按月复制数据
+            copied = 0
+            for month in data_months:
+                copied += conn.execute(text(
+                    "INSERT INTO raw_data_partitioned SELECT * FROM raw_data "
+                    "WHERE capture_time >= :start AND capture_time < :end"
+                ), {"start": month, "end": _add_months(month, 1)}).rowcount or 0
+                logger.info(f"[{db_name}] Copied raw_data month {month:%Y-%m} ({copied} rows so far)")
+
+            # 4. 替换旧表（CASCADE 同时移除其它表引用 raw_data 的外键）
+            conn.execute(text("DROP TABLE raw_data CASCADE"))
+            conn.execute(text("ALTER TABLE raw_data_partitioned RENAME TO raw_data"))
+            conn.execute(text("ALTER TABLE raw_data RENAME CONSTRAINT raw_data_partitioned_pkey TO raw_data_pkey"))
+            conn.execute(text("COMMENT ON TABLE raw_data IS '原始数据表（按 capture_time 按月分区）'"))
+
+            # 5. 会话外键（分区表可以引用普通表）
+            conn.execute(text(
+                "ALTER TABLE raw_data ADD CONSTRAINT raw_data_session_id_fkey "
+                "FOREIGN KEY (session_id) REFERENCES collection_sessions(id) ON DELETE CASCADE"
+            ))
+
+            # 6. 按模型定义重建索引（在父表上创建，自动传播到所有分区）
+            for index in RawData.__table__.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_raw_data_location_geom ON raw_data USING gist (location_geom)"
+            ))
+
+            # 7. 用触发器替代引用 raw_data 的外键级联
+            for statement in RawDataPartitionManager._cleanup_trigger_sql(existing_tables):
+                conn.execute(text(statement))
+
+        logger.info(f"[{db_name}] raw_data converted to partitioned table: {copied} rows, {len(months)} partitions")
+        return {
+            "status": "success",
+            "database": db_name,
+            "rows_copied": copied,
+            "partitions": len(months),
+        }
+
+    @staticmethod
+    def ensure_future_partitions(engine, db_name: str,
+                                 months_ahead: int = RAW_DATA_PARTITION_MONTHS_AHEAD) -> List[str]:
+        """
+        预建当前月及未来 months_ahead 个月的分区
+
+        若默认分区中已有落在目标月份的数据，先在同一事务中将其迁出，再挂载新分区。
+
+        Returns:
+            List[str]: 新建的分区名
+        """
+        from sqlalchemy import text
+
+        created = []
+        current = _month_start(datetime.now())
+        with engine.begin() as conn:
+            if not RawDataPartitionManager.is_partitioned(conn):
+                return created
+            existing = {name for name, _ in RawDataPartitionManager.list_partitions(conn)}
+            has_default = DEFAULT_PARTITION_NAME in existing
+
+        for i in range(months_ahead + 1):
+            month = _add_months(current, i)
+            name = _partition_name(month)
+            if name in existing:
+                continue
+
+            start, end = month, _add_months(month, 1)
+            with engine.begin() as conn:
+                pending = 0
+                if has_default:
+                    pending = conn.execute(text(
+                        f"SELECT count(*) FROM {DEFAULT_PARTITION_NAME} "
+                        "WHERE capture_time >= :start AND capture_time < :end"
+                    ), {"start": start, "end": end}).scalar() or 0
+
+                if not pending:
+                    RawDataPartitionManager._create_month_partition(conn, 'raw_data', month)
+                else:
+                    # 默认分区中有该月数据：建表 → 迁移数据 → 挂载
+                    conn.execute(text(f"SET LOCAL {SKIP_CLEANUP_SETTING} = 'on'"))
+                    conn.execute(text(
+                        f"CREATE TABLE {name} (LIKE raw_data INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                    ))
+                    conn.execute(text(
+                        f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION_NAME} "
+                        "WHERE capture_time >= :start AND capture_time < :end"
+                    ), {"start": start, "end": end})
+                    conn.execute(text(
+                        f"DELETE FROM {DEFAULT_PARTITION_NAME} "
+                        "WHERE capture_time >= :start AND capture_time < :end"
+                    ), {"start": start, "end": end})
+                    conn.execute(text(
+                        f"ALTER TABLE raw_data ATTACH PARTITION {name} "
+                        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                    ))
+                    logger.info(f"[{db_name}] Moved {pending} rows from default partition into {name}")
+
+            created.append(name)
+            logger.info(f"[{db_name}] Created partition {name}")
+
+        return created
+
+    @staticmethod
+    def drop_partitions_before(engine, db_name: str, cutoff: datetime) -> List[str]:
+        """
+        删除整月早于 cutoff 的分区（数据保留策略）
+
+        删除前先清理引用这些数据的标签、处理记录，并将作物对象的来源置空；
+        同一事务中删除该月的聚合数据。提交后释放分区中文件记录引用的对象
+        （内容寻址对象减少引用计数），并使 raw_data 及相关会话的计数和统计缓存失效。
+
+        Args:
+            engine: 用户数据库引擎
+            db_name: 数据库名称
+            cutoff: 截止时间，分区上界不晚于该时间的会被删除
+
+        Returns:
+            List[str]: 已删除的分区名
+        """
+        from sqlalchemy import inspect, text
+        from sqlalchemy.orm import Session
+        from database.db_services.count_service import invalidate_table_counts, session_data_table
+        from database.db_services.rollup_service import remove_rollup_range
+        from database.db_services.storage_object_service import release_object
+
+        dropped = []
+        with engine.begin() as conn:
+            if not RawDataPartitionManager.is_partitioned(conn):
+                return dropped
+            partitions = RawDataPartitionManager.list_partitions(conn)
+            existing_tables = set(inspect(conn).get_table_names() or [])
+
+        for name, month in partitions:
+            if month is None or _add_months(month, 1) > cutoff:
+                continue
+
+            with engine.begin() as conn:
+                conn.execute(text(f"SET LOCAL {SKIP_CLEANUP_SETTING} = 'on'"))
+                session_ids = [row[0] for row in conn.execute(text(f"SELECT DISTINCT session_id FROM {name}"))]
+                objects = conn.execute(text(
+                    f"SELECT object_key, file_meta -> 'thumbnails' FROM {name} WHERE object_key IS NOT NULL"
+                )).all()
+                if 'raw_data_tags' in existing_tables:
+                    conn.execute(text(f"DELETE FROM raw_data_tags WHERE raw_data_id IN (SELECT id FROM {name})"))
+                if 'data_processing' in existing_tables:
+                    conn.execute(text(f"DELETE FROM data_processing WHERE raw_data_id IN (SELECT id FROM {name})"))
+                if 'crop_objects' in existing_tables:
+                    conn.execute(text(
+                        f"UPDATE crop_objects SET source_raw_data_id = NULL "
+                        f"WHERE source_raw_data_id IN (SELECT id FROM {name})"
+                    ))
+                conn.execute(text(f"DROP TABLE {name}"))
+                if 'raw_data_rollups' in existing_tables:
+                    with Session(bind=conn) as db:
+                        remove_rollup_range(db, month, _add_months(month, 1))
+
+            dropped.append(name)
+            logger.info(f"[{db_name}] Dropped partition {name}")
+
+            with Session(bind=engine) as db:
+                for object_key, thumbnails in objects:
+                    release_object(db, object_key, thumbnails)
+                invalidate_table_counts(db, 'raw_data', *(session_data_table(str(sid)) for sid in session_ids))
+            logger.info(f"[{db_name}] Released {len(objects)} objects referenced by {name}")
+
+        return dropped
+
+    @staticmethod
+    def migrate_databases(db_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        将用户数据库的 raw_data 迁移为分区表
+
+        Args:
+            db_name: 用户数据库名称（可选，默认迁移所有活跃用户数据库）
+
+        Returns:
+            dict: 每个数据库的迁移结果
+        """
+        db_names = [db_name] if db_name else DatabaseInitializer.user_database_names(active_only=True)
+        results: Dict[str, Any] = {}
+        for name in db_names:
+            engine = DatabaseInitializer.create_user_engine(name)
+            try:
+                results[name] = RawDataPartitionManager.convert_to_partitioned(engine, name)
+            except Exception as e:
+                logger.error(f"[{name}] raw_data partition migration failed: {e}")
+                results[name] = {"status": "error", "message": str(e)}
+            finally:
+                engine.dispose()
+        return {"status": "success", "databases": results}
+
+    @staticmethod
+    def run_maintenance(db_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        执行一次分区维护：预建未来分区，并按保留期删除过期分区
+
+        Args:
+            db_name: 用户数据库名称（可选，默认处理所有活跃用户数据库）
+
+        Returns:
+            dict: 每个数据库新建和删除的分区
+        """
+        db_names = [db_name] if db_name else DatabaseInitializer.user_database_names(active_only=True)
+        results: Dict[str, Any] = {}
+        for name in db_names:
+            engine = DatabaseInitializer.create_user_engine(name)
+            try:
+                created = RawDataPartitionManager.ensure_future_partitions(engine, name)
+                dropped = []
+                if RAW_DATA_RETENTION_MONTHS > 0:
+                    cutoff = _add_months(_month_start(datetime.now()), -RAW_DATA_RETENTION_MONTHS)
+                    dropped = RawDataPartitionManager.drop_partitions_before(engine, name, cutoff)
+                results[name] = {"created": created, "dropped": dropped}
+            except Exception as e:
+                logger.error(f"[{name}] raw_data partition maintenance failed: {e}")
+                results[name] = {"error": str(e)}
+            finally:
+                engine.dispose()
+        return {"status": "success", "databases": results}
+
+
+# 后台维护线程
+_maintenance_thread: Optional[threading.Thread] = None
+_maintenance_stop = threading.Event()
+
+
+def _maintenance_loop():
+    while not _maintenance_stop.is_set():
+        try:
+            RawDataPartitionManager.run_maintenance()
+        except Exception as e:
+            logger.error(f"raw_data partition maintenance error: {e}")
+        _maintenance_stop.wait(RAW_DATA_PARTITION_MAINTENANCE_INTERVAL)
+
+
+def start_partition_maintenance():
+    """启动分区维护后台线程（启动时立即执行一次，之后按间隔执行）"""
+    global _maintenance_thread
+    if _maintenance_thread and _maintenance_thread.is_alive():
+        return
+    _maintenance_stop.clear()
+    _maintenance_thread = threading.Thread(target=_maintenance_loop, name="raw-data-partitions", daemon=True)
+    _maintenance_thread.start()
+    logger.info("raw_data partition maintenance started")
+
+
+def stop_partition_maintenance():
+    """停止分区维护后台线程"""
+    _maintenance_stop.set()
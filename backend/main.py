@@ -21,7 +21,7 @@ app = FastAPI(
 # 配置CORS - 从环境变量读取
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3010,http://127.0.0.1:3010,http://green-tracker.cn:3010").split(',')
 cors_methods = os.getenv("CORS_METHODS", "GET,POST,PUT,DELETE,OPTIONS").split(',')
-cors_headers = os.getenv("CORS_HEADERS", "Content-Type,Authorization").split(',')
+cors_headers = os.getenv("CORS_HEADERS", "Content-Type,Authorization,Range,If-Range").split(',')
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +29,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=cors_methods,
     allow_headers=cors_headers,
+    # 前端按范围读取文件内容（GET /api/raw-data/{id}/content）时需要读取这些响应头
+    expose_headers=["Accept-Ranges", "Content-Range", "Content-Length", "ETag"],
 )
 
 # 启动时初始化数据库和MQTT
@@ -50,6 +52,11 @@ async def startup_event():
         DatabaseInitializer.migrate_user_databases()
         logger.info("User database migration completed")
 
+        # raw_data 按月分区：后台预建未来分区、清理过期分区
+        from database.raw_data_partitioning import RawDataPartitionManager, start_partition_maintenance
+        if RawDataPartitionManager.is_enabled():
+            start_partition_maintenance()
+
         logger.info("Database initialization completed")
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
@@ -68,9 +75,47 @@ async def startup_event():
         logger.error(f"MQTT initialization failed: {e}")
         logger.warning("MQTT service unavailable, continuing without MQTT...")
 
+    # 启动异步写入队列（write-behind）后台刷写线程
+    try:
+        from utils.ingest_queue import get_ingest_queue
+        get_ingest_queue()
+    except Exception as e:
+        logger.error(f"Ingest queue initialization failed: {e}")
+
 @app.on_event("shutdown")
 async def shutdown_event():
-    """关闭时清理MQTT连接"""
+    """关闭时刷写异步写入队列并清理MQTT连接"""
+    try:
+        from database.raw_data_partitioning import stop_partition_maintenance
+        stop_partition_maintenance()
+    except Exception as e:
+        logger.error(f"Partition maintenance shutdown error: {e}")
+
+    try:
+        from utils.export_jobs import shutdown_export_jobs
+        shutdown_export_jobs()
+    except Exception as e:
+        logger.error(f"Export jobs shutdown error: {e}")
+
+    try:
+        from utils.thumbnail_service import shutdown_thumbnail_render_pool
+        shutdown_thumbnail_render_pool()
+    except Exception as e:
+        logger.error(f"Thumbnail render pool shutdown error: {e}")
+
+    try:
+        from storage.async_storage import shutdown_async_storage
+        shutdown_async_storage()
+    except Exception as e:
+        logger.error(f"Async storage shutdown error: {e}")
+
+    try:
+        from utils.ingest_queue import shutdown_ingest_queue
+        shutdown_ingest_queue()
+        logger.info("Ingest queue flushed and stopped")
+    except Exception as e:
+        logger.error(f"Ingest queue shutdown error: {e}")
+
     try:
         from mqtt.mqtt_client import shutdown_mqtt_client
         shutdown_mqtt_client()
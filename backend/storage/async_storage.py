@@ -0,0 +1,222 @@
+"""
+异步存储层
+
+minio SDK 是同步的，在 async 路由中直接调用 put_object / get_object / stat_object 会阻塞事件循环，
+一次慢读取就会让同一 worker 上的所有请求停顿。AsyncStorage 把 SDK 调用放到专用的有界线程池中执行，
+MinIO 客户端的 urllib3 连接池大小与线程数一致，每个线程都能复用连接；同时按操作统计调用次数、
+失败数和耗时（包含排队等待）。
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# 存储 IO 线程数（同时也是 MinIO 客户端的连接池大小）
+STORAGE_IO_WORKERS = int(os.getenv("STORAGE_IO_WORKERS", "16"))
+
+# MinIO 连接超时与读取超时（秒）
+STORAGE_CONNECT_TIMEOUT = float(os.getenv("STORAGE_CONNECT_TIMEOUT", "10"))
+STORAGE_READ_TIMEOUT = float(os.getenv("STORAGE_READ_TIMEOUT", "300"))
+
+# 每个操作保留的最近耗时样本数（用于计算 p95）
+_LATENCY_SAMPLES = 256
+
+
+def create_storage_http_client(maxsize: int = STORAGE_IO_WORKERS):
+    """
+    创建 MinIO 客户端使用的 urllib3 连接池
+
+    与 minio SDK 默认配置相同（证书校验、5 次重试），但连接池大小与存储 IO 线程数一致，
+    连接超时缩短，避免 MinIO 不可达时线程长时间挂起。
+
+    Args:
+        maxsize: 每个主机保留的最大连接数
+
+    Returns:
+        urllib3.PoolManager: 连接池
+    """
+    import certifi
+    import urllib3
+    from urllib3.util import Retry, Timeout
+
+    return urllib3.PoolManager(
+        timeout=Timeout(connect=STORAGE_CONNECT_TIMEOUT, read=STORAGE_READ_TIMEOUT),
+        maxsize=maxsize,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+    )
+
+
+class AsyncStorage:
+    """
+    异步存储门面
+
+    run() 可在线程池中执行任意阻塞的存储调用；常用的 StorageManager 操作提供了同名的异步封装。
+    """
+
+    def __init__(self, workers: int = STORAGE_IO_WORKERS):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="storage-io")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+
+    def _record(self, operation: str, elapsed_ms: float, succeeded: bool):
+        with self._lock:
+            self._in_flight -= 1
+            metric = self._metrics.get(operation)
+            if metric is None:
+                metric = self._metrics[operation] = {
+                    "count": 0,
+                    "errors": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "samples": deque(maxlen=_LATENCY_SAMPLES),
+                }
+            metric["count"] += 1
+            if not succeeded:
+                metric["errors"] += 1
+            metric["total_ms"] += elapsed_ms
+            metric["max_ms"] = max(metric["max_ms"], elapsed_ms)
+            metric["samples"].append(elapsed_ms)
+
+    async def run(self, operation: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        在存储线程池中执行阻塞调用
+
+        Args:
+            operation: 操作名称（用于统计）
+            fn: 阻塞函数
+            args: 位置参数
+            kwargs: 关键字参数
+
+        Returns:
+            fn 的返回值
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._in_flight += 1
+        started = time.perf_counter()
+        succeeded = False
+        try:
+            result = await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+            succeeded = True
+            return result
+        finally:
+            self._record(operation, (time.perf_counter() - started) * 1000, succeeded)
+
+    async def iter_response(self, response, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+        """
+        分块读取 minio get_object 返回的响应（每次读取都在线程池中执行），结束后释放连接
+
+        Args:
+            response: get_object 返回的 urllib3 响应
+            chunk_size: 每块大小（字节）
+
+        Yields:
+            bytes: 数据块
+        """
+        try:
+            while True:
+                chunk = await self.run("read_chunk", response.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            response.close()
+            response.release_conn()
+
+    # ------------------------------------------------------------------
+    # StorageManager 常用操作
+    # ------------------------------------------------------------------
+
+    async def get_bytes(self, object_path: str) -> Dict[str, Any]:
+        """读取整个对象，见 StorageManager._get_file_bytes_direct"""
+        from storage.storage_manager import get_storage_manager
+        return await self.run("get_object", get_storage_manager()._get_file_bytes_direct, object_path)
+
+    async def read_object_range(self, object_path: str, offset: int, length: int) -> bytes:
+        """读取对象的一段内容，见 StorageManager.read_object_range"""
+        from storage.storage_manager import get_storage_manager
+        return await self.run("get_object_range", get_storage_manager().read_object_range, object_path, offset, length)
+
+    async def open_object(self, object_path: str, offset: int = 0, length: int = 0):
+        """打开对象（或其中一段）的读取响应，见 StorageManager.open_object，配合 iter_response 使用"""
+        from storage.storage_manager import get_storage_manager
+        return await self.run("open_object", get_storage_manager().open_object, object_path, offset, length)
+
+    async def stat_object(self, object_path: str) -> Optional[Dict[str, Any]]:
+        """获取对象元数据，见 StorageManager.stat_object"""
+        from storage.storage_manager import get_storage_manager
+        return await self.run("stat_object", get_storage_manager().stat_object, object_path)
+
+    async def upload_file(self, *args, **kwargs) -> Dict[str, Any]:
+        """流式上传文件，见 StorageManager.upload_file"""
+        from storage.storage_manager import get_storage_manager
+        return await self.run("put_object", get_storage_manager().upload_file, *args, **kwargs)
+
+    async def remove_object(self, object_path: str):
+        """删除对象，见 StorageManager.remove_object"""
+        from storage.storage_manager import get_storage_manager
+        await self.run("remove_object", get_storage_manager().remove_object, object_path)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取线程池占用和各操作的耗时统计
+
+        Returns:
+            Dict[str, Any]: 线程数、进行中（含排队）的调用数，以及每个操作的次数、失败数、平均/p95/最大耗时
+        """
+        with self._lock:
+            operations = {}
+            for operation, metric in self._metrics.items():
+                samples = sorted(metric["samples"])
+                p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))] if samples else 0.0
+                operations[operation] = {
+                    "count": metric["count"],
+                    "errors": metric["errors"],
+                    "avg_ms": round(metric["total_ms"] / metric["count"], 2),
+                    "p95_ms": round(p95, 2),
+                    "max_ms": round(metric["max_ms"], 2),
+                }
+            return {
+                "workers": self.workers,
+                "in_flight": self._in_flight,
+                "saturation": round(self._in_flight / self.workers, 2),
+                "operations": operations,
+            }
+
+    def shutdown(self):
+        """关闭线程池，取消尚未开始的调用"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局实例
+_async_storage: Optional[AsyncStorage] = None
+_async_storage_lock = threading.Lock()
+
+
+def get_async_storage() -> AsyncStorage:
+    """获取异步存储门面单例"""
+    global _async_storage
+    if _async_storage is None:
+        with _async_storage_lock:
+            if _async_storage is None:
+                _async_storage = AsyncStorage(STORAGE_IO_WORKERS)
+    return _async_storage
+
+
+def shutdown_async_storage():
+    """关闭异步存储线程池"""
+    global _async_storage
+    if _async_storage is not None:
+        _async_storage.shutdown()
+        _async_storage = None
@@ -0,0 +1,415 @@
+"""
+本地磁盘对象缓存
+
+缩略图、ZIP 导出等会反复读取同一批热门对象，每次都是一次到 MinIO 的完整往返。
+DiskObjectCache 在本机磁盘上缓存对象内容（读穿透）：
+- 总大小受字节预算限制，超出时按最近访问时间（LRU）淘汰
+- 先写临时文件再原子重命名，读取方不会看到写了一半的条目
+- 条目记录 MinIO ETag，超过复核间隔后用 stat_object 比对 ETag，不一致时重新下载；
+  内容寻址对象（cas/ 路径，以内容 SHA-256 命名）内容不可变，不需要复核
+- 缓存目录可由同一主机上的多个 uvicorn worker 共享，淘汰时用文件锁保证同一时间只有一个进程清理
+
+条目文件格式：4 字节魔数 + 4 字节头长度 + JSON 头（对象路径、ETag、内容类型、大小）+ 对象内容。
+最近访问时间记录在文件 atime（命中时显式更新，不依赖挂载选项），最近复核时间记录在 mtime。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台不加锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 是否启用本地磁盘缓存、缓存目录和字节预算
+DISK_CACHE_ENABLED = os.getenv("DISK_CACHE_ENABLED", "true").lower() == "true"
+DISK_CACHE_DIR = os.getenv("DISK_CACHE_DIR", os.path.join(tempfile.gettempdir(), "green-tracker-object-cache"))
+DISK_CACHE_MAX_BYTES = int(os.getenv("DISK_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+# 超过该大小的对象不缓存（如大视频）
+DISK_CACHE_MAX_OBJECT_BYTES = int(os.getenv("DISK_CACHE_MAX_OBJECT_BYTES", str(64 * 1024 * 1024)))
+# 条目超过该时间（秒）未复核时，读取前用 ETag 复核
+DISK_CACHE_REVALIDATE_SECONDS = int(os.getenv("DISK_CACHE_REVALIDATE_SECONDS", "300"))
+
+_MAGIC = b"GTC1"
+_HEADER_LEN = struct.Struct(">I")
+_TMP_PREFIX = ".tmp-"
+# 淘汰后保留预算的比例，避免每次写入都触发清理
+_EVICT_LOW_WATERMARK = 0.9
+# 超过该时间（秒）的临时文件视为写入进程已退出，清理时删除
+_STALE_TMP_SECONDS = 3600
+
+
+class _EntryWriter:
+    """流式写入一个缓存条目：写入临时文件，大小与头部一致时原子替换为正式条目"""
+
+    def __init__(self, cache: "DiskObjectCache", path: str, header: Dict[str, Any]):
+        self._cache = cache
+        self._path = path
+        self._expected = header["size"]
+        self._written = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(prefix=_TMP_PREFIX, dir=os.path.dirname(path))
+        self._file = os.fdopen(fd, "wb")
+        encoded = json.dumps(header).encode("utf-8")
+        self._file.write(_MAGIC + _HEADER_LEN.pack(len(encoded)) + encoded)
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._written += len(chunk)
+
+    def commit(self) -> bool:
+        """完成写入；实际大小与预期不一致时放弃"""
+        self._file.close()
+        if self._written != self._expected:
+            self._discard_tmp()
+            return False
+        os.replace(self._tmp_path, self._path)
+        self._cache._after_write(self._written)
+        return True
+
+    def abort(self):
+        """放弃写入（读取中断或出错）"""
+        self._file.close()
+        self._discard_tmp()
+
+    def _discard_tmp(self):
+        try:
+            os.unlink(self._tmp_path)
+        except OSError:
+            pass
+
+
+class DiskObjectCache:
+    """
+    本地磁盘对象缓存
+
+    缓存读写失败（磁盘满、权限等）只记录日志，调用方退回直接读取 MinIO。
+    """
+
+    def __init__(
+        self,
+        directory: str = DISK_CACHE_DIR,
+        max_bytes: int = DISK_CACHE_MAX_BYTES,
+        max_object_bytes: int = DISK_CACHE_MAX_OBJECT_BYTES,
+        revalidate_seconds: int = DISK_CACHE_REVALIDATE_SECONDS
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_object_bytes = min(max_object_bytes, max_bytes)
+        self.revalidate_seconds = revalidate_seconds
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # 本进程写入的字节数超过预算的 10% 时扫描目录并淘汰（各 worker 各自计数）
+        self._scan_threshold = max(max_bytes // 10, 1)
+        self._written_since_scan = 0
+
+        # 统计（本进程）
+        self._hits = 0
+        self._misses = 0
+        self._revalidated = 0
+        self._stale = 0
+        self._writes = 0
+        self._evicted = 0
+        self._usage_bytes: Optional[int] = None
+
+        self.evict()
+
+    @staticmethod
+    def is_immutable(object_path: str) -> bool:
+        """内容寻址对象（user_{user_id}/cas/{xx}/{sha256}）以内容命名，内容不会变化"""
+        parts = object_path.split("/")
+        return len(parts) == 4 and parts[1] == "cas"
+
+    def _entry_path(self, object_path: str) -> str:
+        key = hashlib.sha256(object_path.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _open_entry(self, object_path: str) -> Optional[Tuple[BinaryIO, Dict[str, Any], str]]:
+        """打开条目并校验头部和文件大小，损坏的条目直接删除"""
+        path = self._entry_path(object_path)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return None
+        try:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError("魔数不匹配")
+            (header_len,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+            header = json.loads(f.read(header_len))
+            if header.get("object_path") != object_path:
+                raise ValueError("对象路径不匹配")
+            if os.fstat(f.fileno()).st_size != len(_MAGIC) + _HEADER_LEN.size + header_len + header["size"]:
+                raise ValueError("文件大小与头部不一致")
+        except (ValueError, KeyError, struct.error):
+            f.close()
+            self._remove(path)
+            return None
+        return f, header, path
+
+    def lookup(
+        self,
+        object_path: str,
+        stat_fn: Callable[[str], Optional[Dict[str, Any]]]
+    ) -> Optional[Tuple[BinaryIO, Dict[str, Any]]]:
+        """
+        查找有效的缓存条目，超过复核间隔时先用 stat_fn 比对 ETag
+
+        Args:
+            object_path: 对象路径
+            stat_fn: 获取对象元数据的函数（如 StorageManager.stat_object），返回含 etag 的字典
+
+        Returns:
+            Optional[Tuple[BinaryIO, Dict[str, Any]]]: 已定位到内容起始处的文件和条目头部（调用方负责关闭文件），
+            未命中时返回 None
+        """
+        entry = self._open_entry(object_path)
+        if entry is None:
+            with self._lock:
+                self._misses += 1
+            return None
+
+        f, header, path = entry
+        now = time.time()
+        try:
+            validated_at = os.fstat(f.fileno()).st_mtime
+            if not self.is_immutable(object_path) and now - validated_at > self.revalidate_seconds:
+                try:
+                    stat = stat_fn(object_path)
+                except Exception:
+                    stat = None
+                if stat is None or stat.get("etag") != header.get("etag"):
+                    f.close()
+                    self._remove(path)
+                    with self._lock:
+                        self._stale += 1
+                        self._misses += 1
+                    return None
+                validated_at = now
+                with self._lock:
+                    self._revalidated += 1
+            # atime 记录最近访问时间（LRU），mtime 记录最近复核时间
+            os.utime(path, (now, validated_at))
+        except OSError:
+            pass
+
+        with self._lock:
+            self._hits += 1
+        return f, header
+
+    def get(
+        self,
+        object_path: str,
+        stat_fn: Callable[[str], Optional[Dict[str, Any]]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的对象内容
+
+        Args:
+            object_path: 对象路径
+            stat_fn: 获取对象元数据的函数（用于 ETag 复核）
+
+        Returns:
+            Optional[Dict[str, Any]]: data、content_type、etag，未命中时返回 None
+        """
+        entry = self.lookup(object_path, stat_fn)
+        if entry is None:
+            return None
+        f, header = entry
+        with f:
+            data = f.read()
+        return {"data": data, "content_type": header.get("content_type"), "etag": header.get("etag")}
+
+    @staticmethod
+    def iter_entry(f: BinaryIO, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """按块读取 lookup 返回的条目内容，读完后关闭文件"""
+        with f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def open_writer(
+        self,
+        object_path: str,
+        size: Optional[int],
+        etag: Optional[str],
+        content_type: Optional[str]
+    ) -> Optional[_EntryWriter]:
+        """
+        创建条目写入器（用于边读取 MinIO 边写入缓存）
+
+        Args:
+            object_path: 对象路径
+            size: 对象大小（未知或超过单对象上限时不缓存）
+            etag: MinIO ETag
+            content_type: 内容类型
+
+        Returns:
+            Optional[_EntryWriter]: 写入器，不缓存时返回 None
+        """
+        if size is None or size > self.max_object_bytes or not etag:
+            return None
+        header = {"object_path": object_path, "etag": etag, "content_type": content_type, "size": size}
+        try:
+            return _EntryWriter(self, self._entry_path(object_path), header)
+        except OSError as e:
+            logger.warning(f"[磁盘缓存] 创建缓存条目失败: {e}")
+            return None
+
+    def put(self, object_path: str, data: bytes, etag: Optional[str], content_type: Optional[str]) -> bool:
+        """
+        写入完整的对象内容
+
+        Args:
+            object_path: 对象路径
+            data: 对象内容
+            etag: MinIO ETag
+            content_type: 内容类型
+
+        Returns:
+            bool: 是否已缓存
+        """
+        writer = self.open_writer(object_path, len(data), etag, content_type)
+        if writer is None:
+            return False
+        try:
+            writer.write(data)
+            return writer.commit()
+        except OSError as e:
+            writer.abort()
+            logger.warning(f"[磁盘缓存] 写入缓存失败: {e}")
+            return False
+
+    def discard(self, object_path: str):
+        """删除对象的缓存条目（对象被覆盖或删除时调用）"""
+        self._remove(self._entry_path(object_path))
+
+    def _after_write(self, nbytes: int):
+        with self._lock:
+            self._writes += 1
+            self._written_since_scan += nbytes
+            if self._written_since_scan < self._scan_threshold:
+                return
+            self._written_since_scan = 0
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        扫描缓存目录，总大小超过预算时按最近访问时间淘汰到预算的 90%
+
+        其他进程正在清理时直接返回。
+
+        Returns:
+            int: 淘汰的条目数
+        """
+        lock_file = None
+        try:
+            if fcntl is not None:
+                lock_file = open(os.path.join(self.directory, ".evict.lock"), "a")
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return 0
+
+            now = time.time()
+            entries = []
+            total = 0
+            for shard in os.scandir(self.directory):
+                if not shard.is_dir():
+                    continue
+                for item in os.scandir(shard.path):
+                    try:
+                        st = item.stat()
+                    except OSError:
+                        continue
+                    if item.name.startswith(_TMP_PREFIX):
+                        if now - st.st_mtime > _STALE_TMP_SECONDS:
+                            self._remove(item.path)
+                        continue
+                    entries.append((st.st_atime, st.st_size, item.path))
+                    total += st.st_size
+
+            evicted = 0
+            if total > self.max_bytes:
+                target = self.max_bytes * _EVICT_LOW_WATERMARK
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    self._remove(path)
+                    total -= size
+                    evicted += 1
+                logger.info(f"[磁盘缓存] 淘汰 {evicted} 个条目，当前占用 {total} 字节")
+
+            with self._lock:
+                self._evicted += evicted
+                self._usage_bytes = total
+            return evicted
+
+        except OSError as e:
+            logger.warning(f"[磁盘缓存] 清理缓存目录失败: {e}")
+            return 0
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息（命中数等为本进程的计数）
+
+        Returns:
+            Dict[str, Any]: 目录、预算、最近一次扫描的占用，以及命中、未命中、复核、写入和淘汰次数
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "directory": self.directory,
+                "max_bytes": self.max_bytes,
+                "max_object_bytes": self.max_object_bytes,
+                "usage_bytes": self._usage_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else 0.0,
+                "revalidated": self._revalidated,
+                "stale": self._stale,
+                "writes": self._writes,
+                "evicted": self._evicted,
+            }
+
+
+# 全局实例
+_disk_cache: Optional[DiskObjectCache] = None
+_disk_cache_lock = threading.Lock()
+_disk_cache_failed = False
+
+
+def get_disk_cache() -> Optional[DiskObjectCache]:
+    """获取磁盘缓存单例（未启用或缓存目录不可用时返回 None）"""
+    global _disk_cache, _disk_cache_failed
+    if _disk_cache is None and DISK_CACHE_ENABLED and not _disk_cache_failed:
+        with _disk_cache_lock:
+            if _disk_cache is None and not _disk_cache_failed:
+                try:
+                    _disk_cache = DiskObjectCache()
+                    logger.info(f"[磁盘缓存] 已启用: {DISK_CACHE_DIR}, 预算 {DISK_CACHE_MAX_BYTES} 字节")
+                except OSError as e:
+                    _disk_cache_failed = True
+                    logger.error(f"[磁盘缓存] 初始化失败，直接读取 MinIO: {e}")
+    return _disk_cache
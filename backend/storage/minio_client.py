@@ -33,12 +33,14 @@ class MinioClient:
         """初始化 MinIO 客户端"""
         try:
             from minio import Minio
+            from storage.async_storage import create_storage_http_client
 
             self._client = Minio(
                 f"{self.MINIO_ENDPOINT}:{self.MINIO_PORT}",
                 access_key=self.MINIO_ACCESS_KEY,
                 secret_key=self.MINIO_SECRET_KEY,
-                secure=self.MINIO_SECURE
+                secure=self.MINIO_SECURE,
+                http_client=create_storage_http_client()
             )
 
             # 确保算法存储桶存在
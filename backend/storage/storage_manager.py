@@ -4,13 +4,17 @@ MinIO 存储管理器
 存储路径规范：
 - 所有用户共享存储桶：green-tracker-minio
 - 原始数据路径：user_{user_id}/data/session_{session_id}/{filename}
+- 内容寻址路径（去重存储）：user_{user_id}/cas/{sha256[:2]}/{sha256}
 """
 
 import os
 from pathlib import Path
 from dotenv import load_dotenv
 import logging
-from typing import Optional, Dict, Any
+import hashlib
+from typing import Optional, Dict, Any, BinaryIO, Iterable, Iterator, List
+
+from storage.disk_cache import get_disk_cache
 
 # 加载环境变量
 project_root = Path(__file__).parent.parent.parent
@@ -18,6 +22,32 @@ load_dotenv(os.path.join(project_root, '.env'))
 
 logger = logging.getLogger(__name__)
 
+# 流式上传：分片大小（MinIO 要求不小于 5MB）与每次读取的块大小
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+
+class _IterableReader:
+    """将数据块迭代器包装为只读文件对象（供 MinIO 分片上传按 read(n) 读取）"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer.extend(chunk)
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.bytes_read += len(data)
+        return data
+
 
 class StorageManager:
     """MinIO 存储管理器"""
@@ -37,12 +67,14 @@ class StorageManager:
         try:
             from minio import Minio
             from minio.error import S3Error
+            from storage.async_storage import create_storage_http_client
 
             self._client = Minio(
                 f"{self.MINIO_ENDPOINT}:{self.MINIO_PORT}",
                 access_key=self.MINIO_ACCESS_KEY,
                 secret_key=self.MINIO_SECRET_KEY,
-                secure=self.MINIO_SECURE
+                secure=self.MINIO_SECURE,
+                http_client=create_storage_http_client()
             )
             self._S3Error = S3Error
 
@@ -97,6 +129,21 @@ class StorageManager:
 
         return "/".join(parts)
 
+    def _get_cas_object_path(self, user_id: str, sha256: str) -> str:
+        """
+        构建内容寻址对象路径（相同内容的文件共用一个对象）
+
+        路径规范：user_{user_id}/cas/{sha256[:2]}/{sha256}
+
+        Args:
+            user_id: 用户ID
+            sha256: 文件内容 SHA-256（十六进制）
+
+        Returns:
+            对象完整路径
+        """
+        return f"user_{user_id}/cas/{sha256[:2]}/{sha256}"
+
     def _infer_content_type(self, filename: str, default_type: Optional[str] = None) -> str:
         """
         根据文件扩展名推断内容类型
@@ -179,6 +226,7 @@ class StorageManager:
                 length=len(data),
                 content_type=final_content_type
             )
+            self._discard_cached(object_path)
 
             file_url = self._get_file_url(object_path)
 
@@ -200,9 +248,164 @@ class StorageManager:
                 "message": str(e)
             }
 
+    def upload_file(
+        self,
+        user_id: str,
+        fileobj: BinaryIO,
+        filename: str,
+        session_id: str,
+        content_type: Optional[str] = None,
+        part_size: int = UPLOAD_PART_SIZE,
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+        object_path: Optional[str] = None,
+        sha256: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        以流式分片上传方式上传文件对象，同时计算 SHA-256（已提供 sha256 时不再计算）
+
+        文件按块读取，内存占用约为一个分片大小，适用于大视频等文件。
+
+        Args:
+            user_id: 用户ID
+            fileobj: 可读的文件对象（如 UploadFile.file）
+            filename: 文件名
+            session_id: 采集会话ID
+            content_type: 内容类型
+            part_size: 分片大小（字节，MinIO 要求不小于 5MB）
+            chunk_size: 每次从文件读取的字节数
+            object_path: 完整的对象路径（可选，如内容寻址路径；默认按会话路径规范生成）
+            sha256: 调用方已计算的 SHA-256（可选，如内容寻址存储上传前的哈希）
+
+        Returns:
+            上传结果字典（在 upload_bytes 的基础上增加 size 和 sha256）
+        """
+        try:
+            object_path = object_path or self._get_object_path(user_id, filename, session_id)
+
+            if content_type and content_type != 'application/octet-stream':
+                final_content_type = content_type
+            else:
+                final_content_type = self._infer_content_type(filename, content_type)
+
+            hasher = hashlib.sha256() if sha256 is None else None
+
+            def iter_chunks() -> Iterator[bytes]:
+                while True:
+                    chunk = fileobj.read(chunk_size)
+                    if not chunk:
+                        break
+                    if hasher is not None:
+                        hasher.update(chunk)
+                    yield chunk
+
+            result = self.upload_stream(
+                object_path, iter_chunks(), content_type=final_content_type, part_size=part_size
+            )
+
+            return {
+                "success": True,
+                "message": "上传成功",
+                "bucket": self.BUCKET_NAME,
+                "path": object_path,
+                "url": self._get_file_url(object_path),
+                "filename": filename,
+                "size": result["size"],
+                "sha256": hasher.hexdigest() if hasher is not None else sha256
+            }
+
+        except Exception as e:
+            logger.error(f"流式上传文件失败: {e}")
+            return {
+                "success": False,
+                "message": str(e)
+            }
+
+    def put_bytes(
+        self,
+        object_path: str,
+        data: bytes,
+        content_type: str = 'application/octet-stream'
+    ) -> Dict[str, Any]:
+        """
+        将字节数据写入指定的对象路径（用于缩略图等派生文件）
+
+        Args:
+            object_path: 完整的对象路径
+            data: 字节数据
+            content_type: 内容类型
+
+        Returns:
+            包含对象路径和大小的字典
+
+        Raises:
+            MinIO 上传抛出的异常
+        """
+        import io
+
+        self._client.put_object(
+            bucket_name=self.BUCKET_NAME,
+            object_name=object_path,
+            data=io.BytesIO(data),
+            length=len(data),
+            content_type=content_type
+        )
+        self._discard_cached(object_path)
+        return {
+            "success": True,
+            "object_key": object_path,
+            "size": len(data)
+        }
+
+    def upload_stream(
+        self,
+        object_path: str,
+        chunks: Iterable[bytes],
+        content_type: str = 'application/octet-stream',
+        part_size: int = 16 * 1024 * 1024
+    ) -> Dict[str, Any]:
+        """
+        以分片上传方式写入长度未知的数据流（内存占用约为一个分片大小）
+
+        Args:
+            object_path: 完整的对象路径
+            chunks: 数据块迭代器
+            content_type: 内容类型
+            part_size: 分片大小（字节，MinIO 要求不小于 5MB）
+
+        Returns:
+            包含对象路径和写入字节数的字典
+
+        Raises:
+            数据块迭代器或 MinIO 上传抛出的异常（失败时 SDK 会中止分片上传，不留下不完整对象）
+        """
+        reader = _IterableReader(chunks)
+        result = self._client.put_object(
+            bucket_name=self.BUCKET_NAME,
+            object_name=object_path,
+            data=reader,
+            length=-1,
+            part_size=part_size,
+            content_type=content_type
+        )
+        self._discard_cached(object_path)
+        logger.info(f"流式上传完成: {object_path}, {reader.bytes_read} 字节")
+        return {
+            "success": True,
+            "object_key": object_path,
+            "size": reader.bytes_read,
+            "etag": result.etag
+        }
+
+    @staticmethod
+    def _discard_cached(object_path: str):
+        """对象被覆盖或删除后移除本地磁盘缓存中的旧内容"""
+        cache = get_disk_cache()
+        if cache is not None:
+            cache.discard(object_path)
+
     def _get_file_bytes_direct(self, object_path: str) -> Dict[str, Any]:
         """
-        直接通过完整对象路径获取文件二进制数据
+        直接通过完整对象路径获取文件二进制数据（优先读取本地磁盘缓存）
 
         Args:
             object_path: 完整的对象路径
@@ -211,6 +414,17 @@ class StorageManager:
             包含文件数据的字典
         """
         try:
+            cache = get_disk_cache()
+            if cache is not None:
+                cached = cache.get(object_path, self.stat_object)
+                if cached is not None:
+                    return {
+                        "success": True,
+                        "message": "获取成功",
+                        "data": cached["data"],
+                        "content_type": cached["content_type"] or 'application/octet-stream'
+                    }
+
             logger.info(f"直接获取文件数据: {object_path}")
 
             response = self._client.get_object(
@@ -222,11 +436,15 @@ class StorageManager:
             response.close()
             response.release_conn()
 
+            content_type = response.headers.get('Content-Type', 'application/octet-stream')
+            if cache is not None:
+                cache.put(object_path, data, (response.headers.get('ETag') or "").strip('"'), content_type)
+
             return {
                 "success": True,
                 "message": "获取成功",
                 "data": data,
-                "content_type": response.headers.get('Content-Type', 'application/octet-stream')
+                "content_type": content_type
             }
 
         except self._S3Error as e:
@@ -243,13 +461,305 @@ class StorageManager:
                 "message": str(e)
             }
 
-    def _get_file_url(self, object_path: str, expires: int = 7 * 24 * 60 * 60) -> str:
+    def iter_object(self, object_path: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """
+        按块流式读取对象内容（不将整个对象读入内存）
+
+        本地磁盘缓存命中时直接读取缓存文件；未命中时边读取边写入缓存（对象不超过单对象上限时）。
+
+        Args:
+            object_path: 完整的对象路径
+            chunk_size: 每块字节数
+
+        Yields:
+            bytes: 对象数据块
+
+        Raises:
+            S3Error: 对象不存在或读取失败
+        """
+        cache = get_disk_cache()
+        if cache is not None:
+            entry = cache.lookup(object_path, self.stat_object)
+            if entry is not None:
+                yield from cache.iter_entry(entry[0], chunk_size)
+                return
+
+        response = self._client.get_object(
+            bucket_name=self.BUCKET_NAME,
+            object_name=object_path
+        )
+        writer = None
+        if cache is not None:
+            length = response.headers.get('Content-Length')
+            writer = cache.open_writer(
+                object_path,
+                int(length) if length else None,
+                (response.headers.get('ETag') or "").strip('"'),
+                response.headers.get('Content-Type')
+            )
+        try:
+            for chunk in response.stream(chunk_size):
+                if writer is not None:
+                    writer.write(chunk)
+                yield chunk
+            if writer is not None:
+                writer.commit()
+                writer = None
+        finally:
+            # 读取中断（如客户端断开）时丢弃写了一半的缓存条目
+            if writer is not None:
+                writer.abort()
+            response.close()
+            response.release_conn()
+
+    def open_object(self, object_path: str, offset: int = 0, length: int = 0):
+        """
+        打开对象（或其中一段）的读取响应，不读取内容
+
+        Args:
+            object_path: 完整的对象路径
+            offset: 起始字节
+            length: 读取字节数（0 表示读到对象末尾）
+
+        Returns:
+            urllib3 响应，调用方读取完毕后需调用 close() 和 release_conn()
+
+        Raises:
+            S3Error: 对象不存在或读取失败
+        """
+        return self._client.get_object(
+            bucket_name=self.BUCKET_NAME,
+            object_name=object_path,
+            offset=offset,
+            length=length
+        )
+
+    def read_object_range(self, object_path: str, offset: int, length: int) -> bytes:
+        """
+        读取对象的一段内容
+
+        Args:
+            object_path: 完整的对象路径
+            offset: 起始字节
+            length: 读取字节数
+
+        Returns:
+            bytes: 读取的内容
+
+        Raises:
+            S3Error: 对象不存在或读取失败
+        """
+        cache = get_disk_cache()
+        if cache is not None:
+            entry = cache.lookup(object_path, self.stat_object)
+            if entry is not None:
+                with entry[0] as f:
+                    f.seek(offset, os.SEEK_CUR)
+                    return f.read(length)
+
+        response = self._client.get_object(
+            bucket_name=self.BUCKET_NAME,
+            object_name=object_path,
+            offset=offset,
+            length=length
+        )
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def remove_object(self, object_path: str):
+        """
+        删除对象（对象不存在时不报错）
+
+        Args:
+            object_path: 完整的对象路径
+        """
+        self._client.remove_object(self.BUCKET_NAME, object_path)
+        self._discard_cached(object_path)
+
+    def copy_object(self, source_path: str, object_path: str, match_etag: Optional[str] = None):
+        """
+        在服务端复制对象（超过 5GB 的对象自动按分片复制，内容不经过本进程）
+
+        Args:
+            source_path: 源对象路径
+            object_path: 目标对象路径
+            match_etag: 源对象应有的 ETag（可选），不一致时复制失败，避免复制到已被覆盖的内容
+        """
+        from minio.commonconfig import ComposeSource
+
+        self._client.compose_object(
+            self.BUCKET_NAME, object_path,
+            [ComposeSource(self.BUCKET_NAME, source_path, match_etag=match_etag)]
+        )
+        self._discard_cached(object_path)
+
+    def stat_object(self, object_path: str) -> Optional[Dict[str, Any]]:
+        """
+        获取对象元数据（不读取内容）
+
+        Args:
+            object_path: 完整的对象路径
+
+        Returns:
+            Optional[Dict[str, Any]]: 大小、ETag、内容类型和修改时间，对象不存在时返回 None
+        """
+        try:
+            stat = self._client.stat_object(self.BUCKET_NAME, object_path)
+        except self._S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return None
+            raise
+        return {
+            "size": stat.size,
+            "etag": (stat.etag or "").strip('"'),
+            "content_type": stat.content_type,
+            "last_modified": stat.last_modified,
+        }
+
+    def presigned_put_url(self, object_path: str, expires: int = 3600) -> str:
+        """
+        生成预签名 PUT 地址，客户端直接把文件上传到 MinIO
+
+        Args:
+            object_path: 完整的对象路径
+            expires: 过期时间（秒）
+
+        Returns:
+            str: 预签名URL
+        """
+        from datetime import timedelta
+
+        return self._client.presigned_put_object(
+            self.BUCKET_NAME, object_path, expires=timedelta(seconds=expires)
+        )
+
+    # ------------------------------------------------------------------
+    # 分片上传（可续传上传使用，分片由客户端分别上传）
+    # ------------------------------------------------------------------
+
+    def create_multipart_upload(self, object_path: str, content_type: str) -> str:
+        """
+        创建分片上传
+
+        Args:
+            object_path: 完整的对象路径
+            content_type: 内容类型
+
+        Returns:
+            str: MinIO 分片上传ID
+        """
+        return self._client._create_multipart_upload(
+            self.BUCKET_NAME, object_path, {"Content-Type": content_type}
+        )
+
+    def upload_part(
+        self,
+        object_path: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+        content_md5: Optional[str] = None
+    ) -> str:
+        """
+        上传一个分片（同一编号重复上传会覆盖之前的内容）
+
+        Args:
+            object_path: 完整的对象路径
+            upload_id: 分片上传ID
+            part_number: 分片编号（从 1 开始）
+            data: 分片内容
+            content_md5: 客户端提供的 Content-MD5（Base64），由 MinIO 校验
+
+        Returns:
+            str: 分片 ETag
+
+        Raises:
+            S3Error: 上传失败或 Content-MD5 不匹配（BadDigest）
+        """
+        headers = {"Content-MD5": content_md5} if content_md5 else None
+        return self._client._upload_part(
+            self.BUCKET_NAME, object_path, data, headers, upload_id, part_number
+        )
+
+    def list_parts(self, object_path: str, upload_id: str) -> List[Dict[str, Any]]:
+        """
+        列出已上传的分片
+
+        Args:
+            object_path: 完整的对象路径
+            upload_id: 分片上传ID
+
+        Returns:
+            List[Dict[str, Any]]: 分片编号、ETag 和大小，按编号排序
+
+        Raises:
+            S3Error: 分片上传不存在（NoSuchUpload）
+        """
+        parts: List[Dict[str, Any]] = []
+        marker = None
+        while True:
+            result = self._client._list_parts(
+                self.BUCKET_NAME, object_path, upload_id, max_parts=1000, part_number_marker=marker
+            )
+            for part in result.parts:
+                parts.append({
+                    "part_number": part.part_number,
+                    "etag": part.etag,
+                    "size": part.size,
+                })
+            if not result.is_truncated:
+                break
+            marker = result.next_part_number_marker
+        return parts
+
+    def complete_multipart_upload(self, object_path: str, upload_id: str,
+                                  parts: List[Dict[str, Any]]) -> str:
+        """
+        合并分片，生成完整对象
+
+        Args:
+            object_path: 完整的对象路径
+            upload_id: 分片上传ID
+            parts: list_parts 返回的分片（按编号排序）
+
+        Returns:
+            str: 对象 ETag
+        """
+        from minio.datatypes import Part
+
+        result = self._client._complete_multipart_upload(
+            self.BUCKET_NAME, object_path, upload_id,
+            [Part(p["part_number"], p["etag"]) for p in parts]
+        )
+        self._discard_cached(object_path)
+        return result.etag
+
+    def abort_multipart_upload(self, object_path: str, upload_id: str):
+        """
+        中止分片上传并释放已上传的分片
+
+        Args:
+            object_path: 完整的对象路径
+            upload_id: 分片上传ID
+        """
+        self._client._abort_multipart_upload(self.BUCKET_NAME, object_path, upload_id)
+
+    def _get_file_url(
+        self,
+        object_path: str,
+        expires: int = 7 * 24 * 60 * 60,
+        download_name: Optional[str] = None
+    ) -> str:
         """
         生成文件访问URL
 
         Args:
             object_path: 对象路径
             expires: 过期时间（秒），默认7天
+            download_name: 下载时的文件名（可选，设置 Content-Disposition）
 
         Returns:
             预签名URL
@@ -257,10 +767,17 @@ class StorageManager:
         try:
             from datetime import timedelta
 
+            response_headers = None
+            if download_name:
+                response_headers = {
+                    "response-content-disposition": f"attachment; filename=\"{download_name}\""
+                }
+
             url = self._client.presigned_get_object(
                 bucket_name=self.BUCKET_NAME,
                 object_name=object_path,
-                expires=timedelta(seconds=expires)
+                expires=timedelta(seconds=expires),
+                response_headers=response_headers
             )
 
             return url
@@ -0,0 +1,98 @@
+"""
+时序降采样测试
+"""
+
+import numpy as np
+import pytest
+
+from utils.downsampling import StreamingSeriesReducer, lttb_indices, minmax_indices
+
+
+def _series(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=np.float64)
+    y = np.sin(x / 50.0) + rng.normal(0, 0.1, n)
+    return x, y
+
+
+def test_lttb_keeps_endpoints_and_target_size():
+    x, y = _series(1000)
+    idx = lttb_indices(x, y, 100)
+
+    assert len(idx) == 100
+    assert idx[0] == 0
+    assert idx[-1] == 999
+    assert np.all(np.diff(idx) > 0)
+
+
+@pytest.mark.parametrize("target", [2, 1000, 5000])
+def test_lttb_returns_all_points_when_not_reducing(target):
+    x, y = _series(1000)
+    assert np.array_equal(lttb_indices(x, y, target), np.arange(1000))
+
+
+def test_lttb_picks_spike():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[437] = 100.0
+    assert 437 in lttb_indices(x, y, 20)
+
+
+def test_minmax_keeps_extremes_of_each_bucket():
+    x, y = _series(1000)
+    idx = minmax_indices(x, y, 100)
+
+    assert len(idx) <= 100
+    assert np.all(np.diff(idx) > 0)
+    assert int(np.argmin(y)) in idx
+    assert int(np.argmax(y)) in idx
+
+
+def test_minmax_returns_all_points_when_not_reducing():
+    x, y = _series(50)
+    assert np.array_equal(minmax_indices(x, y, 50), np.arange(50))
+
+
+def test_streaming_reducer_small_input_matches_in_memory_lttb():
+    x, y = _series(2000)
+    reducer = StreamingSeriesReducer(100, x[0], x[-1], max_points=10000, chunk_size=128)
+    for xi, yi in zip(x, y):
+        reducer.append(xi, yi)
+
+    rx, ry = reducer.result()
+    idx = lttb_indices(x, y, 100)
+    assert reducer.source_points == 2000
+    assert np.array_equal(rx, x[idx])
+    assert np.array_equal(ry, y[idx])
+
+
+def test_streaming_reducer_large_input_covers_whole_range():
+    x, y = _series(50000)
+    y[12345] = 50.0
+    y[40000] = -50.0
+    reducer = StreamingSeriesReducer(200, x[0], x[-1], max_points=2000, method="minmax", chunk_size=1000)
+    for xi, yi in zip(x, y):
+        reducer.append(xi, yi)
+
+    rx, ry = reducer.result()
+    assert len(rx) <= 200
+    assert np.all(np.diff(rx) > 0)
+    # 代表点分布在整个时间范围内，而不是集中在开头
+    assert rx[0] < 1000 and rx[-1] > 49000
+    # 每个时间桶的最值点被保留
+    assert 50.0 in ry and -50.0 in ry
+
+
+def test_streaming_reducer_out_of_range_points_fall_into_edge_buckets():
+    reducer = StreamingSeriesReducer(10, 0.0, 100.0, max_points=40, chunk_size=8)
+    for xi in range(-20, 200):
+        reducer.append(float(xi), float(xi % 7))
+
+    rx, _ = reducer.result()
+    assert rx[0] == -20.0
+    assert rx[-1] == 199.0
+
+
+def test_streaming_reducer_empty():
+    rx, ry = StreamingSeriesReducer(10, 0.0, 1.0).result()
+    assert len(rx) == 0 and len(ry) == 0
@@ -0,0 +1,79 @@
+"""
+HTTP 条件请求工具测试
+"""
+
+import pytest
+
+from utils.http_cache import RangeNotSatisfiable, if_range_matches, is_not_modified, make_etag, parse_range
+
+ETAG = '"abc123-300-v2"'
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+def test_make_etag_skips_empty_parts():
+    assert make_etag("abc123", 300, None, "", "v2") == ETAG
+
+
+def test_if_none_match_matches_listed_and_weak_etags():
+    assert is_not_modified(ETAG, LAST_MODIFIED, if_none_match=ETAG)
+    assert is_not_modified(ETAG, LAST_MODIFIED, if_none_match=f'"other", W/{ETAG}')
+    assert is_not_modified(ETAG, LAST_MODIFIED, if_none_match="*")
+    assert not is_not_modified(ETAG, LAST_MODIFIED, if_none_match='"other"')
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    assert not is_not_modified(
+        ETAG, LAST_MODIFIED,
+        if_none_match='"other"',
+        if_modified_since="Thu, 01 Jan 2026 00:00:00 GMT"
+    )
+
+
+def test_if_modified_since():
+    assert is_not_modified(ETAG, LAST_MODIFIED, if_modified_since=LAST_MODIFIED)
+    assert is_not_modified(ETAG, LAST_MODIFIED, if_modified_since="Thu, 01 Jan 2026 00:00:00 GMT")
+    assert not is_not_modified(ETAG, LAST_MODIFIED, if_modified_since="Tue, 31 Dec 2024 00:00:00 GMT")
+    assert not is_not_modified(ETAG, LAST_MODIFIED, if_modified_since="not a date")
+
+
+def test_no_conditions():
+    assert not is_not_modified(ETAG, LAST_MODIFIED)
+    assert not is_not_modified(None, None, if_none_match=ETAG)
+
+
+def test_parse_range_forms():
+    assert parse_range("bytes=0-99", 1000) == (0, 99)
+    assert parse_range("bytes=900-", 1000) == (900, 999)
+    assert parse_range("bytes=-100", 1000) == (900, 999)
+    assert parse_range("bytes=-5000", 1000) == (0, 999)
+    assert parse_range("bytes=990-2000", 1000) == (990, 999)
+
+
+def test_parse_range_ignored_forms():
+    assert parse_range(None, 1000) is None
+    assert parse_range("items=0-1", 1000) is None
+    assert parse_range("bytes=0-1,5-9", 1000) is None
+    assert parse_range("bytes=abc", 1000) is None
+    assert parse_range("bytes=9-1", 1000) is None
+
+
+@pytest.mark.parametrize("header,size", [
+    ("bytes=1000-", 1000),
+    ("bytes=-0", 1000),
+    ("bytes=0-", 0),
+    ("bytes=-5", 0),
+])
+def test_parse_range_not_satisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, size)
+
+
+def test_if_range_matches():
+    assert if_range_matches(None, ETAG, LAST_MODIFIED)
+    assert if_range_matches(ETAG, ETAG, LAST_MODIFIED)
+    assert not if_range_matches('"other"', ETAG, LAST_MODIFIED)
+    # If-Range 使用强比较，弱 ETag 永远不匹配
+    assert not if_range_matches(f"W/{ETAG}", ETAG, LAST_MODIFIED)
+    assert if_range_matches(LAST_MODIFIED, ETAG, LAST_MODIFIED)
+    assert not if_range_matches("Thu, 01 Jan 2026 00:00:00 GMT", ETAG, LAST_MODIFIED)
+    assert not if_range_matches(LAST_MODIFIED, ETAG, None)
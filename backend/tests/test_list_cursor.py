@@ -0,0 +1,27 @@
+"""
+原始数据列表游标测试
+"""
+
+from datetime import datetime
+
+import pytest
+
+from database.db_services.raw_data_service import decode_list_cursor, encode_list_cursor
+
+
+def test_cursor_round_trip():
+    capture_time = datetime(2025, 3, 1, 12, 30, 45, 123456)
+    cursor = encode_list_cursor(capture_time, "f3a1c2d4-0000-4000-8000-000000000001")
+
+    assert decode_list_cursor(cursor) == (capture_time, "f3a1c2d4-0000-4000-8000-000000000001")
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_list_cursor(datetime(2025, 1, 1), "id?&/+=")
+    assert all(c.isalnum() or c in "-_" for c in cursor)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "e30", "WyJ4Il0"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_list_cursor(cursor)
@@ -0,0 +1,48 @@
+"""
+时间桶聚合粒度选择测试
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.db_services.rollup_service import (
+    choose_statistics_bucket,
+    choose_timeseries_bucket,
+    get_bucket_start,
+)
+
+T = datetime(2025, 3, 14, 15, 9, 26, 535897)
+
+
+@pytest.mark.parametrize("size,expected", [
+    ("1m", datetime(2025, 3, 14, 15, 9)),
+    ("1h", datetime(2025, 3, 14, 15)),
+    ("1d", datetime(2025, 3, 14)),
+])
+def test_get_bucket_start(size, expected):
+    assert get_bucket_start(T, size) == expected
+
+
+@pytest.mark.parametrize("start,end,expected", [
+    (datetime(2025, 3, 1), datetime(2025, 3, 8), "1d"),
+    (datetime(2025, 3, 1, 6), datetime(2025, 3, 8), "1h"),
+    (datetime(2025, 3, 1, 6, 30), datetime(2025, 3, 1, 7), "1m"),
+    (datetime(2025, 3, 1), datetime(2025, 3, 1, 7, 0, 30), None),
+    (datetime(2025, 3, 1), None, "1d"),
+    (None, datetime(2025, 3, 1, 6), "1h"),
+    (None, None, "1d"),
+])
+def test_choose_statistics_bucket_uses_coarsest_aligned_size(start, end, expected):
+    assert choose_statistics_bucket(start, end) == expected
+
+
+@pytest.mark.parametrize("span,max_points,expected", [
+    (timedelta(hours=2), 500, "1m"),
+    (timedelta(days=7), 500, "1h"),
+    (timedelta(days=365), 500, "1d"),
+    (timedelta(days=5000), 500, "1d"),
+])
+def test_choose_timeseries_bucket_uses_finest_size_within_limit(span, max_points, expected):
+    start = datetime(2025, 1, 1)
+    assert choose_timeseries_bucket(start, start + span, max_points) == expected
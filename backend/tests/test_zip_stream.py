@@ -0,0 +1,77 @@
+"""
+流式 ZIP 写入测试
+"""
+
+import io
+import zipfile
+
+import pytest
+
+from utils.zip_stream import ZipStreamWriter, is_precompressed
+
+
+def _build(members):
+    writer = ZipStreamWriter()
+    out = io.BytesIO()
+    for arcname, chunks in members:
+        for data in writer.write_stream(arcname, chunks):
+            out.write(data)
+    for data in writer.close():
+        out.write(data)
+    return zipfile.ZipFile(io.BytesIO(out.getvalue()))
+
+
+def test_members_round_trip():
+    text = b"time,value\n" * 1000
+    image = bytes(range(256)) * 100
+    archive = _build([
+        ("data/readings.csv", [text[:5000], text[5000:]]),
+        ("images/a.jpg", [image]),
+    ])
+
+    assert archive.testzip() is None
+    assert archive.read("data/readings.csv") == text
+    assert archive.read("images/a.jpg") == image
+
+
+def test_precompressed_members_are_stored():
+    archive = _build([("a.jpg", [b"x" * 1000]), ("b.csv", [b"x" * 1000])])
+
+    assert archive.getinfo("a.jpg").compress_type == zipfile.ZIP_STORED
+    assert archive.getinfo("b.csv").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_is_precompressed():
+    assert is_precompressed("photo.JPEG")
+    assert is_precompressed("mp4")
+    assert not is_precompressed("readings.csv")
+
+
+def test_write_bytes():
+    writer = ZipStreamWriter()
+    data = b"".join(writer.write_bytes("manifest.json", b'{"count": 1}'))
+    data += b"".join(writer.close())
+
+    assert zipfile.ZipFile(io.BytesIO(data)).read("manifest.json") == b'{"count": 1}'
+
+
+def test_failed_member_keeps_partial_content_and_archive_stays_valid():
+    def failing_chunks():
+        yield b"first part;"
+        raise IOError("object read failed")
+
+    writer = ZipStreamWriter()
+    out = io.BytesIO()
+    with pytest.raises(IOError):
+        for data in writer.write_stream("broken.bin", failing_chunks()):
+            out.write(data)
+    # 调用方捕获异常后可以继续写入其他成员
+    for data in writer.write_stream("ok.txt", [b"ok"]):
+        out.write(data)
+    for data in writer.close():
+        out.write(data)
+
+    archive = zipfile.ZipFile(io.BytesIO(out.getvalue()))
+    assert archive.testzip() is None
+    assert archive.read("broken.bin") == b"first part;"
+    assert archive.read("ok.txt") == b"ok"
@@ -0,0 +1,229 @@
+"""
+时序数据降采样模块
+
+提供两种保持曲线形状的降采样算法（基于 NumPy 列式数组）：
+- LTTB（Largest-Triangle-Three-Buckets）：每个桶保留与相邻点构成最大三角形面积的点，视觉上最接近原曲线
+- min/max：每个桶保留最小值和最大值点，保证峰值不丢失
+
+StreamingSeriesReducer 用于逐行读取数据库游标时的内存控制：
+按预先确定的时间范围划分固定数量的时间桶，每桶保留首/末/最小/最大点，最终在候选点上降采样。
+"""
+
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, target: int) -> np.ndarray:
+    """
+    LTTB 降采样，返回被选中点的下标
+
+    Args:
+        x: 横坐标（时间），需升序
+        y: 纵坐标（数值）
+        target: 目标点数（包含首尾两点）
+
+    Returns:
+        np.ndarray: 升序的下标数组
+    """
+    n = len(x)
+    if target >= n or target < 3:
+        return np.arange(n)
+
+    selected = np.empty(target, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # 除首尾点外的 n-2 个点均分为 target-2 个桶
+    edges = (np.arange(target - 1) * ((n - 2) / (target - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    a = 0
+    for i in range(target - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # 下一个桶的平均点（最后一个桶使用末尾点）
+        if i < target - 3:
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        areas = np.abs(
+            (x[a] - avg_x) * (bucket_y - y[a]) - (x[a] - bucket_x) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, target: int) -> np.ndarray:
+    """
+    min/max 降采样：每个桶保留最小值和最大值点，返回被选中点的下标
+
+    Args:
+        x: 横坐标（时间），需升序
+        y: 纵坐标（数值）
+        target: 目标点数（每个桶 2 个点）
+
+    Returns:
+        np.ndarray: 升序、去重后的下标数组
+    """
+    n = len(x)
+    if target >= n or target < 2:
+        return np.arange(n)
+
+    bucket_count = max(target // 2, 1)
+    edges = np.linspace(0, n, bucket_count + 1).astype(np.int64)
+
+    indices: List[int] = []
+    for i in range(bucket_count):
+        start, end = edges[i], edges[i + 1]
+        if start >= end:
+            continue
+        bucket = y[start:end]
+        indices.append(start + int(np.argmin(bucket)))
+        indices.append(start + int(np.argmax(bucket)))
+
+    return np.unique(np.asarray(indices, dtype=np.int64))
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, target: int, method: str = "lttb") -> np.ndarray:
+    """
+    按指定算法降采样，返回被选中点的下标
+
+    Args:
+        x: 横坐标（时间）
+        y: 纵坐标（数值）
+        target: 目标点数
+        method: lttb / minmax
+
+    Returns:
+        np.ndarray: 下标数组
+    """
+    if method == "minmax":
+        return minmax_indices(x, y, target)
+    return lttb_indices(x, y, target)
+
+
+class StreamingSeriesReducer:
+    """
+    流式时序降采样器
+
+    在读取数据前按 [x_start, x_end] 把时间范围等分为固定数量的时间桶，每个桶只保留
+    首点、末点、最小值点和最大值点，内存占用固定且与数据总量无关；最终在这些候选点上
+    执行 LTTB / min/max。候选点在时间上均匀分布，结果覆盖整个时间范围。
+    总点数不超过 max_points 时直接在原始点上降采样。
+    """
+
+    def __init__(self, target: int, x_start: float, x_end: float, max_points: int = 200000,
+                 method: str = "lttb", chunk_size: int = 65536):
+        self.target = target
+        self.max_points = max(max_points, target * 4)
+        self.method = method
+        self.chunk_size = chunk_size
+
+        # 每个时间桶最多贡献 4 个候选点
+        self.bucket_count = max(self.max_points // 4, target)
+        self.x_start = x_start
+        self._width = max(x_end - x_start, 1e-9) / self.bucket_count
+
+        n = self.bucket_count
+        self._count = np.zeros(n, dtype=np.int64)
+        self._first = np.zeros((n, 2), dtype=np.float64)
+        self._last = np.zeros((n, 2), dtype=np.float64)
+        self._min = np.zeros((n, 2), dtype=np.float64)
+        self._max = np.zeros((n, 2), dtype=np.float64)
+
+        # 总点数不超过 max_points 时保留原始点
+        self._raw: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._buffer_x: List[float] = []
+        self._buffer_y: List[float] = []
+        self.source_points = 0
+
+    def append(self, x: float, y: float):
+        """追加一个数据点（x 需不小于之前的点）"""
+        self._buffer_x.append(x)
+        self._buffer_y.append(y)
+        self.source_points += 1
+        if len(self._buffer_x) >= self.chunk_size:
+            self._flush_buffer()
+
+    def _flush_buffer(self):
+        if not self._buffer_x:
+            return
+        x = np.asarray(self._buffer_x, dtype=np.float64)
+        y = np.asarray(self._buffer_y, dtype=np.float64)
+        self._buffer_x = []
+        self._buffer_y = []
+
+        if self._raw is not None:
+            if self.source_points <= self.max_points:
+                self._raw.append((x, y))
+            else:
+                self._raw = None
+
+        # 超出范围的点（如读取期间新写入的数据）归入首尾桶
+        idx = np.clip(((x - self.x_start) // self._width).astype(np.int64), 0, self.bucket_count - 1)
+        order = np.argsort(idx, kind="stable")
+        x, y, idx = x[order], y[order], idx[order]
+
+        starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+        ends = np.r_[starts[1:], len(idx)] - 1
+        buckets = idx[starts]
+        min_pos = np.lexsort((y, idx))[starts]
+        max_pos = np.lexsort((-y, idx))[starts]
+
+        chunk_first = np.column_stack((x[starts], y[starts]))
+        chunk_last = np.column_stack((x[ends], y[ends]))
+        chunk_min = np.column_stack((x[min_pos], y[min_pos]))
+        chunk_max = np.column_stack((x[max_pos], y[max_pos]))
+
+        empty = (self._count[buckets] == 0)[:, None]
+        self._first[buckets] = np.where(empty, chunk_first, self._first[buckets])
+        self._last[buckets] = chunk_last
+        self._min[buckets] = np.where(
+            empty | (chunk_min[:, 1:] < self._min[buckets][:, 1:]), chunk_min, self._min[buckets]
+        )
+        self._max[buckets] = np.where(
+            empty | (chunk_max[:, 1:] > self._max[buckets][:, 1:]), chunk_max, self._max[buckets]
+        )
+        self._count[buckets] += ends - starts + 1
+
+    def _candidates(self) -> Tuple[np.ndarray, np.ndarray]:
+        """按时间顺序返回各时间桶的候选点（去除重复）"""
+        filled = self._count > 0
+        points = np.stack((self._first[filled], self._min[filled], self._max[filled], self._last[filled]), axis=1)
+        points = points.reshape(-1, 2)
+        points = points[np.argsort(points[:, 0], kind="stable")]
+        if len(points) > 1:
+            keep = np.r_[True, np.any(points[1:] != points[:-1], axis=1)]
+            points = points[keep]
+        return points[:, 0], points[:, 1]
+
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        返回降采样后的结果
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (x, y)
+        """
+        self._flush_buffer()
+        if self._raw is not None:
+            if not self._raw:
+                return np.empty(0), np.empty(0)
+            xs = np.concatenate([x for x, _ in self._raw])
+            ys = np.concatenate([y for _, y in self._raw])
+        else:
+            xs, ys = self._candidates()
+        keep = downsample_indices(xs, ys, self.target, self.method)
+        return xs[keep], ys[keep]
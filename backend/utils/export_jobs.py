@@ -0,0 +1,256 @@
+"""
+后台导出任务模块
+
+大数据量导出不再占用 API 请求：
+- POST 创建任务后立即返回任务ID，由后台线程池执行
+- 导出内容以流式方式生成，通过 MinIO 分片上传写入 user_{user_id}/exports/
+- 任务状态（已导出行数、已写入字节数）保存在用户数据库的 export_jobs 表中，
+  任意 worker 都能查询，客户端轮询查询
+- 任务完成后按需生成预签名下载地址
+- 超过保留时间的任务和导出文件通过 database_initializer.py expire-exports 命令清理
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class ExportJobManager:
+    """
+    导出任务管理器
+
+    任务状态保存在用户数据库中（多进程共享），执行由本进程的线程池完成。
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        part_size: int = 16 * 1024 * 1024,
+        url_expires: int = 3600,
+        progress_interval: float = 1.0
+    ):
+        self.workers = workers
+        self.part_size = part_size
+        self.url_expires = url_expires
+        self.progress_interval = progress_interval
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export-job")
+        # 尚未开始执行的任务：任务ID -> 用户ID
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 状态
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _save(job: Dict[str, Any]):
+        """将任务状态写入用户数据库（每次使用独立的短会话，不影响导出游标所在的会话）"""
+        from database.user_db_manager import get_user_db
+        from database.db_services.export_job_service import save_export_job
+
+        db = get_user_db(job["user_id"])
+        try:
+            save_export_job(db, job)
+        finally:
+            db.close()
+
+    @staticmethod
+    def get(db: Session, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取任务状态
+
+        Args:
+            db: 用户数据库会话
+            job_id: 任务ID
+
+        Returns:
+            Optional[Dict[str, Any]]: 任务状态，不存在或已清理时返回 None
+        """
+        from database.db_services.export_job_service import get_export_job
+        return get_export_job(db, job_id)
+
+    def get_download_url(self, job: Dict[str, Any]) -> Optional[str]:
+        """
+        为已完成的任务生成预签名下载地址
+
+        Args:
+            job: 任务状态
+
+        Returns:
+            Optional[str]: 下载地址，任务未完成时返回 None
+        """
+        if job.get("status") != JOB_COMPLETED or not job.get("object_key"):
+            return None
+        from storage.storage_manager import get_storage_manager
+        return get_storage_manager()._get_file_url(
+            job["object_key"],
+            expires=self.url_expires,
+            download_name=job.get("filename")
+        ) or None
+
+    # ------------------------------------------------------------------
+    # 提交与执行
+    # ------------------------------------------------------------------
+
+    def submit(self, user_id: str, format: str, filters: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        """
+        创建导出任务
+
+        Args:
+            user_id: 用户ID
+            format: 导出格式
+            filters: 过滤条件（session_id / data_type / data_subtype）
+
+        Returns:
+            Dict[str, Any]: 新建的任务状态
+        """
+        job_id = uuid.uuid4().hex
+        filename = f"raw_data_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+        job = {
+            "job_id": job_id,
+            "user_id": user_id,
+            "status": JOB_PENDING,
+            "format": format,
+            "filters": filters,
+            "filename": filename,
+            "object_key": f"user_{user_id}/exports/{job_id}.{format}",
+            "rows_done": 0,
+            "bytes_written": 0,
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        self._save(job)
+        with self._lock:
+            self._pending[job_id] = user_id
+        self._executor.submit(self._run, job)
+        logger.info(f"导出任务已创建: {job_id}, 用户: {user_id}, 格式: {format}")
+        return job
+
+    def _track(self, job: Dict[str, Any], chunks: Iterator[bytes], counter: Dict[str, int]) -> Iterator[bytes]:
+        """统计写入字节数并定期保存进度"""
+        last_saved = time.monotonic()
+        for chunk in chunks:
+            job["bytes_written"] += len(chunk)
+            now = time.monotonic()
+            if now - last_saved >= self.progress_interval:
+                job["rows_done"] = counter["rows"]
+                self._save(job)
+                last_saved = now
+            yield chunk
+
+    def _run(self, job: Dict[str, Any]):
+        from database.user_db_manager import get_user_db
+        from database.db_services.export_service import EXPORT_MEDIA_TYPES, stream_raw_data_export
+        from storage.storage_manager import get_storage_manager
+
+        job_id = job["job_id"]
+        with self._lock:
+            self._pending.pop(job_id, None)
+
+        job["status"] = JOB_RUNNING
+        job["started_at"] = datetime.now().isoformat()
+        self._save(job)
+
+        counter = {"rows": 0}
+        chunks = None
+        try:
+            db = get_user_db(job["user_id"])
+            chunks = stream_raw_data_export(
+                db=db,
+                format=job["format"],
+                user_id=job["user_id"],
+                counter=counter,
+                **job["filters"]
+            )
+            get_storage_manager().upload_stream(
+                job["object_key"],
+                self._track(job, chunks, counter),
+                content_type=EXPORT_MEDIA_TYPES[job["format"]],
+                part_size=self.part_size
+            )
+            job["status"] = JOB_COMPLETED
+            logger.info(
+                f"导出任务完成: {job_id}, {counter['rows']} 条, {job['bytes_written']} 字节"
+            )
+        except Exception as e:
+            job["status"] = JOB_FAILED
+            job["error"] = str(e)
+            logger.error(f"导出任务失败: {job_id}: {e}")
+        finally:
+            if chunks is not None:
+                # 上传中途失败时关闭生成器，释放数据库会话
+                chunks.close()
+            job["rows_done"] = counter["rows"]
+            job["finished_at"] = datetime.now().isoformat()
+            try:
+                self._save(job)
+            except Exception as e:
+                logger.error(f"保存导出任务状态失败: {job_id}: {e}")
+
+    def shutdown(self):
+        """停止线程池，尚未开始的任务标记为失败"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        from database.user_db_manager import get_user_db
+
+        with self._lock:
+            pending = list(self._pending.items())
+            self._pending.clear()
+        for job_id, user_id in pending:
+            try:
+                db = get_user_db(user_id)
+                try:
+                    job = self.get(db, job_id)
+                finally:
+                    db.close()
+                if job and job.get("status") == JOB_PENDING:
+                    job["user_id"] = user_id
+                    job["status"] = JOB_FAILED
+                    job["error"] = "服务关闭，任务未执行"
+                    job["finished_at"] = datetime.now().isoformat()
+                    self._save(job)
+            except Exception as e:
+                logger.error(f"标记未执行的导出任务失败: {job_id}: {e}")
+
+
+# 全局实例
+_export_job_manager: Optional[ExportJobManager] = None
+_export_job_lock = threading.Lock()
+
+
+def get_export_job_manager() -> ExportJobManager:
+    """获取导出任务管理器单例"""
+    global _export_job_manager
+    if _export_job_manager is None:
+        with _export_job_lock:
+            if _export_job_manager is None:
+                _export_job_manager = ExportJobManager(
+                    workers=int(os.getenv("EXPORT_JOB_WORKERS", "2")),
+                    part_size=int(os.getenv("EXPORT_JOB_PART_SIZE", str(16 * 1024 * 1024))),
+                    url_expires=int(os.getenv("EXPORT_JOB_URL_EXPIRES", "3600")),
+                )
+    return _export_job_manager
+
+
+def shutdown_export_jobs():
+    """关闭导出任务线程池"""
+    global _export_job_manager
+    if _export_job_manager is not None:
+        _export_job_manager.shutdown()
+        _export_job_manager = None
@@ -0,0 +1,231 @@
+"""
+HTTP 条件请求工具
+
+为图像、文件等二进制响应生成强 ETag 和 Last-Modified，并处理
+If-None-Match / If-Modified-Since 条件请求：内容未变化时返回 304，
+客户端复用本地缓存，服务端不必读取缓存或对象存储。
+同时解析 Range / If-Range 请求头，支持视频拖动等按范围读取。
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    由内容标识（如文件校验和、尺寸、版本）组成强 ETag
+
+    Args:
+        parts: 能唯一确定响应内容的各部分
+
+    Returns:
+        str: 带引号的 ETag
+    """
+    return '"' + "-".join(str(p) for p in parts if p is not None and p != "") + '"'
+
+
+def etag_for_bytes(data: bytes) -> str:
+    """
+    由响应内容计算强 ETag（MD5）
+
+    Args:
+        data: 响应内容
+
+    Returns:
+        str: 带引号的 ETag
+    """
+    return f'"{hashlib.md5(data).hexdigest()}"'
+
+
+def to_http_date(value: Optional[Any]) -> Optional[str]:
+    """
+    转换为 HTTP 日期格式（GMT）
+
+    Args:
+        value: datetime 或 ISO 格式字符串（无时区时按 UTC 处理，与模型的 datetime.utcnow 默认值一致）
+
+    Returns:
+        Optional[str]: HTTP 日期，无法转换时返回 None
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 使用弱比较（忽略 W/ 前缀）"""
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def is_not_modified(
+    etag: Optional[str],
+    last_modified: Optional[str],
+    if_none_match: Optional[str] = None,
+    if_modified_since: Optional[str] = None
+) -> bool:
+    """
+    判断条件请求是否可以返回 304
+
+    请求带 If-None-Match 时只比较 ETag，忽略 If-Modified-Since（RFC 9110）。
+
+    Args:
+        etag: 当前内容的 ETag
+        last_modified: 当前内容的修改时间（HTTP 日期）
+        if_none_match: 请求头 If-None-Match
+        if_modified_since: 请求头 If-Modified-Since
+
+    Returns:
+        bool: 客户端缓存仍然有效时返回 True
+    """
+    if if_none_match:
+        return bool(etag) and _etag_matches(if_none_match, etag)
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cache_headers(
+    etag: Optional[str],
+    last_modified: Optional[str],
+    cache_control: Optional[str] = None
+) -> Dict[str, str]:
+    """
+    生成缓存相关响应头
+
+    Args:
+        etag: ETag
+        last_modified: 修改时间（HTTP 日期）
+        cache_control: Cache-Control 取值
+
+    Returns:
+        Dict[str, str]: 响应头
+    """
+    headers: Dict[str, str] = {}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+
+def not_modified_response(
+    etag: Optional[str],
+    last_modified: Optional[str],
+    cache_control: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    构造 304 响应（不含响应体，保留缓存相关响应头）
+
+    Args:
+        etag: ETag
+        last_modified: 修改时间（HTTP 日期）
+        cache_control: Cache-Control 取值
+        headers: 其他响应头
+
+    Returns:
+        Response: 304 响应
+    """
+    all_headers = dict(headers or {})
+    all_headers.update(cache_headers(etag, last_modified, cache_control))
+    return Response(status_code=304, headers=all_headers)
+
+
+class RangeNotSatisfiable(ValueError):
+    """请求的范围超出内容长度（应返回 416）"""
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个字节范围的 Range 请求头
+
+    支持 bytes=start-end、bytes=start- 和 bytes=-suffix 三种形式。
+    格式无法识别或包含多个范围时返回 None，由调用方返回完整内容（RFC 9110 允许忽略 Range）。
+
+    Args:
+        range_header: 请求头 Range
+        size: 内容总长度
+
+    Returns:
+        Optional[Tuple[int, int]]: 起止字节（闭区间），不按范围响应时返回 None
+
+    Raises:
+        RangeNotSatisfiable: 范围起点超出内容长度，或内容为空（空内容的任何范围都无法满足）
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, sep, end_text = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_text == "":
+            suffix = int(end_text)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable(range_header)
+            return max(size - suffix, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except RangeNotSatisfiable:
+        raise
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(range_header)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def if_range_matches(if_range: Optional[str], etag: Optional[str], last_modified: Optional[str]) -> bool:
+    """
+    判断 If-Range 条件是否成立（不成立时应忽略 Range，返回完整内容）
+
+    If-Range 为 ETag 时使用强比较，为日期时要求与 Last-Modified 完全一致。
+
+    Args:
+        if_range: 请求头 If-Range
+        etag: 当前内容的 ETag
+        last_modified: 当前内容的修改时间（HTTP 日期）
+
+    Returns:
+        bool: 没有 If-Range 或条件成立时返回 True
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return bool(etag) and not if_range.startswith("W/") and if_range == etag
+    if not last_modified:
+        return False
+    try:
+        return parsedate_to_datetime(if_range) == parsedate_to_datetime(last_modified)
+    except (TypeError, ValueError):
+        return False
@@ -5,9 +5,51 @@
 
 import magic
 import hashlib
-from typing import Optional, Any, Dict
+import io
+from dataclasses import dataclass, field
+from typing import Optional, Any, BinaryIO, Dict, List, Union
 from pathlib import Path
 
+# 单次检查时每次读取的块大小，以及保留用于文件头识别的字节数
+_INSPECT_CHUNK_SIZE = 1024 * 1024
+_INSPECT_HEAD_BYTES = 64 * 1024
+
+
+@dataclass
+class ImageInspection:
+    """图像单次检查结果（格式、尺寸、EXIF、校验和与验证结论）"""
+    size_bytes: int
+    format: Optional[str] = None
+    extension: Optional[str] = None
+    mime_type: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    mode: Optional[str] = None
+    has_transparency: Optional[bool] = None
+    exif: Dict[str, Any] = field(default_factory=dict)
+    sha256: Optional[str] = None
+    is_valid: bool = True
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+
+    def to_file_meta(self) -> Dict[str, Any]:
+        """
+        转换为写入 file_meta["image"] 的图像信息
+
+        Returns:
+            Dict[str, Any]: 格式、尺寸、模式和 EXIF（没有 EXIF 时省略）
+        """
+        meta: Dict[str, Any] = {
+            "format": self.format,
+            "width": self.width,
+            "height": self.height,
+            "mode": self.mode,
+            "has_transparency": self.has_transparency,
+        }
+        if self.exif:
+            meta["exif"] = self.exif
+        return meta
+
 
 class ImageProcessor:
     """图像处理器"""
@@ -138,6 +180,148 @@ class ImageProcessor:
                 'error': str(e)
             }
     
+    @staticmethod
+    def _format_from_header(data: bytes) -> Optional[str]:
+        """根据文件头签名识别图像格式"""
+        if data.startswith(b'\xFF\xD8\xFF'):
+            return 'JPEG'
+        if data.startswith(b'\x89PNG\r\n\x1a\n'):
+            return 'PNG'
+        if data.startswith(b'GIF87a') or data.startswith(b'GIF89a'):
+            return 'GIF'
+        if data.startswith(b'BM'):
+            return 'BMP'
+        if data.startswith(b'II*\x00') or data.startswith(b'MM\x00*'):
+            return 'TIFF'
+        if data.startswith(b'RIFF') and data[8:12] == b'WEBP':
+            return 'WEBP'
+        if data.startswith(b'<svg'):
+            return 'SVG'
+        return None
+
+    @staticmethod
+    def inspect_image(
+        source: Union[bytes, BinaryIO],
+        filename: Optional[str] = None,
+        max_size_mb: int = 50,
+        size_bytes: Optional[int] = None,
+        compute_hash: bool = True
+    ) -> ImageInspection:
+        """
+        单次检查图像：识别格式、读取尺寸/模式/EXIF 并计算 SHA-256，同时完成验证
+
+        文件内容只完整读取一次（计算 SHA-256），PIL 只解析文件头，不解码像素；
+        文件头签名无法识别时才使用 python-magic（只检查文件头部）。
+        取代上传路径上 detect_image_format、validate_image_file 和 calculate_checksum 的多次处理。
+
+        Args:
+            source: 文件字节数据，或可 seek 的文件对象（如 UploadFile.file，检查完成后回到开头）
+            filename: 文件名（可选，用于推断扩展名）
+            max_size_mb: 最大文件大小（MB）
+            size_bytes: 文件总大小（不计算校验和且 source 为文件对象时可提供，省去 seek 到末尾）
+            compute_hash: 是否计算 SHA-256（流式上传时已边上传边计算的可以关闭）
+
+        Returns:
+            ImageInspection: 检查结果
+        """
+        if isinstance(source, (bytes, bytearray)):
+            head = bytes(source[:_INSPECT_HEAD_BYTES])
+            sha256 = hashlib.sha256(source).hexdigest() if compute_hash else None
+            size = len(source)
+            fileobj: BinaryIO = io.BytesIO(source)
+        else:
+            fileobj = source
+            fileobj.seek(0)
+            if compute_hash:
+                digest = hashlib.sha256()
+                head = b''
+                size = 0
+                while True:
+                    chunk = fileobj.read(_INSPECT_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if len(head) < _INSPECT_HEAD_BYTES:
+                        head += chunk[:_INSPECT_HEAD_BYTES - len(head)]
+                    digest.update(chunk)
+                    size += len(chunk)
+                sha256 = digest.hexdigest()
+            else:
+                head = fileobj.read(_INSPECT_HEAD_BYTES)
+                sha256 = None
+                if size_bytes is None:
+                    fileobj.seek(0, 2)
+                    size_bytes = fileobj.tell()
+                size = size_bytes
+            fileobj.seek(0)
+
+        result = ImageInspection(size_bytes=size, sha256=sha256)
+
+        # 检查文件大小
+        size_mb = size / (1024 * 1024)
+        if size_mb > max_size_mb:
+            result.is_valid = False
+            result.errors.append(f'文件大小 {size_mb:.2f}MB 超过限制 {max_size_mb}MB')
+        elif size_mb > 10:
+            result.warnings.append(f'文件大小 {size_mb:.2f}MB 较大，可能影响上传速度')
+
+        # PIL 只读取文件头（Image.open 是惰性的，不解码像素）
+        try:
+            from PIL import Image
+            from PIL.ExifTags import TAGS
+
+            with Image.open(fileobj) as image:
+                # 无人机相机常输出 MPO（多图 JPEG），按 JPEG 处理
+                result.format = 'JPEG' if image.format == 'MPO' else image.format
+                result.mime_type = Image.MIME.get(result.format)
+                result.width, result.height = image.size
+                result.mode = image.mode
+                result.has_transparency = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+                for tag_id, value in image.getexif().items():
+                    if isinstance(value, str):
+                        # PostgreSQL JSONB 不接受 \u0000
+                        value = value.replace('\x00', '').strip()
+                    if isinstance(value, (str, int, float)):
+                        result.exif[str(TAGS.get(tag_id, tag_id))] = value
+        except ImportError:
+            result.warnings.append('PIL库未安装，未读取图像尺寸')
+        except Exception:
+            pass
+        finally:
+            if not isinstance(source, (bytes, bytearray)):
+                fileobj.seek(0)
+
+        # PIL 无法识别时（如 SVG、文件头损坏）退回文件头签名和 python-magic
+        if result.format is None:
+            result.format = ImageProcessor._format_from_header(head)
+            if result.format is None:
+                try:
+                    mime_type = magic.from_buffer(head, mime=True)
+                    result.mime_type = mime_type
+                    result.format = ImageProcessor.MIME_TYPES.get(mime_type)
+                except Exception:
+                    pass
+            if result.format and result.format != 'SVG':
+                result.warnings.append('无法读取图像头部信息')
+
+        if result.format is None:
+            result.is_valid = False
+            result.errors.append('不是有效的图像文件')
+        elif result.format not in ImageProcessor.IMAGE_FORMATS:
+            result.is_valid = False
+            result.errors.append(f'不支持的图像格式: {result.format}')
+
+        # 确定扩展名：优先使用检测到的格式，否则使用文件名的扩展名
+        if result.format in ImageProcessor.IMAGE_FORMATS:
+            result.extension = ImageProcessor.IMAGE_FORMATS[result.format][0]
+        elif filename:
+            result.extension = Path(filename).suffix.lower().lstrip('.') or None
+        if result.mime_type is None and result.format:
+            result.mime_type = next(
+                (mime for mime, fmt in ImageProcessor.MIME_TYPES.items() if fmt == result.format), None
+            )
+
+        return result
+
     @staticmethod
     def calculate_checksum(file_data: bytes) -> str:
         """
@@ -214,18 +398,20 @@ class ImageProcessor:
             }
     
     @staticmethod
-    def validate_image_file(file_data: bytes, max_size_mb: int = 50) -> Dict[str, Any]:
+    def validate_image_file(file_data: bytes, max_size_mb: int = 50,
+                            size_bytes: Optional[int] = None) -> Dict[str, Any]:
         """
         验证图像文件
         
         Args:
-            file_data: 文件字节数据
+            file_data: 文件字节数据（流式上传时可以只传入文件头部）
             max_size_mb: 最大文件大小（MB）
+            size_bytes: 文件总大小（只传入文件头部时必须提供）
             
         Returns:
             验证结果字典
         """
-        size_mb = len(file_data) / (1024 * 1024)
+        size_mb = (size_bytes if size_bytes is not None else len(file_data)) / (1024 * 1024)
         
         validation_result: Dict[str, Any] = {
             'is_valid': True,
@@ -0,0 +1,465 @@
+"""
+异步写入队列模块（write-behind）
+
+为数字数据上传提供可选的异步写入模式：
+- 每个用户数据库（按 user_id 区分）一个有界内存队列
+- 后台线程按时间间隔或行数阈值批量刷写（一条多行 INSERT）
+- 队列满时拒绝写入（接口返回 429），形成背压
+- 服务关闭时刷写所有剩余数据
+- 批次因个别行违反约束（如会话已删除导致外键失败）而失败时，通过保存点二分定位问题行，
+  其余行正常提交，只有问题行写入死信文件
+- 连接等其他错误整批退避重试，多次重试仍失败的批次写入死信文件（数据已向客户端确认，不能只记录日志后丢弃）
+- 提供队列深度、刷写延迟、死信行数等统计信息
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+logger = logging.getLogger(__name__)
+
+# 死信目录：每个用户一个 JSONL 文件，每行为一条写入失败的数据
+INGEST_DEAD_LETTER_DIR = os.getenv(
+    "INGEST_DEAD_LETTER_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "ingest_dead_letter")
+)
+
+
+class IngestQueueFullError(Exception):
+    """队列已满，无法接收新数据"""
+    pass
+
+
+class _TenantQueue:
+    """单个用户的写入队列"""
+
+    def __init__(self):
+        self.rows: Deque[Dict[str, Any]] = deque()
+        self.oldest_enqueued_at: Optional[float] = None
+        self.consecutive_failures = 0
+        self.enqueued_total = 0
+        self.flushed_total = 0
+        self.dropped_total = 0
+        self.rejected_total = 0
+        self.last_flush_at: Optional[float] = None
+
+
+class IngestQueueManager:
+    """
+    异步写入队列管理器
+
+    请求线程调用 enqueue() 放入已构建好的行，后台线程负责批量写入用户数据库。
+    """
+
+    def __init__(
+        self,
+        max_rows: int = 10000,
+        flush_interval_ms: int = 200,
+        flush_batch_rows: int = 500,
+        max_retries: int = 3,
+        dead_letter_dir: str = INGEST_DEAD_LETTER_DIR
+    ):
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_batch_rows = flush_batch_rows
+        self.max_retries = max_retries
+        self.dead_letter_dir = dead_letter_dir
+
+        self._queues: Dict[str, _TenantQueue] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # 刷写统计
+        self._flush_count = 0
+        self._flush_failures = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+        # 放弃写入的行数，以及其中成功写入死信文件的行数
+        self._dropped_rows = 0
+        self._dead_letter_rows = 0
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """启动后台刷写线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ingest-flusher", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"异步写入队列已启动: max_rows={self.max_rows}, "
+            f"interval={int(self.flush_interval * 1000)}ms, batch={self.flush_batch_rows}"
+        )
+
+    def shutdown(self, timeout: float = 30.0):
+        """停止后台线程并刷写所有剩余数据"""
+        self._stop_event.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+        # 后台线程退出后，在当前线程中刷写剩余数据（线程可能未在超时内退出，访问队列时仍需加锁）
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            user_ids = list(self._queues.keys())
+        for user_id in user_ids:
+            while self._pending(user_id) and time.monotonic() < deadline:
+                if not self._flush_tenant(user_id, drain=True):
+                    break
+
+        # 仍未写入的数据转入死信文件
+        for user_id in user_ids:
+            with self._lock:
+                queue = self._queues.get(user_id)
+                rows = list(queue.rows) if queue else []
+                if queue:
+                    queue.rows.clear()
+                    queue.oldest_enqueued_at = None
+            if rows:
+                self._dead_letter(user_id, queue, rows, "服务关闭时未能写入数据库")
+
+        with self._lock:
+            dropped = self._dropped_rows
+        if dropped:
+            logger.error(f"异步写入队列已关闭，共 {dropped} 条数据未写入数据库，见死信目录 {self.dead_letter_dir}")
+        else:
+            logger.info("异步写入队列已关闭，所有数据已写入")
+
+    # ------------------------------------------------------------------
+    # 入队
+    # ------------------------------------------------------------------
+
+    def enqueue(self, user_id: str, rows: List[Dict[str, Any]]) -> int:
+        """
+        将一批行放入用户队列（整批接收或整批拒绝）
+
+        Args:
+            user_id: 用户ID（对应 UserDatabaseManager 的 key）
+            rows: build_raw_data_row 构建的行
+
+        Returns:
+            int: 入队后的队列深度
+
+        Raises:
+            IngestQueueFullError: 队列剩余容量不足
+        """
+        if self._stop_event.is_set():
+            raise IngestQueueFullError("写入队列正在关闭")
+
+        with self._wakeup:
+            queue = self._queues.get(user_id)
+            if queue is None:
+                queue = _TenantQueue()
+                self._queues[user_id] = queue
+
+            if len(queue.rows) + len(rows) > self.max_rows:
+                queue.rejected_total += len(rows)
+                raise IngestQueueFullError(
+                    f"写入队列已满（{len(queue.rows)}/{self.max_rows}），请稍后重试"
+                )
+
+            if not queue.rows:
+                queue.oldest_enqueued_at = time.monotonic()
+            queue.rows.extend(rows)
+            queue.enqueued_total += len(rows)
+            depth = len(queue.rows)
+
+            if depth >= self.flush_batch_rows:
+                self._wakeup.notify()
+            return depth
+
+    # ------------------------------------------------------------------
+    # 刷写
+    # ------------------------------------------------------------------
+
+    def _pending(self, user_id: str) -> bool:
+        with self._lock:
+            queue = self._queues.get(user_id)
+            return bool(queue and queue.rows)
+
+    def _dead_letter(self, user_id: str, queue: _TenantQueue, rows: List[Dict[str, Any]], error: str):
+        """
+        将放弃写入的行追加到用户的死信文件（JSONL），供人工排查或重新导入
+
+        Args:
+            user_id: 用户ID
+            queue: 用户队列（用于计数）
+            rows: 放弃写入的行
+            error: 失败原因
+        """
+        written = 0
+        try:
+            os.makedirs(self.dead_letter_dir, exist_ok=True)
+            path = os.path.join(self.dead_letter_dir, f"user_{user_id}.jsonl")
+            failed_at = datetime.utcnow().isoformat()
+            with open(path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(
+                        {"failed_at": failed_at, "error": error, "row": row},
+                        ensure_ascii=False, default=str
+                    ) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            written = len(rows)
+            logger.error(f"用户 {user_id} 的 {len(rows)} 条数据未能写入数据库，已写入死信文件 {path}: {error}")
+        except Exception as e:
+            logger.error(f"用户 {user_id} 的 {len(rows)} 条数据未能写入数据库，且写入死信文件失败（数据丢失）: {e}")
+
+        with self._lock:
+            queue.dropped_total += len(rows)
+            self._dropped_rows += len(rows)
+            self._dead_letter_rows += written
+
+    def _due_tenants(self) -> List[str]:
+        """返回达到刷写条件（行数或等待时间）的用户"""
+        now = time.monotonic()
+        due = []
+        for user_id, queue in self._queues.items():
+            if not queue.rows:
+                continue
+            if len(queue.rows) >= self.flush_batch_rows:
+                due.append(user_id)
+            elif queue.oldest_enqueued_at is not None and now - queue.oldest_enqueued_at >= self.flush_interval:
+                due.append(user_id)
+        return due
+
+    def _run(self):
+        """后台刷写循环"""
+        while not self._stop_event.is_set():
+            with self._wakeup:
+                due = self._due_tenants()
+                if not due:
+                    self._wakeup.wait(timeout=self.flush_interval)
+                    due = self._due_tenants()
+
+            for user_id in due:
+                if self._stop_event.is_set():
+                    break
+                try:
+                    self._flush_tenant(user_id)
+                except Exception as e:
+                    logger.error(f"刷写用户 {user_id} 的写入队列异常: {e}")
+
+    def _flush_tenant(self, user_id: str, drain: bool = False) -> bool:
+        """
+        刷写单个用户队列中的一批数据
+
+        Args:
+            user_id: 用户ID
+            drain: 为 True 时忽略重试上限外的退避，用于关闭时清空队列
+
+        Returns:
+            bool: 是否写入成功
+        """
+        from database.user_db_manager import get_user_db
+        from database.db_services.raw_data_service import insert_raw_data_rows
+        from database.db_services.count_service import invalidate_raw_data_counts
+
+        with self._lock:
+            queue = self._queues.get(user_id)
+            if queue is None or not queue.rows:
+                return True
+            batch = [queue.rows.popleft() for _ in range(min(self.flush_batch_rows, len(queue.rows)))]
+            queue.oldest_enqueued_at = time.monotonic() if queue.rows else None
+
+        started = time.perf_counter()
+        db = None
+        written = batch
+        rejected: List[Tuple[Dict[str, Any], str]] = []
+        try:
+            db = get_user_db(user_id)
+            try:
+                insert_raw_data_rows(db, batch)
+                db.commit()
+            except (IntegrityError, DataError) as e:
+                # 个别行的数据问题：回滚后定位问题行，其余行照常写入
+                db.rollback()
+                logger.warning(f"用户 {user_id} 批量写入存在无法写入的行，逐步定位: {e.orig if hasattr(e, 'orig') else e}")
+                written, rejected = self._insert_isolated(db, batch)
+                db.commit()
+            if written:
+                invalidate_raw_data_counts(db, (row["session_id"] for row in written))
+        except Exception as e:
+            if db is not None:
+                db.rollback()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            exhausted = False
+            with self._lock:
+                self._flush_failures += 1
+                queue.consecutive_failures += 1
+                if queue.consecutive_failures > self.max_retries:
+                    # 多次失败后移出队列写入死信文件，避免阻塞后续写入
+                    queue.consecutive_failures = 0
+                    exhausted = True
+                else:
+                    # 放回队首，下次刷写时重试
+                    queue.rows.extendleft(reversed(batch))
+                    queue.oldest_enqueued_at = time.monotonic()
+                    logger.warning(
+                        f"用户 {user_id} 批量写入失败（第 {queue.consecutive_failures} 次，"
+                        f"{elapsed_ms:.1f}ms），稍后重试: {e}"
+                    )
+            if exhausted:
+                self._dead_letter(user_id, queue, batch, f"批量写入连续失败: {e}")
+            if not drain:
+                # 失败后退避，避免数据库不可用时空转
+                self._stop_event.wait(self.flush_interval)
+            return False
+        finally:
+            if db is not None:
+                db.close()
+
+        for row, error in rejected:
+            self._dead_letter(user_id, queue, [row], f"数据无法写入: {error}")
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            queue.consecutive_failures = 0
+            queue.flushed_total += len(written)
+            queue.last_flush_at = time.time()
+            self._flush_count += 1
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+        logger.debug(f"用户 {user_id} 批量写入 {len(written)} 条数据，耗时 {elapsed_ms:.1f}ms")
+        return True
+
+    @staticmethod
+    def _insert_isolated(db, rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], str]]]:
+        """
+        在保存点中二分写入，定位违反约束或数据无效的行（不提交事务）
+
+        只有 IntegrityError / DataError 会被视为行级问题，其他错误向上抛出，由调用方整批重试。
+
+        Args:
+            db: 数据库会话
+            rows: 待写入的行
+
+        Returns:
+            Tuple: (已写入的行, [(无法写入的行, 错误信息)])
+        """
+        from database.db_services.raw_data_service import insert_raw_data_rows
+
+        written: List[Dict[str, Any]] = []
+        rejected: List[Tuple[Dict[str, Any], str]] = []
+        pending = [rows]
+        while pending:
+            chunk = pending.pop()
+            savepoint = db.begin_nested()
+            try:
+                insert_raw_data_rows(db, chunk)
+                savepoint.commit()
+                written.extend(chunk)
+            except (IntegrityError, DataError) as e:
+                savepoint.rollback()
+                if len(chunk) == 1:
+                    rejected.append((chunk[0], str(getattr(e, "orig", e)).strip()))
+                else:
+                    middle = len(chunk) // 2
+                    pending.append(chunk[middle:])
+                    pending.append(chunk[:middle])
+        return written, rejected
+
+    # ------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------
+
+    def _tenant_stats(self, queue: _TenantQueue) -> Dict[str, Any]:
+        oldest_age_ms = 0.0
+        if queue.rows and queue.oldest_enqueued_at is not None:
+            oldest_age_ms = (time.monotonic() - queue.oldest_enqueued_at) * 1000
+        return {
+            "depth": len(queue.rows),
+            "capacity": self.max_rows,
+            "oldest_age_ms": round(oldest_age_ms, 1),
+            "enqueued_total": queue.enqueued_total,
+            "flushed_total": queue.flushed_total,
+            "dropped_total": queue.dropped_total,
+            "rejected_total": queue.rejected_total,
+            "consecutive_failures": queue.consecutive_failures,
+            "last_flush_at": queue.last_flush_at,
+        }
+
+    def stats(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取队列统计信息
+
+        Args:
+            user_id: 指定用户时只返回该用户的队列信息
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        with self._lock:
+            result: Dict[str, Any] = {
+                "running": bool(self._thread and self._thread.is_alive()),
+                "flush_interval_ms": int(self.flush_interval * 1000),
+                "flush_batch_rows": self.flush_batch_rows,
+                "total_depth": sum(len(q.rows) for q in self._queues.values()),
+                "flush_count": self._flush_count,
+                "flush_failures": self._flush_failures,
+                "last_flush_ms": round(self._last_flush_ms, 2),
+                "max_flush_ms": round(self._max_flush_ms, 2),
+                "avg_flush_ms": round(self._total_flush_ms / self._flush_count, 2) if self._flush_count else 0.0,
+                "dropped_rows": self._dropped_rows,
+                "dead_letter_rows": self._dead_letter_rows,
+                "dead_letter_dir": self.dead_letter_dir,
+            }
+            if user_id is not None:
+                queue = self._queues.get(user_id)
+                result["tenant"] = self._tenant_stats(queue) if queue else self._tenant_stats(_TenantQueue())
+            else:
+                result["tenants"] = {uid: self._tenant_stats(q) for uid, q in self._queues.items()}
+            return result
+
+
+# 全局实例
+_ingest_queue: Optional[IngestQueueManager] = None
+_ingest_queue_lock = threading.Lock()
+
+
+def get_ingest_queue() -> IngestQueueManager:
+    """获取异步写入队列单例（首次调用时启动后台线程）"""
+    global _ingest_queue
+    if _ingest_queue is None:
+        with _ingest_queue_lock:
+            if _ingest_queue is None:
+                _ingest_queue = IngestQueueManager(
+                    max_rows=int(os.getenv("INGEST_QUEUE_MAX_ROWS", "10000")),
+                    flush_interval_ms=int(os.getenv("INGEST_FLUSH_INTERVAL_MS", "200")),
+                    flush_batch_rows=int(os.getenv("INGEST_FLUSH_BATCH_ROWS", "500")),
+                    max_retries=int(os.getenv("INGEST_FLUSH_MAX_RETRIES", "3")),
+                )
+                _ingest_queue.start()
+    return _ingest_queue
+
+
+def get_default_ingest_mode() -> str:
+    """获取默认写入模式（sync / async）"""
+    mode = os.getenv("INGEST_MODE", "sync").lower()
+    return mode if mode in ("sync", "async") else "sync"
+
+
+def shutdown_ingest_queue(timeout: float = 30.0):
+    """关闭异步写入队列（刷写剩余数据）"""
+    global _ingest_queue
+    if _ingest_queue is not None:
+        _ingest_queue.shutdown(timeout=timeout)
+        _ingest_queue = None
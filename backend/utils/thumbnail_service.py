@@ -0,0 +1,573 @@
+"""
+缩略图金字塔模块
+
+图像上传后在后台一次性生成多个尺寸的缩略图（默认 150/300/500）：
+- 原图只解码一次，从大到小逐级缩放；解码和缩放在有并发上限的进程池中执行，不阻塞事件循环
+- 上传后和缩略图接口补齐的渲染进入独立的后台队列，按顺序等待渲染池空位，不会因请求繁忙被拒绝
+- 缩略图写入原图同目录下的 thumbs/，例如 .../session_x/thumbs/<name>_300.jpg
+- 对象路径记录在 raw_data.file_meta["thumbnails"] 中，缩略图接口直接返回预生成的对象
+- 历史数据可通过 database_initializer.py backfill-thumbnails 命令补齐
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from PIL import Image
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# 预生成的缩略图尺寸（正方形边长，像素）
+THUMBNAIL_SIZES: Tuple[int, ...] = tuple(sorted({
+    int(s) for s in os.getenv("THUMBNAIL_SIZES", "150,300,500").split(",") if s.strip()
+}))
+THUMBNAIL_JPEG_QUALITY = int(os.getenv("THUMBNAIL_JPEG_QUALITY", "85"))
+THUMBNAIL_BACKFILL_BATCH_SIZE = int(os.getenv("THUMBNAIL_BACKFILL_BATCH_SIZE", "100"))
+
+# 可以生成缩略图的文件格式（视频等其他文件不生成）
+THUMBNAIL_SOURCE_FORMATS = frozenset({"jpg", "jpeg", "png", "gif", "bmp", "tif", "tiff", "webp"})
+
+# 正方形画布背景色（浅灰色）
+_CANVAS_COLOR = (240, 240, 240)
+
+# 支持 reduce() 整数倍缩小的图像模式
+_REDUCIBLE_MODES = frozenset({'L', 'LA', 'RGB', 'RGBA', 'CMYK'})
+
+
+def is_thumbnail_source(data_type: Optional[str], data_format: Optional[str]) -> bool:
+    """
+    判断原始数据是否可以生成缩略图
+
+    Args:
+        data_type: 数据类型（file，或旧数据中的 image）
+        data_format: 文件格式（扩展名）
+
+    Returns:
+        bool: 可以生成缩略图时返回 True
+    """
+    if data_type == "image":
+        return True
+    return data_type == "file" and (data_format or "").lower() in THUMBNAIL_SOURCE_FORMATS
+
+
+def thumbnail_object_path(object_key: str, size: int) -> str:
+    """
+    计算缩略图的对象路径（与原图同目录的 thumbs/ 下）
+
+    Args:
+        object_key: 原图对象路径
+        size: 缩略图尺寸
+
+    Returns:
+        str: 缩略图对象路径
+    """
+    directory, _, filename = object_key.rpartition("/")
+    stem = filename.rsplit(".", 1)[0]
+    prefix = f"{directory}/thumbs" if directory else "thumbs"
+    return f"{prefix}/{stem}_{size}.jpg"
+
+
+def select_thumbnail(thumbnails: Optional[Dict[str, str]], size: int) -> Optional[Tuple[int, str]]:
+    """
+    从预生成的缩略图中选择不小于请求尺寸的最小一级（都小于请求尺寸时选最大一级）
+
+    Args:
+        thumbnails: file_meta["thumbnails"]，尺寸（字符串）-> 对象路径
+        size: 请求的尺寸
+
+    Returns:
+        Optional[Tuple[int, str]]: (尺寸, 对象路径)，没有预生成缩略图时返回 None
+    """
+    if not thumbnails:
+        return None
+    available = sorted((int(s), path) for s, path in thumbnails.items())
+    for thumb_size, path in available:
+        if thumb_size >= size:
+            return thumb_size, path
+    return available[-1]
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """转换为 RGB，带透明度的图像铺白色背景"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        if image.mode == 'RGBA':
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            return background
+        return image.convert('RGB')
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def _decode_reduced(source: Image.Image, max_size: int) -> Image.Image:
+    """
+    以不低于目标尺寸两倍的分辨率解码图像
+
+    JPEG 通过 draft() 在解码时按 1/2、1/4、1/8 缩小（DCT 缩放），不必解码全尺寸；
+    其他格式解码后先用 reduce() 做整数倍缩小，再交给 LANCZOS 精细缩放。
+    """
+    if source.format == 'JPEG':
+        source.draft('RGB', (max_size * 2, max_size * 2))
+    factor = max(source.size) // (max_size * 2)
+    if factor > 1 and source.mode in _REDUCIBLE_MODES:
+        return source.reduce(factor)
+    return source
+
+
+def _encode_square(image: Image.Image, size: int) -> bytes:
+    """将已缩放的图像居中放到正方形画布上并编码为 JPEG"""
+    canvas = Image.new('RGB', (size, size), _CANVAS_COLOR)
+    canvas.paste(image, ((size - image.size[0]) // 2, (size - image.size[1]) // 2))
+    output = io.BytesIO()
+    canvas.save(output, format='JPEG', quality=THUMBNAIL_JPEG_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def generate_thumbnail_pyramid(image_data: bytes, sizes: Iterable[int] = THUMBNAIL_SIZES) -> Dict[int, bytes]:
+    """
+    生成多个尺寸的缩略图
+
+    原图只解码一次（JPEG 直接按缩小比例解码，其他格式先整数倍缩小）；
+    从最大尺寸开始逐级缩放，较小尺寸基于上一级结果重采样，不再每个尺寸都从原图缩放。
+    该函数为 CPU 密集型，请求中应通过 ThumbnailRenderPool 调用。
+
+    Args:
+        image_data: 原始图像数据
+        sizes: 缩略图尺寸（正方形边长）
+
+    Returns:
+        Dict[int, bytes]: 尺寸 -> JPEG 数据
+
+    Raises:
+        图像无法解码时抛出 PIL 的异常
+    """
+    sizes = sorted(set(sizes), reverse=True)
+    with Image.open(io.BytesIO(image_data)) as source:
+        original_size = source.size
+        image = _to_rgb(_decode_reduced(source, sizes[0]))
+
+        pyramid: Dict[int, bytes] = {}
+        for size in sizes:
+            # thumbnail() 保持宽高比且不会放大
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            pyramid[size] = _encode_square(image, size)
+
+    logger.info(
+        f"[缩略图] 生成成功: {original_size[0]}x{original_size[1]} -> "
+        f"{', '.join(f'{s}:{len(d)}B' for s, d in sorted(pyramid.items()))}"
+    )
+    return pyramid
+
+
+class ThumbnailPoolBusyError(Exception):
+    """缩略图渲染池已满，等待超时"""
+    pass
+
+
+class ThumbnailRenderPool:
+    """
+    缩略图渲染池
+
+    解码和缩放在独立的进程池（或线程池）中执行，不占用事件循环；
+    同时处理的任务数受限，请求路径（render_async）等待空位超过 queue_timeout 时拒绝，
+    避免请求无限堆积。后台渲染通过 submit_background 进入独立的线程队列，
+    由少量后台线程逐个阻塞等待空位，不占用请求线程池，也不会因繁忙被拒绝；
+    带 key 的后台任务在排队或执行期间不会重复入队。
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_pending: int = 4,
+        queue_timeout: float = 3.0,
+        executor: str = "process",
+        background_workers: int = 1,
+        background_max_queued: int = 256
+    ):
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self.queue_timeout = queue_timeout
+        self.executor_type = executor if executor in ("process", "thread") else "process"
+        self.background_workers = max(background_workers, 1)
+        self.background_max_queued = background_max_queued
+
+        self._executor = self._create_executor()
+        self._background = ThreadPoolExecutor(
+            max_workers=self.background_workers, thread_name_prefix="thumb-background"
+        )
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+
+        # 统计
+        self._waiting = 0
+        self._in_flight = 0
+        self._submitted_total = 0
+        self._completed_total = 0
+        self._failed_total = 0
+        self._rejected_total = 0
+        self._total_wait_ms = 0.0
+        self._max_wait_ms = 0.0
+        self._total_render_ms = 0.0
+        self._max_render_ms = 0.0
+        self._background_queued = 0
+        self._background_dropped_total = 0
+        self._background_keys: Set[str] = set()
+
+    def _create_executor(self) -> Executor:
+        if self.executor_type == "thread":
+            return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="thumb-render")
+        # spawn 避免在多线程的服务进程中 fork
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _acquire(self, timeout: Optional[float]):
+        """等待空位（timeout 为 None 时一直等待），超时抛出 ThumbnailPoolBusyError"""
+        started = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            if not acquired:
+                self._rejected_total += 1
+            else:
+                self._in_flight += 1
+                self._submitted_total += 1
+                self._total_wait_ms += wait_ms
+                self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+        if not acquired:
+            raise ThumbnailPoolBusyError(
+                f"缩略图渲染繁忙（{self.max_pending} 个任务处理中），请稍后重试"
+            )
+
+    def _release(self, succeeded: bool, render_ms: float):
+        with self._lock:
+            self._in_flight -= 1
+            if succeeded:
+                self._completed_total += 1
+            else:
+                self._failed_total += 1
+            self._total_render_ms += render_ms
+            self._max_render_ms = max(self._max_render_ms, render_ms)
+        self._slots.release()
+
+    def _submit(self, image_data: bytes, sizes: Iterable[int]) -> Future:
+        """提交任务（调用前已占用空位），任务结束时释放空位"""
+        started = time.perf_counter()
+        try:
+            try:
+                future = self._executor.submit(generate_thumbnail_pyramid, image_data, tuple(sizes))
+            except BrokenExecutor:
+                # 子进程异常退出（如解码时崩溃）后进程池不可再用，重建后重试一次
+                logger.warning("[缩略图] 渲染进程池已损坏，正在重建")
+                self._executor = self._create_executor()
+                future = self._executor.submit(generate_thumbnail_pyramid, image_data, tuple(sizes))
+        except Exception:
+            self._release(False, 0.0)
+            raise
+
+        future.add_done_callback(lambda f: self._release(
+            not f.cancelled() and f.exception() is None,
+            (time.perf_counter() - started) * 1000
+        ))
+        return future
+
+    def render(self, image_data: bytes, sizes: Iterable[int] = THUMBNAIL_SIZES) -> Dict[int, bytes]:
+        """
+        生成缩略图（阻塞调用，用于后台任务和命令行，一直等待空位）
+
+        Args:
+            image_data: 原始图像数据
+            sizes: 缩略图尺寸
+
+        Returns:
+            Dict[int, bytes]: 尺寸 -> JPEG 数据
+        """
+        self._acquire(None)
+        return self._submit(image_data, sizes).result()
+
+    async def render_async(self, image_data: bytes, sizes: Iterable[int] = THUMBNAIL_SIZES) -> Dict[int, bytes]:
+        """
+        生成缩略图（在请求处理中使用，等待空位和渲染都不阻塞事件循环）
+
+        Args:
+            image_data: 原始图像数据
+            sizes: 缩略图尺寸
+
+        Returns:
+            Dict[int, bytes]: 尺寸 -> JPEG 数据
+
+        Raises:
+            ThumbnailPoolBusyError: 等待空位超时
+        """
+        await asyncio.to_thread(self._acquire, self.queue_timeout)
+        return await asyncio.wrap_future(self._submit(image_data, sizes))
+
+    def submit_background(self, fn: Callable[..., Any], *args, key: Optional[str] = None) -> bool:
+        """
+        将后台渲染任务放入独立的后台队列
+
+        Args:
+            fn: 任务函数（在后台线程中执行，可阻塞等待渲染池空位）
+            args: 任务参数
+            key: 去重键（可选），相同 key 的任务排队或执行期间不再重复入队
+
+        Returns:
+            bool: 是否已入队或已在队列中（后台队列已满时返回 False）
+        """
+        with self._lock:
+            if key is not None and key in self._background_keys:
+                return True
+            if self._background_queued >= self.background_max_queued:
+                self._background_dropped_total += 1
+                return False
+            self._background_queued += 1
+            if key is not None:
+                self._background_keys.add(key)
+
+        def finish():
+            with self._lock:
+                self._background_queued -= 1
+                self._background_keys.discard(key)
+
+        def run():
+            try:
+                fn(*args)
+            finally:
+                finish()
+
+        try:
+            self._background.submit(run)
+        except Exception:
+            finish()
+            raise
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取渲染池统计信息
+
+        Returns:
+            Dict[str, Any]: 并发占用、等待数、拒绝数、后台队列长度及等待/渲染耗时
+        """
+        with self._lock:
+            finished = self._completed_total + self._failed_total
+            return {
+                "executor": self.executor_type,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "queue_timeout_s": self.queue_timeout,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "saturation": round(self._in_flight / self.max_pending, 2),
+                "submitted_total": self._submitted_total,
+                "completed_total": self._completed_total,
+                "failed_total": self._failed_total,
+                "rejected_total": self._rejected_total,
+                "avg_wait_ms": round(self._total_wait_ms / self._submitted_total, 2) if self._submitted_total else 0.0,
+                "max_wait_ms": round(self._max_wait_ms, 2),
+                "avg_render_ms": round(self._total_render_ms / finished, 2) if finished else 0.0,
+                "max_render_ms": round(self._max_render_ms, 2),
+                "background_workers": self.background_workers,
+                "background_queued": self._background_queued,
+                "background_dropped_total": self._background_dropped_total,
+            }
+
+    def shutdown(self):
+        """关闭渲染池，取消尚未开始的任务"""
+        self._background.shutdown(wait=False, cancel_futures=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局实例
+_render_pool: Optional[ThumbnailRenderPool] = None
+_render_pool_lock = threading.Lock()
+
+
+def get_thumbnail_render_pool() -> ThumbnailRenderPool:
+    """获取缩略图渲染池单例"""
+    global _render_pool
+    if _render_pool is None:
+        with _render_pool_lock:
+            if _render_pool is None:
+                workers = int(os.getenv("THUMBNAIL_RENDER_WORKERS", "2"))
+                _render_pool = ThumbnailRenderPool(
+                    workers=workers,
+                    max_pending=int(os.getenv("THUMBNAIL_RENDER_MAX_PENDING", str(workers * 2))),
+                    queue_timeout=float(os.getenv("THUMBNAIL_RENDER_QUEUE_TIMEOUT", "3")),
+                    executor=os.getenv("THUMBNAIL_RENDER_EXECUTOR", "process").lower(),
+                    background_workers=int(os.getenv("THUMBNAIL_BACKGROUND_WORKERS", "1")),
+                    background_max_queued=int(os.getenv("THUMBNAIL_BACKGROUND_MAX_QUEUED", "256")),
+                )
+    return _render_pool
+
+
+def shutdown_thumbnail_render_pool():
+    """关闭缩略图渲染池"""
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown()
+        _render_pool = None
+
+
+def store_thumbnail_pyramid(object_key: str, image_data: bytes) -> Dict[str, str]:
+    """
+    生成缩略图金字塔并写入 MinIO
+
+    Args:
+        object_key: 原图对象路径
+        image_data: 原始图像数据
+
+    Returns:
+        Dict[str, str]: 尺寸（字符串，便于 JSON 存储）-> 缩略图对象路径
+    """
+    from storage.storage_manager import get_storage_manager
+
+    storage_manager = get_storage_manager()
+    thumbnails: Dict[str, str] = {}
+    for size, data in get_thumbnail_render_pool().render(image_data).items():
+        path = thumbnail_object_path(object_key, size)
+        storage_manager.put_bytes(path, data, content_type='image/jpeg')
+        thumbnails[str(size)] = path
+    return thumbnails
+
+
+def _load_object(object_key: str) -> Optional[bytes]:
+    from storage.storage_manager import get_storage_manager
+
+    result = get_storage_manager()._get_file_bytes_direct(object_key)
+    if result and result.get('success') and result.get('data'):
+        return result['data']
+    return None
+
+
+def create_thumbnails(user_id: str, raw_data_id: str, object_key: str,
+                      image_data: Optional[bytes] = None) -> bool:
+    """
+    为一条原始数据生成缩略图并记录到 file_meta（上传后的后台任务入口）
+
+    Args:
+        user_id: 用户ID
+        raw_data_id: 原始数据ID
+        object_key: 原图对象路径
+        image_data: 原始图像数据（已在内存中时传入，避免再次从 MinIO 下载）
+
+    Returns:
+        bool: 是否成功
+    """
+    from database.user_db_manager import get_user_db
+    from database.db_services.raw_data_service import update_file_meta
+
+    db = None
+    try:
+        if image_data is None:
+            image_data = _load_object(object_key)
+            if image_data is None:
+                logger.warning(f"[缩略图] 无法读取原图: {object_key}")
+                return False
+
+        thumbnails = store_thumbnail_pyramid(object_key, image_data)
+        db = get_user_db(user_id)
+        if not update_file_meta(db, raw_data_id, {"thumbnails": thumbnails}):
+            logger.warning(f"[缩略图] 记录缩略图失败: {raw_data_id}")
+            return False
+        logger.info(f"[缩略图] 已生成 {raw_data_id} 的缩略图: {sorted(thumbnails, key=int)}")
+        return True
+    except Exception as e:
+        logger.error(f"[缩略图] 生成 {raw_data_id} 的缩略图失败: {e}")
+        return False
+    finally:
+        if db is not None:
+            db.close()
+
+
+def schedule_thumbnails(user_id: str, raw_data_id: str, object_key: str,
+                        image_data: Optional[bytes] = None) -> bool:
+    """
+    将 create_thumbnails 放入渲染池的后台队列（不阻塞调用方）
+
+    同一条数据已在队列中或正在生成时不重复入队；后台队列已满时跳过，
+    可稍后通过 backfill-thumbnails 命令补齐。
+
+    Args:
+        user_id: 用户ID
+        raw_data_id: 原始数据ID
+        object_key: 原图对象路径
+        image_data: 原始图像数据（可选）
+
+    Returns:
+        bool: 是否已入队
+    """
+    queued = get_thumbnail_render_pool().submit_background(
+        create_thumbnails, user_id, raw_data_id, object_key, image_data, key=str(raw_data_id)
+    )
+    if not queued:
+        logger.warning(f"[缩略图] 后台队列已满，跳过 {raw_data_id}，可通过 backfill-thumbnails 补齐")
+    return queued
+
+
+def backfill_thumbnails(db: Session, batch_size: int = THUMBNAIL_BACKFILL_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    为已有图像数据补齐缩略图
+
+    按主键顺序分批扫描，只处理 file_meta 中还没有 thumbnails 的图像；
+    每条数据处理后立即提交，中断后重新执行会跳过已完成的数据。
+
+    Args:
+        db: 用户数据库会话
+        batch_size: 每批扫描的行数
+
+    Returns:
+        Dict[str, Any]: 生成成功和失败的数量
+    """
+    from database.db_models.user_models import RawData
+    from database.db_services.raw_data_service import completed_raw_data, update_file_meta
+
+    generated = 0
+    failed = 0
+    last_id = ''
+    while True:
+        rows = db.query(
+            RawData.id, RawData.data_type, RawData.data_format, RawData.object_key, RawData.file_meta
+        ).filter(
+            RawData.id > last_id,
+            RawData.data_type.in_(("file", "image")),
+            RawData.object_key.isnot(None),
+            completed_raw_data()
+        ).order_by(RawData.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        for row in rows:
+            if (row.file_meta or {}).get("thumbnails"):
+                continue
+            if not is_thumbnail_source(row.data_type, row.data_format):
+                continue
+            try:
+                image_data = _load_object(row.object_key)
+                if image_data is None:
+                    raise ValueError(f"无法读取原图: {row.object_key}")
+                thumbnails = store_thumbnail_pyramid(row.object_key, image_data)
+                if not update_file_meta(db, row.id, {"thumbnails": thumbnails}):
+                    raise ValueError("写入 file_meta 失败")
+                generated += 1
+            except Exception as e:
+                failed += 1
+                logger.error(f"[缩略图] 补齐 {row.id} 的缩略图失败: {e}")
+
+    return {"generated": generated, "failed": failed}
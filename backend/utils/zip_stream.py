@@ -0,0 +1,140 @@
+"""
+流式 ZIP 写入模块
+
+基于标准库 zipfile 写入不可 seek 的输出：每个成员使用数据描述符（data descriptor）
+记录 CRC 和大小，写入的字节立即可以发送给客户端，无需在内存或磁盘中组装整个压缩包。
+
+已经压缩过的格式（JPEG/PNG/MP4 等）以 STORED 方式写入，不再重复压缩。
+"""
+
+import time
+import zipfile
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# 已压缩格式，写入时不再 deflate
+ZIP_STORED_EXTENSIONS = frozenset({
+    "jpg", "jpeg", "png", "gif", "webp", "heic",
+    "mp4", "mov", "avi", "mkv", "webm",
+    "zip", "gz", "7z", "rar", "bz2", "xz",
+})
+
+
+def is_precompressed(filename: str) -> bool:
+    """
+    根据扩展名判断文件是否为已压缩格式
+
+    Args:
+        filename: 文件名或扩展名
+
+    Returns:
+        bool: 已压缩时返回 True
+    """
+    ext = filename.rsplit(".", 1)[-1].lower()
+    return ext in ZIP_STORED_EXTENSIONS
+
+
+class ChunkSink:
+    """只追加、不可 seek 的输出目标（用于 zipfile / pyarrow 流式写入），由调用方取走已写入的数据"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ZipStreamWriter:
+    """
+    流式 ZIP 写入器
+
+    每个写入方法都是生成器，逐块产出压缩包字节；调用方需按顺序完整迭代。
+    """
+
+    def __init__(self, compresslevel: Optional[int] = None):
+        self._sink = ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", compression=zipfile.ZIP_DEFLATED,
+                                    compresslevel=compresslevel, allowZip64=True)
+
+    @staticmethod
+    def _zipinfo(arcname: str, compress: bool, date_time: Optional[Tuple[int, ...]]) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(arcname, date_time=date_time or time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        info.external_attr = 0o644 << 16
+        return info
+
+    def write_stream(
+        self,
+        arcname: str,
+        chunks: Iterable[bytes],
+        compress: Optional[bool] = None,
+        date_time: Optional[Tuple[int, ...]] = None
+    ) -> Iterator[bytes]:
+        """
+        写入一个成员，内容来自数据块迭代器
+
+        数据块迭代器抛出异常时，已写入的部分仍作为该成员保存（压缩包结构保持完整），
+        异常继续向上抛出。
+
+        Args:
+            arcname: 压缩包内路径
+            chunks: 成员内容数据块
+            compress: 是否压缩，默认按扩展名判断（已压缩格式不压缩）
+            date_time: 成员修改时间（默认当前时间）
+
+        Yields:
+            bytes: 压缩包数据块
+        """
+        if compress is None:
+            compress = not is_precompressed(arcname)
+        info = self._zipinfo(arcname, compress, date_time)
+
+        # 大小未知，统一启用 ZIP64 以支持超过 4GB 的成员
+        with self._zip.open(info, mode="w", force_zip64=True) as member:
+            for chunk in chunks:
+                member.write(chunk)
+                data = self._sink.drain()
+                if data:
+                    yield data
+        data = self._sink.drain()
+        if data:
+            yield data
+
+    def write_bytes(self, arcname: str, data: bytes, compress: bool = True) -> Iterator[bytes]:
+        """
+        写入一个内存中的小成员（如元数据文件）
+
+        Args:
+            arcname: 压缩包内路径
+            data: 成员内容
+            compress: 是否压缩
+
+        Yields:
+            bytes: 压缩包数据块
+        """
+        yield from self.write_stream(arcname, [data], compress=compress)
+
+    def close(self) -> Iterator[bytes]:
+        """
+        写入中央目录并结束压缩包
+
+        Yields:
+            bytes: 压缩包数据块
+        """
+        self._zip.close()
+        data = self._sink.drain()
+        if data:
+            yield data